@@ -319,7 +319,8 @@ const CanvasExcali: React.FC<CanvasExcaliProps> = ({
             updated: Date.now(),
             frameId: null,
             index: null,
-            customData: {},
+            // posterURL / spriteURL / duration rendered by the server
+            customData: elementData.customData ?? {},
           },
         ])
 
@@ -391,6 +392,8 @@ const CanvasExcali: React.FC<CanvasExcaliProps> = ({
         return (
           <VideoElement
             src={link}
+            poster={element.customData?.posterURL}
+            hlsSrc={element.customData?.hlsURL}
             width={element.width}
             height={element.height}
           />
@@ -437,16 +440,82 @@ const CanvasExcali: React.FC<CanvasExcaliProps> = ({
     [addVideoEmbed, canvasId]
   )
 
+  const handleElementPending = useCallback(
+    (pendingData: ISocket.SessionElementPendingEvent) => {
+      if (!excalidrawAPI || pendingData.canvas_id !== canvasId) return
+
+      const currentElements = excalidrawAPI.getSceneElements()
+      if (currentElements.some((element) => element.id === pendingData.element.id)) return
+      excalidrawAPI.updateScene({
+        elements: [...currentElements, pendingData.element],
+      })
+    },
+    [excalidrawAPI, canvasId]
+  )
+
+  const handleElementUpdated = useCallback(
+    (updateData: ISocket.SessionElementUpdatedEvent) => {
+      if (!excalidrawAPI || updateData.canvas_id !== canvasId) return
+
+      // Previews and the final image of a placeholder swap its file
+      const file = updateData.file
+      const swapsFile =
+        !!file &&
+        file.mimeType.startsWith('image/') &&
+        updateData.element?.fileId === file.id
+      if (swapsFile) excalidrawAPI.addFiles([file])
+
+      // Only merge customData so local edits (position, size) are kept
+      const elements = excalidrawAPI.getSceneElements().map((element) => {
+        if (element.id !== updateData.element_id) return element
+        const updated = {
+          ...element,
+          customData: {
+            ...element.customData,
+            ...updateData.element?.customData,
+          },
+          isDeleted: element.isDeleted || !!updateData.element?.isDeleted,
+          version: element.version + 1,
+        }
+        if (updated.type !== 'image' || !swapsFile) return updated
+        const isFinal =
+          element.status === 'pending' && updateData.element.status === 'saved'
+        return {
+          ...updated,
+          fileId: file.id,
+          status: updateData.element.status ?? 'saved',
+          // The final image brings its real size, previews keep the placeholder's
+          ...(isFinal && {
+            width: updateData.element.width,
+            height: updateData.element.height,
+          }),
+        }
+      })
+      excalidrawAPI.updateScene({ elements })
+    },
+    [excalidrawAPI, canvasId]
+  )
+
   useEffect(() => {
     eventBus.on('Socket::Session::ImageGenerated', handleImageGenerated)
     eventBus.on('Socket::Session::VideoGenerated', handleVideoGenerated)
+    eventBus.on('Socket::Session::ElementUpdated', handleElementUpdated)
+    eventBus.on('Socket::Session::ElementPending', handleElementPending)
     eventBus.on('Canvas::GenerationStarted', handleGenerationStarted)
     return () => {
       eventBus.off('Socket::Session::ImageGenerated', handleImageGenerated)
       eventBus.off('Socket::Session::VideoGenerated', handleVideoGenerated)
+      eventBus.off('Socket::Session::ElementUpdated', handleElementUpdated)
+      eventBus.off('Socket::Session::ElementPending', handleElementPending)
       eventBus.off('Canvas::GenerationStarted', handleGenerationStarted)
     }
-  }, [handleImageGenerated, handleVideoGenerated, handleGenerationStarted])
+  }, [
+    handleImageGenerated,
+    handleVideoGenerated,
+    handleElementUpdated,
+    handleElementPending,
+    handleGenerationStarted,
+  ])
 
   // Render ghost overlays synced to canvas coordinates
   const renderGhostOverlays = () => {
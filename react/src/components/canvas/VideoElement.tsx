@@ -4,6 +4,8 @@ import { cn } from '@/lib/utils'
 
 interface VideoElementProps {
     src: string
+    // HLS master playlist, used where the browser plays HLS natively
+    hlsSrc?: string
     poster?: string
     duration?: number
     autoPlay?: boolean
@@ -18,8 +20,13 @@ interface VideoElementProps {
     onEnded?: () => void
 }
 
+const canPlayHls = (): boolean =>
+    typeof document !== 'undefined' &&
+    document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== ''
+
 export const VideoElement: React.FC<VideoElementProps> = ({
     src,
+    hlsSrc,
     poster,
     duration,
     autoPlay = false,
@@ -137,8 +144,10 @@ export const VideoElement: React.FC<VideoElementProps> = ({
         >
             <video
                 ref={videoRef}
-                src={src}
+                src={hlsSrc && canPlayHls() ? hlsSrc : src}
                 poster={poster}
+                // With a poster there is nothing to show before playback
+                preload={poster ? 'none' : 'metadata'}
                 loop={loop}
                 muted={muted}
                 className="w-full h-full object-cover"
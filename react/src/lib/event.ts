@@ -31,6 +31,8 @@ export type TEvents = {
   'Socket::Session::Info': ISocket.SessionInfoEvent
   'Socket::Session::ImageGenerated': ISocket.SessionImageGeneratedEvent
   'Socket::Session::VideoGenerated': ISocket.SessionVideoGeneratedEvent
+  'Socket::Session::ElementUpdated': ISocket.SessionElementUpdatedEvent
+  'Socket::Session::ElementPending': ISocket.SessionElementPendingEvent
   'Socket::Session::Delta': ISocket.SessionDeltaEvent
   'Socket::Session::ToolCall': ISocket.SessionToolCallEvent
   'Socket::Session::ToolCallArguments': ISocket.SessionToolCallArgumentsEvent
@@ -122,6 +122,15 @@ export class SocketIOManager {
       case ISocket.SessionEventType.VideoGenerated:
         eventBus.emit('Socket::Session::VideoGenerated', data)
         break
+      case ISocket.SessionEventType.ElementUpdated:
+        eventBus.emit('Socket::Session::ElementUpdated', data)
+        break
+      case ISocket.SessionEventType.ElementPending:
+        eventBus.emit('Socket::Session::ElementPending', data)
+        break
+      case ISocket.SessionEventType.CanvasBatch:
+        data.events.forEach((event) => this.handleSessionUpdate(event))
+        break
       case ISocket.SessionEventType.AllMessages:
         eventBus.emit('Socket::Session::AllMessages', data)
         break
@@ -8,6 +8,9 @@ export enum SessionEventType {
   Info = 'info',
   ImageGenerated = 'image_generated',
   VideoGenerated = 'video_generated',
+  CanvasBatch = 'canvas_batch',
+  ElementUpdated = 'element_updated',
+  ElementPending = 'element_pending',
   Delta = 'delta',
   ToolCall = 'tool_call',
   ToolCallArguments = 'tool_call_arguments',
@@ -44,11 +47,45 @@ export interface SessionImageGeneratedEvent extends SessionBaseEvent {
 export interface SessionVideoGeneratedEvent extends SessionBaseEvent {
   type: SessionEventType.VideoGenerated
   element: any
-  file: BinaryFileData & { duration?: number }
+  file: BinaryFileData & {
+    duration?: number
+    posterURL?: string
+    spriteURL?: string
+    spriteFrames?: number
+  }
   canvas_id: string
   video_url: string
 }
 
+// Fields of an existing canvas element changed on the server (e.g. HLS ready)
+export interface SessionElementUpdatedEvent extends SessionBaseEvent {
+  type: SessionEventType.ElementUpdated
+  canvas_id: string
+  element_id: string
+  element: any
+  file?: BinaryFileData
+}
+
+// Placeholder reserved on the canvas for a generation that is still running;
+// previews and the final asset arrive as element_updated events
+export interface SessionElementPendingEvent extends SessionBaseEvent {
+  type: SessionEventType.ElementPending
+  canvas_id: string
+  element: ExcalidrawImageElement
+}
+
+// Several canvas inserts applied together by the server's canvas writer
+export interface SessionCanvasBatchEvent extends SessionBaseEvent {
+  type: SessionEventType.CanvasBatch
+  canvas_id: string
+  events: (
+    | SessionImageGeneratedEvent
+    | SessionVideoGeneratedEvent
+    | SessionElementUpdatedEvent
+    | SessionElementPendingEvent
+  )[]
+}
+
 export interface SessionDeltaEvent extends SessionBaseEvent {
   type: SessionEventType.Delta
   text: string
@@ -103,6 +140,9 @@ export type SessionUpdateEvent =
   | SessionToolCallProgressEvent
   | SessionImageGeneratedEvent
   | SessionVideoGeneratedEvent
+  | SessionCanvasBatchEvent
+  | SessionElementUpdatedEvent
+  | SessionElementPendingEvent
   | SessionAllMessagesEvent
   | SessionDoneEvent
   | SessionErrorEvent
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Server import-time benchmark
+
+Imports the server entry module (main by default) in fresh interpreters with
+`python -X importtime`, reports the total import time (median of --runs) and
+the slowest imports, and checks the result against scripts/import_budget.json:
+
+- total_ms: upper bound for the cumulative import time of the entry module
+- forbidden: top-level packages that must not be imported at startup; they
+  are loaded on first use (tool modules, agent stack, SDKs)
+
+Usage:
+    python scripts/import_budget.py            # report and check, exit 1 if over budget
+    python scripts/import_budget.py --top 30   # show more of the slowest imports
+    python scripts/import_budget.py --json     # machine readable report
+
+Run it from the repository root with the server's environment active.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(REPO_DIR, 'server')
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_budget.json')
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse `-X importtime` lines into {'name', 'depth', 'self_us', 'cumulative_us'}"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            entries.append({
+                'name': name.strip(),
+                # Nesting is shown as two spaces per level
+                'depth': (len(name) - len(name.lstrip(' ')) - 1) // 2,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+            })
+        except ValueError:
+            continue
+    return entries
+
+
+def measure(module: str) -> List[Dict[str, Any]]:
+    with tempfile.TemporaryDirectory() as user_data_dir:
+        # A throwaway user data dir keeps the run independent of local state
+        env = {**os.environ, 'USER_DATA_DIR': user_data_dir, 'PYTHONDONTWRITEBYTECODE': '1'}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=SERVER_DIR, env=env, capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        tail = '\n'.join(line for line in result.stderr.splitlines()
+                         if not line.startswith('import time:'))[-2000:]
+        raise RuntimeError(f'Importing {module} failed:\n{tail}')
+    return parse_importtime(result.stderr)
+
+
+def build_report(module: str, runs: int, top: int) -> Dict[str, Any]:
+    # The first run warms the bytecode and filesystem caches
+    measure(module)
+    samples = [measure(module) for _ in range(runs)]
+    totals = [next(e['cumulative_us'] for e in s if e['name'] == module) for s in samples]
+    entries = samples[totals.index(sorted(totals)[len(totals) // 2])]
+    packages = sorted({e['name'].split('.')[0] for e in entries})
+    return {
+        'module': module,
+        'total_ms': round(statistics.median(totals) / 1000, 1),
+        'runs_ms': [round(t / 1000, 1) for t in totals],
+        'slowest_cumulative': [
+            {'name': e['name'], 'ms': round(e['cumulative_us'] / 1000, 1)}
+            for e in sorted(entries, key=lambda e: -e['cumulative_us'])
+            if e['name'] != module
+        ][:top],
+        'slowest_self': [
+            {'name': e['name'], 'ms': round(e['self_us'] / 1000, 1)}
+            for e in sorted(entries, key=lambda e: -e['self_us'])
+        ][:top],
+        'packages': packages,
+    }
+
+
+def check(report: Dict[str, Any], budget: Dict[str, Any]) -> List[str]:
+    problems = []
+    if report['total_ms'] > budget['total_ms']:
+        problems.append(f"import of {report['module']} took {report['total_ms']} ms, "
+                        f"budget is {budget['total_ms']} ms")
+    for package in budget.get('forbidden', []):
+        if package in report['packages']:
+            problems.append(f'{package} is imported at startup, it should be loaded on first use')
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default=None, help='Entry module to import (default from the budget file)')
+    parser.add_argument('--runs', type=int, default=5, help='Measured runs; the median is reported')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE, 'r', encoding='utf-8') as f:
+        budget = json.load(f)
+    module = args.module or budget.get('module', 'main')
+
+    try:
+        report = build_report(module, max(1, args.runs), args.top)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    problems = check(report, budget)
+
+    if args.json:
+        print(json.dumps({**report, 'budget': budget, 'problems': problems}, indent=2))
+    else:
+        print(f"Import of {module}: {report['total_ms']} ms (median of {report['runs_ms']}), "
+              f"budget {budget['total_ms']} ms\n")
+        print('Slowest imports (cumulative):')
+        for entry in report['slowest_cumulative']:
+            print(f"  {entry['ms']:>8.1f} ms  {entry['name']}")
+        print('\nSlowest imports (self):')
+        for entry in report['slowest_self']:
+            print(f"  {entry['ms']:>8.1f} ms  {entry['name']}")
+        print()
+        for problem in problems:
+            print(f'❌ {problem}')
+        if not problems:
+            print('✅ Within the import budget')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1043 @@
+#!/usr/bin/env python
+"""
+End-to-end load test with local provider stand-ins
+
+Starts the server (main.socket_app) in-process on a free port, with a
+throwaway user data dir whose config points every provider at a local
+stand-in server, so no request leaves the machine. The stand-in mimics:
+
+- an OpenAI-compatible chat API: streamed (SSE) replies, and tool calls when
+  the user message asks for a generation
+- Jaaz (images, tasks, videos), Replicate, Volces (images and video tasks),
+  Wavespeed, and the OpenAI image API
+- ComfyUI: /prompt, /history, /view, /upload/image and the websocket with
+  progress messages and binary preview frames
+
+Scripted Socket.IO clients then play users, one per --sessions: connect,
+create a canvas (which starts the first chat turn, as the web app does), run
+the remaining --turns through POST /api/chat, and save and reload the canvas
+between turns. A turn ends with the session's `done` event.
+
+Scenarios:
+- chat: text replies only
+- image: every turn calls an image tool (--tool, default Imagen 4 on Replicate)
+- video: every turn calls a video tool (--tool, default Seedance on Volces)
+- comfyui: every turn runs a ComfyUI workflow registered for the test
+
+Reported: turn throughput, turn latency and time to first token
+(p50/p95/p99), canvas request latency, the server event loop's lag, process
+memory (RSS) and the calls the stand-in received. --json prints the report as
+JSON; --baseline compares it with an earlier JSON report and exits 1 on
+regression.
+
+Provider latency and payload sizes are set with --latency, --ttft, --tokens,
+--token-interval, --image-size, --video-bytes and --canvas-elements.
+
+Usage:
+    python scripts/load_test.py                                # 10 sessions x 3 text turns
+    python scripts/load_test.py --sessions 50 --scenario image # every turn generates an image
+    python scripts/load_test.py --scenario comfyui --latency 5 # slow ComfyUI stand-in
+    python scripts/load_test.py --json > load.json             # machine readable report
+    python scripts/load_test.py --baseline load.json           # exit 1 on regression
+
+Run it from the repository root with the server's environment active. The
+clients and the stand-in run on their own event loops in background threads,
+so the measured loop lag is the server's.
+"""
+
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import io
+import itertools
+import json
+import math
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(REPO_DIR, 'server')
+
+# User messages containing the marker make the chat stand-in call a tool
+GENERATE_MARKER = '[generate]'
+TEXT_MODEL = 'load-test-chat'
+API_KEY = 'load-test'
+
+SCENARIO_TOOLS = {
+    'chat': None,
+    'image': 'generate_image_by_imagen_4_replicate',
+    'video': 'generate_video_by_seedance_v1_pro_volces',
+    'comfyui': 'comfyui_load_test',
+}
+
+COMFY_WORKFLOW = {
+    'name': 'load_test',
+    'description': 'Text to image workflow served by the load test ComfyUI stand-in',
+    'api_json': {
+        '4': {'class_type': 'CheckpointLoaderSimple', 'inputs': {'ckpt_name': 'load_test.safetensors'}},
+        '6': {'class_type': 'CLIPTextEncode', 'inputs': {'text': '', 'clip': ['4', 1]}},
+        '3': {'class_type': 'KSampler', 'inputs': {'seed': 1, 'steps': 20, 'model': ['4', 0], 'positive': ['6', 0]}},
+        '9': {'class_type': 'SaveImage', 'inputs': {'images': ['3', 0], 'filename_prefix': 'load_test'}},
+    },
+    'inputs': [{
+        'name': 'prompt', 'type': 'string', 'description': 'Image prompt',
+        'node_id': '6', 'node_input_name': 'text', 'required': True,
+    }],
+}
+
+# Regression thresholds of --baseline: relative, plus an absolute floor for
+# the loop lag, which is noisy in the low milliseconds
+LAG_NOISE_MS = 5.0
+LOOP_LAG_INTERVAL = 0.05
+
+
+@dataclass
+class StandInOptions:
+    latency: float = 0.5
+    ttft: float = 0.2
+    tokens: int = 50
+    token_interval: float = 0.01
+    image_size: int = 1024
+    video_bytes: int = 2 * 1024 * 1024
+    comfy_steps: int = 10
+
+
+def percentiles(values: List[float]) -> Dict[str, Any]:
+    """Count, mean, p50/p95/p99 and max in milliseconds of values in seconds"""
+    if not values:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        # Nearest rank
+        return round(ordered[max(0, math.ceil(p * len(ordered)) - 1)] * 1000, 1)
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 1),
+        'p50': rank(0.50),
+        'p95': rank(0.95),
+        'p99': rank(0.99),
+        'max': round(ordered[-1] * 1000, 1),
+    }
+
+
+def rss_mb() -> Optional[float]:
+    """Resident memory of this process"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak instead of current, kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return ' '.join(p.get('text', '') for p in content if isinstance(p, dict))
+    return ''
+
+
+def _sample_value(name: str, schema: Dict[str, Any]) -> Any:
+    if 'default' in schema:
+        return schema['default']
+    if schema.get('enum'):
+        return schema['enum'][0]
+    kind = schema.get('type')
+    if kind in ('integer', 'number'):
+        return schema.get('minimum', 1)
+    if kind == 'boolean':
+        return False
+    if kind == 'array':
+        return []
+    return 'a lighthouse on a cliff at sunset' if name == 'prompt' else 'load test'
+
+
+def sample_arguments(parameters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Arguments for the required parameters of a tool's JSON schema"""
+    parameters = parameters or {}
+    properties = parameters.get('properties', {})
+    return {name: _sample_value(name, properties.get(name, {})) for name in parameters.get('required', [])}
+
+
+class ProviderStandIns:
+    """Local stand-in for the provider APIs, on one port"""
+
+    def __init__(self, options: StandInOptions) -> None:
+        self.options = options
+        self.calls: Counter[str] = Counter()
+        self.base_url = ''
+        self._runner: Optional[web.AppRunner] = None
+        self._ids = itertools.count(1)
+        # task id -> (ready at, result url)
+        self._tasks: Dict[str, Tuple[float, str]] = {}
+        self._comfy_sockets: Dict[str, web.WebSocketResponse] = {}
+        self._comfy_history: Dict[str, Dict[str, Any]] = {}
+        self._comfy_inputs: set = set()
+        self._image = b''
+        self._preview = b''
+        self._video = b''
+
+    # ========== Server ==========
+
+    async def start(self, port: int) -> str:
+        from PIL import Image
+
+        def png(size: int) -> bytes:
+            # Noise keeps the PNG about as large as a generated image
+            buffer = io.BytesIO()
+            Image.effect_noise((size, size), 48).convert('RGB').save(buffer, format='PNG')
+            return buffer.getvalue()
+
+        self._image = await asyncio.to_thread(png, self.options.image_size)
+        self._preview = await asyncio.to_thread(png, 128)
+        header = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom'
+        self._video = header + os.urandom(max(0, self.options.video_bytes - len(header)))
+
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get('/assets/image.png', self._asset(self._image, 'image/png'))
+        app.router.add_get('/assets/video.mp4', self._asset(self._video, 'video/mp4'))
+        # OpenAI-compatible chat and images; Jaaz and Volces serve chat as well
+        for prefix in ('/openai/v1', '/jaaz/api/v1', '/volces/api/v3'):
+            app.router.add_post(f'{prefix}/chat/completions', self.chat_completions)
+            app.router.add_post(f'{prefix}/images/generations', self.openai_images)
+            app.router.add_post(f'{prefix}/images/edits', self.openai_images)
+        app.router.add_get('/openai/v1/models', self.models)
+        # Jaaz
+        app.router.add_post('/jaaz/api/v1/image/generations', self.jaaz_images)
+        app.router.add_post('/jaaz/api/v1/task/search', self.jaaz_task_search)
+        for path in ('/image/magic', '/image/midjourney/generation',
+                     '/video/sunra/generations', '/video/seedance/generation'):
+            app.router.add_post(f'/jaaz/api/v1{path}', self.jaaz_create_task)
+        app.router.add_get('/jaaz/api/v1/task/{task_id}', self.jaaz_task)
+        # Replicate
+        app.router.add_post('/replicate/v1/models/{owner}/{name}/predictions', self.replicate_predictions)
+        # Volces video
+        app.router.add_post('/volces/api/v3/contents/generations/tasks', self.volces_create_task)
+        app.router.add_get('/volces/api/v3/contents/generations/tasks/{task_id}', self.volces_task)
+        # Wavespeed
+        app.router.add_get('/wavespeed/results/{task_id}', self.wavespeed_result)
+        app.router.add_post('/wavespeed/api/v3/{model:.+}', self.wavespeed_submit)
+        # ComfyUI, at the root: its websocket URL keeps only the host
+        app.router.add_get('/ws', self.comfy_ws)
+        app.router.add_get('/api/prompt', self.comfy_queue)
+        app.router.add_post('/prompt', self.comfy_prompt)
+        app.router.add_get('/history/{prompt_id}', self.comfy_history)
+        app.router.add_get('/view', self.comfy_view)
+        app.router.add_post('/upload/image', self.comfy_upload)
+        app.router.add_get('/system_stats', self.comfy_system_stats)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', port).start()
+        self.base_url = f'http://127.0.0.1:{port}'
+        return self.base_url
+
+    async def stop(self) -> None:
+        for ws in list(self._comfy_sockets.values()):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def _asset(self, body: bytes, content_type: str):
+        async def handler(request: web.Request) -> web.Response:
+            self.calls['asset_download'] += 1
+            return web.Response(body=body, content_type=content_type)
+        return handler
+
+    def _new_id(self, prefix: str) -> str:
+        return f'{prefix}-{next(self._ids)}'
+
+    def _new_task(self, result_url: str) -> str:
+        task_id = self._new_id('task')
+        self._tasks[task_id] = (time.monotonic() + self.options.latency, result_url)
+        return task_id
+
+    def _task_state(self, task_id: str) -> Tuple[Optional[bool], str]:
+        """(done, result url); done is None for unknown tasks"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None, ''
+        return time.monotonic() >= task[0], task[1]
+
+    @property
+    def image_url(self) -> str:
+        return f'{self.base_url}/assets/image.png'
+
+    @property
+    def video_url(self) -> str:
+        return f'{self.base_url}/assets/video.mp4'
+
+    # ========== Chat ==========
+
+    def _tool_call(self, body: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        The tool call the assistant makes next, None for a text reply
+
+        Only turns asking for a generation call tools: a handoff first if the
+        generation tools are not offered, then the first generation tool,
+        then the reply once its result is in the history.
+        """
+        messages = body.get('messages') or []
+        last_user = next((i for i in range(len(messages) - 1, -1, -1)
+                          if messages[i].get('role') == 'user'), None)
+        if last_user is None or GENERATE_MARKER not in _message_text(messages[last_user].get('content')):
+            return None
+        called = {
+            (call.get('function') or {}).get('name')
+            for message in messages[last_user + 1:]
+            for call in message.get('tool_calls') or []
+        }
+        tools = [tool['function'] for tool in body.get('tools') or []
+                 if tool.get('type') == 'function' and tool.get('function')]
+        generation = [tool for tool in tools
+                      if not tool['name'].startswith('transfer_to_') and tool['name'] != 'write_plan']
+        if generation:
+            if any(tool['name'] in called for tool in generation):
+                return None
+            return generation[0]['name'], sample_arguments(generation[0].get('parameters'))
+        handoffs = [tool for tool in tools if tool['name'].startswith('transfer_to_')]
+        if handoffs and not called:
+            return handoffs[0]['name'], {}
+        return None
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.calls['chat_completions'] += 1
+        body = await request.json()
+        model = body.get('model', TEXT_MODEL)
+        completion_id = self._new_id('chatcmpl')
+        tool_call = self._tool_call(body)
+        words = [f' token{i}' for i in range(self.options.tokens)]
+        await asyncio.sleep(self.options.ttft)
+
+        if not body.get('stream'):
+            message: Dict[str, Any] = {'role': 'assistant', 'content': None if tool_call else ''.join(words).strip()}
+            if tool_call:
+                message['tool_calls'] = [{
+                    'id': f'call_{uuid.uuid4().hex[:24]}', 'type': 'function',
+                    'function': {'name': tool_call[0], 'arguments': json.dumps(tool_call[1])},
+                }]
+            return web.json_response({
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': message,
+                             'finish_reason': 'tool_calls' if tool_call else 'stop'}],
+                'usage': {'prompt_tokens': 100, 'completion_tokens': len(words), 'total_tokens': 100 + len(words)},
+            })
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+
+        async def send(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> None:
+            chunk = {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+            await response.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+
+        await send({'role': 'assistant', 'content': ''})
+        if tool_call:
+            name, arguments = tool_call
+            await send({'tool_calls': [{'index': 0, 'id': f'call_{uuid.uuid4().hex[:24]}', 'type': 'function',
+                                        'function': {'name': name, 'arguments': ''}}]})
+            encoded = json.dumps(arguments)
+            step = max(1, len(encoded) // 4)
+            for start in range(0, len(encoded), step):
+                await asyncio.sleep(self.options.token_interval)
+                await send({'tool_calls': [{'index': 0, 'function': {'arguments': encoded[start:start + step]}}]})
+            await send({}, 'tool_calls')
+        else:
+            for word in words:
+                await asyncio.sleep(self.options.token_interval)
+                await send({'content': word})
+            await send({}, 'stop')
+        if (body.get('stream_options') or {}).get('include_usage'):
+            usage = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [],
+                     'usage': {'prompt_tokens': 100, 'completion_tokens': len(words), 'total_tokens': 100 + len(words)}}
+            await response.write(f'data: {json.dumps(usage)}\n\n'.encode())
+        await response.write(b'data: [DONE]\n\n')
+        await response.write_eof()
+        return response
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({'object': 'list', 'data': [{'id': TEXT_MODEL, 'object': 'model', 'owned_by': 'load-test'}]})
+
+    # ========== Images ==========
+
+    async def openai_images(self, request: web.Request) -> web.Response:
+        self.calls[f"images_{request.path.split('/')[1]}"] += 1
+        if request.content_type == 'application/json':
+            body = await request.json()
+        else:
+            body = dict(await request.post())
+        await asyncio.sleep(self.options.latency)
+        count = int(body.get('n') or 1)
+        if body.get('response_format') == 'b64_json':
+            item = {'b64_json': base64.b64encode(self._image).decode()}
+        else:
+            item = {'url': self.image_url}
+        return web.json_response({'created': int(time.time()), 'data': [item] * count})
+
+    async def jaaz_images(self, request: web.Request) -> web.Response:
+        self.calls['jaaz_images'] += 1
+        body = await request.json()
+        await asyncio.sleep(self.options.latency)
+        count = int(body.get('n') or 1)
+        return web.json_response({'created': int(time.time()), 'data': [{'url': self.image_url}] * count})
+
+    async def jaaz_task_search(self, request: web.Request) -> web.Response:
+        return web.json_response({'success': True, 'data': {'found': False}})
+
+    async def jaaz_create_task(self, request: web.Request) -> web.Response:
+        self.calls['jaaz_tasks'] += 1
+        result_url = self.video_url if '/video/' in request.path else self.image_url
+        return web.json_response({'task_id': self._new_task(result_url)})
+
+    async def jaaz_task(self, request: web.Request) -> web.Response:
+        done, result_url = self._task_state(request.match_info['task_id'])
+        if done is None:
+            return web.json_response({'success': True, 'data': {'found': False}})
+        task = {'status': 'succeeded', 'result_url': result_url} if done else {'status': 'processing'}
+        return web.json_response({'success': True, 'data': {'found': True, 'task': task}})
+
+    async def replicate_predictions(self, request: web.Request) -> web.Response:
+        self.calls['replicate'] += 1
+        await request.json()
+        # Prefer: wait, the prediction is returned finished
+        await asyncio.sleep(self.options.latency)
+        return web.json_response({'id': self._new_id('prediction'), 'status': 'succeeded', 'output': self.image_url})
+
+    async def wavespeed_submit(self, request: web.Request) -> web.Response:
+        self.calls['wavespeed'] += 1
+        await request.json()
+        task_id = self._new_task(self.image_url)
+        return web.json_response({'code': 200, 'data': {
+            'id': task_id, 'urls': {'get': f'{self.base_url}/wavespeed/results/{task_id}'}}})
+
+    async def wavespeed_result(self, request: web.Request) -> web.Response:
+        done, result_url = self._task_state(request.match_info['task_id'])
+        if done is None:
+            return web.json_response({'code': 404, 'data': {'status': 'failed'}}, status=404)
+        data = {'status': 'completed', 'outputs': [result_url]} if done else {'status': 'processing', 'outputs': []}
+        return web.json_response({'code': 200, 'data': data})
+
+    # ========== Volces video ==========
+
+    async def volces_create_task(self, request: web.Request) -> web.Response:
+        self.calls['volces_video'] += 1
+        await request.json()
+        return web.json_response({'id': self._new_task(self.video_url)})
+
+    async def volces_task(self, request: web.Request) -> web.Response:
+        done, result_url = self._task_state(request.match_info['task_id'])
+        if done is None:
+            return web.json_response({'status': 'failed', 'detail': 'unknown task'})
+        if not done:
+            return web.json_response({'status': 'running'})
+        return web.json_response({'status': 'succeeded', 'content': {'video_url': result_url}})
+
+    # ========== ComfyUI ==========
+
+    async def comfy_ws(self, request: web.Request) -> web.WebSocketResponse:
+        client_id = request.query.get('clientId', '')
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self._comfy_sockets[client_id] = ws
+        await ws.send_json({'type': 'status', 'data': {
+            'status': {'exec_info': {'queue_remaining': 0}}, 'sid': client_id}})
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            if self._comfy_sockets.get(client_id) is ws:
+                del self._comfy_sockets[client_id]
+        return ws
+
+    async def comfy_queue(self, request: web.Request) -> web.Response:
+        return web.json_response({'exec_info': {'queue_remaining': 0}})
+
+    async def comfy_system_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({'system': {'os': 'load-test'}, 'devices': []})
+
+    async def comfy_prompt(self, request: web.Request) -> web.Response:
+        self.calls['comfyui_prompt'] += 1
+        body = await request.json()
+        prompt_id = body.get('prompt_id') or str(uuid.uuid4())
+        asyncio.create_task(self._comfy_execute(prompt_id, body))
+        return web.json_response({'prompt_id': prompt_id, 'number': next(self._ids), 'node_errors': {}})
+
+    async def _comfy_execute(self, prompt_id: str, body: Dict[str, Any]) -> None:
+        client_id = body.get('client_id', '')
+
+        async def send(message_type: str, data: Dict[str, Any]) -> None:
+            ws = self._comfy_sockets.get(client_id)
+            if ws is not None and not ws.closed:
+                await ws.send_json({'type': message_type, 'data': {**data, 'prompt_id': prompt_id}})
+
+        nodes = list(body.get('prompt') or {})
+        filename = f'load_test_{prompt_id}.png'
+        output = {'images': [{'filename': filename, 'subfolder': '', 'type': 'output'}]}
+        steps = max(1, self.options.comfy_steps)
+        await send('execution_start', {})
+        for index, node in enumerate(nodes):
+            await send('executing', {'node': node, 'display_node': node})
+            if index == 0:
+                # Sampling: progress and a preview frame per step
+                for step in range(1, steps + 1):
+                    await asyncio.sleep(self.options.latency / steps)
+                    await send('progress', {'node': node, 'value': step, 'max': steps})
+                    ws = self._comfy_sockets.get(client_id)
+                    if ws is not None and not ws.closed:
+                        await ws.send_bytes(struct.pack('>II', 1, 2) + self._preview)
+            if index == len(nodes) - 1:
+                await send('executed', {'node': node, 'display_node': node, 'output': output})
+        self._comfy_history[prompt_id] = {
+            'outputs': {nodes[-1]: output} if nodes else {},
+            'status': {'status_str': 'success', 'completed': True, 'messages': []},
+        }
+        await send('executing', {'node': None})
+        await send('execution_success', {})
+
+    async def comfy_history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info['prompt_id']
+        history = self._comfy_history.get(prompt_id)
+        return web.json_response({prompt_id: history} if history else {})
+
+    async def comfy_view(self, request: web.Request) -> web.Response:
+        if request.query.get('type') == 'input':
+            key = f"{request.query.get('subfolder', '')}/{request.query.get('filename', '')}"
+            if key not in self._comfy_inputs:
+                return web.Response(status=404)
+            return web.Response(body=self._preview, content_type='image/png')
+        self.calls['comfyui_view'] += 1
+        return web.Response(body=self._image, content_type='image/png')
+
+    async def comfy_upload(self, request: web.Request) -> web.Response:
+        self.calls['comfyui_upload'] += 1
+        form = await request.post()
+        image = form.get('image')
+        name = getattr(image, 'filename', None) or f'{uuid.uuid4().hex}.png'
+        subfolder = str(form.get('subfolder', ''))
+        self._comfy_inputs.add(f'{subfolder}/{name}')
+        return web.json_response({'name': name, 'subfolder': subfolder, 'type': 'input'})
+
+
+@dataclass
+class TurnResult:
+    session: int
+    turn: int
+    ok: bool
+    latency: float
+    ttft: Optional[float]
+    error: Optional[str] = None
+
+
+class LoadStats:
+    """Results of the clients, only touched on the clients' loop"""
+
+    def __init__(self) -> None:
+        self.turns: List[TurnResult] = []
+        self.canvas_latencies: List[float] = []
+        self.canvas_failures = 0
+        self.events = 0
+        self.errors: Counter[str] = Counter()
+
+
+class SessionClient:
+    """One scripted user: a Socket.IO connection, a canvas and a chat session"""
+
+    def __init__(self, index: int, server_url: str, http: aiohttp.ClientSession,
+                 args: argparse.Namespace, text_model: Dict[str, Any],
+                 tool_list: List[Dict[str, Any]], stats: LoadStats) -> None:
+        self.index = index
+        self.server_url = server_url
+        self.http = http
+        self.args = args
+        self.text_model = text_model
+        self.tool_list = tool_list
+        self.stats = stats
+        self.session_id = f'load-session-{index}-{uuid.uuid4().hex[:8]}'
+        self.canvas_id = f'load-canvas-{index}-{uuid.uuid4().hex[:8]}'
+        self.messages: List[Dict[str, Any]] = []
+        self._done = asyncio.Event()
+        self._turn_started = 0.0
+        self._first_delta: Optional[float] = None
+        self._reply: List[str] = []
+        self._history: Optional[List[Dict[str, Any]]] = None
+        self._error: Optional[str] = None
+
+    async def _on_session_update(self, data: Dict[str, Any]) -> None:
+        self.stats.events += 1
+        if not isinstance(data, dict) or data.get('session_id') != self.session_id:
+            return
+        event_type = data.get('type')
+        if event_type == 'delta':
+            if self._first_delta is None:
+                self._first_delta = time.perf_counter() - self._turn_started
+            self._reply.append(data.get('text', ''))
+        elif event_type == 'all_messages':
+            self._history = data.get('messages')
+        elif event_type == 'error':
+            self._error = str(data.get('error', 'error event'))[:200]
+        elif event_type == 'done':
+            self._done.set()
+
+    async def run(self) -> None:
+        import socketio
+
+        sio = socketio.AsyncClient(reconnection=False)
+        sio.on('session_update', self._on_session_update)
+        await sio.connect(self.server_url, socketio_path='/socket.io', wait_timeout=30)
+        try:
+            for turn in range(self.args.turns):
+                if turn:
+                    await self._canvas_round(turn)
+                await self._chat_turn(turn)
+        finally:
+            await sio.disconnect()
+
+    def _user_message(self, turn: int) -> Dict[str, Any]:
+        text = f'Turn {turn} of session {self.index}: describe a lighthouse on a cliff at sunset.'
+        if self.tool_list:
+            text = f'{GENERATE_MARKER} {text}'
+        return {'role': 'user', 'content': text}
+
+    async def _chat_turn(self, turn: int) -> None:
+        self.messages.append(self._user_message(turn))
+        payload = {
+            'messages': self.messages,
+            'session_id': self.session_id,
+            'canvas_id': self.canvas_id,
+            'text_model': self.text_model,
+            'tool_list': self.tool_list,
+        }
+        if turn == 0:
+            # The web app starts the first turn together with the canvas
+            path = '/api/canvas/create'
+            payload['name'] = f'Load test {self.index}'
+        else:
+            path = '/api/chat'
+
+        self._done.clear()
+        self._first_delta = None
+        self._reply = []
+        self._history = None
+        self._error = None
+        self._turn_started = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            async with self.http.post(f'{self.server_url}{path}', json=payload) as response:
+                await response.read()
+                if response.status != 200:
+                    error = f'{path} returned HTTP {response.status}'
+            if error is None:
+                await asyncio.wait_for(self._done.wait(), self.args.turn_timeout)
+        except asyncio.TimeoutError:
+            error = f'turn timed out after {self.args.turn_timeout}s'
+        except aiohttp.ClientError as e:
+            error = f'{path} failed: {e or type(e).__name__}'
+        latency = time.perf_counter() - self._turn_started
+        error = error or self._error
+
+        self.stats.turns.append(TurnResult(self.index, turn, error is None, latency, self._first_delta, error))
+        if error:
+            self.stats.errors[error] += 1
+        if self._history:
+            self.messages = list(self._history)
+        elif self._reply:
+            self.messages.append({'role': 'assistant', 'content': ''.join(self._reply)})
+
+    def _canvas_document(self, turn: int) -> Dict[str, Any]:
+        elements = [{
+            'id': f'el-{self.index}-{i}',
+            'type': 'rectangle',
+            'x': (i % 10) * 120, 'y': (i // 10) * 120, 'width': 100, 'height': 100,
+            'angle': 0, 'strokeColor': '#1e1e1e', 'backgroundColor': 'transparent',
+            'seed': i, 'version': turn + 1, 'versionNonce': turn * 1000 + i, 'isDeleted': False,
+            'groupIds': [], 'boundElements': None, 'updated': int(time.time() * 1000),
+        } for i in range(self.args.canvas_elements)]
+        return {'elements': elements, 'appState': {'viewBackgroundColor': '#ffffff'}, 'files': {}}
+
+    async def _canvas_request(self, method: str, path: str, **kwargs: Any) -> None:
+        started = time.perf_counter()
+        try:
+            async with self.http.request(method, f'{self.server_url}{path}', **kwargs) as response:
+                await response.read()
+                ok = response.status == 200
+        except aiohttp.ClientError:
+            ok = False
+        self.stats.canvas_latencies.append(time.perf_counter() - started)
+        if not ok:
+            self.stats.canvas_failures += 1
+
+    async def _canvas_round(self, turn: int) -> None:
+        if self.args.canvas_elements <= 0:
+            return
+        await self._canvas_request('POST', f'/api/canvas/{self.canvas_id}/save',
+                                   json={'data': self._canvas_document(turn)})
+        await self._canvas_request('GET', f'/api/canvas/{self.canvas_id}')
+
+
+async def run_clients(args: argparse.Namespace, server_url: str, text_model: Dict[str, Any],
+                      tool_list: List[Dict[str, Any]]) -> Tuple[LoadStats, float]:
+    stats = LoadStats()
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=args.turn_timeout + 30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        clients = [SessionClient(i, server_url, http, args, text_model, tool_list, stats)
+                   for i in range(args.sessions)]
+
+        async def start(client: SessionClient) -> None:
+            await asyncio.sleep(args.ramp * client.index / max(1, len(clients)))
+            try:
+                await client.run()
+            except Exception as e:
+                stats.errors[f'client failed: {e or type(e).__name__}'] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(start(client) for client in clients))
+        return stats, time.perf_counter() - started
+
+
+class LoopMonitor:
+    """Samples the lag of the running loop and the process memory"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL) -> None:
+        self.interval = interval
+        self.lags: List[float] = []
+        self.memory: List[float] = []
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        samples_per_second = max(1, round(1 / self.interval))
+        for count in itertools.count():
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - started - self.interval))
+            if count % samples_per_second == 0:
+                memory = rss_mb()
+                if memory is not None:
+                    self.memory.append(memory)
+
+
+def _start_loop_thread(name: str) -> Tuple[asyncio.AbstractEventLoop, threading.Thread]:
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name=name, daemon=True)
+    thread.start()
+    return loop, thread
+
+
+def write_config(user_data_dir: str, standin_url: str) -> None:
+    import toml
+
+    config = {
+        'jaaz': {'api_key': API_KEY},
+        'openai': {'url': f'{standin_url}/openai/v1/', 'api_key': API_KEY,
+                   'models': {TEXT_MODEL: {'type': 'text'}}},
+        'replicate': {'url': f'{standin_url}/replicate/v1/', 'api_key': API_KEY, 'models': {}},
+        'volces': {'url': f'{standin_url}/volces/api/v3', 'api_key': API_KEY, 'models': {}},
+        'wavespeed': {'url': f'{standin_url}/wavespeed/api/v3', 'api_key': API_KEY, 'models': {}},
+        'comfyui': {'url': standin_url, 'api_key': '', 'is_disabled': False, 'models': {}},
+    }
+    with open(os.path.join(user_data_dir, 'config.toml'), 'w', encoding='utf-8') as f:
+        f.write(toml.dumps(config))
+
+
+async def wait_ready(server_url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while True:
+            try:
+                async with http.get(f'{server_url}/ready') as response:
+                    body = await response.json(content_type=None)
+                    if response.status == 200:
+                        return
+                    if isinstance(body, dict) and body.get('status') == 'failed':
+                        raise RuntimeError(f'Server startup failed: {json.dumps(body)}')
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'Server was not ready after {timeout}s')
+            await asyncio.sleep(0.2)
+
+
+async def register_comfy_workflow(server_url: str) -> None:
+    async with aiohttp.ClientSession() as http:
+        async with http.post(f'{server_url}/api/settings/comfyui/create_workflow', json=COMFY_WORKFLOW) as response:
+            if response.status != 200:
+                raise RuntimeError(f'Registering the ComfyUI workflow failed: {await response.text()}')
+
+
+def tool_entry(tool_id: str) -> Dict[str, Any]:
+    """tool_list entry the web app sends for a tool"""
+    if tool_id.startswith('comfyui_'):
+        return {'id': tool_id, 'provider': 'comfyui', 'type': 'image', 'display_name': tool_id}
+    from services.tool_service import TOOL_MAPPING
+
+    info = TOOL_MAPPING.get(tool_id)
+    if info is None:
+        raise RuntimeError(f'Unknown tool {tool_id}')
+    return {'id': tool_id, 'provider': info['provider'], 'type': info.get('type'),
+            'display_name': info.get('display_name')}
+
+
+async def run(args: argparse.Namespace, options: StandInOptions, user_data_dir: str) -> Dict[str, Any]:
+    server_port = free_port()
+    standin_port = free_port()
+    server_url = f'http://127.0.0.1:{server_port}'
+
+    standins = ProviderStandIns(options)
+    standin_loop, standin_thread = _start_loop_thread('provider-stand-ins')
+    standin_url = asyncio.run_coroutine_threadsafe(standins.start(standin_port), standin_loop).result()
+
+    os.makedirs(os.path.join(user_data_dir, 'files'), exist_ok=True)
+    write_config(user_data_dir, standin_url)
+    # Read when the server modules are imported
+    os.environ.update({
+        'USER_DATA_DIR': user_data_dir,
+        'BASE_API_URL': f'{standin_url}/jaaz',
+        'DEFAULT_PORT': str(server_port),
+        'DISABLE_COMFYUI': 'false',
+        'NO_PROXY': '127.0.0.1,localhost',
+        'no_proxy': '127.0.0.1,localhost',
+    })
+    os.environ.pop('API_BASE_URL', None)
+    sys.path.insert(0, SERVER_DIR)
+
+    import uvicorn
+    import main as server_main
+
+    server = uvicorn.Server(uvicorn.Config(
+        server_main.socket_app, host='127.0.0.1', port=server_port,
+        log_level='warning', access_log=False, lifespan='on'))
+    server_task = asyncio.create_task(server.serve())
+    clients_pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='load-clients')
+    monitor = LoopMonitor()
+    try:
+        await wait_ready(server_url, args.startup_timeout)
+        tool_id = args.tool or SCENARIO_TOOLS[args.scenario]
+        if args.scenario == 'comfyui' and not args.tool:
+            await register_comfy_workflow(server_url)
+        tool_list = [tool_entry(tool_id)] if tool_id else []
+        text_model = {'provider': 'openai', 'model': TEXT_MODEL, 'url': f'{standin_url}/openai/v1/', 'type': 'text'}
+
+        memory_start = rss_mb()
+        monitor.start()
+        stats, duration = await asyncio.wrap_future(clients_pool.submit(
+            asyncio.run, run_clients(args, server_url, text_model, tool_list)))
+        await monitor.stop()
+        memory_end = rss_mb()
+    finally:
+        await monitor.stop()
+        clients_pool.shutdown(wait=False)
+        server.should_exit = True
+        await server_task
+        asyncio.run_coroutine_threadsafe(standins.stop(), standin_loop).result()
+        standin_loop.call_soon_threadsafe(standin_loop.stop)
+        standin_thread.join()
+
+    ok_turns = [t for t in stats.turns if t.ok]
+    return {
+        'scenario': args.scenario,
+        'tool': tool_id,
+        'sessions': args.sessions,
+        'turns_per_session': args.turns,
+        'stand_in': asdict(options),
+        'canvas_elements': args.canvas_elements,
+        'duration_s': round(duration, 2),
+        'turns': {
+            'total': len(stats.turns),
+            'ok': len(ok_turns),
+            'failed': len(stats.turns) - len(ok_turns),
+            'per_second': round(len(ok_turns) / duration, 2) if duration else None,
+            'latency_ms': percentiles([t.latency for t in ok_turns]),
+            'ttft_ms': percentiles([t.ttft for t in ok_turns if t.ttft is not None]),
+        },
+        'canvas_requests': {
+            'total': len(stats.canvas_latencies),
+            'failed': stats.canvas_failures,
+            'per_second': round(len(stats.canvas_latencies) / duration, 2) if duration else None,
+            'latency_ms': percentiles(stats.canvas_latencies),
+        },
+        'socket_events_received': stats.events,
+        'loop_lag_ms': percentiles(monitor.lags),
+        'memory_mb': {
+            'start': memory_start,
+            'peak': max(monitor.memory, default=memory_end),
+            'end': memory_end,
+        },
+        'provider_calls': dict(sorted(standins.calls.items())),
+        'errors': dict(stats.errors.most_common(10)),
+    }
+
+
+def _get(report: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = report
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value if isinstance(value, (int, float)) else None
+
+
+def check(report: Dict[str, Any], baseline: Optional[Dict[str, Any]], tolerance: float) -> List[str]:
+    problems = []
+    if report['turns']['failed']:
+        problems.append(f"{report['turns']['failed']} of {report['turns']['total']} turns failed")
+    if baseline is None:
+        return problems
+
+    for key in ('scenario', 'tool', 'sessions', 'turns_per_session', 'stand_in', 'canvas_elements'):
+        if baseline.get(key) != report.get(key):
+            problems.append(f'baseline was run with a different {key}: {baseline.get(key)!r}, now {report.get(key)!r}')
+
+    # (path, higher is worse, absolute slack)
+    for path, higher_is_worse, slack in (
+        ('turns.latency_ms.p50', True, 0.0),
+        ('turns.latency_ms.p95', True, 0.0),
+        ('turns.latency_ms.p99', True, 0.0),
+        ('turns.ttft_ms.p95', True, 0.0),
+        ('turns.per_second', False, 0.0),
+        ('canvas_requests.latency_ms.p95', True, 0.0),
+        ('loop_lag_ms.p99', True, LAG_NOISE_MS),
+        ('memory_mb.peak', True, 0.0),
+    ):
+        now, before = _get(report, path), _get(baseline, path)
+        if now is None or before is None:
+            continue
+        if higher_is_worse and now > max(before * (1 + tolerance), before + slack):
+            problems.append(f'{path} regressed: {now} (baseline {before})')
+        elif not higher_is_worse and now < before * (1 - tolerance):
+            problems.append(f'{path} regressed: {now} (baseline {before})')
+    return problems
+
+
+def print_report(report: Dict[str, Any], problems: List[str], out: Any) -> None:
+    def line(name: str, stats: Dict[str, Any]) -> str:
+        if not stats['count']:
+            return f'  {name:<22} -'
+        return (f"  {name:<22} p50 {stats['p50']:>8.1f}  p95 {stats['p95']:>8.1f}  "
+                f"p99 {stats['p99']:>8.1f}  max {stats['max']:>8.1f} ms  (n={stats['count']})")
+
+    turns = report['turns']
+    print(f"Scenario {report['scenario']} ({report['tool'] or 'text only'}): "
+          f"{report['sessions']} sessions x {report['turns_per_session']} turns in {report['duration_s']} s", file=out)
+    print(f"  turns                  {turns['ok']} ok, {turns['failed']} failed, {turns['per_second']} turns/s", file=out)
+    print(line('turn latency', turns['latency_ms']), file=out)
+    print(line('time to first token', turns['ttft_ms']), file=out)
+    canvas = report['canvas_requests']
+    print(f"  canvas requests        {canvas['total']} ({canvas['failed']} failed), {canvas['per_second']}/s", file=out)
+    print(line('canvas latency', canvas['latency_ms']), file=out)
+    print(line('event loop lag', report['loop_lag_ms']), file=out)
+    memory = report['memory_mb']
+    print(f"  memory (RSS)           start {memory['start']} MB, peak {memory['peak']} MB, end {memory['end']} MB", file=out)
+    print(f"  socket events received {report['socket_events_received']}", file=out)
+    print(f"  provider calls         {report['provider_calls'] or '-'}", file=out)
+    if report['errors']:
+        print('\nErrors:', file=out)
+        for error, count in report['errors'].items():
+            print(f'  {count:>5} x {error}', file=out)
+    print(file=out)
+    for problem in problems:
+        print(f'❌ {problem}', file=out)
+    if not problems:
+        print('✅ No failures or regressions', file=out)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIO_TOOLS), default='chat', help='Traffic to generate')
+    parser.add_argument('--tool', default=None, help='Tool id the turns call (default from the scenario)')
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent client sessions')
+    parser.add_argument('--turns', type=int, default=3, help='Chat turns per session')
+    parser.add_argument('--ramp', type=float, default=1.0, help='Seconds over which the sessions start')
+    parser.add_argument('--turn-timeout', type=float, default=120.0, help='Seconds after which a turn fails')
+    parser.add_argument('--startup-timeout', type=float, default=60.0, help='Seconds to wait for /ready')
+    parser.add_argument('--latency', type=float, default=0.5, help='Stand-in seconds per image/video/ComfyUI job')
+    parser.add_argument('--ttft', type=float, default=0.2, help='Stand-in seconds to the first chat token')
+    parser.add_argument('--tokens', type=int, default=50, help='Tokens per streamed chat reply')
+    parser.add_argument('--token-interval', type=float, default=0.01, help='Stand-in seconds between chat tokens')
+    parser.add_argument('--image-size', type=int, default=1024, help='Side in pixels of the generated images')
+    parser.add_argument('--video-bytes', type=int, default=2 * 1024 * 1024, help='Size of the generated videos')
+    parser.add_argument('--canvas-elements', type=int, default=50, help='Elements per canvas save, 0 disables canvas traffic')
+    parser.add_argument('--baseline', default=None, help='JSON report to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression against the baseline')
+    parser.add_argument('--verbose', action='store_true', help='Show the server log')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+    if args.sessions < 1 or args.turns < 1:
+        parser.error('--sessions and --turns must be at least 1')
+
+    options = StandInOptions(
+        latency=args.latency, ttft=args.ttft, tokens=args.tokens, token_interval=args.token_interval,
+        image_size=args.image_size, video_bytes=args.video_bytes)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix='load_test_') as user_data_dir:
+        if not args.verbose:
+            # The server logs every event; keep the report readable
+            sys.stdout = sys.stderr = open(os.devnull, 'w', encoding='utf-8')
+        try:
+            report = asyncio.run(run(args, options, user_data_dir))
+        except RuntimeError as e:
+            print(e, file=sys.__stderr__)
+            return 2
+        finally:
+            if not args.verbose:
+                # main.py wraps whatever stdout/stderr are on import
+                sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    out = sys.stdout
+
+    problems = check(report, baseline, args.tolerance)
+    if args.json:
+        print(json.dumps({**report, 'problems': problems}, indent=2), file=out)
+    else:
+        print_report(report, problems, out)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
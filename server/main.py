@@ -7,8 +7,9 @@ sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
 print('Importing websocket_router')
 from routers.websocket_router import *  # DO NOT DELETE THIS LINE, OTHERWISE, WEBSOCKET WILL NOT WORK
 print('Importing routers')
-from routers import config_router, image_router, root_router, workspace, canvas, ssl_test, chat_router, settings, tool_confirmation, stripe_webhook, agents, litellm_router, metrics_router
-from fastapi.responses import FileResponse
+from routers import config_router, image_router, root_router, workspace, canvas, chat_router, settings, tool_confirmation, metrics_router, generation_jobs_router, video_router, asset_router
+from routers.lazy_router import include_lazy_router
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -28,23 +29,67 @@ print('Importing tool_service')
 from services.tool_service import tool_service
 print('Importing metrics_service')
 from services.metrics_service import metrics_service
+from services.loop_monitor_service import loop_monitor_service
+print('Importing cluster_service')
+from services.cluster_service import cluster_service
+print('Importing generation_job_service')
+from services.generation_job_service import generation_job_service
+print('Importing video_packaging_service')
+from services.video_packaging_service import video_packaging_service
+print('Importing asset_catalog_service')
+from services.asset_catalog_service import asset_catalog_service
+from services.comfyui_client_service import comfyui_client_service
 
-async def initialize():
-    print('Initializing config_service')
-    await config_service.initialize()
-    print('Initializing broadcast_init_done')
-    await broadcast_init_done()
+print('Importing startup_service')
+from services.startup_service import startup_service
+from services.db_service import db_service
+from utils.http_client import HttpClient
+from routers.root_router import prefetch_model_catalog
+
+# Seconds an API request waits for startup to finish before getting a 503
+READY_WAIT_SECONDS = float(os.getenv('READY_WAIT_SECONDS', '30'))
+
+
+async def warm_up_provider_connections():
+    """Open TLS connections to the configured providers in the shared pool"""
+    results = await HttpClient.warm_up(config_service.get_active_provider_urls().values())
+    print(f'🔥 Provider connections warmed up: {results}')
+
+
+async def start_asset_catalog_backfill():
+    asset_catalog_service.start_backfill()
+
+
+def register_startup_steps():
+    startup_service.add_step('config', config_service.initialize)
+    startup_service.add_step('database', db_service.initialize)
+    startup_service.add_step('cluster', cluster_service.start)
+    startup_service.add_step('tools', tool_service.initialize, after=('config', 'database'))
+    startup_service.add_step('generation_jobs', generation_job_service.start, after=('config', 'database', 'cluster'))
+    startup_service.add_step('broadcast_init_done', broadcast_init_done, after=('tools',))
+    startup_service.add_step('http_warmup', warm_up_provider_connections, after=('config',), critical=False, timeout=10)
+    startup_service.add_step('model_catalog', prefetch_model_catalog, after=('config',), critical=False, timeout=10)
+    startup_service.add_step('asset_catalog', start_asset_catalog_backfill, after=('database',), critical=False)
 
 root_dir = os.path.dirname(__file__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # onstartup
-    # TODO: Check if there will be racing conditions when user send chat request but tools and models are not initialized yet.
-    await initialize()
-    await tool_service.initialize()
+    # onstartup: initialization runs in the background so /health answers
+    # immediately; /ready and the API wait for it (see readiness_gate)
+    loop_monitor_service.start()
+    register_startup_steps()
+    startup_service.start()
     yield
     # onshutdown
+    await startup_service.stop()
+    await loop_monitor_service.stop()
+    await asset_catalog_service.stop()
+    await generation_job_service.stop()
+    video_packaging_service.stop()
+    await cluster_service.stop()
+    await comfyui_client_service.close_all()
+    await HttpClient.close_shared()
 
 print('Creating FastAPI app')
 app = FastAPI(lifespan=lifespan)
@@ -80,6 +125,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Add metrics middleware (tracks all requests)
@@ -111,6 +157,19 @@ async def metrics_middleware(request: Request, call_next):
         )
         raise
 
+# Hold API requests until startup finished (tools registered, database migrated)
+@app.middleware("http")
+async def readiness_gate(request: Request, call_next):
+    path = request.url.path
+    if not startup_service.ready and (path.startswith('/api/') or path.startswith('/webhook/')):
+        if not await startup_service.wait_ready(READY_WAIT_SECONDS):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server is starting", "startup": startup_service.report()},
+                headers={"Retry-After": "1"},
+            )
+    return await call_next(request)
+
 # Include routers
 print('Including routers')
 app.include_router(config_router.router)
@@ -119,13 +178,17 @@ app.include_router(root_router.router)
 app.include_router(canvas.router)
 app.include_router(workspace.router)
 app.include_router(image_router.router)
-app.include_router(ssl_test.router)
 app.include_router(chat_router.router)
 app.include_router(tool_confirmation.router)
-app.include_router(stripe_webhook.router)
-app.include_router(agents.router)
-app.include_router(litellm_router.router)
 app.include_router(metrics_router.router)
+app.include_router(generation_jobs_router.router)
+app.include_router(video_router.router)
+app.include_router(asset_router.router)
+# Rarely used routers with heavy imports, loaded on their first request
+include_lazy_router(app, 'routers.ssl_test', ['/api/test_ssl', '/api/test_ssl_full', '/api/ssl_status'])
+include_lazy_router(app, 'routers.stripe_webhook', ['/webhook'])
+include_lazy_router(app, 'routers.agents', ['/api/agents'])
+include_lazy_router(app, 'routers.litellm_router', ['/api/litellm'])
 
 # Mount the React build directory
 react_build_dir = os.environ.get('UI_DIST_DIR', os.path.join(
@@ -155,6 +218,13 @@ async def health_check():
     return {"status": "healthy", "port": os.environ.get("PORT", "not set"), "host": os.environ.get("HOST", "not set")}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for load balancers: 503 until startup finished, with the per-step timing report"""
+    report = startup_service.report()
+    return JSONResponse(status_code=200 if report['ready'] else 503, content=report)
+
+
 @app.get("/")
 async def serve_react_app():
     try:
@@ -193,6 +263,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--port', type=int, default=8000,
                         help='Port to run the server on')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 1)),
+                        help='Number of worker processes (requires MESSAGE_BUS_URL for more than 1)')
     args = parser.parse_args()
     import uvicorn
     
@@ -214,4 +286,10 @@ if __name__ == "__main__":
     print("=" * 60, flush=True)
 
     # Run with Socket.IO wrapper for WebSocket support (PRODUCTION READY)
-    uvicorn.run(socket_app, host=host, port=port)
+    if args.workers > 1:
+        if not cluster_service.distributed:
+            print("⚠️  Running multiple workers without MESSAGE_BUS_URL: broadcasts, cancellation and canvas locks stay per-worker", flush=True)
+        # Multiple workers need an import string; put them behind sticky sessions
+        uvicorn.run("main:socket_app", host=host, port=port, workers=args.workers)
+    else:
+        uvicorn.run(socket_app, host=host, port=port)
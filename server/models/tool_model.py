@@ -1,16 +1,22 @@
-from typing import Optional, TypedDict
-from langchain_core.tools import BaseTool
+from typing import TYPE_CHECKING, Optional, TypedDict
+
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
 
 class ToolInfoRequired(TypedDict):
-    tool_function: BaseTool
     provider: str
 
 class ToolInfoOptional(TypedDict, total=False):
     display_name: Optional[str]
     type: Optional[str]
 
-class ToolInfo(ToolInfoRequired, ToolInfoOptional):
-    pass
+class ToolInfo(ToolInfoRequired, ToolInfoOptional, total=False):
+    # "module:attribute" of the tool function, imported on first use
+    # (see services.tool_service.resolve_tool_function)
+    tool_path: str
+    tool_function: "BaseTool"
+    # ComfyUI workflow tools: id of the comfy_workflows row
+    workflow_id: int
 
 class ToolInfoJsonRequired(TypedDict):
     provider: str
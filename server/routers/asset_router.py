@@ -0,0 +1,75 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Optional
+import base64
+import json
+from services.asset_catalog_service import asset_catalog_service
+
+router = APIRouter(prefix="/api/assets")
+
+MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(row: dict) -> str:
+    raw = json.dumps([row['created_at'], row['file_id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        created_at, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(created_at), str(file_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/search")
+async def search_assets(
+    response: Response,
+    q: Optional[str] = None,
+    kind: Optional[str] = None,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    canvas_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Search generated images/videos, newest first.
+
+    `q` is matched against prompts (and model/provider names); every word has
+    to match, as a prefix. The other parameters are exact filters, `since` and
+    `until` bound the creation time (ISO 8601). The response carries an
+    `X-Next-Cursor` header when more pages exist; pass it back as `cursor`.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    try:
+        assets = await asset_catalog_service.search(
+            q=q,
+            filters={
+                'kind': kind,
+                'provider': provider,
+                'model': model,
+                'canvas_id': canvas_id,
+                'session_id': session_id,
+            },
+            since=since,
+            until=until,
+            limit=limit,
+            after=after,
+        )
+    except Exception as e:
+        # e.g. an FTS5 syntax error that slipped through query escaping
+        raise HTTPException(status_code=400, detail=f"Invalid search: {e}")
+    if len(assets) == limit:
+        response.headers['X-Next-Cursor'] = _encode_cursor(assets[-1])
+    return assets
+
+
+@router.post("/backfill")
+async def backfill_assets():
+    """Catalog files in the asset store that are not indexed yet"""
+    added = await asset_catalog_service.backfill()
+    return {"added": added}
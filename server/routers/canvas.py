@@ -1,15 +1,47 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi.concurrency import run_in_threadpool
 #from routers.agent import chat
 from services.chat_service import handle_chat
 from services.db_service import db_service
+from utils.thumbnail import save_canvas_thumbnail, remove_canvas_thumbnails
+from typing import Optional
 import asyncio
+import base64
 import json
 
+MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(row: dict) -> str:
+    raw = json.dumps([row['updated_at'], row['id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        updated_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(updated_at), str(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 router = APIRouter(prefix="/api/canvas")
 
 @router.get("/list")
-async def list_canvases():
-    return await db_service.list_canvases()
+async def list_canvases(response: Response, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    List canvases, most recently updated first.
+
+    Without `limit` all canvases are returned. With `limit`, the response
+    carries an `X-Next-Cursor` header when more pages exist; pass it back as
+    `cursor` to fetch the next page.
+    """
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = _decode_cursor(cursor) if cursor else None
+    canvases = await db_service.list_canvases(limit=limit, after=after)
+    if limit is not None and len(canvases) == limit:
+        response.headers['X-Next-Cursor'] = _encode_cursor(canvases[-1])
+    return canvases
 
 @router.post("/create")
 async def create_canvas(request: Request):
@@ -29,7 +61,11 @@ async def get_canvas(id: str):
 async def save_canvas(id: str, request: Request):
     payload = await request.json()
     data_str = json.dumps(payload['data'])
-    await db_service.save_canvas_data(id, data_str, payload['thumbnail'])
+    thumbnail = payload.get('thumbnail')
+    if thumbnail is not None:
+        # Store a downscaled file instead of the inline data URL
+        thumbnail = await run_in_threadpool(save_canvas_thumbnail, id, thumbnail)
+    await db_service.save_canvas_data(id, data_str, thumbnail)
     return {"id": id }
 
 @router.post("/{id}/rename")
@@ -42,4 +78,5 @@ async def rename_canvas(id: str, request: Request):
 @router.delete("/{id}/delete")
 async def delete_canvas(id: str):
     await db_service.delete_canvas(id)
+    await run_in_threadpool(remove_canvas_thumbnails, id)
     return {"id": id }
\ No newline at end of file
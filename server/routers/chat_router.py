@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Request
 from services.chat_service import handle_chat
 from services.magic_service import handle_magic
-from services.stream_service import get_stream_task
+from services.stream_service import cancel_stream_task
 from typing import Dict
 
 router = APIRouter(prefix="/api")
@@ -30,7 +30,8 @@ async def cancel_chat(session_id: str):
     """
     Endpoint to cancel an ongoing stream task for a given session_id.
 
-    If the task exists and is not yet completed, it will be cancelled.
+    If the task exists and is not yet completed, it will be cancelled, even
+    when it runs on another worker of the cluster.
 
     Path parameter:
         session_id (str): The ID of the session whose task should be cancelled.
@@ -39,9 +40,7 @@ async def cancel_chat(session_id: str):
         {"status": "cancelled"} if the task was cancelled.
         {"status": "not_found_or_done"} if no such task exists or it is already done.
     """
-    task = get_stream_task(session_id)
-    if task and not task.done():
-        task.cancel()
+    if await cancel_stream_task(session_id):
         return {"status": "cancelled"}
     return {"status": "not_found_or_done"}
 
@@ -68,7 +67,8 @@ async def cancel_magic(session_id: str) -> Dict[str, str]:
     """
     Endpoint to cancel an ongoing magic generation task for a given session_id.
 
-    If the task exists and is not yet completed, it will be cancelled.
+    If the task exists and is not yet completed, it will be cancelled, even
+    when it runs on another worker of the cluster.
 
     Path parameter:
         session_id (str): The ID of the session whose task should be cancelled.
@@ -77,8 +77,6 @@ async def cancel_magic(session_id: str) -> Dict[str, str]:
         {"status": "cancelled"} if the task was cancelled.
         {"status": "not_found_or_done"} if no such task exists or it is already done.
     """
-    task = get_stream_task(session_id)
-    if task and not task.done():
-        task.cancel()
+    if await cancel_stream_task(session_id):
         return {"status": "cancelled"}
     return {"status": "not_found_or_done"}
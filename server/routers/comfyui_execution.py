@@ -1,29 +1,18 @@
 import json
-import os
-from socket import timeout
-import sys
 import time
-import urllib.error
 import urllib.parse
 import uuid
 from datetime import timedelta
-import asyncio
 
-import httpx
-import websockets
-import typer
 from rich import print as pprint
 from rich.progress import BarColumn, Column, Progress, Table, TimeElapsedColumn
-from utils.http_client import HttpClient
 
+from services.comfyui_client_service import ComfyUIBackendError, ComfyUIError, comfyui_client_service
 from services.websocket_service import send_to_websocket
 
 
 async def check_comfy_server_running(base_url):
-    async with HttpClient.create(timeout=10) as client:
-        url = f"{base_url}/api/prompt"
-        response = await client.get(url)
-        return response.status_code == 200
+    return await comfyui_client_service.get_client(base_url).is_healthy()
 
 
 async def execute(
@@ -34,12 +23,19 @@ async def execute(
     local_paths=False,
     timeout=300,
     ctx: dict = {},
+    on_preview=None,
 ):
+    """
+    Queue a workflow and, with wait, follow it until it finishes
+
+    on_preview, if given, is awaited with (image bytes, mime type) for every
+    preview frame the server sends while sampling.
+    """
     if not await check_comfy_server_running(base_url):
         pprint(
             f"[bold red]ComfyUI not running on specified address ({base_url})[/bold red]"
         )
-        raise typer.Exit(code=1)
+        raise ComfyUIBackendError(f"ComfyUI not running on specified address ({base_url})")
 
     progress = None
     start = time.time()
@@ -52,7 +48,8 @@ async def execute(
         print("Queuing comfyui workflow")
 
     execution = WorkflowExecution(
-        workflow, base_url, verbose, progress, local_paths, timeout, ctx=ctx
+        workflow, base_url, verbose, progress, local_paths, timeout, ctx=ctx,
+        on_preview=on_preview,
     )
 
     try:
@@ -78,6 +75,7 @@ async def execute(
         else:
             pprint("[bold green]Workflow queued[/bold green]")
     finally:
+        execution.close()
         if progress:
             progress.stop()
     return execution
@@ -118,12 +116,15 @@ class WorkflowExecution:
         local_paths,
         timeout=30,
         ctx: dict = {},
+        on_preview=None,
     ):
         self.workflow = workflow
         self.base_url = base_url
         self.verbose = verbose
         self.local_paths = local_paths
-        self.client_id = str(uuid.uuid4())
+        # Runs share the websocket of the server's client
+        self.client = comfyui_client_service.get_client(base_url)
+        self.client_id = self.client.client_id
         self.outputs = []
         self.progress = progress
         self.remaining_nodes = set(self.workflow.keys())
@@ -136,67 +137,58 @@ class WorkflowExecution:
         self.progress_task = None
         self.progress_node = None
         self.prompt_id = None
-        self.ws = None
+        self.events = None
+        self.executed_nodes = set()
         self.timeout = timeout
         self.ctx = ctx
+        self.on_preview = on_preview
 
     async def connect(self):
-        if self.base_url.startswith("https"):
-            self.ws_core = "wss://"
-        else:
-            self.ws_core = "ws://"
-        ws_url = self.base_url.split("//")[1]
-        if "/" in ws_url:
-            ws_url = ws_url.split("/")[0]
-        self.ws = await websockets.connect(
-            f"{self.ws_core}{ws_url}/ws?clientId={self.client_id}"
-        )
+        await self.client.connect()
 
     async def queue(self):
-        data = {"prompt": self.workflow, "client_id": self.client_id}
-        async with HttpClient.create() as client:
-            try:
-                response = await client.post(f"{self.base_url}/prompt", json=data)
-                body = response.json()
-                self.prompt_id = body["prompt_id"]
-            except httpx.HTTPStatusError as e:
-                message = "An unknown error occurred"
-                if e.response.status_code == 500:
-                    message = e.response.text
-                elif e.response.status_code == 400:
-                    body = e.response.json()
-                    if body["node_errors"].keys():
-                        message = json.dumps(body["node_errors"], indent=2)
-
+        prompt_id = str(uuid.uuid4())
+        if self.client.connected:
+            # Subscribe before queueing so that no event is missed
+            self.events = self.client.subscribe(prompt_id)
+        try:
+            self.prompt_id = await self.client.queue_prompt(self.workflow, prompt_id)
+        except ComfyUIBackendError:
+            # The job is re-queued on another server, see comfyui_client_service.dispatch
+            self.client.unsubscribe(prompt_id)
+            raise
+        except ComfyUIError as e:
+            self.client.unsubscribe(prompt_id)
+            message = "An unknown error occurred"
+            if e.status == 500:
+                message = str(e)
+            elif e.status == 400 and isinstance(e.body, dict):
+                if e.body.get("node_errors"):
+                    message = json.dumps(e.body["node_errors"], indent=2)
+                elif e.body.get("error"):
+                    message = json.dumps(e.body["error"], indent=2)
+
+            if self.progress:
                 self.progress.stop()
 
-                pprint(f"[bold red]Error running workflow\n{message}[/bold red]")
-                await send_to_websocket(
-                    self.ctx.get("session_id"), {"type": "error", "error": message}
-                )
-                raise Exception(message)
+            pprint(f"[bold red]Error running workflow\n{message}[/bold red]")
+            await send_to_websocket(
+                self.ctx.get("session_id"), {"type": "error", "error": message}
+            )
+            raise Exception(message)
+        if self.events is not None:
+            self.client.rekey(prompt_id, self.prompt_id)
 
     async def watch_execution(self):
-        async for message in self.ws:
-            if isinstance(message, str):
-                message = json.loads(message)
-                if message.get("data", {}).get("prompt_id") != self.prompt_id:
-                    continue
-                if not await self.on_message(message):
-                    # get task_id and check if task_id is saved to prompt
-                    async with HttpClient.create() as client:
-                        try:
-                            response = await client.get(f"{self.base_url}/history/{self.prompt_id}")
-                            if response.status_code != 200:
-                                raise Exception(response)
-                            response_body = response.json()
-                            if self.prompt_id in response_body:
-                                break
-                            else:
-                                continue
-                        except Exception as e:
-                            pprint(f"[bold red]Error getting history\n{str(e)}[/bold red]")
-                            raise Exception(message)
+        while True:
+            message = await self.events.get()
+            if not await self.on_message(message):
+                break
+
+    def close(self):
+        if self.prompt_id is not None:
+            self.client.unsubscribe(self.prompt_id)
+        self.events = None
 
     def update_overall_progress(self):
         self.progress.update(
@@ -229,12 +221,14 @@ class WorkflowExecution:
 
     async def on_message(self, message):
         data = message["data"] if "data" in message else {}
+        if message["type"] == "status":
+            # Broadcast to all runs that are still waiting in the queue
+            await self.on_status(data)
+            return True
         if "prompt_id" not in data or data["prompt_id"] != self.prompt_id:
             return True
 
-        if message["type"] == "status":
-            return await self.on_status(data)
-        elif message["type"] == "executing":
+        if message["type"] == "executing":
             return await self.on_executing(data)
         elif message["type"] == "execution_cached":
             await self.on_cached(data)
@@ -242,13 +236,24 @@ class WorkflowExecution:
             await self.on_progress(data)
         elif message["type"] == "executed":
             await self.on_executed(data)
-        elif message["type"] == "execution_error":
+        elif message["type"] == "preview":
+            if self.on_preview:
+                await self.on_preview(data["image"], data["mime_type"])
+        elif message["type"] == "execution_success":
+            return False
+        elif message["type"] in ("execution_error", "execution_interrupted"):
             await self.on_error(data)
+        elif message["type"] == "history":
+            return await self.on_history(data)
+        elif message["type"] == "connection_lost":
+            raise ComfyUIBackendError(data.get("error", "Lost connection to ComfyUI"))
 
         return True
 
     async def on_status(self, data):
-        queue = data['data']['status']['exec_info']['queue_remaining']
+        queue = data.get("status", {}).get("exec_info", {}).get("queue_remaining")
+        if queue is None:
+            return
         await send_to_websocket(
             self.ctx.get("session_id"),
             {
@@ -319,6 +324,7 @@ class WorkflowExecution:
 
     async def on_executed(self, data):
         self.remaining_nodes.discard(data["node"])
+        self.executed_nodes.add(data["node"])
         self.update_overall_progress()
 
         if "output" not in data:
@@ -345,6 +351,23 @@ class WorkflowExecution:
             },
         )
 
+    async def on_history(self, data):
+        """The prompt finished while the websocket was reconnecting"""
+        history = data.get("history", {})
+        status = history.get("status", {})
+        if status.get("status_str") == "error":
+            errors = [m[1] for m in status.get("messages", []) if m[0] == "execution_error"]
+            await self.on_error(errors[0] if errors else status)
+
+        for node_id, output in history.get("outputs", {}).items():
+            if node_id in self.executed_nodes or not output:
+                continue
+            for img in output.get("images", []):
+                self.outputs.append(self.format_image_path(img))
+            for gif in output.get("gifs", []):
+                self.outputs.append(self.format_image_path(gif))
+        return False
+
     async def on_error(self, data):
         pprint(
             f"[bold red]Error running workflow\n{json.dumps(data, indent=2)}[/bold red]"
@@ -356,25 +379,22 @@ class WorkflowExecution:
         raise Exception(json.dumps(data, indent=2))
 
 
-async def upload_image(image, base_url, filename=None, subfolder='jaaz'):
-    # Create a tuple with (filename, file_content) for proper multipart upload
-    files = {"image": (filename, image)}
-    data = {"type": "input", "subfolder": subfolder, "overwrite": "false"}
-    async with HttpClient.create() as client:
-        try:
-            response = await client.post(
-                f"{base_url}/upload/image", files=files, data=data
-            )
-            body = response.json()
-            image_name = body["name"]
-            return f"{subfolder}/{image_name}"
-        except httpx.HTTPStatusError as e:
-            message = "An unknown error occurred"
-            if e.response.status_code == 500:
-                message = e.response.text
-            elif e.response.status_code == 400:
-                body = e.response.json()
-                if body["node_errors"].keys():
-                    message = json.dumps(body["node_errors"], indent=2)
-            pprint(f"[bold red]Error uploading image\n{message}[/bold red]")
-            raise Exception(message)
+async def upload_image(image, base_url, filename=None, subfolder='jaaz', digest=None):
+    """Upload an input image; content the server already holds is not sent again"""
+    data = image.getvalue() if hasattr(image, "getvalue") else image
+    try:
+        return await comfyui_client_service.get_client(base_url).upload_input(
+            data, filename or "image.png", subfolder, digest
+        )
+    except ComfyUIBackendError:
+        raise
+    except ComfyUIError as e:
+        message = "An unknown error occurred"
+        if e.status == 500:
+            message = str(e)
+        elif e.status == 400 and isinstance(e.body, dict) and e.body.get("node_errors"):
+            message = json.dumps(e.body["node_errors"], indent=2)
+        else:
+            message = str(e) or message
+        pprint(f"[bold red]Error uploading image\n{message}[/bold red]")
+        raise Exception(message)
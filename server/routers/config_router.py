@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Request
 from services.config_service import config_service
 # from tools.video_models_dynamic import register_video_models  # Disabled video models
-from services.tool_service import tool_service
+from services.rate_limit_service import rate_limit_service
 
 router = APIRouter(prefix="/api/config")
 
@@ -19,8 +19,7 @@ async def get_config():
 @router.post("")
 async def update_config(request: Request):
     data = await request.json()
+    # 工具服务订阅了配置变更，只会更新配置发生变化的供应商的工具
     res = await config_service.update_config(data)
-
-    # 每次更新配置后，重新初始化工具
-    await tool_service.initialize()
+    rate_limit_service.reload_limits()
     return res
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from services.generation_job_service import generation_job_service
+
+router = APIRouter(prefix="/api/generation_jobs")
+
+
+@router.get("")
+async def list_generation_jobs(
+    session_id: Optional[str] = None,
+    canvas_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+):
+    """List generation jobs, newest first"""
+    return await generation_job_service.list_jobs(
+        session_id=session_id, canvas_id=canvas_id, status=status, limit=limit)
+
+
+@router.get("/{job_id}")
+async def get_generation_job(job_id: str):
+    job = await generation_job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    job.pop('payload', None)
+    return job
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_generation_job(job_id: str):
+    """Cancel a queued or running generation job"""
+    cancelled = await generation_job_service.cancel(job_id)
+    return {"status": "cancelled" if cancelled else "not_found_or_finished"}
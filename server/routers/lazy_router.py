@@ -0,0 +1,91 @@
+"""
+Lazily imported routers
+
+Rarely used routers (Stripe webhooks, SSL diagnostics, ...) pull in heavy
+dependencies at import time. include_lazy_router() registers a placeholder
+route for the router's path prefixes instead; the module is imported, and its
+startup handlers are run, on the first request under one of the prefixes.
+After that, matching is delegated to the router's real routes.
+"""
+
+import asyncio
+import importlib
+import inspect
+from typing import Any, List, Optional, Sequence, Tuple
+from fastapi import APIRouter, FastAPI
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import URLPath
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+
+class LazyRouterRoute(BaseRoute):
+    def __init__(self, app: FastAPI, module: str, prefixes: Sequence[str]) -> None:
+        self.app = app
+        self.module = module
+        self.prefixes = tuple(prefix.rstrip('/') for prefix in prefixes)
+        self._routes: Optional[List[BaseRoute]] = None
+        self._lock = asyncio.Lock()
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope['type'] not in ('http', 'websocket'):
+            return Match.NONE, {}
+        if self._routes is None:
+            path = scope['path']
+            if any(path == prefix or path.startswith(prefix + '/') for prefix in self.prefixes):
+                return Match.FULL, {}
+            return Match.NONE, {}
+
+        best: Tuple[Match, Scope] = (Match.NONE, {})
+        for route in self._routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return Match.FULL, {**child_scope, 'lazy_route': route}
+            if match == Match.PARTIAL and best[0] == Match.NONE:
+                best = (Match.PARTIAL, {**child_scope, 'lazy_route': route})
+        return best
+
+    def url_path_for(self, name: str, /, **path_params: Any) -> URLPath:
+        for route in self._routes or []:
+            try:
+                return route.url_path_for(name, **path_params)
+            except NoMatchFound:
+                pass
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = scope.pop('lazy_route', None)
+        if route is not None:
+            await route.handle(scope, receive, send)
+            return
+        # First request: load the router, then route the request again
+        await self._load()
+        await self.app.router(scope, receive, send)
+
+    async def _load(self) -> None:
+        async with self._lock:
+            if self._routes is not None:
+                return
+            module = await run_in_threadpool(importlib.import_module, self.module)
+            router: APIRouter = module.router
+            # Resolves the router prefix into full route paths
+            holder = APIRouter()
+            holder.include_router(router)
+            for handler in router.on_startup:
+                result = handler()
+                if inspect.isawaitable(result):
+                    await result
+            self._routes = list(holder.routes)
+            print(f"📦 Loaded router {self.module}")
+
+
+def include_lazy_router(app: FastAPI, module: str, prefixes: Sequence[str]) -> None:
+    """
+    Serve `module.router` under `prefixes`, importing the module on first use
+
+    Args:
+        app: Application to register the placeholder route on
+        module: Module defining `router`
+        prefixes: Paths (and everything below them) the router handles
+    """
+    app.router.routes.append(LazyRouterRoute(app, module, prefixes))
@@ -3,11 +3,17 @@ Metrics router for exposing Prometheus metrics and dashboard data.
 Endpoints:
   - GET /metrics - Prometheus metrics in text format
   - GET /api/metrics - JSON summary of metrics for dashboard
+  - GET /api/metrics/providers - Provider admission control and health state
+  - GET /api/metrics/loop - Call sites that blocked the event loop
+  - DELETE /api/metrics/loop - Reset the event loop stall statistics
 """
 
 from fastapi import APIRouter, Request
 from fastapi.responses import Response
 from services.metrics_service import metrics_service
+from services.rate_limit_service import rate_limit_service
+from services.provider_health_service import provider_health_service
+from services.loop_monitor_service import loop_monitor_service
 
 router = APIRouter()
 
@@ -41,3 +47,37 @@ async def get_endpoints_metrics():
         "timestamp": __import__('datetime').datetime.utcnow().isoformat(),
         "endpoints": aggregated
     }
+
+
+@router.get("/api/metrics/providers", tags=["metrics"])
+async def get_provider_metrics():
+    """
+    Return in-flight calls, queue depth and average queue wait per provider,
+    plus circuit breaker state and live latency percentiles.
+    """
+    return {
+        "timestamp": __import__('datetime').datetime.utcnow().isoformat(),
+        "providers": rate_limit_service.get_stats(),
+        "health": provider_health_service.get_stats()
+    }
+
+
+@router.get("/api/metrics/loop", tags=["metrics"])
+async def get_loop_metrics():
+    """
+    Return the event loop stalls caught by the watchdog, aggregated by the
+    call site that blocked the loop, with the last captured stack of each.
+    """
+    return {
+        "timestamp": __import__('datetime').datetime.utcnow().isoformat(),
+        "loop": loop_monitor_service.get_stats()
+    }
+
+
+@router.delete("/api/metrics/loop", tags=["metrics"])
+async def reset_loop_metrics():
+    """
+    Reset the event loop stall statistics (the lag histogram is kept).
+    """
+    loop_monitor_service.reset()
+    return {"status": "ok"}
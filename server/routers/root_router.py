@@ -1,5 +1,7 @@
 import os
+import time
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 import requests
 import httpx
 from models.tool_model import ToolInfoJson
@@ -9,11 +11,15 @@ from services.db_service import db_service
 from utils.http_client import HttpClient
 # services
 from models.config_model import ModelInfo
-from typing import List
+from typing import List, Optional, Tuple
 from services.tool_service import TOOL_MAPPING
 
 router = APIRouter(prefix="/api")
 
+# Ollama model list cache: (fetched at, base url, models)
+OLLAMA_MODELS_TTL = 60
+_ollama_models_cache: Optional[Tuple[float, str, List[str]]] = None
+
 
 def get_ollama_model_list() -> List[str]:
     base_url = config_service.get_config().get('ollama', {}).get(
@@ -28,6 +34,27 @@ def get_ollama_model_list() -> List[str]:
         return []
 
 
+async def get_ollama_models() -> List[str]:
+    """
+    Cached get_ollama_model_list(); the blocking request runs in a worker
+    thread and an unreachable Ollama costs its timeout at most once per TTL
+    """
+    global _ollama_models_cache
+    base_url = config_service.get_config().get('ollama', {}).get(
+        'url', os.getenv('OLLAMA_HOST', 'http://localhost:11434'))
+    cached = _ollama_models_cache
+    if cached and cached[1] == base_url and time.monotonic() - cached[0] < OLLAMA_MODELS_TTL:
+        return cached[2]
+    models = await run_in_threadpool(get_ollama_model_list)
+    _ollama_models_cache = (time.monotonic(), base_url, models)
+    return models
+
+
+async def prefetch_model_catalog() -> None:
+    """Fill the model list caches during startup"""
+    await get_ollama_models()
+
+
 async def get_comfyui_model_list(base_url: str) -> List[str]:
     """Get ComfyUI model list from object_info API"""
     try:
@@ -79,7 +106,7 @@ async def get_models() -> list[ModelInfo]:
         'url', os.getenv('OLLAMA_HOST', 'http://localhost:11434'))
     # Add Ollama models if URL is available
     if ollama_url and ollama_url.strip():
-        ollama_models = get_ollama_model_list()
+        ollama_models = await get_ollama_models()
         for ollama_model in ollama_models:
             res.append({
                 'provider': 'ollama',
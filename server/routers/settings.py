@@ -252,8 +252,15 @@ async def create_workflow(request: CreateWorkflowRequest):
         api_json = json.dumps(request.api_json)
         inputs = json.dumps(request.inputs)
         outputs = json.dumps(request.outputs)
-        await db_service.create_comfy_workflow(name, api_json, request.description, inputs, outputs)
-        await tool_service.initialize()
+        workflow_id = await db_service.create_comfy_workflow(name, api_json, request.description, inputs, outputs)
+        tool_service.add_comfy_workflow({
+            "id": workflow_id,
+            "name": name,
+            "description": request.description,
+            "api_json": api_json,
+            "inputs": inputs,
+            "outputs": outputs,
+        })
         return {"success": True}
     except Exception as e:
         raise HTTPException(
@@ -268,7 +275,7 @@ async def list_workflows():
 @router.delete("/comfyui/delete_workflow/{id}")
 async def delete_workflow(id: int):
     result = await db_service.delete_comfy_workflow(id)
-    await tool_service.initialize()
+    await tool_service.remove_comfy_workflow(id)
     return result
 
 
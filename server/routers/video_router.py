@@ -0,0 +1,68 @@
+"""
+HLS packages of generated videos
+
+  - GET  /api/hls/{video_id}/{path}   master/rendition playlists and segments
+  - POST /api/hls/{file_id}           package a stored video on demand
+"""
+
+import os
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from services.config_service import FILES_DIR
+from services.video_packaging_service import video_packaging_service
+from utils.hls import package_dir, is_packaged, playlist_url, video_id_from_filename
+from utils.video_probe import ffmpeg_available
+
+router = APIRouter(prefix="/api/hls")
+
+# Packages are written once and renamed into place, so their content never
+# changes; playlists get a shorter lifetime in case a package is rebuilt
+SEGMENT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PLAYLIST_CACHE_CONTROL = "public, max-age=3600"
+
+MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+@router.get("/{video_id}/{path:path}")
+async def get_hls_file(video_id: str, path: str):
+    if video_id != video_id_from_filename(video_id):
+        raise HTTPException(status_code=400, detail="Invalid video id")
+
+    root = os.path.realpath(package_dir(video_id))
+    file_path = os.path.realpath(os.path.join(root, path))
+    if not file_path.startswith(root + os.sep):
+        raise HTTPException(status_code=400, detail="Invalid path")
+    extension = os.path.splitext(file_path)[1]
+    if extension not in MEDIA_TYPES or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    cache_control = PLAYLIST_CACHE_CONTROL if extension == ".m3u8" else SEGMENT_CACHE_CONTROL
+    return FileResponse(
+        file_path,
+        media_type=MEDIA_TYPES[extension],
+        headers={"Cache-Control": cache_control},
+    )
+
+
+@router.post("/{file_id}")
+async def package_video(file_id: str):
+    """Package a stored video into HLS, waiting for the result"""
+    if not os.path.isfile(os.path.join(FILES_DIR, os.path.basename(file_id))):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    video_id = video_id_from_filename(file_id)
+    if is_packaged(video_id):
+        return {"status": "ready", "url": playlist_url(video_id)}
+    if not ffmpeg_available():
+        raise HTTPException(status_code=503, detail="ffmpeg is not installed on the server")
+
+    try:
+        result = await video_packaging_service.package(file_id)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Cannot package video: {e}")
+    if result is None:
+        raise HTTPException(status_code=500, detail="HLS packaging failed")
+    return {"status": "ready", **result}
@@ -6,14 +6,14 @@ async def connect(sid, environ, auth):
     print(f"Client {sid} connected")
     
     user_info = auth or {}
-    add_connection(sid, user_info)
+    await add_connection(sid, user_info)
     
     await sio.emit('connected', {'status': 'connected'}, room=sid)
 
 @sio.event
 async def disconnect(sid):
     print(f"Client {sid} disconnected")
-    remove_connection(sid)
+    await remove_connection(sid)
 
 @sio.event
 async def ping(sid, data):
@@ -3,10 +3,12 @@ import traceback
 import platform
 import subprocess
 import mimetypes
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, StreamingResponse
 from services.config_service import USER_DATA_DIR
-from typing import List, Dict, Any
+from utils.dir_listing import query_directory, file_type_from_name, invalidate, MAX_PAGE_SIZE
+from typing import List, Dict, Any, Optional
 import io
 
 router = APIRouter(prefix="/api")
@@ -22,6 +24,8 @@ async def update_file(request: Request):
         content = data["content"]
         with open(full_path, "w") as f:
             f.write(content)
+        # Size/mtime changed without touching the directory's mtime
+        invalidate(os.path.dirname(full_path))
         return {"success": True}
     except Exception as e:
         return {"error": str(e), "path": path}
@@ -87,26 +91,59 @@ async def read_file(request: Request):
     except Exception as e:
         return {"error": str(e), "path": path}
 
+def _page_size(limit: Optional[int]) -> Optional[int]:
+    return max(1, min(limit, MAX_PAGE_SIZE)) if limit is not None else None
+
+
+def _parse_types(type: Optional[str]) -> Optional[List[str]]:
+    return [t.strip() for t in type.split(',') if t.strip()] if type else None
+
+
+async def _query(response: Response, path: str, **kwargs: Any) -> List[Dict[str, Any]]:
+    """
+    Run a directory query in a worker thread and set the X-Next-Cursor
+    header when there are more pages
+    """
+    try:
+        entries, next_cursor = await run_in_threadpool(query_directory, path, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return entries
+
+
 @router.get("/list_files_in_dir")
-async def list_files_in_dir(rel_path: str):
+async def list_files_in_dir(
+    rel_path: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: str = "mtime",
+    order: str = "desc",
+    q: Optional[str] = None,
+):
+    """
+    List a workspace directory, most recently modified first by default.
+
+    With `limit`, the response carries an `X-Next-Cursor` header when more
+    pages exist; pass it back as `cursor` (with the same sort/filter
+    parameters) to fetch the next page.
+    """
     try:
         full_path = os.path.join(WORKSPACE_ROOT, rel_path)
-        files = os.listdir(full_path)
-        file_nodes = []
-        for file in files:
-            file_path = os.path.join(full_path, file)
-            file_nodes.append({
-                "name": file,
-                "is_dir": os.path.isdir(file_path),
-                "rel_path": os.path.join(rel_path, file),
-                "mtime": os.path.getmtime(file_path)  # Get modification time
-            })
-        # Sort by modification time in descending order
-        file_nodes.sort(key=lambda x: x["mtime"], reverse=True)
-        # Remove mtime from response as it was only used for sorting
-        for node in file_nodes:
-            node.pop("mtime")
-        return file_nodes
+        entries = await _query(
+            response, full_path,
+            sort=sort, descending=order != "asc", name_contains=q,
+            limit=_page_size(limit), cursor=cursor,
+        )
+        return [{
+            "name": entry["name"],
+            "is_dir": entry["is_dir"],
+            "rel_path": os.path.join(rel_path, entry["name"]),
+        } for entry in entries]
+    except HTTPException:
+        raise
     except Exception as e:
         return []
 
@@ -159,12 +196,27 @@ async def open_folder_in_explorer(request: Request):
         raise HTTPException(status_code=500, detail=f"Error opening folder: {str(e)}")
 
 @router.get("/browse_filesystem")
-async def browse_filesystem(path: str = ""):
+async def browse_filesystem(
+    response: Response,
+    path: str = "",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: str = "name",
+    order: str = "asc",
+    type: Optional[str] = None,
+    q: Optional[str] = None,
+):
     """
     浏览电脑任意位置的文件系统
     
     Args:
         path: 要浏览的路径，如果为空则从用户家目录开始
+        limit: 每页数量，为空则返回全部；还有下一页时响应头带 X-Next-Cursor
+        cursor: 上一页返回的 X-Next-Cursor
+        sort: 排序字段 name / mtime / size（文件夹始终在前）
+        order: asc / desc
+        type: 按文件类型过滤，逗号分隔，如 image,video
+        q: 按文件名过滤（不区分大小写）
     
     Returns:
         包含文件夹和文件信息的列表
@@ -181,55 +233,36 @@ async def browse_filesystem(path: str = ""):
         if not os.path.isdir(path):
             raise HTTPException(status_code=400, detail="Path is not a directory")
         
-        items = []
-        
+        types = _parse_types(type)
+        if types is not None and "folder" not in types:
+            # 按类型过滤时保留文件夹，方便继续浏览
+            types.append("folder")
+
         try:
-            # 获取目录下的所有项目
-            for item in os.listdir(path):
-                item_path = os.path.join(path, item)
-                
-                # 跳过隐藏文件（可选）
-                if item.startswith('.'):
-                    continue
-                
-                try:
-                    stat = os.stat(item_path)
-                    is_dir = os.path.isdir(item_path)
-                    
-                    # 获取文件类型
-                    file_type = "folder" if is_dir else get_file_type(item_path)
-                    
-                    # 获取文件大小（仅对文件）
-                    size = stat.st_size if not is_dir else None
-                    
-                    # 获取修改时间
-                    mtime = stat.st_mtime
-                    
-                    # 检查是否是图片或视频文件
-                    is_media = file_type in ["image", "video"]
-                    
-                    item_info = {
-                        "name": item,
-                        "path": item_path,
-                        "type": file_type,
-                        "size": size,
-                        "mtime": mtime,
-                        "is_directory": is_dir,
-                        "is_media": is_media,
-                        "has_thumbnail": is_media  # 可以生成缩略图
-                    }
-                    
-                    items.append(item_info)
-                    
-                except (OSError, PermissionError):
-                    # 跳过无法访问的文件
-                    continue
-                    
+            # 跳过隐藏文件，文件夹在前
+            entries = await _query(
+                response, path,
+                sort=sort, descending=order == "desc", dirs_first=True,
+                include_hidden=False, types=types, name_contains=q,
+                limit=_page_size(limit), cursor=cursor,
+            )
         except PermissionError:
             raise HTTPException(status_code=403, detail="Permission denied")
         
-        # 按类型和名称排序：文件夹在前，然后按名称排序
-        items.sort(key=lambda x: (not x["is_directory"], x["name"].lower()))
+        items = []
+        for entry in entries:
+            # 检查是否是图片或视频文件
+            is_media = entry["type"] in ["image", "video"]
+            items.append({
+                "name": entry["name"],
+                "path": entry["path"],
+                "type": entry["type"],
+                "size": entry["size"],
+                "mtime": entry["mtime"],
+                "is_directory": entry["is_dir"],
+                "is_media": is_media,
+                "has_thumbnail": is_media  # 可以生成缩略图
+            })
         
         return {
             "current_path": path,
@@ -237,17 +270,34 @@ async def browse_filesystem(path: str = ""):
             "items": items
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/get_media_files")
-async def get_media_files(path: str):
+async def get_media_files(
+    path: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: str = "mtime",
+    order: str = "desc",
+    type: Optional[str] = None,
+    q: Optional[str] = None,
+):
     """
     获取指定文件夹下的所有媒体文件（图片和视频）
     
     Args:
         path: 文件夹路径
+        limit: 每页数量，为空则返回全部；还有下一页时响应头带 X-Next-Cursor
+        cursor: 上一页返回的 X-Next-Cursor
+        sort: 排序字段 mtime / name / size
+        order: asc / desc
+        type: image 或 video，为空则两者都返回
+        q: 按文件名过滤（不区分大小写）
     
     Returns:
         媒体文件列表
@@ -256,34 +306,27 @@ async def get_media_files(path: str):
         if not os.path.exists(path) or not os.path.isdir(path):
             raise HTTPException(status_code=400, detail="Invalid directory path")
         
-        media_files = []
-        
+        types = [t for t in _parse_types(type) or ["image", "video"] if t in ("image", "video")]
         try:
-            for item in os.listdir(path):
-                item_path = os.path.join(path, item)
-                
-                if os.path.isfile(item_path):
-                    file_type = get_file_type(item_path)
-                    
-                    if file_type in ["image", "video"]:
-                        stat = os.stat(item_path)
-                        
-                        media_files.append({
-                            "name": item,
-                            "path": item_path,
-                            "type": file_type,
-                            "size": stat.st_size,
-                            "mtime": stat.st_mtime
-                        })
-                        
+            entries = await _query(
+                response, path,
+                sort=sort, descending=order != "asc", files_only=True,
+                types=types or ["image", "video"], name_contains=q,
+                limit=_page_size(limit), cursor=cursor,
+            )
         except PermissionError:
             raise HTTPException(status_code=403, detail="Permission denied")
         
-        # 按修改时间排序
-        media_files.sort(key=lambda x: x["mtime"], reverse=True)
-        
-        return media_files
+        return [{
+            "name": entry["name"],
+            "path": entry["path"],
+            "type": entry["type"],
+            "size": entry["size"],
+            "mtime": entry["mtime"]
+        } for entry in entries]
         
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
@@ -325,32 +368,7 @@ def get_file_type(file_path: str) -> str:
     Returns:
         文件类型: 'image', 'video', 'audio', 'document', 'archive', 'code', 'file'
     """
-    if os.path.isdir(file_path):
-        return "folder"
-    
-    _, ext = os.path.splitext(file_path.lower())
-    
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg', '.ico'}
-    video_extensions = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.3gp'}
-    audio_extensions = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a'}
-    document_extensions = {'.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.pages'}
-    archive_extensions = {'.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz'}
-    code_extensions = {'.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.php', '.rb', '.go', '.rs'}
-    
-    if ext in image_extensions:
-        return "image"
-    elif ext in video_extensions:
-        return "video"
-    elif ext in audio_extensions:
-        return "audio"
-    elif ext in document_extensions:
-        return "document"
-    elif ext in archive_extensions:
-        return "archive"
-    elif ext in code_extensions:
-        return "code"
-    else:
-        return "file"
+    return file_type_from_name(file_path, os.path.isdir(file_path))
 
 @router.get("/serve_file")
 async def serve_file(file_path: str):
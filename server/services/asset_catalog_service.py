@@ -0,0 +1,273 @@
+"""
+Asset catalog service - searchable index of generated images and videos
+
+Every generated image/video saved to a canvas is recorded in the `assets`
+table with its dimensions, mime type, size, canvas/session and the generation
+parameters that get_image_info_and_save embeds as PNG text chunks (prompt,
+model, provider, aspect ratio). Prompts are full-text indexed with SQLite FTS5
+(`assets_fts`), so the UI can search and list assets without opening any file.
+
+Files that were generated before the catalog existed (or written by other
+code paths) are picked up by a background backfill that scans FILES_DIR on
+startup; their canvas is recovered from the canvases that reference them.
+"""
+
+import asyncio
+import json
+import os
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+from services.config_service import FILES_DIR
+from services.db_service import db_service
+from utils.dir_listing import file_type_from_name
+from utils.png_metadata import read_png_file_info
+from utils.video_probe import probe_video
+
+# Text chunks stored in their own columns rather than in `metadata`
+INDEXED_KEYS = ('prompt', 'provider', 'model', 'aspect_ratio')
+# Derived files living next to the assets that are not assets themselves
+DERIVED_SUFFIXES = ('_poster.jpg', '_sprite.jpg')
+DERIVED_PREFIXES = ('thumb_', 'preview_')
+BACKFILL_BATCH_SIZE = 200
+
+
+def _iso_timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def is_catalog_file(name: str) -> bool:
+    if name.startswith(DERIVED_PREFIXES) or name.endswith(DERIVED_SUFFIXES):
+        return False
+    return file_type_from_name(name) in ('image', 'video')
+
+
+def read_asset_info(path: str) -> Dict[str, Any]:
+    """
+    Describe a stored image/video from its header only (blocking)
+
+    Returns:
+        Dict with the catalog columns that can be derived from the file
+    """
+    name = os.path.basename(path)
+    kind = file_type_from_name(name)
+    stat = os.stat(path)
+    info: Dict[str, Any] = {
+        'file_id': name,
+        'kind': kind,
+        'size': stat.st_size,
+        'width': 0,
+        'height': 0,
+        'created_at': _iso_timestamp(stat.st_mtime),
+    }
+    text: Dict[str, str] = {}
+    try:
+        if name.lower().endswith('.png'):
+            info['width'], info['height'], text = read_png_file_info(path)
+            info['mime_type'] = 'image/png'
+        elif kind == 'image':
+            # Lazy open: only the header is parsed
+            with Image.open(path) as image:
+                info['width'], info['height'] = image.size
+                info['mime_type'] = Image.MIME.get(image.format or '', '')
+        else:
+            probe = probe_video(path)
+            info['width'], info['height'] = probe['width'], probe['height']
+            info['mime_type'] = 'video/mp4'
+    except Exception as e:
+        print(f"⚠️ Cannot read header of asset {name}: {e}")
+
+    for key in INDEXED_KEYS:
+        info[key] = text.pop(key, '')
+    info['metadata'] = json.dumps(text, ensure_ascii=False)
+    return info
+
+
+def _fts_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match (as a prefix)"""
+    terms = [term.replace('"', '""') for term in q.split()]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+class AssetCatalogService:
+    def __init__(self) -> None:
+        self._has_fts: Optional[bool] = None
+        self._backfill_task: Optional[asyncio.Task[None]] = None
+
+    async def record(
+        self,
+        filename: str,
+        session_id: str = '',
+        canvas_id: str = '',
+        **fields: Any,
+    ) -> None:
+        """
+        Add a stored file to the catalog
+
+        Never raises: a catalog failure must not fail the generation.
+
+        Args:
+            filename: File name in FILES_DIR
+            session_id: Session that generated the asset
+            canvas_id: Canvas the asset was inserted into
+            **fields: Known column values overriding the ones read from the
+                file (e.g. prompt for videos)
+        """
+        try:
+            info = await run_in_threadpool(read_asset_info, os.path.join(FILES_DIR, filename))
+            info['created_at'] = _iso_timestamp(time.time())
+            info.update({'session_id': session_id, 'canvas_id': canvas_id})
+            info.update({k: v for k, v in fields.items() if v})
+            await db_service.upsert_assets([info])
+        except Exception as e:
+            print(f"⚠️ Failed to record asset {filename} in the catalog: {e}")
+
+    async def record_many(
+        self,
+        filenames: Iterable[str],
+        session_id: str = '',
+        canvas_id: str = '',
+        **fields: Any,
+    ) -> None:
+        """
+        Add several stored files to the catalog in one worker-thread read and
+        one database write; never raises, see record()
+        """
+        names = list(filenames)
+        if not names:
+            return
+        try:
+            infos = await run_in_threadpool(
+                lambda: [read_asset_info(os.path.join(FILES_DIR, name)) for name in names])
+            created_at = _iso_timestamp(time.time())
+            for info in infos:
+                info['created_at'] = created_at
+                info.update({'session_id': session_id, 'canvas_id': canvas_id})
+                info.update({k: v for k, v in fields.items() if v})
+            await db_service.upsert_assets(infos)
+        except Exception as e:
+            print(f"⚠️ Failed to record assets {', '.join(names)} in the catalog: {e}")
+
+    async def search(
+        self,
+        q: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search the catalog, newest first (keyset pagination on created_at, file_id)"""
+        if self._has_fts is None:
+            self._has_fts = await db_service.has_asset_fts()
+        match = like = None
+        if q and q.strip():
+            if self._has_fts:
+                match = _fts_query(q)
+            else:
+                like = q.strip()
+
+        rows = await db_service.search_assets(
+            match=match, like=like, filters=filters, since=since, until=until,
+            limit=limit, after=after)
+        for row in rows:
+            row['url'] = f"/api/file/{row['file_id']}"
+            try:
+                row['metadata'] = json.loads(row.get('metadata') or '{}')
+            except json.JSONDecodeError:
+                row['metadata'] = {}
+        return rows
+
+    def start_backfill(self) -> None:
+        """Index files in FILES_DIR missing from the catalog, in the background"""
+        if self._backfill_task is None or self._backfill_task.done():
+            self._backfill_task = asyncio.create_task(self.backfill())
+
+    async def stop(self) -> None:
+        if self._backfill_task is not None and not self._backfill_task.done():
+            self._backfill_task.cancel()
+            try:
+                await self._backfill_task
+            except asyncio.CancelledError:
+                pass
+
+    async def backfill(self) -> int:
+        """
+        Scan FILES_DIR and catalog files that are not in the catalog yet
+
+        Returns:
+            int: Number of assets added
+        """
+        try:
+            known = set(await db_service.list_asset_file_ids())
+            names = await run_in_threadpool(self._scan_files_dir, known)
+            if not names:
+                return 0
+
+            print(f"🗂️ Backfilling asset catalog with {len(names)} file(s)")
+            canvas_by_file = await self._canvas_references(set(names))
+            added = 0
+            for start in range(0, len(names), BACKFILL_BATCH_SIZE):
+                batch = names[start:start + BACKFILL_BATCH_SIZE]
+                assets = await run_in_threadpool(self._read_batch, batch)
+                for asset in assets:
+                    asset.setdefault('session_id', '')
+                    asset['canvas_id'] = canvas_by_file.get(asset['file_id'], '')
+                await db_service.upsert_assets(assets)
+                added += len(assets)
+            print(f"🗂️ Asset catalog backfill done, {added} file(s) added")
+            return added
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Asset catalog backfill failed: {e}")
+            traceback.print_exc()
+            return 0
+
+    @staticmethod
+    def _scan_files_dir(known: Set[str]) -> List[str]:
+        if not os.path.isdir(FILES_DIR):
+            return []
+        with os.scandir(FILES_DIR) as it:
+            return sorted(
+                entry.name for entry in it
+                if entry.name not in known and is_catalog_file(entry.name) and entry.is_file()
+            )
+
+    @staticmethod
+    def _read_batch(names: Iterable[str]) -> List[Dict[str, Any]]:
+        assets: List[Dict[str, Any]] = []
+        for name in names:
+            try:
+                assets.append(read_asset_info(os.path.join(FILES_DIR, name)))
+            except OSError:
+                # Removed while backfilling
+                continue
+        return assets
+
+    async def _canvas_references(self, names: Set[str]) -> Dict[str, str]:
+        """file name -> id of a canvas whose files reference it"""
+        canvases = await db_service.list_canvas_data()
+
+        def _map() -> Dict[str, str]:
+            references: Dict[str, str] = {}
+            for canvas_id, data in canvases:
+                try:
+                    files = (json.loads(data) or {}).get('files') or {}
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                for file_data in files.values():
+                    url = (file_data or {}).get('dataURL') or ''
+                    if '/api/file/' in url:
+                        name = url.split('/api/file/')[-1].split('?')[0]
+                        if name in names:
+                            references.setdefault(name, canvas_id)
+            return references
+
+        return await run_in_threadpool(_map)
+
+
+asset_catalog_service = AssetCatalogService()
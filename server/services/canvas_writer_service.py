@@ -0,0 +1,284 @@
+"""
+Canvas writer service - one mutation actor per canvas
+
+All server-side element inserts (generated images, videos, ComfyUI outputs) and
+updates of existing elements go through the writer of their canvas instead of
+doing their own read-modify-write. A writer drains everything pending in its queue and applies
+it in a single load/place/save cycle under the canvas lock, then broadcasts the
+whole batch in one `session_update`. The mutations of one submit() call are
+queued as a unit and never split across batches; a submission that fails leaves
+no partial changes and only fails its own callers, the rest of the batch is
+still saved and broadcast. Writers exit after IDLE_TIMEOUT seconds without work.
+"""
+
+import asyncio
+import copy
+import json
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from services.db_service import db_service
+from services.cluster_service import cluster_service
+from services.websocket_service import broadcast_session_update
+
+IDLE_TIMEOUT = 30.0
+MAX_BATCH_SIZE = 64
+
+# Builds the new element given the canvas data it will be inserted into, so
+# placement sees the elements inserted earlier in the same batch
+ElementBuilder = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class _Mutation:
+    def __init__(self, session_id: str, event: Dict[str, Any]) -> None:
+        self.session_id = session_id
+        self.event = event
+        self.future: asyncio.Future[Optional[Dict[str, Any]]] = asyncio.get_running_loop().create_future()
+
+    async def apply(self, canvas_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply to the canvas data in place, returns the broadcast event"""
+        raise NotImplementedError
+
+
+class CanvasMutation(_Mutation):
+    """Insert of one element and its file into a canvas"""
+
+    def __init__(
+        self,
+        session_id: str,
+        file_data: Optional[Dict[str, Any]],
+        build_element: ElementBuilder,
+        event: Dict[str, Any],
+    ) -> None:
+        """
+        Args:
+            session_id: Session to attribute the broadcast to
+            file_data: Excalidraw file entry, must contain 'id'; None for
+                elements without a file yet (pending placeholders)
+            build_element: Coroutine function creating the placed element
+            event: Broadcast event (type and extra fields), 'element' and
+                'file' are filled in by the writer
+        """
+        super().__init__(session_id, event)
+        self.file_data = file_data
+        self.build_element = build_element
+
+    async def apply(self, canvas_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        element = await self.build_element(canvas_data)
+        canvas_data['elements'].append(element)
+        if self.file_data is not None:
+            canvas_data['files'][self.file_data['id']] = self.file_data
+        return {**self.event, 'element': element, 'file': self.file_data}
+
+
+class CanvasElementUpdate(_Mutation):
+    """Merge fields into an existing element (and its file entry)"""
+
+    def __init__(
+        self,
+        session_id: str,
+        element_id: str,
+        fields: Dict[str, Any],
+        event: Dict[str, Any],
+        file_fields: Optional[Dict[str, Any]] = None,
+        file_data: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Args:
+            session_id: Session to attribute the broadcast to
+            element_id: Id of the element to update
+            fields: Element fields to set; 'customData' is merged key by key
+            event: Broadcast event (type and extra fields), 'element' and
+                'file' are filled in by the writer
+            file_fields: Fields to set on the element's file entry
+            file_data: New file entry to add, e.g. when a pending element
+                gets its asset; set 'fileId' in `fields` to point to it. The
+                replaced file entry is dropped unless another element uses it
+        """
+        super().__init__(session_id, event)
+        self.element_id = element_id
+        self.fields = fields
+        self.file_fields = file_fields or {}
+        self.file_data = file_data
+
+    async def apply(self, canvas_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        element = next(
+            (e for e in canvas_data['elements'] if e.get('id') == self.element_id), None)
+        if element is None or element.get('isDeleted'):
+            # Removed by the user in the meantime, nothing to update
+            return None
+
+        previous_file_id = element.get('fileId')
+        for key, value in self.fields.items():
+            if key == 'customData':
+                element['customData'] = {**(element.get('customData') or {}), **value}
+            else:
+                element[key] = value
+        element['version'] = element.get('version', 1) + 1
+
+        if self.file_data is not None:
+            canvas_data['files'][self.file_data['id']] = self.file_data
+        if previous_file_id and previous_file_id != element.get('fileId') and not any(
+                e.get('fileId') == previous_file_id for e in canvas_data['elements']):
+            canvas_data['files'].pop(previous_file_id, None)
+
+        file_data = canvas_data['files'].get(element.get('fileId'))
+        if file_data is not None:
+            file_data.update(self.file_fields)
+        return {**self.event, 'element_id': self.element_id, 'element': element, 'file': file_data}
+
+
+class _CanvasWriter:
+    def __init__(self, service: 'CanvasWriterService', canvas_id: str) -> None:
+        self.service = service
+        self.canvas_id = canvas_id
+        # One entry per submit() call, so its mutations stay in one batch
+        self.queue: asyncio.Queue[List[_Mutation]] = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        # Submission that did not fit in the previous batch
+        carry: Optional[List[_Mutation]] = None
+        while True:
+            if carry is not None:
+                first, carry = carry, None
+            else:
+                try:
+                    first = await asyncio.wait_for(self.queue.get(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if self.queue.empty():
+                        self.service._writer_exited(self)
+                        return
+                    continue
+
+            # Whole submissions only; a single one larger than MAX_BATCH_SIZE
+            # still goes in one batch
+            submissions = [first]
+            size = len(first)
+            while not self.queue.empty():
+                submission = self.queue.get_nowait()
+                if size + len(submission) > MAX_BATCH_SIZE:
+                    carry = submission
+                    break
+                submissions.append(submission)
+                size += len(submission)
+
+            try:
+                await self._apply(submissions)
+            except Exception as e:
+                print(f"❌ Failed to write {size} element(s) to canvas {self.canvas_id}: {e}")
+                traceback.print_exc()
+                for submission in submissions:
+                    for mutation in submission:
+                        if not mutation.future.done():
+                            mutation.future.set_exception(e)
+
+    async def _apply(self, submissions: List[List[_Mutation]]) -> None:
+        events: List[Dict[str, Any]] = []
+        applied: List[Tuple[_Mutation, Optional[Dict[str, Any]]]] = []
+        async with cluster_service.lock(f"canvas:{self.canvas_id}"):
+            canvas: Optional[Dict[str, Any]] = await db_service.get_canvas_data(self.canvas_id)
+            if canvas is None:
+                canvas = {'data': {}}
+            canvas_data: Dict[str, Any] = canvas.get('data') or {}
+            canvas_data.setdefault('elements', [])
+            canvas_data.setdefault('files', {})
+
+            for submission in submissions:
+                # Apply to a copy when other submissions share the batch, so a
+                # failing one can be dropped without its partial changes
+                work = copy.deepcopy(canvas_data) if len(submissions) > 1 else canvas_data
+                try:
+                    submission_events = [await mutation.apply(work) for mutation in submission]
+                except Exception as e:
+                    print(f"❌ Failed to apply {len(submission)} change(s) to canvas {self.canvas_id}: {e}")
+                    traceback.print_exc()
+                    for mutation in submission:
+                        mutation.future.set_exception(e)
+                    continue
+                canvas_data = work
+                for mutation, event in zip(submission, submission_events):
+                    applied.append((mutation, event['element'] if event else None))
+                    if event is not None:
+                        events.append({
+                            'session_id': mutation.session_id,
+                            'canvas_id': self.canvas_id,
+                            **event,
+                        })
+
+            if events:
+                await db_service.save_canvas_data(self.canvas_id, json.dumps(canvas_data))
+
+        for mutation, element in applied:
+            mutation.future.set_result(element)
+
+        if not events:
+            return
+
+        if len(events) == 1:
+            await broadcast_session_update(events[0]['session_id'], self.canvas_id, events[0])
+        else:
+            print(f"🧩 Inserted {len(events)} elements into canvas {self.canvas_id} in one batch")
+            await broadcast_session_update(events[0]['session_id'], self.canvas_id, {
+                'type': 'canvas_batch',
+                'events': events,
+            })
+
+
+class CanvasWriterService:
+    def __init__(self) -> None:
+        self._writers: Dict[str, _CanvasWriter] = {}
+
+    def _writer_exited(self, writer: _CanvasWriter) -> None:
+        if self._writers.get(writer.canvas_id) is writer:
+            del self._writers[writer.canvas_id]
+
+    async def submit(self, canvas_id: str, mutations: Sequence[_Mutation]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Queue element inserts/updates for a canvas and wait until they are saved
+
+        Mutations submitted together are queued as one unit and always applied
+        in the same batch, saved and broadcast together.
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: The placed or updated elements, in
+            submission order (None for updates of elements that no longer exist)
+        """
+        writer = self._writers.get(canvas_id)
+        if writer is None or writer.task.done():
+            writer = _CanvasWriter(self, canvas_id)
+            self._writers[canvas_id] = writer
+        writer.queue.put_nowait(list(mutations))
+        return list(await asyncio.gather(*(m.future for m in mutations)))
+
+    async def insert(
+        self,
+        canvas_id: str,
+        session_id: str,
+        file_data: Dict[str, Any],
+        build_element: ElementBuilder,
+        event: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Queue a single element insert and return the placed element"""
+        elements = await self.submit(
+            canvas_id, [CanvasMutation(session_id, file_data, build_element, event)])
+        element = elements[0]
+        assert element is not None
+        return element
+
+    async def update_element(
+        self,
+        canvas_id: str,
+        session_id: str,
+        element_id: str,
+        fields: Dict[str, Any],
+        event: Dict[str, Any],
+        file_fields: Optional[Dict[str, Any]] = None,
+        file_data: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Queue an update of an existing element, returns it or None if it is gone"""
+        elements = await self.submit(
+            canvas_id, [CanvasElementUpdate(session_id, element_id, fields, event, file_fields, file_data)])
+        return elements[0]
+
+
+canvas_writer_service = CanvasWriterService()
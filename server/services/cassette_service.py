@@ -0,0 +1,328 @@
+"""
+Cassette service - record and replay of model streams and provider calls
+
+CASSETTE_MODE=record stores, in CASSETTE_DIR (default user_data/cassettes):
+- chat-<key>.jsonl.gz: the chunks the agent graph streamed in a chat turn
+  (astream in messages/custom/values mode) with their timing, keyed by the
+  turn's inputs (text model, messages, tools, system prompt)
+- image-<provider>-<shape>-<id>.jsonl.gz: one IMAGE_PROVIDERS call: the
+  provider's HTTP exchanges during the call (aiohttp; request headers are not
+  stored, bodies over CASSETTE_MAX_BODY only by size and digest), its result
+  or error, and the generated image files
+
+CASSETTE_MODE=replay serves from the recordings instead. A chat turn whose
+inputs match a recording streams the recorded chunks into StreamProcessor
+without calling the model. Image calls with the same provider, model, aspect
+ratio and image count take the matching recordings in turn and return copies
+of their images, or raise their error. Events are paced as recorded, divided
+by CASSETTE_SPEED (0 replays without waiting). Calls without a recording run
+live.
+
+The file format is described in utils/cassette.py.
+"""
+
+import asyncio
+import os
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import aiohttp
+from fastapi.concurrency import run_in_threadpool
+from services.config_service import USER_DATA_DIR
+from utils.cassette import (
+    CASSETTE_SUFFIX,
+    CassetteEvent,
+    decode_value,
+    encode_body,
+    encode_value,
+    list_cassettes,
+    read_cassette,
+    request_key,
+    write_cassette,
+)
+
+OFF = 'off'
+RECORD = 'record'
+REPLAY = 'replay'
+
+Cassette = Tuple[Dict[str, Any], List[CassetteEvent]]
+
+# HTTP exchanges of the provider call being recorded in this task
+_http_exchanges: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar('cassette_http_exchanges', default=None)
+
+
+class CassetteReplayError(Exception):
+    """A replayed call failed when it was recorded"""
+
+
+class Recorder:
+    """Events of one recording, offsets relative to its start"""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.events: List[CassetteEvent] = []
+
+    def offset(self, at: Optional[float] = None) -> float:
+        return round((time.monotonic() if at is None else at) - self.started, 4)
+
+    def add(self, event_type: str, data: Any, at: Optional[float] = None) -> None:
+        self.events.append([self.offset(at), event_type, data])
+
+
+class _RecordingRunnable:
+    def __init__(self, runnable: Any, name: str, header: Dict[str, Any]) -> None:
+        self.runnable = runnable
+        self.name = name
+        self.header = header
+
+    async def astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        recorder = Recorder()
+        try:
+            async for chunk in self.runnable.astream(*args, **kwargs):
+                recorder.add('chunk', encode_value(chunk))
+                yield chunk
+        except Exception as e:
+            recorder.add('error', f"{type(e).__name__}: {e}")
+            await cassette_service.save(self.name, self.header, recorder.events)
+            raise
+        await cassette_service.save(self.name, self.header, recorder.events)
+
+
+class RecordingGraph:
+    """Wraps the agent graph; its compiled graph records what astream() yields"""
+
+    def __init__(self, graph: Any, name: str, header: Dict[str, Any]) -> None:
+        self.graph = graph
+        self.name = name
+        self.header = header
+
+    def compile(self, *args: Any, **kwargs: Any) -> _RecordingRunnable:
+        return _RecordingRunnable(self.graph.compile(*args, **kwargs), self.name, self.header)
+
+
+class ReplayGraph:
+    """Stands in for the agent graph, streaming the chunks of a chat cassette"""
+
+    def __init__(self, name: str, events: List[CassetteEvent]) -> None:
+        self.name = name
+        self.events = events
+
+    def compile(self, *args: Any, **kwargs: Any) -> 'ReplayGraph':
+        return self
+
+    async def astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        started = time.monotonic()
+        for offset, event_type, data in self.events:
+            await cassette_service.pace(started, offset)
+            if event_type == 'chunk':
+                mode, payload = data
+                # 'messages' chunks are (message, metadata) tuples
+                yield (mode, tuple(payload) if mode == 'messages' else payload)
+            elif event_type == 'error':
+                raise CassetteReplayError(data)
+
+
+def _decode_events(events: List[CassetteEvent]) -> List[CassetteEvent]:
+    return [[offset, event_type, decode_value(data)] for offset, event_type, data in events]
+
+
+class CassetteService:
+    def __init__(self) -> None:
+        mode = os.getenv('CASSETTE_MODE', OFF).lower()
+        self.mode = mode if mode in (RECORD, REPLAY) else OFF
+        self.directory = os.getenv('CASSETTE_DIR') or os.path.join(USER_DATA_DIR, 'cassettes')
+        self.speed = float(os.getenv('CASSETTE_SPEED', '1'))
+        self.max_body = int(os.getenv('CASSETTE_MAX_BODY', str(256 * 1024)))
+        # Replay: cassettes by path, listings and round-robin position by prefix
+        self._cassettes: Dict[str, Cassette] = {}
+        self._listings: Dict[str, List[str]] = {}
+        self._positions: Dict[str, int] = {}
+        self._trace_config: Optional[aiohttp.TraceConfig] = None
+        if self.mode != OFF:
+            print(f"📼 Cassette {self.mode} mode, directory {self.directory}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    # ========== Files ==========
+
+    async def save(self, name: str, header: Dict[str, Any], events: List[CassetteEvent]) -> None:
+        """Write a cassette; failures are logged, never raised into the recorded call"""
+        path = os.path.join(self.directory, name + CASSETTE_SUFFIX)
+        try:
+            size = await run_in_threadpool(write_cassette, path, header, events)
+            print(f"📼 Recorded {name} ({len(events)} events, {size / 1024:.1f} KiB)")
+        except Exception as e:
+            print(f"⚠️ Failed to write cassette {name}: {e}")
+            traceback.print_exc()
+
+    async def _load(self, path: str) -> Optional[Cassette]:
+        cassette = self._cassettes.get(path)
+        if cassette is None:
+            try:
+                cassette = await run_in_threadpool(read_cassette, path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Failed to read cassette {path}: {e}")
+                return None
+            self._cassettes[path] = cassette
+        return cassette
+
+    async def next_cassette(self, prefix: str) -> Optional[Cassette]:
+        """The next of the cassettes whose name starts with prefix, in turn"""
+        paths = self._listings.get(prefix)
+        if paths is None:
+            paths = await run_in_threadpool(list_cassettes, self.directory, prefix)
+            self._listings[prefix] = paths
+        if not paths:
+            return None
+        position = self._positions.get(prefix, 0)
+        self._positions[prefix] = position + 1
+        return await self._load(paths[position % len(paths)])
+
+    async def pace(self, started: float, offset: float) -> None:
+        """Wait until a recorded offset is reached, at CASSETTE_SPEED"""
+        if self.speed <= 0:
+            return
+        delay = started + offset / self.speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # ========== Chat streams ==========
+
+    @staticmethod
+    def chat_name(inputs: Dict[str, Any]) -> str:
+        text_model = inputs.get('text_model') or {}
+        key = request_key(
+            text_model.get('provider'),
+            text_model.get('model'),
+            inputs.get('messages'),
+            sorted(tool.get('id', '') for tool in inputs.get('tool_list') or []),
+            inputs.get('system_prompt') or '',
+        )
+        return f"chat-{key}"
+
+    def record_chat(self, graph: Any, inputs: Dict[str, Any]) -> RecordingGraph:
+        """
+        Wrap the agent graph of a chat turn so its stream is recorded
+
+        Args:
+            graph: Graph passed to StreamProcessor.process_stream
+            inputs: langgraph_multi_agent arguments, stored in the header
+        """
+        name = self.chat_name(inputs)
+        return RecordingGraph(graph, name, {'kind': 'chat', 'key': name, 'inputs': inputs})
+
+    async def replay_chat(self, inputs: Dict[str, Any]) -> Optional[ReplayGraph]:
+        """Graph replaying the recording of a chat turn with these inputs, if any"""
+        name = self.chat_name(inputs)
+        path = os.path.join(self.directory, name + CASSETTE_SUFFIX)
+        cassette = await self._load(path) if os.path.exists(path) else None
+        if cassette is None:
+            print(f"📼 No cassette {name} for session {inputs.get('session_id')}, calling the model")
+            return None
+        # Messages are rebuilt per replay, the graph consumer may keep them
+        events = await run_in_threadpool(_decode_events, cassette[1])
+        print(f"📼 Replaying {name} for session {inputs.get('session_id')}")
+        return ReplayGraph(name, events)
+
+    # ========== Provider HTTP exchanges ==========
+
+    def trace_configs(self) -> List[aiohttp.TraceConfig]:
+        """aiohttp trace configs capturing exchanges while recording, else none"""
+        if not self.recording:
+            return []
+        if self._trace_config is None:
+            self._trace_config = self._build_trace_config()
+        return [self._trace_config]
+
+    @contextmanager
+    def capture_http(self) -> Iterator[List[Dict[str, Any]]]:
+        """Collect the aiohttp exchanges made by the current task"""
+        exchanges: List[Dict[str, Any]] = []
+        token = _http_exchanges.set(exchanges)
+        try:
+            yield exchanges
+        finally:
+            _http_exchanges.reset(token)
+
+    def http_events(self, recorder: Recorder, exchanges: List[Dict[str, Any]]) -> List[CassetteEvent]:
+        events = []
+        for exchange in exchanges:
+            finished = exchange.get('finished') or exchange.get('headers_at') or exchange['started']
+            events.append([recorder.offset(exchange['started']), 'http', {
+                'method': exchange['method'],
+                'url': exchange['url'],
+                'status': exchange.get('status'),
+                'content_type': exchange.get('content_type', ''),
+                'duration': round(finished - exchange['started'], 4),
+                'request': encode_body(bytes(exchange['request']), 'application/json', self.max_body),
+                'response': encode_body(bytes(exchange['response']), exchange.get('content_type', ''), self.max_body),
+                **({'error': exchange['error']} if 'error' in exchange else {}),
+            }])
+        return events
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session: Any, context: Any, params: Any) -> None:
+            exchanges = _http_exchanges.get()
+            context.cassette_exchange = None
+            if exchanges is not None:
+                context.cassette_exchange = {
+                    'started': time.monotonic(),
+                    'method': params.method,
+                    'url': str(params.url),
+                    'request': bytearray(),
+                    'response': bytearray(),
+                }
+                exchanges.append(context.cassette_exchange)
+
+        async def on_request_chunk_sent(session: Any, context: Any, params: Any) -> None:
+            exchange = getattr(context, 'cassette_exchange', None)
+            if exchange is not None:
+                exchange['request'] += params.chunk
+
+        async def on_request_end(session: Any, context: Any, params: Any) -> None:
+            exchange = getattr(context, 'cassette_exchange', None)
+            if exchange is not None:
+                exchange['status'] = params.response.status
+                exchange['content_type'] = params.response.content_type or ''
+                exchange['headers_at'] = time.monotonic()
+
+        async def on_response_chunk_received(session: Any, context: Any, params: Any) -> None:
+            exchange = getattr(context, 'cassette_exchange', None)
+            if exchange is not None:
+                exchange['response'] += params.chunk
+                exchange['finished'] = time.monotonic()
+
+        async def on_request_exception(session: Any, context: Any, params: Any) -> None:
+            exchange = getattr(context, 'cassette_exchange', None)
+            if exchange is not None:
+                exchange['error'] = f"{type(params.exception).__name__}: {params.exception}"
+                exchange['finished'] = time.monotonic()
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_response_chunk_received.append(on_response_chunk_received)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    @staticmethod
+    def new_name(prefix: str) -> str:
+        return f"{prefix}{uuid.uuid4().hex[:8]}"
+
+
+cassette_service = CassetteService()
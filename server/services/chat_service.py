@@ -8,9 +8,9 @@ from typing import Dict, Any, List, Optional
 # Import service modules
 from models.tool_model import ToolInfoJson
 from services.db_service import db_service
-from services.langgraph_service import langgraph_multi_agent
 from services.websocket_service import send_to_websocket
 from services.stream_service import add_stream_task, remove_stream_task
+from services.knowledge_service import knowledge_service
 from models.config_model import ModelInfo
 
 
@@ -46,6 +46,11 @@ async def handle_chat(data: Dict[str, Any]) -> None:
     # TODO: save and fetch system prompt from db or settings config
     system_prompt: Optional[str] = data.get('system_prompt')
 
+    # Only the knowledge chunks relevant to the latest user message go into the prompt
+    knowledge_prompt = await _knowledge_prompt(messages)
+    if knowledge_prompt:
+        system_prompt = f"{system_prompt}\n\n{knowledge_prompt}" if system_prompt else knowledge_prompt
+
     # If there is only one message, create a new chat session
     if len(messages) == 1:
         # create new session
@@ -55,12 +60,16 @@ async def handle_chat(data: Dict[str, Any]) -> None:
 
     await db_service.create_message(session_id, messages[-1].get('role', 'user'), json.dumps(messages[-1])) if len(messages) > 0 else None
 
+    # Imported on first chat: the agent stack (langgraph, langchain and the
+    # model clients) is the slowest part of the server to import
+    from services.langgraph_service import langgraph_multi_agent
+
     # Create and start langgraph_agent task for chat processing
     task = asyncio.create_task(langgraph_multi_agent(
         messages, canvas_id, session_id, text_model, tool_list, system_prompt))
 
     # Register the task in stream_tasks (for possible cancellation)
-    add_stream_task(session_id, task)
+    await add_stream_task(session_id, task)
     try:
         # Await completion of the langgraph_agent task
         await task
@@ -68,8 +77,30 @@ async def handle_chat(data: Dict[str, Any]) -> None:
         print(f"🛑Session {session_id} cancelled during stream")
     finally:
         # Always remove the task from stream_tasks after completion/cancellation
-        remove_stream_task(session_id)
+        await remove_stream_task(session_id)
         # Notify frontend WebSocket that chat processing is done
         await send_to_websocket(session_id, {
             'type': 'done'
         })
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get('content', '')
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return ' '.join(
+            part.get('text', '') for part in content
+            if isinstance(part, dict) and part.get('type') == 'text'
+        )
+    return ''
+
+
+async def _knowledge_prompt(messages: List[Dict[str, Any]]) -> str:
+    query = next(
+        (_message_text(m) for m in reversed(messages) if m.get('role') == 'user'), '')
+    try:
+        return await knowledge_service.build_knowledge_prompt(query)
+    except Exception as e:
+        print(f"⚠️ Knowledge retrieval failed: {e}")
+        return ''
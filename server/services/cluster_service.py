@@ -0,0 +1,300 @@
+"""
+Cluster service - coordination between uvicorn workers
+
+Built on top of `services.message_bus`. Provides:
+- BusClientManager: Socket.IO client manager that fans emits out to all
+  workers through the bus (same idea as socketio.AsyncRedisManager)
+- Cross-worker stream cancellation
+- Distributed locks (used for canvas writes)
+- A shared registry of Socket.IO connections and running stream tasks
+
+With the default in-memory bus everything stays in-process and behaves like a
+single worker. Set MESSAGE_BUS_URL=redis://... to run N workers per host behind
+a load balancer with sticky sessions.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import traceback
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+import socketio  # type: ignore
+from socketio.async_pubsub_manager import AsyncPubSubManager  # type: ignore
+from nanoid import generate
+from services.message_bus import MessageBus, message_bus
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{generate(size=6)}"
+
+SOCKETIO_CHANNEL = 'cluster:socketio'
+CANCEL_CHANNEL = 'cluster:stream_cancel'
+WORKERS_KEY = 'cluster:workers'
+STREAM_TASKS_KEY = 'cluster:stream_tasks'
+
+HEARTBEAT_INTERVAL = 10
+# A worker that has not sent a heartbeat for this long is considered dead
+WORKER_TTL = 3 * HEARTBEAT_INTERVAL
+
+
+def _connections_key(worker_id: str) -> str:
+    return f'cluster:connections:{worker_id}'
+
+
+class BusClientManager(AsyncPubSubManager):
+    """Socket.IO client manager that publishes emits on the message bus"""
+
+    name = 'messagebus'
+
+    def __init__(self, bus: MessageBus, channel: str = SOCKETIO_CHANNEL) -> None:
+        super().__init__(channel=channel)
+        self.bus = bus
+
+    async def _publish(self, data: Dict[str, Any]) -> None:
+        await self.bus.publish(self.channel, data)
+
+    async def _listen(self) -> AsyncIterator[Dict[str, Any]]:
+        async for message in self.bus.subscribe(self.channel):
+            yield message
+
+
+class LockTimeoutError(Exception):
+    """Raised when a distributed lock could not be acquired in time"""
+
+
+class LockLostError(Exception):
+    """Raised in a critical section whose distributed lock expired or was taken over"""
+
+
+class ClusterService:
+    """Cluster membership, shared registries, locks and cancellation"""
+
+    def __init__(self, bus: MessageBus) -> None:
+        self.bus = bus
+        self.worker_id = WORKER_ID
+        self._background_tasks: Set[asyncio.Task[Any]] = set()
+        self._local_locks: Dict[str, asyncio.Lock] = {}
+        self._lock_refs: Dict[str, int] = {}
+        self._started = False
+
+    @property
+    def distributed(self) -> bool:
+        return self.bus.distributed
+
+    def create_client_manager(self) -> Optional[socketio.AsyncManager]:
+        """Socket.IO client manager for this deployment (None = default)"""
+        if not self.distributed:
+            return None
+        return BusClientManager(self.bus)
+
+    # ========== Lifecycle ==========
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        try:
+            await self.bus.connect()
+        except Exception as e:
+            print(f"❌ Failed to connect to message bus: {e}")
+            traceback.print_exc()
+        self._spawn(self._heartbeat_loop())
+        self._spawn(self._cancel_listener())
+        mode = 'cluster' if self.distributed else 'single worker'
+        print(f"✅ Cluster service started ({mode}), worker id {self.worker_id}")
+
+    async def stop(self) -> None:
+        for task in list(self._background_tasks):
+            task.cancel()
+        try:
+            await self.bus.hdel(WORKERS_KEY, self.worker_id)
+            await self.bus.delete(_connections_key(self.worker_id))
+        except Exception as e:
+            print(f"Error unregistering worker {self.worker_id}: {e}")
+        await self.bus.close()
+        self._started = False
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            try:
+                await self.bus.hset(WORKERS_KEY, self.worker_id, str(time.time()))
+                await self._reap_dead_workers()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Cluster heartbeat failed: {e}")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def _live_workers(self) -> Set[str]:
+        workers = await self.bus.hgetall(WORKERS_KEY)
+        now = time.time()
+        return {w for w, ts in workers.items() if now - float(ts) < WORKER_TTL}
+
+    async def _reap_dead_workers(self) -> None:
+        workers = await self.bus.hgetall(WORKERS_KEY)
+        live = await self._live_workers()
+        for worker_id in workers.keys() - live:
+            print(f"🧹 Removing stale worker {worker_id} from cluster registry")
+            await self.bus.hdel(WORKERS_KEY, worker_id)
+            await self.bus.delete(_connections_key(worker_id))
+        stream_tasks = await self.bus.hgetall(STREAM_TASKS_KEY)
+        for session_id, worker_id in stream_tasks.items():
+            if worker_id not in live and worker_id != self.worker_id:
+                await self.bus.hdel(STREAM_TASKS_KEY, session_id)
+
+    # ========== Connection registry ==========
+
+    async def register_connection(self, sid: str, user_info: Dict[str, Any]) -> None:
+        try:
+            await self.bus.hset(_connections_key(self.worker_id), sid, json.dumps(user_info))
+        except Exception as e:
+            print(f"Error registering connection {sid}: {e}")
+
+    async def unregister_connection(self, sid: str) -> None:
+        try:
+            await self.bus.hdel(_connections_key(self.worker_id), sid)
+        except Exception as e:
+            print(f"Error unregistering connection {sid}: {e}")
+
+    async def get_connection_count(self) -> int:
+        """Number of Socket.IO connections across all live workers"""
+        workers = await self._live_workers() | {self.worker_id}
+        counts = await asyncio.gather(
+            *(self.bus.hlen(_connections_key(w)) for w in workers))
+        return sum(counts)
+
+    # ========== Stream tasks and cancellation ==========
+
+    async def register_stream_task(self, session_id: str) -> None:
+        try:
+            await self.bus.hset(STREAM_TASKS_KEY, session_id, self.worker_id)
+        except Exception as e:
+            print(f"Error registering stream task {session_id}: {e}")
+
+    async def unregister_stream_task(self, session_id: str) -> None:
+        try:
+            await self.bus.hdel(STREAM_TASKS_KEY, session_id)
+        except Exception as e:
+            print(f"Error unregistering stream task {session_id}: {e}")
+
+    async def request_cancel(self, session_id: str) -> bool:
+        """
+        Ask the worker running a session's stream task to cancel it.
+
+        Returns:
+            bool: True if some worker owns the task and was notified
+        """
+        owner = await self.bus.hget(STREAM_TASKS_KEY, session_id)
+        if not owner:
+            return False
+        await self.bus.publish(CANCEL_CHANNEL, {
+            'session_id': session_id,
+            'worker_id': owner,
+        })
+        return True
+
+    async def _cancel_listener(self) -> None:
+        from services.stream_service import cancel_local_stream_task
+        while True:
+            try:
+                async for message in self.bus.subscribe(CANCEL_CHANNEL):
+                    if message.get('worker_id') not in (None, self.worker_id):
+                        continue
+                    session_id = message.get('session_id', '')
+                    if cancel_local_stream_task(session_id):
+                        print(f"🛑 Cancelled stream {session_id} on request from another worker")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Cancel listener failed: {e}")
+                await asyncio.sleep(1)
+
+    # ========== Locks ==========
+
+    @asynccontextmanager
+    async def lock(self, name: str, ttl_ms: int = 60000, timeout: Optional[float] = None):
+        """
+        Exclusive lock across all workers.
+
+        Always serializes coroutines of this worker with a local asyncio.Lock;
+        in cluster mode additionally holds a TTL-bound lock key on the bus.
+        """
+        local_lock = self._local_locks.setdefault(name, asyncio.Lock())
+        self._lock_refs[name] = self._lock_refs.get(name, 0) + 1
+        try:
+            async with local_lock:
+                if not self.distributed:
+                    yield
+                    return
+                async with self._bus_lock(name, ttl_ms, timeout):
+                    yield
+        finally:
+            # Drop idle locks so the lock table does not grow forever
+            self._lock_refs[name] -= 1
+            if self._lock_refs[name] == 0:
+                del self._lock_refs[name]
+                self._local_locks.pop(name, None)
+
+    @asynccontextmanager
+    async def _bus_lock(self, name: str, ttl_ms: int, timeout: Optional[float]):
+        """
+        TTL-bound lock key on the message bus, released only by its owner.
+
+        The TTL is renewed every ttl_ms / 3 while the critical section runs; if
+        the key expired or another owner took it anyway, the critical section
+        is cancelled and fails with LockLostError.
+        """
+        key = f'cluster:lock:{name}'
+        token = f'{self.worker_id}:{generate(size=8)}'
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        delay = 0.01
+        while not await self.bus.set_if_absent(key, token, ttl_ms):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeoutError(f"Timed out waiting for lock {name}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+        holder = asyncio.current_task()
+        lost = False
+
+        async def _renew() -> None:
+            nonlocal lost
+            while True:
+                await asyncio.sleep(ttl_ms / 3000)
+                try:
+                    if await self.bus.expire_if_equals(key, token, ttl_ms):
+                        continue
+                except Exception as e:
+                    # Keep trying while the current TTL still covers us
+                    print(f"⚠️ Error renewing lock {name}: {e}")
+                    continue
+                lost = True
+                print(f"⚠️ Lock {name} was lost while held, aborting its critical section")
+                if holder is not None:
+                    holder.cancel()
+                return
+
+        renew_task = asyncio.create_task(_renew())
+        try:
+            yield
+        except asyncio.CancelledError:
+            if not lost:
+                raise
+            if holder is not None:
+                holder.uncancel()
+            raise LockLostError(f"Lock {name} expired while held") from None
+        finally:
+            renew_task.cancel()
+            try:
+                # Atomic compare-and-delete: never removes a lock another owner took
+                await self.bus.delete_if_equals(key, token)
+            except Exception as e:
+                print(f"Error releasing lock {name}: {e}")
+
+cluster_service = ClusterService(message_bus)
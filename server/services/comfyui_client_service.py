@@ -0,0 +1,662 @@
+"""
+ComfyUI client service - one long-lived connection per ComfyUI server
+
+ComfyUI reports execution events over a websocket that is bound to a client
+id; every prompt queued with that client id reports to that socket. Instead of
+a health check, a fresh websocket and history polling per workflow run, each
+server gets one ComfyUIClient that keeps a single websocket open and routes the
+events to the runs waiting on them by `prompt_id`:
+
+- subscribe() registers a run before it is queued, so no event is missed;
+  events for prompt ids nobody subscribed to yet are buffered briefly
+- `status` events (queue length) are kept on the client and forwarded to runs
+  that have not started executing
+- binary preview frames carry no prompt id; they are attributed to the prompt
+  the server is currently executing
+- on disconnect the client reconnects with backoff and asks /history once per
+  waiting run for the events it may have missed; with nothing waiting it
+  tries once and otherwise reconnects on next use
+- is_healthy() is answered by the open connection, or by a cached
+  GET /api/prompt when there is none
+
+Several ComfyUI servers can be configured (`url` plus a `urls` list in the
+comfyui section of config.toml); they form a backend pool. dispatch() runs a
+job on the least loaded reachable backend, where the load is the live
+`queue_remaining` plus prompts queued since the last status event. Backends
+that recently ran a job needing the same models or input images get a bonus,
+so model loads, node caches and uploads are reused. A job whose backend fails
+(unreachable, connection lost for good) is re-queued on another backend;
+errors of the workflow itself are not retried.
+
+Input images are uploaded through upload_input(), which names the remote file
+after the content hash and remembers per backend which hashes it holds. A
+reference image reused across runs is uploaded once: later runs find it in
+the cache (re-verified with a HEAD /view after UPLOAD_VERIFY_TTL, so files
+removed on the server are noticed), identical concurrent uploads share one
+request, and after a restart a HEAD finds files uploaded earlier.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import struct
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlsplit
+import aiohttp
+from services.config_service import config_service
+from utils.http_client import HttpClient
+
+T = TypeVar('T')
+
+CONNECT_TIMEOUT = 10.0
+REQUEST_TIMEOUT = 60.0
+HEARTBEAT = 30.0
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+# Waiting runs are failed when the server stays unreachable this long
+RECONNECT_GIVE_UP = 60.0
+HEALTHY_TTL = 10.0
+UNHEALTHY_TTL = 3.0
+# Events for prompt ids that are not subscribed (yet)
+MAX_ORPHAN_PROMPTS = 64
+MAX_ORPHAN_EVENTS = 256
+
+# Affinity keys remembered per backend
+MAX_AFFINITY_KEYS = 512
+# Queue slots a matching affinity key is worth, and the cap over all keys
+AFFINITY_WEIGHT = 1.0
+MAX_AFFINITY_BONUS = 3.0
+# Backends a job is tried on before giving up
+DISPATCH_ATTEMPTS = 3
+MODEL_EXTENSIONS = ('.safetensors', '.ckpt', '.pt', '.pth', '.bin', '.gguf', '.sft')
+
+# Uploaded inputs remembered per backend, and how long an entry is trusted
+# before its presence is checked again
+MAX_UPLOADS = 1024
+UPLOAD_VERIFY_TTL = 600.0
+
+# Binary websocket frame types sent by ComfyUI
+PREVIEW_IMAGE = 1
+PREVIEW_IMAGE_WITH_METADATA = 4
+PREVIEW_MIME_TYPES = {1: 'image/jpeg', 2: 'image/png'}
+
+# Events after which the prompt is no longer running
+FINISHED_EVENTS = ('execution_success', 'execution_error', 'execution_interrupted')
+
+
+class ComfyUIError(Exception):
+    """Raised when ComfyUI rejects a request"""
+
+    def __init__(self, message: str, status: Optional[int] = None, body: Any = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class ComfyUIBackendError(ComfyUIError):
+    """Raised when a ComfyUI server cannot be reached; the job may run elsewhere"""
+
+
+class ComfyUIClient:
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.client_id = str(uuid.uuid4())
+        # Last queue length reported by the server
+        self.queue_remaining: Optional[int] = None
+        self.last_status_at: Optional[float] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Task[None]] = None
+        self._connect_lock = asyncio.Lock()
+        self._closing = False
+        self._subscriptions: Dict[str, asyncio.Queue[Dict[str, Any]]] = {}
+        # prompt ids whose execution started, they no longer get status events
+        self._started: set[str] = set()
+        self._orphans: OrderedDict[str, List[Dict[str, Any]]] = OrderedDict()
+        self._running_prompt_id: Optional[str] = None
+        self._health: Optional[bool] = None
+        self._health_checked_at = 0.0
+        # Jobs dispatched here and not finished
+        self.in_flight = 0
+        # Prompts queued here since the last status event
+        self._queued_since_status = 0
+        self._affinity: OrderedDict[str, None] = OrderedDict()
+        # content hash -> (remote "subfolder/name", verified at)
+        self._uploads: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+        self._pending_uploads: Dict[str, asyncio.Future[str]] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    @property
+    def pending(self) -> int:
+        """Number of runs waiting for events"""
+        return len(self._subscriptions)
+
+    @property
+    def load(self) -> float:
+        """Estimated number of prompts ahead of a new one"""
+        if self.connected and self.queue_remaining is not None:
+            return self.queue_remaining + self._queued_since_status
+        return self.in_flight
+
+    def affinity_score(self, keys: Sequence[str]) -> float:
+        matches = sum(1 for key in keys if key in self._affinity)
+        return min(matches * AFFINITY_WEIGHT, MAX_AFFINITY_BONUS)
+
+    def remember(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._affinity[key] = None
+            self._affinity.move_to_end(key)
+        while len(self._affinity) > MAX_AFFINITY_KEYS:
+            self._affinity.popitem(last=False)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # No total timeout, the websocket lives as long as the server
+            self._session = HttpClient.create_aiohttp_client(
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT))
+        return self._session
+
+    def _ws_url(self) -> str:
+        parts = urlsplit(self.base_url)
+        scheme = 'wss' if parts.scheme == 'https' else 'ws'
+        return f"{scheme}://{parts.netloc}/ws?clientId={self.client_id}"
+
+    # ========== Connection ==========
+
+    async def connect(self) -> None:
+        """Make sure the websocket is open; raises if the server is unreachable"""
+        if self.connected:
+            return
+        async with self._connect_lock:
+            if self.connected:
+                return
+            await self._open()
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_loop())
+
+    async def _open(self) -> None:
+        try:
+            self._ws = await asyncio.wait_for(
+                self._get_session().ws_connect(
+                    self._ws_url(), heartbeat=HEARTBEAT, max_msg_size=0),
+                CONNECT_TIMEOUT)
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+            self._set_health(False)
+            raise ComfyUIBackendError(
+                f"Cannot connect to ComfyUI at {self.base_url}: {e or type(e).__name__}") from e
+        self._set_health(True)
+        print(f"🔌 Connected to ComfyUI websocket at {self.base_url}")
+
+    async def _read_loop(self) -> None:
+        while True:
+            ws = self._ws
+            if ws is not None:
+                try:
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self._on_text(msg.data)
+                        elif msg.type == aiohttp.WSMsgType.BINARY:
+                            self._on_binary(msg.data)
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"⚠️ ComfyUI websocket at {self.base_url} failed: {e}")
+                    traceback.print_exc()
+            self._ws = None
+            self._running_prompt_id = None
+            if self._closing or not await self._reconnect():
+                return
+            await self._recover()
+
+    async def _reconnect(self) -> bool:
+        """Reopen the websocket with backoff; False when giving up"""
+        print(f"🔌 ComfyUI websocket at {self.base_url} closed, reconnecting")
+        lost_at = time.monotonic()
+        delay = RECONNECT_MIN_DELAY
+        while not self._closing:
+            try:
+                async with self._connect_lock:
+                    if not self.connected:
+                        await self._open()
+                return True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._subscriptions:
+                    # Nobody is waiting, connect again on next use
+                    return False
+                if time.monotonic() - lost_at >= RECONNECT_GIVE_UP:
+                    self._fail_all(f"Lost connection to ComfyUI at {self.base_url}: {e}")
+                    return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        return False
+
+    async def _recover(self) -> None:
+        """Deliver the results of prompts that finished while disconnected"""
+        for prompt_id in list(self._subscriptions):
+            try:
+                history = await self.get_history(prompt_id)
+            except Exception as e:
+                print(f"⚠️ Failed to get ComfyUI history for {prompt_id}: {e}")
+                continue
+            if prompt_id in history:
+                self._deliver(prompt_id, {
+                    'type': 'history',
+                    'data': {'prompt_id': prompt_id, 'history': history[prompt_id]},
+                })
+
+    def _fail_all(self, error: str) -> None:
+        for prompt_id in list(self._subscriptions):
+            self._deliver(prompt_id, {
+                'type': 'connection_lost',
+                'data': {'prompt_id': prompt_id, 'error': error},
+            })
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._reader is not None and not self._reader.done():
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # ========== Event routing ==========
+
+    def subscribe(self, prompt_id: str) -> 'asyncio.Queue[Dict[str, Any]]':
+        """Queue receiving the events of a prompt, register before queueing it"""
+        queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue()
+        self._subscriptions[prompt_id] = queue
+        for message in self._orphans.pop(prompt_id, []):
+            queue.put_nowait(message)
+        return queue
+
+    def rekey(self, prompt_id: str, server_prompt_id: str) -> None:
+        """Move a subscription to the prompt id the server assigned"""
+        queue = self._subscriptions.pop(prompt_id, None)
+        if queue is None or prompt_id == server_prompt_id:
+            if queue is not None:
+                self._subscriptions[prompt_id] = queue
+            return
+        self._subscriptions[server_prompt_id] = queue
+        for message in self._orphans.pop(server_prompt_id, []):
+            queue.put_nowait(message)
+
+    def unsubscribe(self, prompt_id: str) -> None:
+        self._subscriptions.pop(prompt_id, None)
+        self._started.discard(prompt_id)
+
+    def _deliver(self, prompt_id: str, message: Dict[str, Any]) -> None:
+        queue = self._subscriptions.get(prompt_id)
+        if queue is not None:
+            queue.put_nowait(message)
+            return
+        # The POST /prompt response may arrive after the first events
+        events = self._orphans.setdefault(prompt_id, [])
+        self._orphans.move_to_end(prompt_id)
+        if len(events) < MAX_ORPHAN_EVENTS:
+            events.append(message)
+        while len(self._orphans) > MAX_ORPHAN_PROMPTS:
+            self._orphans.popitem(last=False)
+
+    def _on_text(self, raw: str) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        message_type = message.get('type')
+        data = message.get('data') or {}
+
+        if message_type == 'status':
+            exec_info = (data.get('status') or {}).get('exec_info') or {}
+            if 'queue_remaining' in exec_info:
+                self.queue_remaining = exec_info['queue_remaining']
+                self.last_status_at = time.monotonic()
+                self._queued_since_status = 0
+            for prompt_id, queue in self._subscriptions.items():
+                if prompt_id not in self._started:
+                    queue.put_nowait(message)
+            return
+
+        prompt_id = data.get('prompt_id')
+        if not prompt_id:
+            return
+        if message_type == 'execution_start' or (message_type == 'executing' and data.get('node') is not None):
+            self._running_prompt_id = prompt_id
+            self._started.add(prompt_id)
+        elif message_type in FINISHED_EVENTS or (message_type == 'executing' and data.get('node') is None):
+            if self._running_prompt_id == prompt_id:
+                self._running_prompt_id = None
+                # In case the server's status event for it is missed
+                self._queued_since_status = max(0, self._queued_since_status - 1)
+        self._deliver(prompt_id, message)
+
+    def _on_binary(self, raw: bytes) -> None:
+        if len(raw) < 8:
+            return
+        event_type = struct.unpack('>I', raw[:4])[0]
+        prompt_id = self._running_prompt_id
+        if event_type == PREVIEW_IMAGE:
+            image_type = struct.unpack('>I', raw[4:8])[0]
+            image = raw[8:]
+        elif event_type == PREVIEW_IMAGE_WITH_METADATA:
+            metadata_length = struct.unpack('>I', raw[4:8])[0]
+            try:
+                metadata = json.loads(raw[8:8 + metadata_length])
+            except ValueError:
+                return
+            prompt_id = metadata.get('prompt_id') or prompt_id
+            image = raw[8 + metadata_length:]
+            mime_type = metadata.get('image_type')
+            image_type = 2 if mime_type == 'image/png' else 1
+        else:
+            return
+        if prompt_id and prompt_id in self._subscriptions:
+            self._deliver(prompt_id, {
+                'type': 'preview',
+                'data': {
+                    'prompt_id': prompt_id,
+                    'mime_type': PREVIEW_MIME_TYPES.get(image_type, 'image/jpeg'),
+                    'image': image,
+                },
+            })
+
+    # ========== HTTP API ==========
+
+    async def queue_prompt(self, workflow: Dict[str, Any], prompt_id: str) -> str:
+        """
+        Queue a workflow for this client's websocket
+
+        Returns:
+            str: Prompt id assigned by the server (older servers ignore ours)
+
+        Raises:
+            ComfyUIError: The server rejected the workflow
+            ComfyUIBackendError: The server could not be reached
+        """
+        data = {'prompt': workflow, 'client_id': self.client_id, 'prompt_id': prompt_id}
+        try:
+            async with self._get_session().post(
+                    f"{self.base_url}/prompt", json=data,
+                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as response:
+                text = await response.text()
+                status = response.status
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+            self._set_health(False)
+            raise ComfyUIBackendError(
+                f"Cannot queue prompt on ComfyUI at {self.base_url}: {e or type(e).__name__}") from e
+        try:
+            body = json.loads(text)
+        except ValueError:
+            body = None
+        if status != 200 or not isinstance(body, dict) or 'prompt_id' not in body:
+            raise ComfyUIError(text or f"HTTP {status}", status, body)
+        self._queued_since_status += 1
+        return str(body['prompt_id'])
+
+    async def upload_input(
+        self,
+        data: bytes,
+        filename: str,
+        subfolder: str = 'jaaz',
+        digest: Optional[str] = None,
+    ) -> str:
+        """
+        Upload an input image unless the server already holds the same content
+
+        Args:
+            data: File content
+            filename: Original name, only its extension is kept
+            subfolder: Subfolder of ComfyUI's input directory
+            digest: sha256 hex digest of data, computed if not given
+
+        Returns:
+            str: "subfolder/name" to put into LoadImage inputs
+
+        Raises:
+            ComfyUIError: The server rejected the upload
+            ComfyUIBackendError: The server could not be reached
+        """
+        digest = digest or hashlib.sha256(data).hexdigest()
+        key = f"{subfolder}:{digest}"
+        entry = self._uploads.get(key)
+        if entry is not None and time.monotonic() - entry[1] < UPLOAD_VERIFY_TTL:
+            self._uploads.move_to_end(key)
+            return entry[0]
+
+        pending = self._pending_uploads.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._upload(data, filename, subfolder, digest))
+            self._pending_uploads[key] = pending
+            pending.add_done_callback(lambda _: self._pending_uploads.pop(key, None))
+        remote_name = await asyncio.shield(pending)
+
+        self._uploads[key] = (remote_name, time.monotonic())
+        self._uploads.move_to_end(key)
+        while len(self._uploads) > MAX_UPLOADS:
+            self._uploads.popitem(last=False)
+        self.remember([f"upload:{digest}"])
+        return remote_name
+
+    async def _upload(self, data: bytes, filename: str, subfolder: str, digest: str) -> str:
+        # Content-addressed name: the same image always maps to the same file
+        name = f"{digest[:32]}{os.path.splitext(filename)[1].lower() or '.png'}"
+        session = self._get_session()
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        try:
+            async with session.head(
+                    f"{self.base_url}/view",
+                    params={'filename': name, 'subfolder': subfolder, 'type': 'input'},
+                    timeout=timeout) as response:
+                if response.status == 200:
+                    return f"{subfolder}/{name}"
+
+            form = aiohttp.FormData()
+            form.add_field('image', data, filename=name)
+            form.add_field('type', 'input')
+            form.add_field('subfolder', subfolder)
+            form.add_field('overwrite', 'true')
+            async with session.post(f"{self.base_url}/upload/image", data=form, timeout=timeout) as response:
+                text = await response.text()
+                status = response.status
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+            self._set_health(False)
+            raise ComfyUIBackendError(
+                f"Cannot upload image to ComfyUI at {self.base_url}: {e or type(e).__name__}") from e
+        try:
+            body = json.loads(text)
+        except ValueError:
+            body = None
+        if status != 200 or not isinstance(body, dict) or 'name' not in body:
+            raise ComfyUIError(text or f"HTTP {status}", status, body)
+        print(f"📤 Uploaded {filename} to ComfyUI at {self.base_url} as {subfolder}/{body['name']}")
+        return f"{body.get('subfolder') or subfolder}/{body['name']}"
+
+    async def get_history(self, prompt_id: str) -> Dict[str, Any]:
+        async with self._get_session().get(
+                f"{self.base_url}/history/{prompt_id}",
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as response:
+            if response.status != 200:
+                raise ComfyUIError(f"HTTP {response.status}", response.status)
+            return await response.json(content_type=None)
+
+    # ========== Health ==========
+
+    def _set_health(self, healthy: bool) -> None:
+        self._health = healthy
+        self._health_checked_at = time.monotonic()
+
+    async def is_healthy(self) -> bool:
+        if self.connected:
+            return True
+        ttl = HEALTHY_TTL if self._health else UNHEALTHY_TTL
+        if self._health is not None and time.monotonic() - self._health_checked_at < ttl:
+            return self._health
+        try:
+            async with self._get_session().get(
+                    f"{self.base_url}/api/prompt",
+                    timeout=aiohttp.ClientTimeout(total=CONNECT_TIMEOUT)) as response:
+                healthy = response.status == 200
+        except Exception:
+            healthy = False
+        self._set_health(healthy)
+        return healthy
+
+    async def probe(self) -> bool:
+        """Whether jobs can be dispatched here; keeps the websocket open for live status"""
+        if self.connected:
+            return True
+        if self._health is False and time.monotonic() - self._health_checked_at < UNHEALTHY_TTL:
+            return False
+        try:
+            await self.connect()
+            return True
+        except ComfyUIBackendError:
+            return False
+
+
+def workflow_affinity(workflow: Dict[str, Any]) -> List[str]:
+    """Affinity keys of a workflow: the model files and input images it loads"""
+    keys = []
+    for node in workflow.values():
+        inputs = node.get('inputs', {}) if isinstance(node, dict) else {}
+        for name, value in inputs.items():
+            if not isinstance(value, str):
+                continue
+            if value.lower().endswith(MODEL_EXTENSIONS):
+                keys.append(f"model:{value}")
+            elif name == 'image' and 'LoadImage' in str(node.get('class_type', '')):
+                keys.append(f"input:{value}")
+    return keys
+
+
+class ComfyUIClientService:
+    def __init__(self) -> None:
+        self._clients: Dict[str, ComfyUIClient] = {}
+
+    def get_client(self, base_url: str) -> ComfyUIClient:
+        base_url = base_url.rstrip('/')
+        client = self._clients.get(base_url)
+        if client is None:
+            client = ComfyUIClient(base_url)
+            self._clients[base_url] = client
+        return client
+
+    def get_backend_urls(self) -> List[str]:
+        """Configured ComfyUI servers: `url` and the optional `urls` list"""
+        config = config_service.app_config.get('comfyui', {})
+        urls = [config.get('url', '')]
+        extra = config.get('urls') or []
+        urls.extend([extra] if isinstance(extra, str) else extra)
+        backends: List[str] = []
+        for url in urls:
+            url = str(url or '').strip().rstrip('/')
+            if url and url not in backends:
+                backends.append(url)
+        return backends
+
+    async def select(self, affinity: Sequence[str] = (), exclude: Sequence[str] = ()) -> ComfyUIClient:
+        """
+        Pick the backend for a job: the least loaded reachable one, minus an
+        affinity bonus for backends that already served the same keys
+
+        Raises:
+            ComfyUIBackendError: No backend is configured or reachable
+        """
+        urls = [url for url in self.get_backend_urls() if url not in exclude]
+        if not urls:
+            raise ComfyUIBackendError('No ComfyUI server available')
+        clients = [self.get_client(url) for url in urls]
+        if len(clients) == 1:
+            # Nothing to choose from, the run reports an unreachable server
+            return clients[0]
+        reachable = await asyncio.gather(*(client.probe() for client in clients))
+        candidates = [client for client, ok in zip(clients, reachable) if ok]
+        if not candidates:
+            raise ComfyUIBackendError(f"No ComfyUI server reachable: {', '.join(urls)}")
+        return min(candidates, key=lambda client: (
+            client.load - client.affinity_score(affinity), client.in_flight, random.random()))
+
+    async def dispatch(
+        self,
+        run: Callable[[str], Awaitable[T]],
+        affinity: Iterable[str] = (),
+        attempts: int = DISPATCH_ATTEMPTS,
+    ) -> T:
+        """
+        Run a job on a backend of the pool
+
+        Args:
+            run: Coroutine function doing the whole job (uploads, execution,
+                output download) against the given base URL
+            affinity: Keys of what the job needs on the server, see
+                workflow_affinity()
+            attempts: Number of backends to try when one fails
+
+        Raises:
+            ComfyUIBackendError: The job failed on every backend tried
+        """
+        keys = list(affinity)
+        failed: List[str] = []
+        last_error: Optional[ComfyUIBackendError] = None
+        while True:
+            try:
+                client = await self.select(keys, exclude=failed)
+            except ComfyUIBackendError:
+                # Report why the last backend failed rather than "none left"
+                if last_error is not None:
+                    raise last_error
+                raise
+            client.in_flight += 1
+            try:
+                result = await run(client.base_url)
+            except ComfyUIBackendError as e:
+                last_error = e
+                failed.append(client.base_url)
+                if len(failed) >= attempts:
+                    raise
+                print(f"⚠️ ComfyUI server {client.base_url} failed, re-queueing the job: {e}")
+                continue
+            finally:
+                client.in_flight -= 1
+            client.remember(keys)
+            return result
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Load and connection state of the configured backends"""
+        return [
+            {
+                'url': client.base_url,
+                'connected': client.connected,
+                'queue_remaining': client.queue_remaining,
+                'in_flight': client.in_flight,
+                'load': client.load,
+            }
+            for client in (self.get_client(url) for url in self.get_backend_urls())
+        ]
+
+    async def close_all(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+
+comfyui_client_service = ComfyUIClientService()
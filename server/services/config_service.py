@@ -1,9 +1,11 @@
+import asyncio
 import copy
 import os
 import traceback
-import aiofiles
 import toml
-from typing import Dict, TypedDict, Literal, Optional
+from typing import Awaitable, Callable, Dict, List, Set, TypedDict, Literal, Optional
+from fastapi.concurrency import run_in_threadpool
+from utils.cached_file import CachedFile
 
 # 定义配置文件的类型结构
 
@@ -20,6 +22,10 @@ class ProviderConfig(TypedDict, total=False):
     max_tokens: int
     models: Dict[str, ModelConfig]
     is_custom: Optional[bool]
+    # Admission control for image/video calls, see services/rate_limit_service.py
+    max_in_flight: int
+    requests_per_second: float
+    model_limits: Dict[str, Dict[str, float]]
 
 
 AppConfig = Dict[str, ProviderConfig]
@@ -91,6 +97,12 @@ DEFAULT_PROVIDERS_CONFIG: AppConfig = {
 
 }
 
+# API hosts of providers whose URL is not part of their config
+PROVIDER_API_URLS: Dict[str, str] = {
+    'replicate': 'https://api.replicate.com/v1/',
+    'volces': 'https://ark.cn-beijing.volces.com/api/v3',
+}
+
 SERVER_DIR = os.path.dirname(os.path.dirname(__file__))
 USER_DATA_DIR = os.getenv(
     "USER_DATA_DIR",
@@ -119,54 +131,103 @@ VIDEO_FORMATS = (
 )
 
 
+def _changed_providers(old: AppConfig, new: AppConfig) -> Set[str]:
+    return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+
+ConfigListener = Callable[[Set[str]], Awaitable[None]]
+
+
 class ConfigService:
+    """
+    Provider configuration stored in config.toml
+
+    The parsed config is kept in memory and re-read only when the file's
+    inode/mtime/size change (edits made outside the app are picked up on the
+    next access). Writes are atomic (temp file + rename) and run in a thread
+    pool. Listeners registered with add_listener() are told which providers
+    changed, so dependents such as tool_service can update just those.
+    """
+
     def __init__(self):
-        self.app_config: AppConfig = copy.deepcopy(DEFAULT_PROVIDERS_CONFIG)
+        self._app_config: AppConfig = copy.deepcopy(DEFAULT_PROVIDERS_CONFIG)
         self.config_file = os.getenv(
             "CONFIG_PATH", os.path.join(USER_DATA_DIR, "config.toml")
         )
+        self._file: CachedFile[AppConfig] = CachedFile(self.config_file, self._parse)
+        # Copy of the config as last loaded/written, for change detection;
+        # callers may mutate app_config in place before update_config()
+        self._last_config: AppConfig = copy.deepcopy(self._app_config)
+        self._listeners: List[ConfigListener] = []
+        self._write_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self.initialized = False
 
+    @property
+    def app_config(self) -> AppConfig:
+        if self.initialized:
+            self._refresh()
+        return self._app_config
+
     def _get_jaaz_url(self) -> str:
         """Get the correct jaaz URL"""
         return os.getenv('BASE_API_URL', 'https://jaaz.app').rstrip('/') + '/api/v1/'
 
-    async def initialize(self) -> None:
+    def _parse(self, content: str) -> AppConfig:
+        config: AppConfig = toml.loads(content)
+        app_config: AppConfig = copy.deepcopy(DEFAULT_PROVIDERS_CONFIG)
+        for provider, provider_config in config.items():
+            if provider not in DEFAULT_PROVIDERS_CONFIG:
+                provider_config['is_custom'] = True
+            app_config[provider] = provider_config
+            # image/video models are hardcoded in the default provider config
+            provider_models = copy.deepcopy(DEFAULT_PROVIDERS_CONFIG.get(
+                provider, {}).get('models', {}))
+            for model_name, model_config in provider_config.get('models', {}).items():
+                # Only text model can be self added
+                if model_config.get('type') == 'text' and model_name not in provider_models:
+                    provider_models[model_name] = model_config
+                    provider_models[model_name]['is_custom'] = True
+            app_config[provider]['models'] = provider_models
+
+        # 确保 jaaz URL 始终正确
+        if 'jaaz' in app_config:
+            app_config['jaaz']['url'] = self._get_jaaz_url()
+        return app_config
+
+    def _refresh(self) -> None:
+        """Reload the config if the file changed on disk (a stat() otherwise)"""
         try:
-            # Ensure the user_data directory exists
-            os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+            config, reloaded = self._file.get()
+        except Exception as e:
+            print(f"Error reloading config: {e}")
+            return
+        if not reloaded or config is None:
+            return
+        print(f"🔄 Config file {self.config_file} changed on disk, reloaded")
+        changed = _changed_providers(self._last_config, config)
+        self._app_config = config
+        self._last_config = copy.deepcopy(config)
+        if changed and self._listeners:
+            self._schedule_notify(changed)
 
+    async def initialize(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        try:
             # Check if config file exists
             if not self.exists_config():
                 print(
                     f"Config file not found at {self.config_file}, creating default configuration")
-                # Create default config file
-                with open(self.config_file, "w") as f:
-                    toml.dump(self.app_config, f)
+                # Create default config file (and the user_data directory)
+                await run_in_threadpool(
+                    self._file.write, self._app_config, toml.dumps(self._app_config))
                 print(f"Default config file created at {self.config_file}")
-                self.initialized = True
                 return
 
-            async with aiofiles.open(self.config_file, "r") as f:
-                content = await f.read()
-                config: AppConfig = toml.loads(content)
-            for provider, provider_config in config.items():
-                if provider not in DEFAULT_PROVIDERS_CONFIG:
-                    provider_config['is_custom'] = True
-                self.app_config[provider] = provider_config
-                # image/video models are hardcoded in the default provider config
-                provider_models = DEFAULT_PROVIDERS_CONFIG.get(
-                    provider, {}).get('models', {})
-                for model_name, model_config in provider_config.get('models', {}).items():
-                    # Only text model can be self added
-                    if model_config.get('type') == 'text' and model_name not in provider_models:
-                        provider_models[model_name] = model_config
-                        provider_models[model_name]['is_custom'] = True
-                self.app_config[provider]['models'] = provider_models
-
-            # 确保 jaaz URL 始终正确
-            if 'jaaz' in self.app_config:
-                self.app_config['jaaz']['url'] = self._get_jaaz_url()
+            config, _ = await run_in_threadpool(self._file.get)
+            if config is not None:
+                self._app_config = config
+                self._last_config = copy.deepcopy(config)
         except Exception as e:
             print(f"Error loading config: {e}")
             traceback.print_exc()
@@ -174,20 +235,46 @@ class ConfigService:
             self.initialized = True
 
     def get_config(self) -> AppConfig:
-        if 'jaaz' in self.app_config:
-            self.app_config['jaaz']['url'] = self._get_jaaz_url()
-        return self.app_config
+        config = self.app_config
+        if 'jaaz' in config:
+            config['jaaz']['url'] = self._get_jaaz_url()
+        return config
+
+    def add_listener(self, listener: ConfigListener) -> None:
+        """Call `await listener(changed_providers)` after the config changed"""
+        self._listeners.append(listener)
+
+    async def _notify(self, changed: Set[str]) -> None:
+        results = await asyncio.gather(
+            *(listener(changed) for listener in self._listeners), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"⚠️ Config change listener failed: {result}")
+
+    def _schedule_notify(self, changed: Set[str]) -> None:
+        try:
+            asyncio.get_running_loop().create_task(self._notify(changed))
+        except RuntimeError:
+            # Reloaded from a worker thread
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(
+                    lambda: self._loop.create_task(self._notify(changed)))  # type: ignore[union-attr]
 
     async def update_config(self, data: AppConfig) -> Dict[str, str]:
         try:
             if 'jaaz' in data:
                 data['jaaz']['url'] = self._get_jaaz_url()
 
-            os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
-            with open(self.config_file, "w") as f:
-                toml.dump(data, f)
-            self.app_config = data
+            async with self._write_lock:
+                # Temp file + rename in a worker thread: readers never see a
+                # partial file and the event loop is not blocked
+                await run_in_threadpool(self._file.write, data, toml.dumps(data))
+                changed = _changed_providers(self._last_config, data)
+                self._app_config = data
+                self._last_config = copy.deepcopy(data)
 
+            if changed:
+                await self._notify(changed)
             return {
                 "status": "success",
                 "message": "Configuration updated successfully",
@@ -196,6 +283,19 @@ class ConfigService:
             traceback.print_exc()
             return {"status": "error", "message": str(e)}
 
+    def get_active_provider_urls(self) -> Dict[str, str]:
+        """Base URLs of the providers that can be called (jaaz, or configured with an api key)"""
+        urls: Dict[str, str] = {}
+        for provider, provider_config in self.app_config.items():
+            if provider_config.get('is_disabled'):
+                continue
+            if provider != 'jaaz' and not provider_config.get('api_key'):
+                continue
+            url = provider_config.get('url') or PROVIDER_API_URLS.get(provider, '')
+            if url:
+                urls[provider] = url
+        return urls
+
     def exists_config(self) -> bool:
         return os.path.exists(self.config_file)
 
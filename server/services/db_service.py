@@ -1,19 +1,40 @@
+import asyncio
 import sqlite3
 import json
 import os
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 import aiosqlite
+from fastapi.concurrency import run_in_threadpool
 from .config_service import USER_DATA_DIR
 from .migrations.manager import MigrationManager, CURRENT_VERSION
 
 DB_PATH = os.path.join(USER_DATA_DIR, "localmanus.db")
 
+ASSET_COLUMNS = (
+    'file_id', 'kind', 'mime_type', 'width', 'height', 'size', 'prompt', 'provider',
+    'model', 'aspect_ratio', 'canvas_id', 'session_id', 'metadata', 'created_at',
+)
+
 class DatabaseService:
     def __init__(self):
         self.db_path = DB_PATH
-        self._ensure_db_directory()
         self._migration_manager = MigrationManager()
-        self._init_db()
+        self._init_lock = asyncio.Lock()
+        self._initialized = False
+
+    async def initialize(self) -> None:
+        """
+        Create/migrate the schema; called once during startup (see
+        services/startup_service.py). Migrations can take a while on large
+        databases, so they run in a worker thread instead of at import time.
+        """
+        async with self._init_lock:
+            if self._initialized:
+                return
+            await run_in_threadpool(self._ensure_db_directory)
+            await run_in_threadpool(self._init_db)
+            self._initialized = True
 
     def _ensure_db_directory(self):
         """Ensure the database directory exists"""
@@ -52,15 +73,34 @@ class DatabaseService:
             """, (id, name))
             await db.commit()
 
-    async def list_canvases(self) -> List[Dict[str, Any]]:
-        """Get all canvases"""
+    async def list_canvases(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        List canvases, most recently updated first
+
+        Only lightweight columns are selected; `thumbnail` is a URL.
+        Uses keyset pagination on (updated_at, id): pass the last row's
+        (updated_at, id) as `after` to fetch the next page.
+        """
+        query = """
+            SELECT id, name, description, thumbnail, created_at, updated_at
+            FROM canvases
+        """
+        params: List[Any] = []
+        if after is not None:
+            query += " WHERE (updated_at, id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY updated_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
         async with aiosqlite.connect(self.db_path) as db:
             db.row_factory = sqlite3.Row
-            cursor = await db.execute("""
-                SELECT id, name, description, thumbnail, created_at, updated_at
-                FROM canvases
-                ORDER BY updated_at DESC
-            """)
+            cursor = await db.execute(query, params)
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
@@ -126,12 +166,12 @@ class DatabaseService:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
-    async def save_canvas_data(self, id: str, data: str, thumbnail: str = None):
-        """Save canvas data"""
+    async def save_canvas_data(self, id: str, data: str, thumbnail: Optional[str] = None):
+        """Save canvas data, keeping the current thumbnail when none is given"""
         async with aiosqlite.connect(self.db_path) as db:
             await db.execute("""
                 UPDATE canvases 
-                SET data = ?, thumbnail = ?, updated_at = STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')
+                SET data = ?, thumbnail = COALESCE(?, thumbnail), updated_at = STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')
                 WHERE id = ?
             """, (data, thumbnail, id))
             await db.commit()
@@ -169,14 +209,15 @@ class DatabaseService:
             await db.execute("UPDATE canvases SET name = ? WHERE id = ?", (name, id))
             await db.commit()
 
-    async def create_comfy_workflow(self, name: str, api_json: str, description: str, inputs: str, outputs: str = None):
-        """Create a new comfy workflow"""
+    async def create_comfy_workflow(self, name: str, api_json: str, description: str, inputs: str, outputs: str = None) -> int:
+        """Create a new comfy workflow, returns its id"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
+            cursor = await db.execute("""
                 INSERT INTO comfy_workflows (name, api_json, description, inputs, outputs)
                 VALUES (?, ?, ?, ?, ?)
             """, (name, api_json, description, inputs, outputs))
             await db.commit()
+            return cursor.lastrowid
 
     async def list_comfy_workflows(self) -> List[Dict[str, Any]]:
         """List all comfy workflows"""
@@ -210,5 +251,189 @@ class DatabaseService:
         except json.JSONDecodeError as exc:
             raise ValueError(f"Stored workflow api_json is not valid JSON: {exc}")
 
+    async def create_generation_job(self, id: str, kind: str, payload: str, session_id: str = '', canvas_id: str = ''):
+        """Enqueue a generation job"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                INSERT INTO generation_jobs (id, kind, payload, session_id, canvas_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, (id, kind, payload, session_id, canvas_id))
+            await db.commit()
+
+    async def claim_generation_job(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the oldest runnable generation job
+
+        Runnable jobs are queued ones and running ones whose lease expired
+        (their worker died or the server restarted).
+        """
+        now = time.time()
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = sqlite3.Row
+            cursor = await db.execute("""
+                UPDATE generation_jobs
+                SET status = 'running', worker_id = ?, lease_expires_at = ?, attempts = attempts + 1,
+                    updated_at = STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')
+                WHERE id = (
+                    SELECT id FROM generation_jobs
+                    WHERE status = 'queued' OR (status = 'running' AND lease_expires_at < ?)
+                    ORDER BY created_at ASC
+                    LIMIT 1
+                )
+                RETURNING *
+            """, (worker_id, now + lease_seconds, now))
+            row = await cursor.fetchone()
+            await db.commit()
+            return dict(row) if row else None
+
+    async def renew_generation_job_leases(self, worker_id: str, job_ids: List[str], lease_seconds: float):
+        """Extend the leases of jobs currently run by a worker"""
+        if not job_ids:
+            return
+        placeholders = ','.join('?' for _ in job_ids)
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(f"""
+                UPDATE generation_jobs SET lease_expires_at = ?
+                WHERE worker_id = ? AND status = 'running' AND id IN ({placeholders})
+            """, (time.time() + lease_seconds, worker_id, *job_ids))
+            await db.commit()
+
+    async def update_generation_job(self, id: str, **fields: Any):
+        """Update columns of a generation job (status, result, error, remote_task_id, ...)"""
+        if not fields:
+            return
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(f"""
+                UPDATE generation_jobs
+                SET {assignments}, updated_at = STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')
+                WHERE id = ?
+            """, (*fields.values(), id))
+            await db.commit()
+
+    async def get_generation_job(self, id: str) -> Optional[Dict[str, Any]]:
+        """Get a generation job"""
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = sqlite3.Row
+            cursor = await db.execute("SELECT * FROM generation_jobs WHERE id = ?", (id,))
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
+    async def list_generation_jobs(
+        self,
+        session_id: Optional[str] = None,
+        canvas_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """List generation jobs, newest first"""
+        conditions: List[str] = []
+        params: List[Any] = []
+        for column, value in (('session_id', session_id), ('canvas_id', canvas_id), ('status', status)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        query = """
+            SELECT id, kind, status, session_id, canvas_id, remote_task_id, result, error,
+                   attempts, worker_id, created_at, updated_at
+            FROM generation_jobs
+        """
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = sqlite3.Row
+            cursor = await db.execute(query, params)
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def upsert_assets(self, assets: List[Dict[str, Any]]):
+        """Insert or update asset catalog rows (keyed by file_id)"""
+        if not assets:
+            return
+        columns = list(ASSET_COLUMNS)
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(
+            f'{column} = COALESCE(NULLIF(excluded.{column}, \'\'), {column})'
+            for column in columns if column not in ('file_id', 'created_at'))
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.executemany(f"""
+                INSERT INTO assets ({', '.join(columns)})
+                VALUES ({placeholders})
+                ON CONFLICT(file_id) DO UPDATE SET {updates}
+            """, [tuple(asset.get(column) for column in columns) for asset in assets])
+            await db.commit()
+
+    async def list_asset_file_ids(self) -> List[str]:
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute("SELECT file_id FROM assets")
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def has_asset_fts(self) -> bool:
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'assets_fts'")
+            return await cursor.fetchone() is not None
+
+    async def search_assets(
+        self,
+        match: Optional[str] = None,
+        like: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the asset catalog, newest first
+
+        Args:
+            match: FTS5 query over prompt/model/provider
+            like: Substring of the prompt (used when FTS5 is unavailable)
+            filters: Exact-match column filters (kind, provider, model, ...)
+            since / until: created_at range (ISO timestamps)
+            after: (created_at, file_id) of the last row of the previous page
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+        if match:
+            conditions.append("rowid IN (SELECT rowid FROM assets_fts WHERE assets_fts MATCH ?)")
+            params.append(match)
+        if like:
+            conditions.append("prompt LIKE ? ESCAPE '\\'")
+            params.append('%' + like.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        for column, value in (filters or {}).items():
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if since:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if until:
+            conditions.append('created_at < ?')
+            params.append(until)
+        if after is not None:
+            conditions.append('(created_at, file_id) < (?, ?)')
+            params.extend(after)
+
+        query = f"SELECT {', '.join(ASSET_COLUMNS)} FROM assets"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, file_id DESC LIMIT ?"
+        params.append(limit)
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = sqlite3.Row
+            cursor = await db.execute(query, params)
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def list_canvas_data(self) -> List[Tuple[str, str]]:
+        """(id, data) of every canvas"""
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute("SELECT id, data FROM canvases WHERE data IS NOT NULL")
+            return [(row[0], row[1]) for row in await cursor.fetchall()]
+
 # Create a singleton instance
 db_service = DatabaseService()
@@ -0,0 +1,349 @@
+"""
+Generation job service - durable queue for image/video generation
+
+Tools enqueue a job into the `generation_jobs` table instead of calling
+providers inline. A pool of worker coroutines claims jobs, runs the handler
+registered for the job kind (provider call + canvas commit) and stores the
+result. The chat stream only waits for the result, so cancelling a chat does
+not abort a generation that is already running.
+
+Jobs survive restarts: a claimed job holds a lease that its worker renews, and
+jobs whose lease expired are claimed again. Handlers store the provider's
+remote task id on the job (`JobContext.set_remote_task_id`) so that a resumed
+job continues polling the remote task instead of starting a new generation.
+
+The number of workers per process is set with GENERATION_WORKERS (default 4).
+Set it to 0 to make a process enqueue-only; in cluster mode all workers claim
+from the same table.
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from nanoid import generate
+from services.db_service import db_service
+from services.cluster_service import cluster_service
+
+JOB_EVENTS_CHANNEL = 'cluster:generation_jobs'
+
+# Status values
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 3
+# Fallback polling interval when no wake-up event is received
+IDLE_POLL_INTERVAL = 2.0
+
+# Modules registering job handlers, imported when the workers start
+HANDLER_MODULES = [
+    'tools.utils.image_generation_core',
+    'tools.video_generation.video_generation_core',
+]
+
+
+class JobContext:
+    """Job passed to handlers"""
+
+    def __init__(self, job: Dict[str, Any]) -> None:
+        self.id: str = job['id']
+        self.kind: str = job['kind']
+        self.session_id: str = job.get('session_id') or ''
+        self.canvas_id: str = job.get('canvas_id') or ''
+        self.payload: Dict[str, Any] = json.loads(job['payload'])
+        self.remote_task_id: Optional[str] = job.get('remote_task_id')
+        self.attempts: int = job.get('attempts') or 0
+
+    async def set_remote_task_id(self, task_id: str) -> None:
+        """Persist the provider task id so polling can resume after a restart"""
+        self.remote_task_id = task_id
+        await db_service.update_generation_job(self.id, remote_task_id=task_id)
+
+
+JobHandler = Callable[[JobContext], Awaitable[str]]
+
+
+class GenerationJobError(Exception):
+    """Raised to waiters when a job failed or was cancelled"""
+
+
+class GenerationJobService:
+    """Durable generation job queue with a worker pool"""
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, JobHandler] = {}
+        self._num_workers = int(os.getenv('GENERATION_WORKERS', '4'))
+        self._workers: List[asyncio.Task[Any]] = []
+        self._background_tasks: Set[asyncio.Task[Any]] = set()
+        self._running_jobs: Dict[str, asyncio.Task[Any]] = {}
+        self._running_attempts: Dict[str, int] = {}
+        self._cancel_requested: Set[str] = set()
+        self._waiters: Dict[str, List[asyncio.Future[Dict[str, Any]]]] = {}
+        self._wakeup = asyncio.Event()
+        self._started = False
+
+    def register_handler(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    # ========== Lifecycle ==========
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        for module in HANDLER_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                print(f"❌ Failed to load generation job handlers from {module}: {e}")
+                traceback.print_exc()
+
+        self._spawn(self._event_listener())
+        self._spawn(self._lease_renewal_loop())
+        for i in range(self._num_workers):
+            self._workers.append(asyncio.create_task(self._worker_loop(i)))
+        print(f"✅ Generation job service started with {self._num_workers} workers")
+
+    async def stop(self) -> None:
+        self._started = False
+        running = dict(self._running_attempts)
+        for task in [*self._workers, *self._background_tasks]:
+            task.cancel()
+        # Put running jobs back in the queue; the next process resumes them
+        # (polling the remote task when one was already created)
+        for job_id, attempts in running.items():
+            try:
+                await db_service.update_generation_job(
+                    job_id, status=QUEUED, worker_id=None, lease_expires_at=None,
+                    attempts=max(attempts - 1, 0))
+            except Exception as e:
+                print(f"⚠️ Failed to requeue generation job {job_id}: {e}")
+        self._workers.clear()
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    # ========== Public API ==========
+
+    async def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        session_id: str = '',
+        canvas_id: str = '',
+    ) -> str:
+        """
+        Enqueue a job
+
+        Returns:
+            str: Job ID
+        """
+        job_id = 'job_' + generate(size=12)
+        await db_service.create_generation_job(
+            job_id, kind, json.dumps(payload), session_id, canvas_id)
+        print(f"📥 Generation job {job_id} ({kind}) queued")
+        await self._publish({'event': 'queued', 'job_id': job_id})
+        return job_id
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> str:
+        """
+        Wait until a job finishes and return its result
+
+        Raises:
+            GenerationJobError: If the job failed or was cancelled
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Dict[str, Any]] = loop.create_future()
+        self._waiters.setdefault(job_id, []).append(future)
+        deadline = loop.time() + timeout if timeout is not None else None
+        try:
+            while True:
+                # The result normally arrives through the job event; re-check
+                # the table now and then in case an event was missed.
+                job = await db_service.get_generation_job(job_id)
+                if job is None:
+                    raise GenerationJobError(f"Generation job {job_id} not found")
+                if job['status'] in FINISHED_STATUSES:
+                    return self._job_result(job)
+                wait_for = 5.0
+                if deadline is not None:
+                    wait_for = min(wait_for, deadline - loop.time())
+                    if wait_for <= 0:
+                        raise asyncio.TimeoutError(f"Timed out waiting for generation job {job_id}")
+                try:
+                    job = await asyncio.wait_for(asyncio.shield(future), wait_for)
+                    return self._job_result(job)
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            waiters = self._waiters.get(job_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(job_id, None)
+
+    async def run(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        session_id: str = '',
+        canvas_id: str = '',
+        wait: bool = True,
+    ) -> str:
+        """
+        Enqueue a job and, by default, wait for its result
+
+        With wait=False returns immediately with a message containing the job
+        id; the result is committed to the canvas when the job finishes.
+        """
+        job_id = await self.submit(kind, payload, session_id, canvas_id)
+        if not wait:
+            return f"generation job {job_id} queued, the result will be added to the canvas when it is ready"
+        return await self.wait(job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job"""
+        job = await db_service.get_generation_job(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return False
+        await db_service.update_generation_job(job_id, status=CANCELLED, error='Cancelled')
+        await self._publish({'event': 'cancel', 'job_id': job_id})
+        return True
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await db_service.get_generation_job(job_id)
+
+    async def list_jobs(self, **filters: Any) -> List[Dict[str, Any]]:
+        return await db_service.list_generation_jobs(**filters)
+
+    # ========== Workers ==========
+
+    async def _worker_loop(self, index: int) -> None:
+        while True:
+            try:
+                job = await db_service.claim_generation_job(
+                    cluster_service.worker_id, LEASE_SECONDS)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), IDLE_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Generation worker {index} error: {e}")
+                traceback.print_exc()
+                await asyncio.sleep(IDLE_POLL_INTERVAL)
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        ctx = JobContext(job)
+        if ctx.attempts > MAX_ATTEMPTS:
+            await self._finish(ctx.id, FAILED, error=f"Gave up after {MAX_ATTEMPTS} attempts")
+            return
+
+        handler = self._handlers.get(ctx.kind)
+        if handler is None:
+            await self._finish(ctx.id, FAILED, error=f"No handler for job kind {ctx.kind}")
+            return
+
+        if ctx.remote_task_id:
+            print(f"🔁 Resuming generation job {ctx.id} (remote task {ctx.remote_task_id})")
+        else:
+            print(f"⚙️ Running generation job {ctx.id} ({ctx.kind})")
+
+        task = asyncio.create_task(handler(ctx))
+        self._running_jobs[ctx.id] = task
+        self._running_attempts[ctx.id] = ctx.attempts
+        try:
+            result = await task
+            await self._finish(ctx.id, SUCCEEDED, result=result)
+        except asyncio.CancelledError:
+            if ctx.id not in self._cancel_requested:
+                raise
+            # Cancelled through the API
+            print(f"🛑 Generation job {ctx.id} cancelled")
+            await self._finish(ctx.id, CANCELLED, error='Cancelled')
+        except Exception as e:
+            print(f"❌ Generation job {ctx.id} failed: {e}")
+            traceback.print_exc()
+            await self._finish(ctx.id, FAILED, error=str(e))
+        finally:
+            self._running_jobs.pop(ctx.id, None)
+            self._running_attempts.pop(ctx.id, None)
+            self._cancel_requested.discard(ctx.id)
+
+    async def _finish(self, job_id: str, status: str, result: Optional[str] = None,
+                      error: Optional[str] = None) -> None:
+        current = await db_service.get_generation_job(job_id)
+        if current is not None and current['status'] == CANCELLED and status != CANCELLED:
+            return
+        await db_service.update_generation_job(
+            job_id, status=status, result=result, error=error, lease_expires_at=None)
+        await self._publish({'event': 'finished', 'job_id': job_id})
+
+    async def _lease_renewal_loop(self) -> None:
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            try:
+                await db_service.renew_generation_job_leases(
+                    cluster_service.worker_id, list(self._running_jobs.keys()), LEASE_SECONDS)
+            except Exception as e:
+                print(f"⚠️ Failed to renew generation job leases: {e}")
+
+    # ========== Events ==========
+
+    async def _publish(self, message: Dict[str, Any]) -> None:
+        try:
+            await cluster_service.bus.publish(JOB_EVENTS_CHANNEL, message)
+        except Exception as e:
+            print(f"⚠️ Failed to publish generation job event: {e}")
+
+    async def _event_listener(self) -> None:
+        while True:
+            try:
+                async for message in cluster_service.bus.subscribe(JOB_EVENTS_CHANNEL):
+                    await self._handle_event(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Generation job event listener failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _handle_event(self, message: Dict[str, Any]) -> None:
+        event = message.get('event')
+        job_id = message.get('job_id', '')
+        if event == 'queued':
+            self._wakeup.set()
+        elif event == 'cancel':
+            task = self._running_jobs.get(job_id)
+            if task is not None:
+                self._cancel_requested.add(job_id)
+                task.cancel()
+        elif event == 'finished' and job_id in self._waiters:
+            job = await db_service.get_generation_job(job_id)
+            if job is None:
+                return
+            for future in self._waiters.get(job_id, []):
+                if not future.done():
+                    future.set_result(job)
+
+    @staticmethod
+    def _job_result(job: Dict[str, Any]) -> str:
+        if job['status'] == SUCCEEDED:
+            return job.get('result') or ''
+        raise GenerationJobError(job.get('error') or f"Generation job {job['id']} {job['status']}")
+
+
+generation_job_service = GenerationJobService()
@@ -322,6 +322,50 @@ class JaazService:
             Exception: 当视频生成失败时抛出异常
         """
         # 1. 创建 Seedance 视频生成任务
+        task_id = await self.create_seedance_video_task(
+            prompt=prompt,
+            model=model,
+            resolution=resolution,
+            duration=duration,
+            aspect_ratio=aspect_ratio,
+            input_images=input_images,
+            **kwargs
+        )
+
+        # 2. 等待任务完成
+        result = await self.poll_for_task_completion(task_id)
+        if not result:
+            raise Exception("Seedance video generation failed")
+
+        if result.get('error'):
+            raise Exception(f"Seedance video generation failed: {result['error']}")
+
+        if not result.get('result_url'):
+            raise Exception("No result URL found in Seedance video generation response")
+
+        print(
+            f"✅ Seedance video generated successfully: {result.get('result_url')}")
+        return result
+
+    async def create_seedance_video_task(
+        self,
+        prompt: str,
+        model: str,
+        resolution: str = "480p",
+        duration: int = 5,
+        aspect_ratio: str = "16:9",
+        input_images: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> str:
+        """
+        创建云端 Seedance 视频生成任务
+
+        Returns:
+            str: 任务 ID
+
+        Raises:
+            Exception: 当任务创建失败时抛出异常
+        """
         async with HttpClient.create_aiohttp() as session:
             payload = {
                 "prompt": prompt,
@@ -351,21 +395,7 @@ class JaazService:
                     raise Exception(f"Failed to create Seedance video task: HTTP {response.status} - {error_text}")
 
         print(f"✅ Seedance video task created: {task_id}")
-
-        # 2. 等待任务完成
-        result = await self.poll_for_task_completion(task_id)
-        if not result:
-            raise Exception("Seedance video generation failed")
-
-        if result.get('error'):
-            raise Exception(f"Seedance video generation failed: {result['error']}")
-
-        if not result.get('result_url'):
-            raise Exception("No result URL found in Seedance video generation response")
-
-        print(
-            f"✅ Seedance video generated successfully: {result.get('result_url')}")
-        return result
+        return task_id
 
     async def create_midjourney_task(
         self,
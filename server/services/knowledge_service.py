@@ -14,11 +14,22 @@ Knowledge Service - 知识库服务模块
 1. 从设置中获取启用的知识库完整数据
 2. 提供格式化的知识库信息访问接口
 3. 与设置服务集成管理知识库数据
+4. 本地检索：知识库被切分为片段并建立 BM25 索引（持久化在
+   USER_DATA_DIR/knowledge_index），对话时只注入与当前用户消息最相关的
+   top-k 片段，而不是完整的知识库内容
 """
 
-from typing import List, Dict, Any
+import os
+import threading
+from typing import List, Dict, Any, Optional
+from fastapi.concurrency import run_in_threadpool
+from .config_service import USER_DATA_DIR
 from .settings_service import settings_service
 
+KNOWLEDGE_INDEX_DIR = os.path.join(USER_DATA_DIR, 'knowledge_index')
+# 每次对话注入的知识片段数量
+KNOWLEDGE_TOP_K = int(os.getenv('KNOWLEDGE_TOP_K', '5'))
+
 
 class KnowledgeService:
     """
@@ -29,7 +40,23 @@ class KnowledgeService:
 
     def __init__(self):
         """初始化知识库服务"""
-        pass
+        self._index = None
+        self._index_lock = threading.Lock()
+        # 知识库数据无论通过哪个接口写入设置，都会在这里增量更新索引
+        settings_service.add_listener(self._on_settings_changed)
+
+    @property
+    def index(self):
+        """检索索引，首次使用时才加载（NumPy 不在启动路径上导入）"""
+        with self._index_lock:
+            if self._index is None:
+                from utils.knowledge_index import KnowledgeIndex
+                self._index = KnowledgeIndex(KNOWLEDGE_INDEX_DIR)
+        return self._index
+
+    async def _on_settings_changed(self, changed_keys, settings) -> None:
+        if 'enabled_knowledge_data' in changed_keys:
+            await self.refresh_index(settings.get('enabled_knowledge_data') or [])
 
     def get_enabled_knowledge_ids(self) -> List[str]:
         """
@@ -97,6 +124,56 @@ class KnowledgeService:
         """
         return await settings_service.update_enabled_knowledge_data(knowledge_data_list)
 
+    async def refresh_index(self, knowledge_data_list: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        增量更新检索索引，只重新处理内容有变化的知识库
+
+        Args:
+            knowledge_data_list: 启用的知识库数据列表，默认从设置中读取
+        """
+        if knowledge_data_list is None:
+            knowledge_data_list = await run_in_threadpool(self.get_enabled_knowledge_data)
+        try:
+            await run_in_threadpool(self.index.sync, knowledge_data_list)
+        except Exception as e:
+            print(f"⚠️ Failed to update knowledge index: {e}")
+
+    async def retrieve(self, query: str, top_k: int = KNOWLEDGE_TOP_K) -> List[Dict[str, Any]]:
+        """
+        检索与查询最相关的知识片段
+
+        Returns:
+            List[Dict[str, Any]]: 片段列表，每项包含 knowledge_id、name、text、score
+        """
+        if not query.strip() or top_k <= 0:
+            return []
+
+        def _retrieve() -> List[Dict[str, Any]]:
+            knowledge_list = self.get_enabled_knowledge_data()
+            if not knowledge_list:
+                return []
+            # 同步一次以覆盖直接写入设置文件的修改；未变化时只比较指纹
+            return self.index.sync_and_search(knowledge_list, query, top_k)
+
+        return await run_in_threadpool(_retrieve)
+
+    async def build_knowledge_prompt(self, query: str) -> str:
+        """
+        将检索到的知识片段格式化为可追加到系统提示词的文本
+
+        Returns:
+            str: 没有相关片段时返回空字符串
+        """
+        chunks = await self.retrieve(query)
+        if not chunks:
+            return ''
+        sections = [f"### {chunk['name']}\n{chunk['text']}" for chunk in chunks]
+        return (
+            "# Knowledge base\n"
+            "Excerpts from the user's enabled knowledge bases that are relevant to the "
+            "current request. Use them when they apply.\n\n" + "\n\n".join(sections)
+        )
+
 
 # 创建全局知识库服务实例
 knowledge_service = KnowledgeService()
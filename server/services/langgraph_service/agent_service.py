@@ -9,6 +9,7 @@ from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
 from services.websocket_service import send_to_websocket  # type: ignore
 from services.config_service import config_service
+from services.cassette_service import cassette_service
 from typing import Optional, List, Dict, Any, cast, Set, TypedDict
 from models.config_model import ModelInfo
 
@@ -97,6 +98,32 @@ async def langgraph_multi_agent(
         # 0. 修复消息历史
         fixed_messages = _fix_chat_history(messages)
 
+        # 1. 上下文与流处理器
+        context = {
+            'canvas_id': canvas_id,
+            'session_id': session_id,
+            'tool_list': tool_list,
+        }
+        processor = StreamProcessor(
+            session_id, db_service, send_to_websocket)  # type: ignore
+
+        # 回放模式：有匹配的录制时直接回放，不调用模型
+        cassette_inputs: Dict[str, Any] = {}
+        if cassette_service.enabled:
+            cassette_inputs = {
+                'messages': fixed_messages,
+                'canvas_id': canvas_id,
+                'session_id': session_id,
+                'text_model': text_model,
+                'tool_list': tool_list,
+                'system_prompt': system_prompt,
+            }
+        if cassette_service.replaying:
+            replay = await cassette_service.replay_chat(cassette_inputs)
+            if replay is not None:
+                await processor.process_stream(replay, fixed_messages, context)
+                return
+
         # 2. 文本模型
         text_model_instance = _create_text_model(text_model)
 
@@ -118,17 +145,10 @@ async def langgraph_multi_agent(
             agents=agents,  # type: ignore
             default_active_agent=last_agent if last_agent else agent_names[0]
         )
+        if cassette_service.recording:
+            swarm = cassette_service.record_chat(swarm, cassette_inputs)
 
-        # 5. 创建上下文
-        context = {
-            'canvas_id': canvas_id,
-            'session_id': session_id,
-            'tool_list': tool_list,
-        }
-
-        # 6. 流处理
-        processor = StreamProcessor(
-            session_id, db_service, send_to_websocket)  # type: ignore
+        # 5. 流处理
         await processor.process_stream(swarm, fixed_messages, context)
 
     except Exception as e:
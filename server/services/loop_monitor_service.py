@@ -0,0 +1,185 @@
+"""
+Loop monitor service - event loop lag sampling and a stall watchdog
+
+A sampler task sleeps LOOP_LAG_INTERVAL_MS at a time and records how late it
+wakes up as the event_loop_lag_seconds histogram. Each wake-up is a heartbeat.
+
+A watchdog thread watches the heartbeats. When one is more than
+LOOP_STALL_THRESHOLD_MS late, some callback is blocking the loop: the thread
+captures the loop thread's stack at that moment (sys._current_frames()), and
+the stall is charged to the innermost frame in the server's own code - the
+call site that blocks, e.g. a sync HTTP client, an image encode or a file read
+not moved to the thread pool. Stalls are aggregated per call site (count,
+total and max blocked time, last stack) and served by /api/metrics/loop.
+
+Stalls shorter than the threshold are not sampled. A blocking call ending
+before the next heartbeat is due can be missed, calls blocking longer than
+LOOP_LAG_INTERVAL_MS + LOOP_STALL_THRESHOLD_MS never are.
+
+LOOP_MONITOR=false disables both.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from services.metrics_service import metrics_service
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Frames kept per captured stack, innermost first
+STACK_LIMIT = 40
+# Call sites kept; the one with the least blocked time is dropped beyond this
+MAX_SITES = 200
+
+UNSAMPLED_SITE = '<not sampled>'
+
+
+def _call_site(stack: traceback.StackSummary) -> str:
+    """Innermost frame in the server's code (not this module), else innermost"""
+    for frame in reversed(stack):
+        if frame.filename.startswith(SERVER_DIR) and 'site-packages' not in frame.filename \
+                and frame.filename != __file__:
+            return f"{os.path.relpath(frame.filename, SERVER_DIR)}:{frame.lineno} in {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return UNSAMPLED_SITE
+
+
+class LoopMonitorService:
+    def __init__(self) -> None:
+        self.enabled = os.getenv('LOOP_MONITOR', 'true').lower() not in ('0', 'false', 'no', 'off')
+        self.interval = float(os.getenv('LOOP_LAG_INTERVAL_MS', '100')) / 1000
+        self.threshold = float(os.getenv('LOOP_STALL_THRESHOLD_MS', '100')) / 1000
+        self._heartbeat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        # Stack the watchdog captured for the stall after this heartbeat
+        self._pending: Optional[Tuple[float, str, List[str]]] = None
+        self._sites: Dict[str, Dict[str, Any]] = {}
+        self._stalls = 0
+
+    def start(self) -> None:
+        """Start sampling the running loop (call from the loop)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        print(f"🩺 Loop monitor started (every {self.interval * 1000:.0f} ms, "
+              f"stalls over {self.threshold * 1000:.0f} ms)")
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _sample(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            previous = self._heartbeat
+            self._heartbeat = now
+            metrics_service.record_loop_lag(lag)
+            if lag >= self.threshold:
+                self._record_stall(previous, lag)
+
+    def _record_stall(self, heartbeat: float, lag: float) -> None:
+        """Charge a finished stall to the call site the watchdog caught it in"""
+        metrics_service.record_loop_stall()
+        with self._lock:
+            pending, self._pending = self._pending, None
+            site, stack = UNSAMPLED_SITE, []
+            if pending is not None and pending[0] == heartbeat:
+                _, site, stack = pending
+            self._stalls += 1
+            entry = self._sites.get(site)
+            if entry is None:
+                if len(self._sites) >= MAX_SITES:
+                    del self._sites[min(self._sites, key=lambda key: self._sites[key]['total_seconds'])]
+                entry = self._sites[site] = {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+            entry['count'] += 1
+            entry['total_seconds'] += lag
+            entry['max_seconds'] = max(entry['max_seconds'], lag)
+            entry['last_seen'] = datetime.utcnow().isoformat()
+            if stack:
+                entry['stack'] = stack
+        print(f"🐢 Event loop blocked {lag * 1000:.0f} ms at {site}")
+
+    def _watch(self) -> None:
+        """Watchdog thread: capture the loop thread's stack when a heartbeat is late"""
+        captured = 0.0
+        while not self._stopping.is_set():
+            heartbeat = self._heartbeat
+            delay = heartbeat + self.interval + self.threshold - time.monotonic()
+            if delay > 0:
+                self._stopping.wait(delay)
+                continue
+            if heartbeat == captured:
+                # Stall already sampled, wait for the loop to come back
+                self._stopping.wait(self.interval)
+                continue
+            captured = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore[arg-type]
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame, limit=STACK_LIMIT)
+            del frame
+            site = _call_site(stack)
+            with self._lock:
+                self._pending = (heartbeat, site, [line.rstrip() for line in stack.format()])
+
+    def reset(self) -> None:
+        """Forget the aggregated stalls"""
+        with self._lock:
+            self._sites.clear()
+            self._stalls = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Stall count and the call sites blocking the loop, worst first"""
+        with self._lock:
+            sites = [
+                {
+                    'site': site,
+                    'count': entry['count'],
+                    'total_ms': round(entry['total_seconds'] * 1000, 1),
+                    'max_ms': round(entry['max_seconds'] * 1000, 1),
+                    'last_seen': entry['last_seen'],
+                    'stack': entry.get('stack', []),
+                }
+                for site, entry in self._sites.items()
+            ]
+            stalls = self._stalls
+        sites.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        return {
+            'enabled': self.enabled,
+            'running': self._task is not None,
+            'interval_ms': self.interval * 1000,
+            'threshold_ms': self.threshold * 1000,
+            'stalls': stalls,
+            'sites': sites,
+        }
+
+
+loop_monitor_service = LoopMonitorService()
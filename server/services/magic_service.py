@@ -57,7 +57,7 @@ async def handle_magic(data: Dict[str, Any]) -> None:
     task = asyncio.create_task(_process_magic_generation(messages, session_id, canvas_id))
 
     # Register the task in stream_tasks (for possible cancellation)
-    add_stream_task(session_id, task)
+    await add_stream_task(session_id, task)
     try:
         # Await completion of the magic generation task
         await task
@@ -65,7 +65,7 @@ async def handle_magic(data: Dict[str, Any]) -> None:
         print(f"🛑Magic generation session {session_id} cancelled")
     finally:
         # Always remove the task from stream_tasks after completion/cancellation
-        remove_stream_task(session_id)
+        await remove_stream_task(session_id)
         # Notify frontend WebSocket that magic generation is done
         await send_to_websocket(session_id, {'type': 'done'})
 
@@ -4,7 +4,6 @@ from pydantic import BaseModel
 from contextlib import AsyncExitStack
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from anthropic import Anthropic
 
 
 
@@ -13,6 +12,8 @@ class MCPClient:
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
+        # Imported here so that importing this module does not load the SDK
+        from anthropic import Anthropic
         self.anthropic = Anthropic()
         self.tools: List[Dict[str, Any]]  = []
 
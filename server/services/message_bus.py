@@ -0,0 +1,361 @@
+"""
+Message bus for cluster mode
+
+A small pluggable pub/sub + key/value abstraction shared by all uvicorn
+workers of a deployment. It carries Socket.IO fan-out, cross-worker stream
+cancellation, distributed canvas locks and the shared connection registry.
+
+Backends (selected by the MESSAGE_BUS_URL environment variable):
+- memory://                  In-process backend (default, single worker only)
+- redis://[:password@]host:port[/db]
+                             Redis-protocol backend. Only plain RESP2 commands
+                             are used (PUBLISH, SUBSCRIBE, SET NX PX, GET, DEL,
+                             HSET, HGET, HDEL, HGETALL, HLEN, plus EVAL for the
+                             owner-checked lock release and renewal), so a Redis
+                             server or any compatible local stand-in with Lua
+                             scripting can serve it.
+"""
+
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class MessageBus(ABC):
+    """Pub/sub and key/value operations shared across workers"""
+
+    # Whether messages published here reach other processes
+    distributed: bool = False
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        """Publish a JSON-serializable message on a channel"""
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over messages published on a channel"""
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: str, ttl_ms: int) -> bool:
+        """Set key to value with a TTL only if it does not exist yet"""
+
+    @abstractmethod
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        """Atomically delete key only if it still holds value"""
+
+    @abstractmethod
+    async def expire_if_equals(self, key: str, value: str, ttl_ms: int) -> bool:
+        """Atomically reset the TTL of key only if it still holds value"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def hset(self, key: str, field: str, value: str) -> None:
+        pass
+
+    @abstractmethod
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def hdel(self, key: str, field: str) -> None:
+        pass
+
+    @abstractmethod
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        pass
+
+    @abstractmethod
+    async def hlen(self, key: str) -> int:
+        pass
+
+
+class InMemoryMessageBus(MessageBus):
+    """In-process backend, used when running a single worker"""
+
+    distributed = False
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, List[asyncio.Queue[Dict[str, Any]]]] = {}
+        self._values: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._hashes: Dict[str, Dict[str, str]] = {}
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        # Round-trip through JSON so both backends see the same payloads
+        payload = json.loads(json.dumps(message))
+        for queue in self._subscribers.get(channel, []):
+            queue.put_nowait(payload)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Dict[str, Any]]:  # type: ignore[override]
+        queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue()
+        self._subscribers.setdefault(channel, []).append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].remove(queue)
+
+    def _get_live(self, key: str) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return value
+
+    async def set_if_absent(self, key: str, value: str, ttl_ms: int) -> bool:
+        if self._get_live(key) is not None:
+            return False
+        self._values[key] = (value, time.monotonic() + ttl_ms / 1000)
+        return True
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        if self._get_live(key) != value:
+            return False
+        del self._values[key]
+        return True
+
+    async def expire_if_equals(self, key: str, value: str, ttl_ms: int) -> bool:
+        if self._get_live(key) != value:
+            return False
+        self._values[key] = (value, time.monotonic() + ttl_ms / 1000)
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._get_live(key)
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+        self._hashes.pop(key, None)
+
+    async def hset(self, key: str, field: str, value: str) -> None:
+        self._hashes.setdefault(key, {})[field] = value
+
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        return self._hashes.get(key, {}).get(field)
+
+    async def hdel(self, key: str, field: str) -> None:
+        self._hashes.get(key, {}).pop(field, None)
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        return dict(self._hashes.get(key, {}))
+
+    async def hlen(self, key: str) -> int:
+        return len(self._hashes.get(key, {}))
+
+
+class RespError(Exception):
+    """Error reply returned by a Redis-protocol server"""
+
+
+class _RespConnection:
+    """Minimal RESP2 connection over asyncio streams"""
+
+    def __init__(self, host: str, port: int, password: Optional[str], db: int) -> None:
+        self.host = host
+        self.port = port
+        self.password = password
+        self.db = db
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def open(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._call('AUTH', self.password)
+        if self.db:
+            await self._call('SELECT', str(self.db))
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+    @staticmethod
+    def _encode(args: Tuple[str, ...]) -> bytes:
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            data = arg.encode('utf-8')
+            parts.append(f'${len(data)}\r\n'.encode() + data + b'\r\n')
+        return b''.join(parts)
+
+    async def read_reply(self) -> Any:
+        assert self._reader is not None
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError('Message bus connection closed')
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b'+':
+            return body.decode()
+        if prefix == b'-':
+            raise RespError(body.decode())
+        if prefix == b':':
+            return int(body)
+        if prefix == b'$':
+            length = int(body)
+            if length == -1:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2].decode('utf-8')
+        if prefix == b'*':
+            length = int(body)
+            if length == -1:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RespError(f'Unexpected reply: {line!r}')
+
+    async def send(self, *args: str) -> None:
+        assert self._writer is not None
+        self._writer.write(self._encode(args))
+        await self._writer.drain()
+
+    async def _call(self, *args: str) -> Any:
+        await self.send(*args)
+        return await self.read_reply()
+
+    async def execute(self, *args: str) -> Any:
+        """Send one command and wait for its reply, reconnecting once if needed"""
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if not self.connected:
+                        await self.open()
+                    return await self._call(*args)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                    await self.close()
+                    if attempt == 1:
+                        raise
+
+
+# Compare-and-delete / compare-and-expire, atomic on the server
+_DELETE_IF_EQUALS = (
+    "if redis.call('get',KEYS[1])==ARGV[1] then return redis.call('del',KEYS[1]) else return 0 end"
+)
+_EXPIRE_IF_EQUALS = (
+    "if redis.call('get',KEYS[1])==ARGV[1] then return redis.call('pexpire',KEYS[1],ARGV[2]) "
+    "else return 0 end"
+)
+
+
+class RedisMessageBus(MessageBus):
+    """Redis-protocol backend for running several workers/hosts"""
+
+    distributed = True
+
+    def __init__(self, url: str) -> None:
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        path = (parsed.path or '').lstrip('/')
+        self.db = int(path) if path.isdigit() else 0
+        self._conn = self._new_connection()
+
+    def _new_connection(self) -> _RespConnection:
+        return _RespConnection(self.host, self.port, self.password, self.db)
+
+    async def connect(self) -> None:
+        await self._conn.execute('PING')
+
+    async def close(self) -> None:
+        await self._conn.close()
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        await self._conn.execute('PUBLISH', channel, json.dumps(message))
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Dict[str, Any]]:  # type: ignore[override]
+        # Pub/sub needs a dedicated connection; reconnect with backoff on failure
+        backoff = 0.5
+        while True:
+            conn = self._new_connection()
+            try:
+                await conn.open()
+                await conn.send('SUBSCRIBE', channel)
+                backoff = 0.5
+                while True:
+                    reply = await conn.read_reply()
+                    if not isinstance(reply, list) or len(reply) != 3 or reply[0] != 'message':
+                        continue
+                    try:
+                        yield json.loads(reply[2])
+                    except json.JSONDecodeError:
+                        continue
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                print(f"⚠️ Message bus subscription to {channel} lost: {e}, retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10)
+            finally:
+                await conn.close()
+
+    async def set_if_absent(self, key: str, value: str, ttl_ms: int) -> bool:
+        return await self._conn.execute('SET', key, value, 'NX', 'PX', str(ttl_ms)) == 'OK'
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        return await self._conn.execute('EVAL', _DELETE_IF_EQUALS, '1', key, value) == 1
+
+    async def expire_if_equals(self, key: str, value: str, ttl_ms: int) -> bool:
+        return await self._conn.execute('EVAL', _EXPIRE_IF_EQUALS, '1', key, value, str(ttl_ms)) == 1
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._conn.execute('GET', key)
+
+    async def delete(self, key: str) -> None:
+        await self._conn.execute('DEL', key)
+
+    async def hset(self, key: str, field: str, value: str) -> None:
+        await self._conn.execute('HSET', key, field, value)
+
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        return await self._conn.execute('HGET', key, field)
+
+    async def hdel(self, key: str, field: str) -> None:
+        await self._conn.execute('HDEL', key, field)
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        reply = await self._conn.execute('HGETALL', key) or []
+        return {reply[i]: reply[i + 1] for i in range(0, len(reply), 2)}
+
+    async def hlen(self, key: str) -> int:
+        return int(await self._conn.execute('HLEN', key) or 0)
+
+
+def create_message_bus(url: Optional[str] = None) -> MessageBus:
+    """Create a message bus backend from a URL (defaults to MESSAGE_BUS_URL)"""
+    url = url if url is not None else os.getenv('MESSAGE_BUS_URL', 'memory://')
+    scheme = urlparse(url).scheme
+    if scheme in ('', 'memory'):
+        return InMemoryMessageBus()
+    if scheme in ('redis', 'tcp'):
+        return RedisMessageBus(url)
+    print(f"⚠️ Unsupported message bus URL {url}, falling back to in-memory message bus")
+    return InMemoryMessageBus()
+
+
+message_bus = create_message_bus()
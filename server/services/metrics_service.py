@@ -74,6 +74,36 @@ tool_request_duration_seconds = Histogram(
     registry=metrics_registry
 )
 
+# Provider admission control (services/rate_limit_service.py)
+provider_queue_wait_seconds = Histogram(
+    'provider_queue_wait_seconds',
+    'Time provider calls wait for an admission slot',
+    ['provider', 'model_name'],
+    registry=metrics_registry,
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+
+provider_failures_total = Counter(
+    'provider_failures_total',
+    'Failed provider calls',
+    ['provider', 'model_name'],
+    registry=metrics_registry
+)
+
+provider_failovers_total = Counter(
+    'provider_failovers_total',
+    'Generations moved to an equivalent provider',
+    ['from_provider', 'to_provider'],
+    registry=metrics_registry
+)
+
+provider_hedges_total = Counter(
+    'provider_hedges_total',
+    'Hedged provider calls, by provider that returned first',
+    ['provider', 'winner'],
+    registry=metrics_registry
+)
+
 # Active connections
 active_connections = Gauge(
     'active_connections',
@@ -81,6 +111,28 @@ active_connections = Gauge(
     registry=metrics_registry
 )
 
+# Startup
+startup_step_duration_seconds = Gauge(
+    'startup_step_duration_seconds',
+    'Duration of each startup step of this process',
+    ['step', 'status'],
+    registry=metrics_registry
+)
+
+# Event loop responsiveness (services/loop_monitor_service.py)
+event_loop_lag_seconds = Histogram(
+    'event_loop_lag_seconds',
+    'Delay of the event loop sampler wake-ups past their schedule',
+    registry=metrics_registry,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+event_loop_stalls_total = Counter(
+    'event_loop_stalls_total',
+    'Event loop stalls longer than the watchdog threshold',
+    registry=metrics_registry
+)
+
 # Chat messages
 chat_messages_total = Counter(
     'chat_messages_total',
@@ -177,10 +229,55 @@ class MetricsService:
             tool_name=tool_name
         ).observe(duration)
     
+    def record_provider_queue_wait(
+        self,
+        provider: str,
+        model_name: str,
+        wait: float
+    ):
+        """Record how long a provider call waited for admission."""
+        provider_queue_wait_seconds.labels(
+            provider=provider,
+            model_name=model_name
+        ).observe(wait)
+
+    def record_provider_failure(self, provider: str, model_name: str):
+        """Record a failed provider call."""
+        provider_failures_total.labels(
+            provider=provider,
+            model_name=model_name
+        ).inc()
+
+    def record_provider_failover(self, from_provider: str, to_provider: str):
+        """Record a failover to an equivalent provider."""
+        provider_failovers_total.labels(
+            from_provider=from_provider,
+            to_provider=to_provider
+        ).inc()
+
+    def record_provider_hedge(self, provider: str, winner: str):
+        """Record a hedged call and which provider won."""
+        provider_hedges_total.labels(
+            provider=provider,
+            winner=winner
+        ).inc()
+
+    def record_loop_lag(self, lag: float):
+        """Record one event loop lag sample."""
+        event_loop_lag_seconds.observe(lag)
+
+    def record_loop_stall(self):
+        """Record an event loop stall over the watchdog threshold."""
+        event_loop_stalls_total.inc()
+
     def set_active_connections(self, count: int):
         """Set the current number of active connections."""
         active_connections.set(count)
     
+    def record_startup_step(self, step: str, status: str, duration: float):
+        """Record how long a startup step took."""
+        startup_step_duration_seconds.labels(step=step, status=status).set(duration)
+
     def record_chat_message(self, sender_type: str):
         """Record a chat message."""
         chat_messages_total.labels(sender_type=sender_type).inc()
@@ -3,10 +3,13 @@ import sqlite3
 from services.migrations.v1_initial_schema import V1InitialSchema
 from services.migrations.v2_add_canvases import V2AddCanvases
 from services.migrations.v3_add_comfy_workflow import V3AddComfyWorkflow
+from services.migrations.v4_move_canvas_thumbnails import V4MoveCanvasThumbnails
+from services.migrations.v5_add_generation_jobs import V5AddGenerationJobs
+from services.migrations.v6_add_asset_catalog import V6AddAssetCatalog
 from . import Migration
 
 # Database version
-CURRENT_VERSION = 3
+CURRENT_VERSION = 6
 
 ALL_MIGRATIONS = [
     {
@@ -21,6 +24,18 @@ ALL_MIGRATIONS = [
         'version': 3,
         'migration': V3AddComfyWorkflow,
     },
+    {
+        'version': 4,
+        'migration': V4MoveCanvasThumbnails,
+    },
+    {
+        'version': 5,
+        'migration': V5AddGenerationJobs,
+    },
+    {
+        'version': 6,
+        'migration': V6AddAssetCatalog,
+    },
 ]
 class MigrationManager:
     def get_migrations_to_apply(self, current_version: int, target_version: int) -> List[Type[Migration]]:
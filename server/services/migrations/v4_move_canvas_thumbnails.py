@@ -0,0 +1,29 @@
+from . import Migration
+import sqlite3
+from utils.thumbnail import save_canvas_thumbnail, is_thumbnail_url
+
+
+class V4MoveCanvasThumbnails(Migration):
+    version = 4
+    description = "Move canvas thumbnails to the asset store"
+
+    def up(self, conn: sqlite3.Connection) -> None:
+        # Backfill: convert inline data URL thumbnails (and full-size image
+        # URLs) into downscaled thumbnail files referenced by URL
+        cursor = conn.execute("""
+            SELECT id, thumbnail FROM canvases
+            WHERE thumbnail IS NOT NULL AND thumbnail != ''
+        """)
+        for canvas_id, thumbnail in cursor.fetchall():
+            if is_thumbnail_url(thumbnail):
+                continue
+            try:
+                url = save_canvas_thumbnail(canvas_id, thumbnail)
+            except Exception as e:
+                print(f"Failed to migrate thumbnail for canvas {canvas_id}: {e}")
+                url = ''
+            conn.execute(
+                "UPDATE canvases SET thumbnail = ? WHERE id = ?", (url, canvas_id))
+
+    def down(self, conn: sqlite3.Connection) -> None:
+        pass
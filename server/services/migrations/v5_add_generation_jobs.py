@@ -0,0 +1,39 @@
+from . import Migration
+import sqlite3
+
+
+class V5AddGenerationJobs(Migration):
+    version = 5
+    description = "Add generation jobs queue"
+
+    def up(self, conn: sqlite3.Connection) -> None:
+        # Durable queue of image/video generation jobs, see services/generation_job_service.py
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS generation_jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                session_id TEXT DEFAULT '',
+                canvas_id TEXT DEFAULT '',
+                payload TEXT NOT NULL,
+                remote_task_id TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_expires_at REAL,
+                created_at TEXT DEFAULT (STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')),
+                updated_at TEXT DEFAULT (STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now'))
+            )
+        """)
+
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs(status, created_at)
+        """)
+
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_generation_jobs_session ON generation_jobs(session_id, created_at DESC)
+        """)
+
+    def down(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DROP TABLE IF EXISTS generation_jobs")
@@ -0,0 +1,74 @@
+from . import Migration
+import sqlite3
+
+
+class V6AddAssetCatalog(Migration):
+    version = 6
+    description = "Add generated asset catalog"
+
+    def up(self, conn: sqlite3.Connection) -> None:
+        # One row per generated image/video in FILES_DIR, see services/asset_catalog_service.py
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS assets (
+                file_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                mime_type TEXT DEFAULT '',
+                width INTEGER DEFAULT 0,
+                height INTEGER DEFAULT 0,
+                size INTEGER DEFAULT 0,
+                prompt TEXT DEFAULT '',
+                provider TEXT DEFAULT '',
+                model TEXT DEFAULT '',
+                aspect_ratio TEXT DEFAULT '',
+                canvas_id TEXT DEFAULT '',
+                session_id TEXT DEFAULT '',
+                metadata TEXT DEFAULT '{}',
+                created_at TEXT DEFAULT (STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now'))
+            )
+        """)
+
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_assets_created ON assets(created_at DESC, file_id DESC)
+        """)
+
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_assets_canvas ON assets(canvas_id, created_at DESC)
+        """)
+
+        # Full-text index over prompts, kept in sync by triggers. Some SQLite
+        # builds lack FTS5; search then falls back to LIKE.
+        try:
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS assets_fts USING fts5(
+                    prompt, model, provider,
+                    content='assets', content_rowid='rowid'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ FTS5 is not available, asset search will use LIKE: {e}")
+            return
+
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS assets_fts_insert AFTER INSERT ON assets BEGIN
+                INSERT INTO assets_fts(rowid, prompt, model, provider)
+                VALUES (new.rowid, new.prompt, new.model, new.provider);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS assets_fts_delete AFTER DELETE ON assets BEGIN
+                INSERT INTO assets_fts(assets_fts, rowid, prompt, model, provider)
+                VALUES ('delete', old.rowid, old.prompt, old.model, old.provider);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS assets_fts_update AFTER UPDATE ON assets BEGIN
+                INSERT INTO assets_fts(assets_fts, rowid, prompt, model, provider)
+                VALUES ('delete', old.rowid, old.prompt, old.model, old.provider);
+                INSERT INTO assets_fts(rowid, prompt, model, provider)
+                VALUES (new.rowid, new.prompt, new.model, new.provider);
+            END
+        """)
+
+    def down(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DROP TABLE IF EXISTS assets_fts")
+        conn.execute("DROP TABLE IF EXISTS assets")
@@ -0,0 +1,201 @@
+"""
+Provider health service - live latency/error stats, circuit breakers and
+retry budgets per provider
+
+Fed by the generation code paths (see tools/utils/provider_router.py), used to
+decide whether to call a provider at all, whether a failed call may be
+retried, and when a slow call should be hedged.
+
+Circuit breaker per provider:
+- closed: calls go through; opens when at least BREAKER_MIN_FAILURES of the
+  last BREAKER_WINDOW calls failed and the failure rate is >= BREAKER_FAILURE_RATE
+- open: calls are rejected for BREAKER_COOLDOWN seconds
+- half-open: a single probe call is let through; success closes the breaker,
+  failure opens it again
+
+Retry budget per provider: every call deposits RETRY_BUDGET_RATIO tokens (up to
+RETRY_BUDGET_MAX); every retry spends one. This caps retries at a fraction of
+real traffic so an outage does not multiply the load on the provider.
+"""
+
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from services.metrics_service import metrics_service
+
+BREAKER_WINDOW = 20
+BREAKER_MIN_FAILURES = 5
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_COOLDOWN = 30.0
+
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MAX = 10.0
+
+LATENCY_WINDOW = 100
+# Percentiles are only trusted after this many samples
+MIN_LATENCY_SAMPLES = 10
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised when no provider can be called because their breakers are open"""
+
+
+class CircuitBreaker:
+    def __init__(self) -> None:
+        self.state = CLOSED
+        self.results: Deque[bool] = deque(maxlen=BREAKER_WINDOW)
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (reserves the half-open probe)"""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= BREAKER_COOLDOWN:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def available(self) -> bool:
+        """Like allow() but without reserving the probe"""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= BREAKER_COOLDOWN
+        return self.state == CLOSED or not self.probe_in_flight
+
+    def record(self, success: bool) -> None:
+        self.results.append(success)
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = False
+            if success:
+                self.state = CLOSED
+                self.results.clear()
+            else:
+                self._open()
+            return
+        failures = self.results.count(False)
+        if (self.state == CLOSED and failures >= BREAKER_MIN_FAILURES
+                and failures / len(self.results) >= BREAKER_FAILURE_RATE):
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+
+class RetryBudget:
+    def __init__(self) -> None:
+        self.tokens = RETRY_BUDGET_MAX / 2
+
+    def deposit(self) -> None:
+        self.tokens = min(RETRY_BUDGET_MAX, self.tokens + RETRY_BUDGET_RATIO)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class LatencyStats:
+    """Rolling window of successful call latencies"""
+
+    def __init__(self) -> None:
+        self.samples: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ProviderHealthService:
+    def __init__(self) -> None:
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._budgets: Dict[str, RetryBudget] = {}
+        self._latency: Dict[Tuple[str, str], LatencyStats] = {}
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker()
+        return self._breakers[provider]
+
+    def budget(self, provider: str) -> RetryBudget:
+        if provider not in self._budgets:
+            self._budgets[provider] = RetryBudget()
+        return self._budgets[provider]
+
+    def latency(self, provider: str, model: str) -> LatencyStats:
+        key = (provider, model)
+        if key not in self._latency:
+            self._latency[key] = LatencyStats()
+        return self._latency[key]
+
+    def record_success(self, provider: str, model: str, seconds: float) -> None:
+        self.breaker(provider).record(True)
+        self.budget(provider).deposit()
+        self.latency(provider, model).add(seconds)
+        metrics_service.record_model_request(provider, model, seconds)
+
+    def record_failure(self, provider: str, model: str, seconds: float) -> None:
+        breaker = self.breaker(provider)
+        was_open = breaker.state == OPEN
+        breaker.record(False)
+        self.budget(provider).deposit()
+        metrics_service.record_provider_failure(provider, model)
+        if breaker.state == OPEN and not was_open:
+            print(f"⚡ Circuit breaker opened for provider {provider} "
+                  f"(error rate {breaker.error_rate:.0%})")
+
+    def p95(self, provider: str, model: str) -> Optional[float]:
+        return self.latency(provider, model).percentile(0.95)
+
+    def score(self, provider: str, model: str) -> Tuple[float, float]:
+        """Sort key for choosing between equivalent providers (lower is better)"""
+        p50 = self.latency(provider, model).percentile(0.5)
+        return (self.breaker(provider).error_rate, p50 if p50 is not None else float('inf'))
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        for provider, breaker in self._breakers.items():
+            stats[provider] = {
+                'breaker': breaker.state,
+                'error_rate': round(breaker.error_rate, 3),
+                'retry_budget': round(self.budget(provider).tokens, 2),
+                'models': {},
+            }
+        for (provider, model), latency in self._latency.items():
+            entry = stats.setdefault(provider, {'models': {}})
+            p50 = latency.percentile(0.5)
+            p95 = latency.percentile(0.95)
+            entry['models'][model] = {
+                'samples': len(latency.samples),
+                'p50_ms': round(p50 * 1000) if p50 is not None else None,
+                'p95_ms': round(p95 * 1000) if p95 is not None else None,
+            }
+        return stats
+
+
+provider_health_service = ProviderHealthService()
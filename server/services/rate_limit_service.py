@@ -0,0 +1,289 @@
+"""
+Rate limit service - admission control for outbound provider calls
+
+Every image/video provider call goes through `rate_limit_service.acquire()`,
+which enforces per provider and per (provider, model):
+- max_in_flight: maximum number of concurrent calls
+- requests_per_second: token bucket refill rate (burst = max(1, rate))
+
+Waiting calls are granted with weighted fair queuing across sessions: each
+call gets a virtual finish tag `max(V, last_tag[session]) + 1 / weight` and the
+smallest tag that fits the limits goes first, so a session submitting a burst
+of generations cannot starve the others.
+
+Limits come from DEFAULT_PROVIDER_LIMITS, overridden per provider in
+config.toml:
+
+    [replicate]
+    max_in_flight = 6
+    requests_per_second = 5
+    model_limits = { "black-forest-labs/flux-kontext-pro" = { max_in_flight = 2 } }
+
+Video generations only hold a slot for the request creating their remote
+task, not while it is polled. Video providers without a task API are admitted
+through a separate `<provider>:video` gate (FALLBACK_LIMITS), so long video
+generations never occupy the provider's image slots.
+
+Limits apply per server process.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from services.config_service import config_service
+from services.metrics_service import metrics_service
+
+# Conservative defaults; 0 means unlimited
+DEFAULT_PROVIDER_LIMITS: Dict[str, Dict[str, float]] = {
+    'jaaz': {'max_in_flight': 8, 'requests_per_second': 4},
+    'openai': {'max_in_flight': 4, 'requests_per_second': 2},
+    'replicate': {'max_in_flight': 6, 'requests_per_second': 5},
+    'volces': {'max_in_flight': 4, 'requests_per_second': 2},
+    'wavespeed': {'max_in_flight': 4, 'requests_per_second': 2},
+}
+FALLBACK_LIMITS: Dict[str, float] = {'max_in_flight': 4, 'requests_per_second': 0}
+
+
+class TokenBucket:
+    """Token bucket; a rate of 0 disables it"""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+class _Gate:
+    """Concurrency slot counter + token bucket for one provider or model"""
+
+    def __init__(self, max_in_flight: int, requests_per_second: float) -> None:
+        self.max_in_flight = max_in_flight
+        self.bucket = TokenBucket(requests_per_second)
+        self.in_flight = 0
+
+    def has_slot(self) -> bool:
+        return self.max_in_flight <= 0 or self.in_flight < self.max_in_flight
+
+
+class _Waiter:
+    def __init__(self, start: float, tag: float, seq: int, session_id: str, model: str,
+                 future: 'asyncio.Future[None]') -> None:
+        self.start = start
+        self.tag = tag
+        self.seq = seq
+        self.session_id = session_id
+        self.model = model
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        # Set when a slot was counted for this waiter; it must then be released
+        self.granted = False
+
+
+class _ProviderScheduler:
+    """Weighted fair queue in front of one provider"""
+
+    def __init__(self, provider: str) -> None:
+        self.provider = provider
+        self.gate = _Gate(**_limits_for(provider))
+        self.model_gates: Dict[str, _Gate] = {}
+        self.waiters: List[_Waiter] = []
+        self.virtual_time = 0.0
+        self.last_tags: Dict[str, float] = {}
+        self._seq = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.total_wait = 0.0
+        self.granted = 0
+
+    def model_gate(self, model: str) -> _Gate:
+        gate = self.model_gates.get(model)
+        if gate is None:
+            gate = _Gate(**_limits_for(self.provider, model))
+            self.model_gates[model] = gate
+        return gate
+
+    def enqueue(self, session_id: str, model: str, weight: float) -> _Waiter:
+        start = max(self.virtual_time, self.last_tags.get(session_id, 0.0))
+        tag = start + 1.0 / max(weight, 1e-6)
+        self.last_tags[session_id] = tag
+        self._seq += 1
+        waiter = _Waiter(start, tag, self._seq, session_id, model,
+                         asyncio.get_running_loop().create_future())
+        self.waiters.append(waiter)
+        self.waiters.sort(key=lambda w: (w.tag, w.seq))
+        self.dispatch()
+        return waiter
+
+    def remove(self, waiter: _Waiter) -> None:
+        if waiter in self.waiters:
+            self.waiters.remove(waiter)
+        self.dispatch()
+
+    def release(self, model: str) -> None:
+        self.gate.in_flight -= 1
+        self.model_gate(model).in_flight -= 1
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        """Grant waiters in tag order while limits allow"""
+        retry_in: Optional[float] = None
+        # A waiter cancelled while queued must not be granted a slot nobody releases
+        self.waiters = [w for w in self.waiters if not w.future.done()]
+        while self.waiters and self.gate.has_slot():
+            provider_delay = self.gate.bucket.delay()
+            if provider_delay > 0:
+                retry_in = provider_delay
+                break
+            granted = None
+            for waiter in self.waiters:
+                model_gate = self.model_gate(waiter.model)
+                if not model_gate.has_slot():
+                    continue
+                model_delay = model_gate.bucket.delay()
+                if model_delay > 0:
+                    retry_in = model_delay if retry_in is None else min(retry_in, model_delay)
+                    continue
+                granted = waiter
+                break
+            if granted is None:
+                break
+            self._grant(granted)
+
+        if retry_in is not None and self._timer is None:
+            def _wake() -> None:
+                self._timer = None
+                self.dispatch()
+            self._timer = asyncio.get_running_loop().call_later(retry_in, _wake)
+
+    def _grant(self, waiter: _Waiter) -> None:
+        self.waiters.remove(waiter)
+        model_gate = self.model_gate(waiter.model)
+        self.gate.bucket.take()
+        model_gate.bucket.take()
+        self.gate.in_flight += 1
+        model_gate.in_flight += 1
+        waiter.granted = True
+        self.virtual_time = max(self.virtual_time, waiter.start)
+        wait = time.monotonic() - waiter.enqueued_at
+        self.total_wait += wait
+        self.granted += 1
+        metrics_service.record_provider_queue_wait(self.provider, waiter.model, wait)
+        if not waiter.future.done():
+            waiter.future.set_result(None)
+        if not self.waiters:
+            # Idle: forget per-session tags so they do not grow forever
+            self.last_tags.clear()
+
+
+def _limits_for(provider: str, model: Optional[str] = None) -> Dict[str, Any]:
+    provider_config: Dict[str, Any] = dict(config_service.app_config.get(provider, {}))  # type: ignore
+    if model is None:
+        limits = dict(DEFAULT_PROVIDER_LIMITS.get(provider, FALLBACK_LIMITS))
+        for key in ('max_in_flight', 'requests_per_second'):
+            if key in provider_config:
+                limits[key] = provider_config[key]
+    else:
+        # Models are unlimited unless configured; the provider gate still applies
+        limits = {'max_in_flight': 0, 'requests_per_second': 0}
+        limits.update(provider_config.get('model_limits', {}).get(model, {}))
+    return {
+        'max_in_flight': int(limits.get('max_in_flight', 0)),
+        'requests_per_second': float(limits.get('requests_per_second', 0)),
+    }
+
+
+class RateLimitService:
+    """Per-provider admission control with weighted fair queuing"""
+
+    def __init__(self) -> None:
+        self._schedulers: Dict[str, _ProviderScheduler] = {}
+
+    def _scheduler(self, provider: str) -> _ProviderScheduler:
+        scheduler = self._schedulers.get(provider)
+        if scheduler is None:
+            scheduler = _ProviderScheduler(provider)
+            self._schedulers[provider] = scheduler
+        return scheduler
+
+    def reload_limits(self) -> None:
+        """Apply changed limits from config; in-flight counters are kept"""
+        for provider, scheduler in self._schedulers.items():
+            limits = _limits_for(provider)
+            scheduler.gate.max_in_flight = limits['max_in_flight']
+            scheduler.gate.bucket = TokenBucket(limits['requests_per_second'])
+            for model, gate in scheduler.model_gates.items():
+                limits = _limits_for(provider, model)
+                gate.max_in_flight = limits['max_in_flight']
+                gate.bucket = TokenBucket(limits['requests_per_second'])
+            scheduler.dispatch()
+
+    @asynccontextmanager
+    async def acquire(self, provider: str, model: str, session_id: str = '', weight: float = 1.0):
+        """
+        Wait for an admission slot for a provider call
+
+        Args:
+            provider: Provider name (e.g. 'replicate')
+            model: Model identifier
+            session_id: Fairness key, calls are balanced across sessions
+            weight: Share of the provider given to this session
+        """
+        scheduler = self._scheduler(provider)
+        waiter = scheduler.enqueue(session_id, model, weight)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.granted:
+                scheduler.release(model)
+            else:
+                scheduler.remove(waiter)
+            raise
+        try:
+            yield
+        finally:
+            scheduler.release(model)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current in-flight/queued counts and average queue wait per provider"""
+        stats: Dict[str, Any] = {}
+        for provider, scheduler in self._schedulers.items():
+            queued: Dict[Tuple[str, str], int] = {}
+            for waiter in scheduler.waiters:
+                key = (waiter.session_id, waiter.model)
+                queued[key] = queued.get(key, 0) + 1
+            stats[provider] = {
+                'in_flight': scheduler.gate.in_flight,
+                'max_in_flight': scheduler.gate.max_in_flight,
+                'requests_per_second': scheduler.gate.bucket.rate,
+                'queued': len(scheduler.waiters),
+                'queued_sessions': len({session for session, _ in queued}),
+                'avg_queue_wait_ms': round(scheduler.total_wait / scheduler.granted * 1000, 2)
+                if scheduler.granted else 0,
+                'models': {
+                    model: {'in_flight': gate.in_flight, 'max_in_flight': gate.max_in_flight}
+                    for model, gate in scheduler.model_gates.items()
+                },
+            }
+        return stats
+
+
+rate_limit_service = RateLimitService()
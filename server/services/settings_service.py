@@ -7,11 +7,12 @@ Settings Service - 设置服务模块
 - 其他应用配置项
 
 主要功能：
-1. 读取和写入 JSON 格式的设置文件
+1. 读取和写入 JSON 格式的设置文件（内存快照 + 原子写入）
 2. 提供默认设置配置
 3. 敏感信息掩码处理（如密码）
 4. 设置的合并和更新操作
 5. 全局设置状态管理
+6. 设置变更通知（add_listener），依赖方可以只处理变化的部分
 
 文件结构：
 - DEFAULT_SETTINGS: 默认配置模板
@@ -20,9 +21,13 @@ Settings Service - 设置服务模块
 - app_settings: 全局设置缓存
 """
 
+import asyncio
+import copy
 import os
 import traceback
 import json
+from fastapi.concurrency import run_in_threadpool
+from utils.cached_file import CachedFile, write_atomic
 
 # 用户数据目录路径，优先使用环境变量，否则使用默认路径
 USER_DATA_DIR = os.getenv("USER_DATA_DIR", os.path.join(
@@ -63,6 +68,10 @@ class SettingsService:
             os.path.dirname(os.path.dirname(__file__)))
         self.settings_file = os.getenv(
             "SETTINGS_PATH", os.path.join(USER_DATA_DIR, "settings.json"))
+        # 解析后的设置快照，文件变化（inode / mtime / size）时才重新读取
+        self._file = CachedFile(self.settings_file, self._parse)
+        self._write_lock = asyncio.Lock()
+        self._listeners = []
 
     async def exists_settings(self):
         """
@@ -76,12 +85,48 @@ class SettingsService:
         """
         return os.path.exists(self.settings_file)
 
+    def _parse(self, content):
+        """解析设置文件内容并与默认设置合并，确保所有键都存在"""
+        settings = json.loads(content)
+        merged_settings = copy.deepcopy(DEFAULT_SETTINGS)
+        for key, value in settings.items():
+            if key in merged_settings and isinstance(merged_settings[key], dict) and isinstance(value, dict):
+                # 对于字典类型的设置，进行深度合并
+                merged_settings[key].update(value)
+            else:
+                # 其他类型直接覆盖
+                merged_settings[key] = value
+        return merged_settings
+
+    def _snapshot(self):
+        """
+        获取内存中的设置快照
+
+        只有当设置文件的 inode / mtime / size 变化时才重新读取和解析，
+        其余情况只需一次 stat 调用。
+        """
+        global app_settings
+        try:
+            if not os.path.exists(self.settings_file):
+                # 如果设置文件不存在，创建默认设置文件
+                self.create_default_settings()
+            settings, _ = self._file.get()
+            if settings is None:
+                return copy.deepcopy(DEFAULT_SETTINGS)
+            # 更新全局设置缓存
+            app_settings = settings
+            return settings
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+            traceback.print_exc()
+            return copy.deepcopy(DEFAULT_SETTINGS)
+
     def get_settings(self):
         """
         获取所有设置配置（用于 API 响应）
 
         该方法会：
-        1. 读取设置文件（如果不存在则创建默认配置）
+        1. 读取设置文件（如果不存在则创建默认配置），文件未变化时直接使用内存快照
         2. 与默认设置合并，确保所有必需的键都存在
         3. 对敏感信息进行掩码处理
         4. 更新全局设置缓存
@@ -92,33 +137,7 @@ class SettingsService:
         Note:
             返回的设置适用于 API 响应，敏感信息（如密码）会被 '*' 掩码
         """
-        try:
-            if not os.path.exists(self.settings_file):
-                # 如果设置文件不存在，创建默认设置文件
-                self.create_default_settings()
-
-            # 读取 JSON 配置文件
-            with open(self.settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
-
-            # 与默认设置合并，确保所有键都存在
-            merged_settings = {**DEFAULT_SETTINGS}
-            for key, value in settings.items():
-                if key in merged_settings and isinstance(merged_settings[key], dict) and isinstance(value, dict):
-                    # 对于字典类型的设置，进行深度合并
-                    merged_settings[key].update(value)
-                else:
-                    # 其他类型直接覆盖
-                    merged_settings[key] = value
-
-            # 更新全局设置缓存（存储未掩码的完整版本）
-            global app_settings
-            app_settings = merged_settings
-            return merged_settings
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-            traceback.print_exc()
-            return DEFAULT_SETTINGS
+        return dict(self._snapshot())
 
     def get_raw_settings(self):
         """
@@ -133,32 +152,28 @@ class SettingsService:
             dict: 包含所有设置的完整字典，敏感信息未被掩码
 
         Note:
-            此方法返回的数据包含敏感信息，仅供内部使用，不应直接用于 API 响应
+            此方法返回的数据包含敏感信息，仅供内部使用，不应直接用于 API 响应。
+            返回的是快照的浅拷贝，不要修改其中的嵌套对象
         """
-        try:
-            if not os.path.exists(self.settings_file):
-                # 如果设置文件不存在，创建默认设置
-                self.create_default_settings()
+        return dict(self._snapshot())
 
-            # 读取 JSON 配置文件
-            with open(self.settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
+    def add_listener(self, listener):
+        """
+        订阅设置变更通知
 
-            # 与默认设置合并
-            merged_settings = {**DEFAULT_SETTINGS}
-            for key, value in settings.items():
-                if key in merged_settings and isinstance(merged_settings[key], dict) and isinstance(value, dict):
-                    merged_settings[key].update(value)
-                else:
-                    merged_settings[key] = value
+        Args:
+            listener: 异步回调 `async def listener(changed_keys: set, settings: dict)`，
+                在通过 update_settings 写入的设置发生变化后调用
+        """
+        self._listeners.append(listener)
 
-            # 更新全局设置缓存
-            global app_settings
-            app_settings = merged_settings
-            return merged_settings
-        except Exception as e:
-            print(f"Error loading raw settings: {e}")
-            return DEFAULT_SETTINGS
+    async def _notify(self, changed_keys, settings):
+        results = await asyncio.gather(
+            *(listener(changed_keys, settings) for listener in self._listeners),
+            return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"⚠️ Settings change listener failed: {result}")
 
     def get_proxy_config(self):
         """
@@ -234,15 +249,37 @@ class SettingsService:
             Exception: 当文件创建失败时抛出异常
         """
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
-
-            # 写入默认设置到 JSON 文件
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(DEFAULT_SETTINGS, f, indent=2)
+            # 原子写入默认设置到 JSON 文件（自动创建目录）
+            write_atomic(self.settings_file, json.dumps(DEFAULT_SETTINGS, indent=2))
         except Exception as e:
             print(f"Error creating default settings: {e}")
 
+    def _write_update(self, data):
+        """
+        合并并原子写入设置（阻塞，在线程池中运行）
+
+        Returns:
+            tuple: (更新后的设置, 发生变化的键集合)
+        """
+        existing_settings = self._snapshot()
+        new_settings = dict(existing_settings)
+
+        # 合并新数据到现有设置
+        for key, value in data.items():
+            current = existing_settings.get(key)
+            if isinstance(current, dict) and isinstance(value, dict):
+                # 对于字典类型，进行深度合并而不是替换
+                new_settings[key] = {**current, **value}
+            else:
+                # 其他类型直接覆盖
+                new_settings[key] = value
+
+        changed_keys = {key for key in data if existing_settings.get(key) != new_settings[key]}
+        if changed_keys or not os.path.exists(self.settings_file):
+            # 临时文件 + 重命名，读取方不会看到写了一半的文件
+            self._file.write(new_settings, json.dumps(new_settings, indent=2))
+        return new_settings, changed_keys
+
     async def update_settings(self, data):
         """
         更新设置配置
@@ -250,8 +287,9 @@ class SettingsService:
         该方法会：
         1. 读取现有设置
         2. 与新数据进行合并（深度合并字典类型）
-        3. 保存更新后的设置到文件
+        3. 在线程池中原子写入设置文件（临时文件 + 重命名）
         4. 更新全局设置缓存
+        5. 通知订阅者哪些设置发生了变化
 
         Args:
             data (dict): 要更新的设置数据，可以是部分设置
@@ -267,35 +305,16 @@ class SettingsService:
             })
         """
         try:
-            # 加载现有设置，如果文件不存在则使用默认设置
-            existing_settings = DEFAULT_SETTINGS.copy()
-            if os.path.exists(self.settings_file):
-                try:
-                    with open(self.settings_file, 'r', encoding='utf-8') as f:
-                        existing_settings = json.load(f)
-                except Exception as e:
-                    print(f"Error reading existing settings: {e}")
-
-            # 合并新数据到现有设置
-            for key, value in data.items():
-                if key in existing_settings and isinstance(existing_settings[key], dict) and isinstance(value, dict):
-                    # 对于字典类型，进行深度合并而不是替换
-                    existing_settings[key].update(value)
-                else:
-                    # 其他类型直接覆盖
-                    existing_settings[key] = value
-
-            # 确保目录存在
-            os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
-
-            # 保存更新后的设置到文件
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_settings, f, indent=2)
+            # 串行化写入，避免并发的读取-合并-写入互相覆盖
+            async with self._write_lock:
+                new_settings, changed_keys = await run_in_threadpool(self._write_update, data)
 
             # 更新全局设置缓存
             global app_settings
-            app_settings = existing_settings
+            app_settings = new_settings
 
+            if changed_keys:
+                await self._notify(changed_keys, new_settings)
             return {"status": "success", "message": "Settings updated successfully"}
         except Exception as e:
             traceback.print_exc()
@@ -0,0 +1,192 @@
+"""
+Startup service - runs the initialization steps of the server
+
+Steps (config load, database migration, tool registration, connection
+warm-up, ...) are registered with their dependencies and run concurrently in
+the background once the lifespan starts, so the server answers /health right
+away. A step starts as soon as the steps it depends on have succeeded; when a
+dependency fails, the step is skipped.
+
+The server is ready when every step has finished and no critical step failed.
+GET /ready reflects that (503 until then) and API requests wait for it, so a
+chat request arriving during startup no longer races tool registration. The
+per-step timing report is returned by /ready, printed once startup finishes
+and exported as the `startup_step_duration_seconds` metric.
+"""
+
+import asyncio
+import time
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from services.metrics_service import metrics_service
+
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class StartupStep:
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[], Awaitable[Any]],
+        after: Sequence[str] = (),
+        critical: bool = True,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.run = run
+        self.after = tuple(after)
+        self.critical = critical
+        self.timeout = timeout
+        self.status = PENDING
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class StartupService:
+    def __init__(self) -> None:
+        self._steps: Dict[str, StartupStep] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+        self._done = asyncio.Event()
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def add_step(
+        self,
+        name: str,
+        run: Callable[[], Awaitable[Any]],
+        after: Sequence[str] = (),
+        critical: bool = True,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Register a startup step
+
+        Args:
+            name: Unique step name, used in `after` and in the report
+            run: Coroutine function doing the work
+            after: Steps that must succeed before this one starts
+            critical: Whether a failure keeps the server from becoming ready
+            timeout: Seconds after which the step is cancelled and failed
+        """
+        unknown = [dep for dep in after if dep not in self._steps]
+        if unknown:
+            raise ValueError(f"Startup step {name} depends on unknown steps {unknown}")
+        self._steps[name] = StartupStep(name, run, after, critical, timeout)
+
+    def start(self) -> None:
+        """Run all steps in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_all())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and not self.failed
+
+    @property
+    def failed(self) -> bool:
+        return any(step.critical and step.status in (FAILED, SKIPPED) for step in self._steps.values())
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until startup finished; returns whether the server is ready"""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.ready
+
+    async def _run_all(self) -> None:
+        self._started_at = time.monotonic()
+        tasks: Dict[str, asyncio.Task[bool]] = {}
+        # Steps are registered after their dependencies, so the dependency
+        # tasks always exist when a step is scheduled
+        for step in self._steps.values():
+            tasks[step.name] = asyncio.create_task(
+                self._run_step(step, [tasks[dep] for dep in step.after]))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            self._finished_at = time.monotonic()
+            self._done.set()
+            self._print_report()
+
+    async def _run_step(self, step: StartupStep, dependencies: List['asyncio.Task[bool]']) -> bool:
+        results = await asyncio.gather(*dependencies)
+        if not all(results):
+            step.status = SKIPPED
+            step.error = 'a dependency failed'
+            return False
+
+        step.status = RUNNING
+        step.started_at = time.monotonic()
+        try:
+            await asyncio.wait_for(step.run(), step.timeout)
+            step.status = SUCCEEDED
+        except asyncio.TimeoutError:
+            step.status = FAILED
+            step.error = f"timed out after {step.timeout}s"
+        except Exception as e:
+            step.status = FAILED
+            step.error = str(e) or type(e).__name__
+            traceback.print_exc()
+        finally:
+            step.finished_at = time.monotonic()
+        metrics_service.record_startup_step(
+            step.name, step.status, step.finished_at - step.started_at)
+        if step.status == FAILED:
+            print(f"{'❌' if step.critical else '⚠️'} Startup step {step.name} failed: {step.error}")
+        return step.status == SUCCEEDED
+
+    def report(self) -> Dict[str, Any]:
+        """Readiness and per-step timing, milliseconds relative to the start"""
+        def _ms(t: Optional[float]) -> Optional[float]:
+            if t is None or self._started_at is None:
+                return None
+            return round((t - self._started_at) * 1000, 1)
+
+        if not self._done.is_set():
+            status = 'starting'
+        else:
+            status = 'failed' if self.failed else 'ready'
+        return {
+            'status': status,
+            'ready': self.ready,
+            'total_ms': _ms(self._finished_at),
+            'steps': [
+                {
+                    'name': step.name,
+                    'status': step.status,
+                    'critical': step.critical,
+                    'after': list(step.after),
+                    'started_ms': _ms(step.started_at),
+                    'duration_ms': (round((step.finished_at - step.started_at) * 1000, 1)
+                                    if step.started_at is not None and step.finished_at is not None else None),
+                    'error': step.error,
+                }
+                for step in self._steps.values()
+            ],
+        }
+
+    def _print_report(self) -> None:
+        report = self.report()
+        print(f"🚀 Startup {report['status']} in {report['total_ms']} ms")
+        for step in report['steps']:
+            timing = (f"{step['started_ms']:>8.1f} ms +{step['duration_ms']:.1f} ms"
+                      if step['duration_ms'] is not None else ' ' * 11 + '-')
+            print(f"   {step['name']:<20} {step['status']:<10} {timing}"
+                  + (f"  ({step['error']})" if step['error'] else ''))
+
+
+startup_service = StartupService()
@@ -1,11 +1,13 @@
 # services/stream_service.py
 from typing import Dict, Optional, Any
 import asyncio
+from services.cluster_service import cluster_service
 
-# Dictionary to store active stream tasks, keyed by session_id
+# Dictionary to store active stream tasks of this worker, keyed by session_id.
+# The cluster-wide session -> worker registry lives in cluster_service.
 stream_tasks: Dict[str, asyncio.Task[Any]] = {}
 
-def add_stream_task(session_id: str, task: asyncio.Task[Any]) -> None:
+async def add_stream_task(session_id: str, task: asyncio.Task[Any]) -> None:
     """
     Add a stream task for the given session_id.
 
@@ -14,8 +16,9 @@ def add_stream_task(session_id: str, task: asyncio.Task[Any]) -> None:
         task: The task object to associate with the session.
     """
     stream_tasks[session_id] = task
+    await cluster_service.register_stream_task(session_id)
 
-def remove_stream_task(session_id: str) -> None:
+async def remove_stream_task(session_id: str) -> None:
     """
     Remove the stream task associated with the given session_id.
 
@@ -23,10 +26,11 @@ def remove_stream_task(session_id: str) -> None:
         session_id (str): Unique identifier for the session.
     """
     stream_tasks.pop(session_id, None)
+    await cluster_service.unregister_stream_task(session_id)
 
 def get_stream_task(session_id: str) -> Optional[asyncio.Task[Any]]:
     """
-    Retrieve the stream task associated with the given session_id.
+    Retrieve the stream task of this worker associated with the given session_id.
 
     Args:
         session_id (str): Unique identifier for the session.
@@ -36,4 +40,28 @@ def get_stream_task(session_id: str) -> Optional[asyncio.Task[Any]]:
     """
     return stream_tasks.get(session_id)
 
+def cancel_local_stream_task(session_id: str) -> bool:
+    """
+    Cancel the stream task of the given session_id if it runs on this worker.
+
+    Returns:
+        bool: True if a running task was cancelled.
+    """
+    task = stream_tasks.get(session_id)
+    if task and not task.done():
+        task.cancel()
+        return True
+    return False
+
+async def cancel_stream_task(session_id: str) -> bool:
+    """
+    Cancel the stream task of the given session_id on whichever worker runs it.
+
+    Returns:
+        bool: True if the task was cancelled locally or the owning worker was notified.
+    """
+    if cancel_local_stream_task(session_id):
+        return True
+    return await cluster_service.request_cancel(session_id)
+
 # 你也可以加一个 list_stream_tasks() 返回所有 session_id
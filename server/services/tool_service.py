@@ -1,83 +1,41 @@
+import importlib
 import traceback
-from typing import Dict
-from langchain_core.tools import BaseTool
+from typing import TYPE_CHECKING, Any, Dict, Set
 from models.tool_model import ToolInfo
-from tools.comfy_dynamic import build_tool
-from tools.write_plan import write_plan_tool
-from tools.generate_image_by_gpt_image_1_jaaz import generate_image_by_gpt_image_1_jaaz
-from tools.generate_image_by_imagen_4_jaaz import generate_image_by_imagen_4_jaaz
-from tools.generate_image_by_imagen_4_replicate import (
-    generate_image_by_imagen_4_replicate,
-)
-from tools.generate_image_by_ideogram3_bal_jaaz import (
-    generate_image_by_ideogram3_bal_jaaz,
-)
-
-# from tools.generate_image_by_flux_1_1_pro import generate_image_by_flux_1_1_pro
-from tools.generate_image_by_flux_kontext_pro_jaaz import (
-    generate_image_by_flux_kontext_pro_jaaz,
-)
-from tools.generate_image_by_flux_kontext_pro_replicate import (
-    generate_image_by_flux_kontext_pro_replicate,
-)
-from tools.generate_image_by_flux_kontext_max_jaaz import (
-    generate_image_by_flux_kontext_max,
-)
-from tools.generate_image_by_flux_kontext_max_replicate import (
-    generate_image_by_flux_kontext_max_replicate,
-)
-from tools.generate_image_by_doubao_seedream_3_jaaz import (
-    generate_image_by_doubao_seedream_3_jaaz,
-)
-from tools.generate_image_by_doubao_seedream_3_volces import (
-    generate_image_by_doubao_seedream_3_volces,
-)
-from tools.generate_image_by_doubao_seededit_3_volces import (
-    edit_image_by_doubao_seededit_3_volces,
-)
-from tools.generate_video_by_seedance_v1_jaaz import generate_video_by_seedance_v1_jaaz
-from tools.generate_video_by_seedance_v1_pro_volces import (
-    generate_video_by_seedance_v1_pro_volces,
-)
-from tools.generate_video_by_seedance_v1_lite_volces import (
-    generate_video_by_seedance_v1_lite_t2v,
-    generate_video_by_seedance_v1_lite_i2v,
-)
-from tools.generate_video_by_kling_v2_jaaz import generate_video_by_kling_v2_jaaz
-from tools.generate_image_by_recraft_v3_jaaz import generate_image_by_recraft_v3_jaaz
-from tools.generate_image_by_recraft_v3_replicate import (
-    generate_image_by_recraft_v3_replicate,
-)
-from tools.generate_video_by_hailuo_02_jaaz import generate_video_by_hailuo_02_jaaz
-from tools.generate_video_by_veo3_fast_jaaz import generate_video_by_veo3_fast_jaaz
-from tools.generate_image_by_midjourney_jaaz import generate_image_by_midjourney_jaaz
 from services.config_service import config_service
 from services.db_service import db_service
 
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
+
+# Tool functions are referenced as "module:attribute" and imported on first
+# use by get_tool(): importing every tool module (and langchain with them) up
+# front made cold starts take seconds.
+
 TOOL_MAPPING: Dict[str, ToolInfo] = {
     "generate_image_by_gpt_image_1_jaaz": {
         "display_name": "GPT Image 1",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_gpt_image_1_jaaz,
+        "tool_path": "tools.generate_image_by_gpt_image_1_jaaz:generate_image_by_gpt_image_1_jaaz",
     },
     "generate_image_by_imagen_4_jaaz": {
         "display_name": "Imagen 4",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_imagen_4_jaaz,
+        "tool_path": "tools.generate_image_by_imagen_4_jaaz:generate_image_by_imagen_4_jaaz",
     },
     "generate_image_by_recraft_v3_jaaz": {
         "display_name": "Recraft v3",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_recraft_v3_jaaz,
+        "tool_path": "tools.generate_image_by_recraft_v3_jaaz:generate_image_by_recraft_v3_jaaz",
     },
     "generate_image_by_ideogram3_bal_jaaz": {
         "display_name": "Ideogram 3 Balanced",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_ideogram3_bal_jaaz,
+        "tool_path": "tools.generate_image_by_ideogram3_bal_jaaz:generate_image_by_ideogram3_bal_jaaz",
     },
     # "generate_image_by_flux_1_1_pro_jaaz": {
     #     "display_name": "Flux 1.1 Pro",
@@ -89,79 +47,79 @@ TOOL_MAPPING: Dict[str, ToolInfo] = {
         "display_name": "Flux Kontext Pro",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_flux_kontext_pro_jaaz,
+        "tool_path": "tools.generate_image_by_flux_kontext_pro_jaaz:generate_image_by_flux_kontext_pro_jaaz",
     },
     "generate_image_by_flux_kontext_max_jaaz": {
         "display_name": "Flux Kontext Max",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_flux_kontext_max,
+        "tool_path": "tools.generate_image_by_flux_kontext_max_jaaz:generate_image_by_flux_kontext_max",
     },
     "generate_image_by_midjourney_jaaz": {
         "display_name": "Midjourney",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_midjourney_jaaz,
+        "tool_path": "tools.generate_image_by_midjourney_jaaz:generate_image_by_midjourney_jaaz",
     },
     "generate_image_by_doubao_seedream_3_jaaz": {
         "display_name": "Doubao Seedream 3",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_doubao_seedream_3_jaaz,
+        "tool_path": "tools.generate_image_by_doubao_seedream_3_jaaz:generate_image_by_doubao_seedream_3_jaaz",
     },
     "generate_image_by_doubao_seedream_3_volces": {
         "display_name": "Doubao Seedream 3 by volces",
         "type": "image",
         "provider": "volces",
-        "tool_function": generate_image_by_doubao_seedream_3_volces,
+        "tool_path": "tools.generate_image_by_doubao_seedream_3_volces:generate_image_by_doubao_seedream_3_volces",
     },
     "edit_image_by_doubao_seededit_3_volces": {
         "display_name": "Doubao Seededit 3 by volces",
         "type": "image",
         "provider": "volces",
-        "tool_function": edit_image_by_doubao_seededit_3_volces,
+        "tool_path": "tools.generate_image_by_doubao_seededit_3_volces:edit_image_by_doubao_seededit_3_volces",
     },
     "generate_video_by_seedance_v1_jaaz": {
         "display_name": "Doubao Seedance v1",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_seedance_v1_jaaz,
+        "tool_path": "tools.generate_video_by_seedance_v1_jaaz:generate_video_by_seedance_v1_jaaz",
     },
     "generate_video_by_hailuo_02_jaaz": {
         "display_name": "Hailuo 02",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_hailuo_02_jaaz,
+        "tool_path": "tools.generate_video_by_hailuo_02_jaaz:generate_video_by_hailuo_02_jaaz",
     },
     "generate_video_by_kling_v2_jaaz": {
         "display_name": "Kling v2.1 Standard",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_kling_v2_jaaz,
+        "tool_path": "tools.generate_video_by_kling_v2_jaaz:generate_video_by_kling_v2_jaaz",
     },
     "generate_video_by_seedance_v1_pro_volces": {
         "display_name": "Doubao Seedance v1 by volces",
         "type": "video",
         "provider": "volces",
-        "tool_function": generate_video_by_seedance_v1_pro_volces,
+        "tool_path": "tools.generate_video_by_seedance_v1_pro_volces:generate_video_by_seedance_v1_pro_volces",
     },
     "generate_video_by_seedance_v1_lite_volces_t2v": {
         "display_name": "Doubao Seedance v1 lite(text-to-video)",
         "type": "video",
         "provider": "volces",
-        "tool_function": generate_video_by_seedance_v1_lite_t2v,
+        "tool_path": "tools.generate_video_by_seedance_v1_lite_volces:generate_video_by_seedance_v1_lite_t2v",
     },
     "generate_video_by_seedance_v1_lite_i2v_volces": {
         "display_name": "Doubao Seedance v1 lite(images-to-video)",
         "type": "video",
         "provider": "volces",
-        "tool_function": generate_video_by_seedance_v1_lite_i2v,
+        "tool_path": "tools.generate_video_by_seedance_v1_lite_volces:generate_video_by_seedance_v1_lite_i2v",
     },
     "generate_video_by_veo3_fast_jaaz": {
         "display_name": "Veo3 Fast",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_veo3_fast_jaaz,
+        "tool_path": "tools.generate_video_by_veo3_fast_jaaz:generate_video_by_veo3_fast_jaaz",
     },
     # ---------------
     # Replicate Tools
@@ -170,25 +128,25 @@ TOOL_MAPPING: Dict[str, ToolInfo] = {
         "display_name": "Imagen 4",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_imagen_4_replicate,
+        "tool_path": "tools.generate_image_by_imagen_4_replicate:generate_image_by_imagen_4_replicate",
     },
     "generate_image_by_recraft_v3_replicate": {
         "display_name": "Recraft v3",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_recraft_v3_replicate,
+        "tool_path": "tools.generate_image_by_recraft_v3_replicate:generate_image_by_recraft_v3_replicate",
     },
     "generate_image_by_flux_kontext_pro_replicate": {
         "display_name": "Flux Kontext Pro",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_flux_kontext_pro_replicate,
+        "tool_path": "tools.generate_image_by_flux_kontext_pro_replicate:generate_image_by_flux_kontext_pro_replicate",
     },
     "generate_image_by_flux_kontext_max_replicate": {
         "display_name": "Flux Kontext Max",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_flux_kontext_max_replicate,
+        "tool_path": "tools.generate_image_by_flux_kontext_max_replicate:generate_image_by_flux_kontext_max_replicate",
     },
 }
 
@@ -197,13 +155,14 @@ class ToolService:
     def __init__(self):
         self.tools: Dict[str, ToolInfo] = {}
         self._register_required_tools()
+        config_service.add_listener(self.on_config_changed)
 
     def _register_required_tools(self):
         """注册必须的工具"""
         try:
             self.tools["write_plan"] = {
                 "provider": "system",
-                "tool_function": write_plan_tool,
+                "tool_path": "tools.write_plan:write_plan_tool",
             }
         except ImportError as e:
             print(f"❌ 注册必须工具失败 write_plan: {e}")
@@ -242,9 +201,53 @@ class ToolService:
             print(f"❌ Failed to initialize tool service: {e}")
             traceback.print_stack()
 
-    def get_tool(self, tool_name: str) -> BaseTool | None:
+    async def on_config_changed(self, changed_providers: Set[str]):
+        """Re-register only the tools of providers whose config changed"""
+        for provider_name in changed_providers:
+            # Jaaz tools are always registered
+            if provider_name == "jaaz":
+                continue
+            for tool_id in [tool_id for tool_id, tool_info in self.tools.items()
+                            if tool_info.get("provider") == provider_name]:
+                self.remove_tool(tool_id)
+
+            provider_config = config_service.app_config.get(provider_name, {})
+            if provider_name == "comfyui":
+                if provider_config.get("url", ""):
+                    await register_comfy_tools()
+            elif provider_config.get("api_key", ""):
+                for tool_id, tool_info in TOOL_MAPPING.items():
+                    if tool_info.get("provider") == provider_name:
+                        self.register_tool(tool_id, tool_info)
+            print(f"🔄 Updated tools of provider {provider_name}")
+
+    def add_comfy_workflow(self, wf: Dict[str, Any]) -> None:
+        """Register the tool of a newly created ComfyUI workflow"""
+        if not config_service.app_config.get("comfyui", {}).get("url", ""):
+            return
+        # The newest workflow of a name wins, as in a full registration
+        tool_id = f"comfyui_{wf['name']}"
+        if tool_id in self.tools:
+            self.remove_tool(tool_id)
+        register_comfy_workflow(wf)
+
+    async def remove_comfy_workflow(self, workflow_id: int) -> None:
+        """Unregister the tool of a deleted ComfyUI workflow"""
+        _comfy_tool_cache.pop(workflow_id, None)
+        removed = [tool_id for tool_id, tool_info in self.tools.items()
+                   if tool_info.get("workflow_id") == workflow_id]
+        for tool_id in removed:
+            self.remove_tool(tool_id)
+        if not removed or not config_service.app_config.get("comfyui", {}).get("url", ""):
+            return
+        # An older workflow of the same name takes its place
+        for wf in await db_service.list_comfy_workflows():
+            if f"comfyui_{wf['name']}" in removed:
+                register_comfy_workflow(wf)
+
+    def get_tool(self, tool_name: str) -> "BaseTool | None":
         tool_info = self.tools.get(tool_name)
-        return tool_info.get("tool_function") if tool_info else None
+        return resolve_tool_function(tool_info) if tool_info else None
 
     def remove_tool(self, tool_id: str):
         self.tools.pop(tool_id)
@@ -258,15 +261,73 @@ class ToolService:
         self._register_required_tools()
 
 
+def resolve_tool_function(tool_info: ToolInfo) -> "BaseTool | None":
+    """
+    Import the tool function of a registered tool on first use
+
+    The function is cached in tool_info, which for built-in tools is the shared
+    TOOL_MAPPING entry, so every module is imported at most once.
+    """
+    tool_function = tool_info.get("tool_function")
+    if tool_function is None and tool_info.get("tool_path"):
+        module_name, _, attr = tool_info["tool_path"].partition(":")
+        try:
+            tool_function = getattr(importlib.import_module(module_name), attr)
+        except Exception as e:
+            print(f"❌ Failed to load tool {tool_info['tool_path']}: {e}")
+            traceback.print_exc()
+            return None
+        tool_info["tool_function"] = tool_function
+    return tool_function
+
+
 tool_service = ToolService()
 
 
-async def register_comfy_tools() -> Dict[str, BaseTool]:
+# Built ComfyUI workflow tools by workflow id; stored workflows are never
+# edited, so a tool is built once per workflow and reused when tools are
+# re-registered (config change, initialize)
+_comfy_tool_cache: "Dict[int, BaseTool]" = {}
+
+
+def register_comfy_workflow(wf: Dict[str, Any]) -> "BaseTool | None":
+    """Compile one workflow into a tool and register it as comfyui_<name>"""
+    # Only needed when ComfyUI is configured; pulls in langchain
+    from tools.comfy_dynamic import build_tool
+
+    try:
+        tool_fn = _comfy_tool_cache.get(wf["id"])
+        if tool_fn is None:
+            tool_fn = build_tool(wf)
+            _comfy_tool_cache[wf["id"]] = tool_fn
+        # Export with a unique python identifier so that `dir(module)` works
+        unique_name = f"comfyui_{wf['name']}"
+        tool_service.register_tool(
+            unique_name,
+            {
+                "provider": "comfyui",
+                "tool_function": tool_fn,
+                "display_name": wf["name"],
+                # TODO: Add comfyui workflow type! Not hardcoded!
+                "type": "image",
+                "workflow_id": wf["id"],
+            },
+        )
+        return tool_fn
+    except Exception as exc:  # pragma: no cover
+        print(
+            f"[comfy_dynamic] Failed to create tool for workflow {wf.get('id')}: {exc}"
+        )
+        traceback.print_exc()
+        return None
+
+
+async def register_comfy_tools() -> "Dict[str, BaseTool]":
     """
     Fetch all workflows from DB and build tool callables.
     Run inside the current event loop.
     """
-    dynamic_comfy_tools: Dict[str, BaseTool] = {}
+    dynamic_comfy_tools: "Dict[str, BaseTool]" = {}
     try:
         workflows = await db_service.list_comfy_workflows()
     except Exception as exc:  # pragma: no cover
@@ -275,25 +336,8 @@ async def register_comfy_tools() -> Dict[str, BaseTool]:
         return {}
 
     for wf in workflows:
-        try:
-            tool_fn = build_tool(wf)
-            # Export with a unique python identifier so that `dir(module)` works
-            unique_name = f"comfyui_{wf['name']}"
-            dynamic_comfy_tools[unique_name] = tool_fn
-            tool_service.register_tool(
-                unique_name,
-                {
-                    "provider": "comfyui",
-                    "tool_function": tool_fn,
-                    "display_name": wf["name"],
-                    # TODO: Add comfyui workflow type! Not hardcoded!
-                    "type": "image",
-                },
-            )
-        except Exception as exc:  # pragma: no cover
-            print(
-                f"[comfy_dynamic] Failed to create tool for workflow {wf.get('id')}: {exc}"
-            )
-            print(traceback.print_stack())
+        tool_fn = register_comfy_workflow(wf)
+        if tool_fn is not None:
+            dynamic_comfy_tools[f"comfyui_{wf['name']}"] = tool_fn
 
     return dynamic_comfy_tools
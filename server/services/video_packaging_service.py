@@ -0,0 +1,99 @@
+"""
+Video packaging service - optional HLS packaging of generated videos
+
+When VIDEO_HLS=true and ffmpeg is installed, every video saved to a canvas is
+packaged into HLS renditions in the background (see utils/hls.py). Packaging
+runs on a dedicated pool of HLS_WORKERS threads (default 2), each driving one
+ffmpeg process at a time, so a burst of videos queues up instead of starting
+dozens of encoders. Once done, the canvas element gets `customData.hlsURL`
+through the canvas writer and an `element_updated` event is broadcast.
+
+Packages are served by routers/video_router.py.
+"""
+
+import asyncio
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set
+from services.canvas_writer_service import canvas_writer_service
+from utils.hls import package_hls, video_id_from_filename
+from utils.video_probe import ffmpeg_available
+from services.config_service import FILES_DIR
+
+
+class VideoPackagingService:
+    def __init__(self) -> None:
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # video_id -> running packaging, so concurrent requests share one job
+        self._running: Dict[str, asyncio.Future[Optional[Dict[str, Any]]]] = {}
+        self._background: Set[asyncio.Task[None]] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv('VIDEO_HLS', 'false').lower() == 'true' and ffmpeg_available()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            workers = max(1, int(os.getenv('HLS_WORKERS', '2')))
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hls')
+        return self._executor
+
+    async def package(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Package a stored video (file name in FILES_DIR) into HLS
+
+        Returns:
+            Dict with 'url' of the master playlist and 'renditions', or None
+            if packaging failed
+        """
+        video_id = video_id_from_filename(filename)
+        running = self._running.get(video_id)
+        if running is not None:
+            return await asyncio.shield(running)
+
+        source = os.path.join(FILES_DIR, os.path.basename(filename))
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_executor(), package_hls, source, video_id)
+        self._running[video_id] = future
+        future.add_done_callback(lambda _: self._running.pop(video_id, None))
+        # A cancelled caller does not abort the encode other callers may share
+        return await asyncio.shield(future)
+
+    def is_packaging(self, filename: str) -> bool:
+        return video_id_from_filename(filename) in self._running
+
+    def schedule(self, filename: str, canvas_id: str, session_id: str, element_id: str) -> None:
+        """Package a video in the background and point its canvas element at the playlist"""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self._package_for_element(filename, canvas_id, session_id, element_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _package_for_element(self, filename: str, canvas_id: str, session_id: str, element_id: str) -> None:
+        try:
+            result = await self.package(filename)
+            if result is None:
+                print(f"🎞️ HLS packaging failed for {filename}, keeping the MP4")
+                return
+            print(f"🎞️ HLS package ready for {filename}: {result['url']}")
+            await canvas_writer_service.update_element(
+                canvas_id, session_id, element_id,
+                {'customData': {'hlsURL': result['url']}},
+                {'type': 'element_updated'},
+                file_fields={'hlsURL': result['url']},
+            )
+        except Exception as e:
+            print(f"❌ Error packaging {filename} to HLS: {e}")
+            traceback.print_exc()
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for task in list(self._background):
+            task.cancel()
+
+
+video_packaging_service = VideoPackagingService()
@@ -1,22 +1,21 @@
 # services/websocket_service.py
-from services.websocket_state import sio, get_all_socket_ids
+from services.websocket_state import sio
 import traceback
 from typing import Any, Dict
 
 
 async def broadcast_session_update(session_id: str, canvas_id: str | None, event: Dict[str, Any]):
-    socket_ids = get_all_socket_ids()
-    if socket_ids:
-        try:
-            for socket_id in socket_ids:
-                await sio.emit('session_update', {
-                    'canvas_id': canvas_id,
-                    'session_id': session_id,
-                    **event
-                }, room=socket_id)
-        except Exception as e:
-            print(f"Error broadcasting session update for {session_id}: {e}")
-            traceback.print_exc()
+    # A single broadcast emit instead of one emit per socket: in cluster mode it
+    # is published once on the message bus and delivered by every worker
+    try:
+        await sio.emit('session_update', {
+            'canvas_id': canvas_id,
+            'session_id': session_id,
+            **event
+        })
+    except Exception as e:
+        print(f"Error broadcasting session update for {session_id}: {e}")
+        traceback.print_exc()
 
 # compatible with legacy codes
 # TODO: All Broadcast should have a canvas_id
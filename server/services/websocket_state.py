@@ -2,6 +2,7 @@
 import socketio
 import os
 from typing import Dict
+from services.cluster_service import cluster_service
 
 # Get CORS origins from environment variable, fallback to localhost for development
 def get_cors_origins():
@@ -33,24 +34,33 @@ def get_cors_origins():
     print(f"⚠️  CORS_ORIGINS not set, using development origins: {dev_origins}")
     return dev_origins
 
+# In cluster mode the client manager fans emits out to every worker over the
+# message bus, so broadcasts reach sockets connected to other processes
 sio = socketio.AsyncServer(
     cors_allowed_origins=get_cors_origins(),
-    async_mode='asgi'
+    async_mode='asgi',
+    client_manager=cluster_service.create_client_manager(),
 )
 
+# Connections of this worker; the cluster-wide registry lives in cluster_service
 active_connections: Dict[str, dict] = {}
 
-def add_connection(socket_id: str, user_info: dict = None):
+async def add_connection(socket_id: str, user_info: dict = None):
     active_connections[socket_id] = user_info or {}
+    await cluster_service.register_connection(socket_id, active_connections[socket_id])
     print(f"New connection added: {socket_id}, total connections: {len(active_connections)}")
 
-def remove_connection(socket_id: str):
+async def remove_connection(socket_id: str):
     if socket_id in active_connections:
         del active_connections[socket_id]
         print(f"Connection removed: {socket_id}, total connections: {len(active_connections)}")
+    await cluster_service.unregister_connection(socket_id)
 
 def get_all_socket_ids():
     return list(active_connections.keys())
 
 def get_connection_count():
     return len(active_connections)
+
+async def get_cluster_connection_count():
+    return await cluster_service.get_connection_count()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+import services.canvas_writer_service as canvas_writer_module
+from services.canvas_writer_service import CanvasMutation, CanvasWriterService
+
+
+def _builder(element_id: str):
+    async def build(canvas_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {'id': element_id, 'type': 'image'}
+    return build
+
+
+async def _broken_builder(canvas_data: Dict[str, Any]) -> Dict[str, Any]:
+    raise RuntimeError('placement failed')
+
+
+def test_failing_submission_does_not_fail_the_batch(monkeypatch):
+    saved: List[Dict[str, Any]] = []
+    broadcasts: List[Dict[str, Any]] = []
+
+    async def get_canvas_data(canvas_id: str) -> Dict[str, Any]:
+        return {'data': {'elements': [], 'files': {}}}
+
+    async def save_canvas_data(canvas_id: str, data: str) -> None:
+        saved.append(json.loads(data))
+
+    async def broadcast(session_id: str, canvas_id: str, event: Dict[str, Any]) -> None:
+        broadcasts.append(event)
+
+    monkeypatch.setattr(canvas_writer_module.db_service, 'get_canvas_data', get_canvas_data)
+    monkeypatch.setattr(canvas_writer_module.db_service, 'save_canvas_data', save_canvas_data)
+    monkeypatch.setattr(canvas_writer_module, 'broadcast_session_update', broadcast)
+
+    async def scenario():
+        service = CanvasWriterService()
+        event = {'type': 'image_generated'}
+        # Queued together so they land in the same batch
+        good = asyncio.ensure_future(service.submit('c1', [
+            CanvasMutation('s1', None, _builder('a'), event),
+        ]))
+        bad = asyncio.ensure_future(service.submit('c1', [
+            CanvasMutation('s1', None, _builder('b'), event),
+            CanvasMutation('s1', None, _broken_builder, event),
+        ]))
+        other = asyncio.ensure_future(service.submit('c1', [
+            CanvasMutation('s1', None, _builder('c'), event),
+        ]))
+        return await asyncio.gather(good, bad, other, return_exceptions=True)
+
+    good, bad, other = asyncio.run(scenario())
+
+    assert good == [{'id': 'a', 'type': 'image'}]
+    assert isinstance(bad, RuntimeError)
+    assert other == [{'id': 'c', 'type': 'image'}]
+    # The failed submission's first element is not saved
+    assert [e['id'] for e in saved[-1]['elements']] == ['a', 'c']
+    assert sum(len(b.get('events', [b])) for b in broadcasts) == 2
+
+
+def test_single_failing_submission_saves_nothing(monkeypatch):
+    saved: List[str] = []
+
+    async def get_canvas_data(canvas_id: str) -> Dict[str, Any]:
+        return {'data': {'elements': [], 'files': {}}}
+
+    async def save_canvas_data(canvas_id: str, data: str) -> None:
+        saved.append(data)
+
+    monkeypatch.setattr(canvas_writer_module.db_service, 'get_canvas_data', get_canvas_data)
+    monkeypatch.setattr(canvas_writer_module.db_service, 'save_canvas_data', save_canvas_data)
+
+    async def scenario():
+        service = CanvasWriterService()
+        await service.submit('c1', [
+            CanvasMutation('s1', None, _builder('a'), {'type': 'image_generated'}),
+            CanvasMutation('s1', None, _broken_builder, {'type': 'image_generated'}),
+        ])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+    assert saved == []
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from services.cluster_service import ClusterService, LockLostError
+from services.message_bus import InMemoryMessageBus
+
+
+class _SharedBus(InMemoryMessageBus):
+    """In-memory bus taking the distributed lock path"""
+
+    distributed = True
+
+
+def test_release_keeps_a_lock_taken_over_by_another_owner():
+    async def scenario():
+        bus = _SharedBus()
+        cluster = ClusterService(bus)
+        async with cluster.lock('canvas:1'):
+            # Another owner holds the key by the time we release
+            await bus.delete('cluster:lock:canvas:1')
+            await bus.set_if_absent('cluster:lock:canvas:1', 'other', 60000)
+        assert await bus.get('cluster:lock:canvas:1') == 'other'
+
+    asyncio.run(scenario())
+
+
+def test_lock_is_renewed_while_held():
+    async def scenario():
+        bus = _SharedBus()
+        cluster = ClusterService(bus)
+        async with cluster.lock('canvas:1', ttl_ms=90):
+            await asyncio.sleep(0.3)
+            assert (await bus.get('cluster:lock:canvas:1') or '').startswith(cluster.worker_id)
+        assert await bus.get('cluster:lock:canvas:1') is None
+
+    asyncio.run(scenario())
+
+
+def test_lost_lock_fails_the_critical_section():
+    async def scenario():
+        bus = _SharedBus()
+        cluster = ClusterService(bus)
+        with pytest.raises(LockLostError):
+            async with cluster.lock('canvas:1', ttl_ms=90):
+                await bus.delete('cluster:lock:canvas:1')
+                await bus.set_if_absent('cluster:lock:canvas:1', 'other', 60000)
+                await asyncio.sleep(1)
+        assert await bus.get('cluster:lock:canvas:1') == 'other'
+
+    asyncio.run(scenario())
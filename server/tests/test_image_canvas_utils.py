@@ -0,0 +1,21 @@
+import asyncio
+
+from services.asset_catalog_service import is_catalog_file
+from tools.utils import image_canvas_utils
+
+
+def test_previews_are_not_catalog_files():
+    assert not is_catalog_file('preview_abc.jpg')
+    assert not is_catalog_file('preview_abc.png')
+    assert is_catalog_file('im_abc.png')
+
+
+def test_clear_previews_removes_files_written_before_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_canvas_utils, 'FILES_DIR', str(tmp_path))
+    (tmp_path / 'preview_el1.jpg').write_bytes(b'jpeg')
+    (tmp_path / 'preview_el1.png').write_bytes(b'png')
+    assert 'el1' not in image_canvas_utils._previews
+
+    asyncio.run(image_canvas_utils._clear_previews(['el1', 'el2']))
+
+    assert list(tmp_path.iterdir()) == []
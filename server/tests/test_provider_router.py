@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from services.provider_health_service import HALF_OPEN, ProviderHealthService
+from tools.utils import provider_router
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+
+
+def _failing_call(error: Exception):
+    async def call(provider: str, model: str):
+        raise error
+    return call
+
+
+def test_only_transient_errors_count_against_the_breaker(monkeypatch):
+    health = ProviderHealthService()
+    monkeypatch.setattr(provider_router, 'provider_health_service', health)
+
+    with pytest.raises(_StatusError):
+        asyncio.run(provider_router._timed_call(('p', 'm'), _failing_call(_StatusError(400))))
+    assert list(health.breaker('p').results) == []
+
+    with pytest.raises(_StatusError):
+        asyncio.run(provider_router._timed_call(('p', 'm'), _failing_call(_StatusError(503))))
+    assert list(health.breaker('p').results) == [False]
+
+
+def test_non_transient_error_gives_back_the_half_open_probe(monkeypatch):
+    health = ProviderHealthService()
+    monkeypatch.setattr(provider_router, 'provider_health_service', health)
+    breaker = health.breaker('p')
+    breaker.state = HALF_OPEN
+    assert breaker.allow()
+
+    with pytest.raises(_StatusError):
+        asyncio.run(provider_router._timed_call(('p', 'm'), _failing_call(_StatusError(422))))
+    assert breaker.state == HALF_OPEN
+    assert not breaker.probe_in_flight
@@ -0,0 +1,77 @@
+import asyncio
+
+from services.rate_limit_service import RateLimitService
+
+
+def _service(max_in_flight: int) -> RateLimitService:
+    service = RateLimitService()
+    service._scheduler('test').gate.max_in_flight = max_in_flight
+    return service
+
+
+def test_holder_releases_while_waiter_is_cancelled():
+    async def run():
+        service = _service(1)
+        scheduler = service._scheduler('test')
+        queued = asyncio.Event()
+        tasks = {}
+
+        async def holder():
+            async with service.acquire('test', 'model', 'a'):
+                await queued.wait()
+                # Cancel the waiter in the same tick the slot frees
+                tasks['waiter'].cancel()
+
+        async def waiter():
+            async with service.acquire('test', 'model', 'b'):
+                pass
+
+        holder_task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        tasks['waiter'] = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert len(scheduler.waiters) == 1
+        queued.set()
+        await asyncio.gather(holder_task, tasks['waiter'], return_exceptions=True)
+
+        assert scheduler.gate.in_flight == 0
+        assert scheduler.model_gate('model').in_flight == 0
+        assert scheduler.waiters == []
+        # The provider is still usable
+        async with service.acquire('test', 'model', 'c'):
+            assert scheduler.gate.in_flight == 1
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+
+
+def test_waiter_cancelled_after_grant_releases_its_slot():
+    async def run():
+        service = _service(1)
+        scheduler = service._scheduler('test')
+        holding = asyncio.Event()
+        release = asyncio.Event()
+
+        async def holder():
+            async with service.acquire('test', 'model', 'a'):
+                holding.set()
+                await release.wait()
+
+        async def waiter():
+            async with service.acquire('test', 'model', 'b'):
+                await asyncio.sleep(10)
+
+        holder_task = asyncio.create_task(holder())
+        await holding.wait()
+        waiter_task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+
+        # The slot is granted to the waiter, then it is cancelled before it runs
+        release.set()
+        await holder_task
+        waiter_task.cancel()
+        await asyncio.gather(waiter_task, return_exceptions=True)
+
+        assert scheduler.gate.in_flight == 0
+        assert scheduler.model_gate('model').in_flight == 0
+
+    asyncio.run(asyncio.wait_for(run(), 5))
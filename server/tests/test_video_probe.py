@@ -0,0 +1,40 @@
+import struct
+
+import pytest
+
+from utils.video_probe import VideoProbeError, probe_video
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+FTYP = _box(b'ftyp', b'isom' + b'\0' * 4)
+MVHD = _box(b'mvhd', b'\0' * 12 + struct.pack('>II', 1000, 5000) + b'\0' * 80)
+TKHD = _box(b'tkhd', b'\0' * 40 + struct.pack('>9i', 65536, 0, 0, 0, 65536, 0, 0, 0, 1 << 30)
+            + struct.pack('>II', 640 << 16, 360 << 16))
+HDLR = _box(b'hdlr', b'\0' * 8 + b'vide' + b'\0' * 12)
+MOOV = _box(b'moov', MVHD + _box(b'trak', TKHD + _box(b'mdia', HDLR)))
+MDAT = _box(b'mdat', b'x' * 8)
+
+
+def test_probe_reads_video_track(tmp_path):
+    path = tmp_path / 'a.mp4'
+    path.write_bytes(FTYP + MOOV + MDAT)
+    info = probe_video(str(path))
+    assert (info['width'], info['height'], info['duration']) == (640, 360, 5.0)
+    assert info['faststart']
+
+
+def test_truncated_moov_raises(tmp_path):
+    path = tmp_path / 'partial.mp4'
+    path.write_bytes(FTYP + MDAT + MOOV[:60])
+    with pytest.raises(VideoProbeError):
+        probe_video(str(path))
+
+
+def test_moov_without_video_track_raises(tmp_path):
+    path = tmp_path / 'audio.mp4'
+    path.write_bytes(FTYP + _box(b'moov', MVHD) + MDAT)
+    with pytest.raises(VideoProbeError):
+        probe_video(str(path))
@@ -19,28 +19,35 @@ If `run_comfy_workflow` is not yet implemented it will still work
 
 from __future__ import annotations
 
-import json
+import asyncio
+import hashlib
 import os
-import random
 import time
 import traceback
-from io import BytesIO
-from typing import Annotated, Any, Dict, List, Optional
+from typing import Annotated, Any, Dict, List, Optional, Tuple
 from common import DEFAULT_PORT
 from utils.url_helper import get_base_url
 from .utils.image_canvas_utils import (
     generate_file_id,
-    generate_new_image_element,
+    reserve_placeholders,
+    discard_placeholders,
+    send_placeholder_preview,
+    save_images_to_canvas,
+    placeholder_size,
 )
+from fastapi.concurrency import run_in_threadpool
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import InjectedToolCallId, tool, BaseTool
 from pydantic import BaseModel, Field, create_model
 from routers.comfyui_execution import upload_image
-from services.config_service import FILES_DIR, config_service, IMAGE_FORMATS
-from services.db_service import db_service
-from services.websocket_service import broadcast_session_update, send_to_websocket
+from services.config_service import FILES_DIR, IMAGE_FORMATS
+from services.comfyui_client_service import comfyui_client_service
+from services.canvas_writer_service import canvas_writer_service, CanvasMutation
+from services.asset_catalog_service import asset_catalog_service
+from services.websocket_service import send_to_websocket
 
 from .utils.comfyui import ComfyUIWorkflowRunner
+from .utils.comfyui_template import ComfyWorkflowTemplate, compile_workflow
 from tools.video_generation.video_canvas_utils import generate_new_video_element
 
 
@@ -57,21 +64,13 @@ def _python_type(param_type: str, default: Any):
     return str
 
 
-def _build_input_schema(wf: Dict[str, Any]) -> type[BaseModel]:
+def _build_input_schema(template: ComfyWorkflowTemplate) -> type[BaseModel]:
     """
-    Build a Pydantic model named '<WorkflowName>Input' from workflow['inputs'].
-    The `inputs` column is stored in DB as JSON text -> parse first.
+    Build a Pydantic model named '<WorkflowName>Input' from the workflow's
+    compiled input definitions.
     """
-    try:
-        input_defs: List[Dict[str, Any]] = (
-            wf["inputs"] if isinstance(wf["inputs"], list) else json.loads(wf["inputs"])
-        )
-    except Exception:
-        # fall back to empty model if bad schema
-        input_defs = []
-
     fields: Dict[str, tuple] = {}
-    for param in input_defs:
+    for param in template.input_defs:
         name = param.get("name")
         if not name:
             continue
@@ -95,13 +94,28 @@ def _build_input_schema(wf: Dict[str, Any]) -> type[BaseModel]:
         Field(description="Tool call identifier"),
     )
 
-    model_name = f"{wf['name'].title().replace(' ', '')}InputSchema"
+    model_name = f"{template.name.title().replace(' ', '')}InputSchema"
     return create_model(model_name, __base__=BaseModel, **fields)
 
 
+def _read_images(image_files: Dict[str, str]) -> Dict[str, Tuple[str, bytes]]:
+    """Argument name -> (sha256 hex digest, content) of the given FILES_DIR images"""
+    images = {}
+    for key, filename in image_files.items():
+        with open(os.path.join(FILES_DIR, filename), "rb") as image_file:
+            data = image_file.read()
+        images[key] = (hashlib.sha256(data).hexdigest(), data)
+    return images
+
+
 def build_tool(wf: Dict[str, Any]) -> BaseTool:
-    """Return an @tool function for the given workflow record."""
-    input_schema = _build_input_schema(wf)
+    """
+    Return an @tool function for the given workflow record.
+
+    The workflow is compiled once here; each call instantiates the template.
+    """
+    template = compile_workflow(wf)
+    input_schema = _build_input_schema(template)
 
     @tool(
         wf["name"],
@@ -123,15 +137,12 @@ def build_tool(wf: Dict[str, Any]) -> BaseTool:
         print("🛠️canvas_id", canvas_id, "session_id", session_id)
         # Inject the tool call id into the context
         ctx["tool_call_id"] = tool_call_id
-        api_url = str(
-            config_service.app_config.get("comfyui", {}).get("url", "")
-        ).rstrip("/")
 
         # if there's image, upload it!
         # First, let's filter all values endswith .jpg .png etc
-
-        required_data = dict(kwargs)
-        for key, value in required_data.items():
+        # Images are uploaded to the server the job is dispatched to
+        image_files: Dict[str, str] = {}
+        for key, value in kwargs.items():
             if isinstance(value, str) and value.lower().endswith(IMAGE_FORMATS):
                 # Image!
                 # Extract filename from potential API path like "/api/file/filename.png"
@@ -144,153 +155,97 @@ def build_tool(wf: Dict[str, Any]) -> BaseTool:
                 image_path = os.path.join(FILES_DIR, filename)
                 if not os.path.exists(image_path):
                     continue
-                with open(image_path, "rb") as image_file:
-                    image_bytes = image_file.read()
-                image_stream = BytesIO(image_bytes)
-                image_name = await upload_image(image_stream, api_url, filename)
-                required_data[key] = image_name
-
-        workflow_dict = await db_service.get_comfy_workflow(wf["id"])
-
-        try:
-            input_defs: List[Dict[str, Any]] = (
-                wf["inputs"]
-                if isinstance(wf["inputs"], list)
-                else json.loads(wf["inputs"])
-            )
-        except Exception:
-            input_defs = []
-
-        for param in input_defs:
-            param_name = param.get("name")
-            node_id = param.get("node_id")
-            node_input_name = param.get("node_input_name")
-
-            if not (param_name and node_id and node_input_name):
-                continue
-
-            if param_name in required_data:
-                value = required_data[param_name]
-                if node_id in workflow_dict:
-                    node_inputs = workflow_dict[node_id].get("inputs", {})
-                    if node_input_name in node_inputs:
-                        node_inputs[node_input_name] = value
-
-        # Process seed if has seed
-        # 改为直接遍历节点输入检测seed字段，替代字符串匹配
-        seed_nodes = []
-        for node_id, node in workflow_dict.items():
-            if "seed" in node.get("inputs", {}):  # 直接检查节点输入是否有seed字段
-                seed_nodes.append(node_id)  # 收集所有含seed的节点，不移除break
-
-        if len(seed_nodes) > 0:  # 仅在存在种子节点时执行
-            for node_id in seed_nodes:
-                # 使用更大的随机范围（0到2^32-1更符合常见种子范围）
-                workflow_dict[node_id]["inputs"]["seed"] = random.randint(
-                    1, (1 << 32) - 1
-                )
-
-        try:
-            generator = ComfyUIWorkflowRunner(workflow_dict, api_url)
+                image_files[key] = filename
+
+        # Read and hash every image once; the hash lets a server skip
+        # uploads of content it already holds
+        images = await run_in_threadpool(_read_images, image_files)
+
+        # Reserve the canvas space now, ComfyUI preview frames are shown in it
+        placeholder_ids = await reserve_placeholders(
+            session_id, canvas_id, [placeholder_size("1:1")], template.name)
+
+        async def on_preview(image: bytes, mime_type: str) -> None:
+            await send_placeholder_preview(
+                session_id, canvas_id, placeholder_ids[0], image, mime_type)
+
+        async def run_on(api_url: str):
+            required_data = dict(kwargs)
+            keys = list(images)
+            remote_names = await asyncio.gather(*(
+                upload_image(images[key][1], api_url, image_files[key], digest=images[key][0])
+                for key in keys
+            ))
+            required_data.update(zip(keys, remote_names))
+
+            generator = ComfyUIWorkflowRunner(template.instantiate(required_data), api_url)
             extra_kwargs = {}
             extra_kwargs["ctx"] = ctx
+            if placeholder_ids:
+                extra_kwargs["on_preview"] = on_preview
+            return await generator.generate(**extra_kwargs)
 
-            outputs = await generator.generate(**extra_kwargs)
+        try:
+            affinity = list(template.affinity) + [
+                f"upload:{digest}" for digest, _ in images.values()
+            ]
+            outputs = await comfyui_client_service.dispatch(run_on, affinity)
             # if outputs is not a list of list, make it a list of list
             if not isinstance(outputs, list) or (
                 outputs and not isinstance(outputs[0], (list, tuple))
             ):
                 outputs = [outputs]
 
-            # update the canvas data, add the new image element
-            canvas_data = await db_service.get_canvas_data(canvas_id)
-            if "data" not in canvas_data:
-                canvas_data["data"] = {}
-            if "elements" not in canvas_data["data"]:
-                canvas_data["data"]["elements"] = []
-            if "files" not in canvas_data["data"]:
-                canvas_data["data"]["files"] = {}
+            # Images go into the placeholder (and a grid next to it),
+            # videos are inserted in one writer batch
+            image_outputs = [o for o in outputs if o[0].startswith("image")]
+            await save_images_to_canvas(
+                session_id, canvas_id, image_outputs, placeholder_ids, provider="comfyui")
 
             generated_files_info = []
+            mutations: List[CanvasMutation] = []
 
             for output in outputs:
                 mime_type, width, height, filename = output
-                file_id = generate_file_id()
-
-                url = f"/api/file/{filename}"
+                base_url = get_base_url()
+                image_url = f"{base_url}/api/file/{filename}"
+                generated_files_info.append({"url": image_url, "filename": filename})
+                if mime_type.startswith("image"):
+                    continue
 
+                file_id = generate_file_id()
                 file_data = {
                     "mimeType": mime_type,
                     "id": file_id,
-                    "dataURL": url,
+                    "dataURL": f"/api/file/{filename}",
                     "created": int(time.time() * 1000),
                 }
 
-                # Pass the current canvas_data to the element generation function
-                if mime_type.startswith("image"):
-                    new_element = await generate_new_image_element(
-                        canvas_id,
-                        file_id,
-                        {
-                            "width": width,
-                            "height": height,
-                        },
-                        canvas_data=canvas_data.get("data", {}),
-                    )
-                else:
-                    new_element = await generate_new_video_element(
+                async def build_element(
+                    canvas_data: Dict[str, Any],
+                    file_id: str = file_id,
+                    width: int = width,
+                    height: int = height,
+                ) -> Dict[str, Any]:
+                    return await generate_new_video_element(
                         canvas_id,
                         file_id,
                         {
                             "width": width,
                             "height": height,
                         },
-                        canvas_data=canvas_data.get("data", {}),
+                        canvas_data=canvas_data,
                     )
 
-                canvas_data["data"]["elements"].append(new_element)
-                canvas_data["data"]["files"][file_id] = file_data
-
-                base_url = get_base_url()
-                image_url = f"{base_url}/api/file/{filename}"
-
-                generated_files_info.append(
-                    {
-                        "element": new_element,
-                        "file": file_data,
-                        "url": image_url,
-                        "mime_type": mime_type,
-                        "filename": filename,
-                    }
-                )
-
-            await db_service.save_canvas_data(
-                canvas_id, json.dumps(canvas_data["data"])
-            )
+                mutations.append(CanvasMutation(
+                    session_id, file_data, build_element,
+                    {"type": "video_generated", "video_url": image_url}))
 
-            for file_info in generated_files_info:
-                if file_info["mime_type"].startswith("image"):
-                    await broadcast_session_update(
-                        session_id,
-                        canvas_id,
-                        {
-                            "type": "image_generated",
-                            "element": file_info["element"],
-                            "file": file_info["file"],
-                            "image_url": file_info["url"],
-                        },
-                    )
-                else:
-                    await broadcast_session_update(
-                        session_id,
-                        canvas_id,
-                        {
-                            "type": "video_generated",
-                            "element": file_info["element"],
-                            "file": file_info["file"],
-                            "video_url": file_info["url"],
-                        },
-                    )
+            if mutations:
+                await canvas_writer_service.submit(canvas_id, mutations)
+                await asset_catalog_service.record_many(
+                    [o[3] for o in outputs if not o[0].startswith("image")],
+                    session_id, canvas_id, provider="comfyui")
 
             # Create a markdown string for all the generated files
             markdown_images = []
@@ -301,7 +256,11 @@ def build_tool(wf: Dict[str, Any]) -> BaseTool:
 
             return f"workflow executed successfully {', '.join(markdown_images)}"
 
+        except asyncio.CancelledError:
+            await discard_placeholders(session_id, canvas_id, placeholder_ids)
+            raise
         except Exception as e:
+            await discard_placeholders(session_id, canvas_id, placeholder_ids)
             print(f"Error generating image: {str(e)}")
             traceback.print_exc()
             await send_to_websocket(session_id, {"type": "error", "error": str(e)})
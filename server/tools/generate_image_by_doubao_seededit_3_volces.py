@@ -12,6 +12,10 @@ class EditImageByDoubaoSeedream3InputSchema(BaseModel):
     image: list[str] = Field(
         description="Required. The image for image generation. Pass a list of image_id here (Only 1 image supported. If you want to generate multiple images. Call another), e.g. ['im_hfuiut78.png']. Best for image editing cases like: Editing specific parts of the image, Removing specific objects, Maintaining visual elements across scenes (character/object consistency), Generating new content in the style of the reference (style transfer), etc."
     )
+    num_images: int = Field(
+        default=1, ge=1, le=4,
+        description="Optional; Number of variations to generate in this call, 1 to 4. Use it instead of calling the tool several times when the user asks for multiple images or variations."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -25,6 +29,7 @@ async def edit_image_by_doubao_seededit_3_volces(
     image: list[str],
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
 ) -> str:
     """
     Generate an image using Doubao Seedream 3 model via the provider framework
@@ -39,6 +44,7 @@ async def edit_image_by_doubao_seededit_3_volces(
         provider="volces",
         model="doubao-seededit-3-0-i2i-250628",
         prompt=prompt,
+        num_images=num_images,
         input_images=image,
     )
 
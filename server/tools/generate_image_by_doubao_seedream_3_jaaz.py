@@ -12,6 +12,10 @@ class GenerateImageByDoubaoSeedream3InputSchema(BaseModel):
     aspect_ratio: str = Field(
         description="Required. Aspect ratio of the image, only these values are allowed: 1:1, 16:9, 4:3, 3:4, 9:16. Choose the best fitting aspect ratio according to the prompt. Best ratio for posters is 3:4"
     )
+    num_images: int = Field(
+        default=1, ge=1, le=4,
+        description="Optional; Number of variations to generate in this call, 1 to 4. Use it instead of calling the tool several times when the user asks for multiple images or variations."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -23,6 +27,7 @@ async def generate_image_by_doubao_seedream_3_jaaz(
     aspect_ratio: str,
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
 ) -> str:
     """
     Generate an image using Doubao Seedream 3 model via the provider framework
@@ -37,6 +42,7 @@ async def generate_image_by_doubao_seedream_3_jaaz(
         provider='jaaz',
         model="doubao/doubao-seedream-3-0-t2i-250415",
         prompt=prompt,
+        num_images=num_images,
         aspect_ratio=aspect_ratio,
         input_images=None,
     )
@@ -12,6 +12,10 @@ class GenerateImageByFlux11ProInputSchema(BaseModel):
     aspect_ratio: str = Field(
         description="Required. Aspect ratio of the image, only these values are allowed: 1:1, 16:9, 4:3, 3:4, 9:16. Choose the best fitting aspect ratio according to the prompt. Best ratio for posters is 3:4"
     )
+    num_images: int = Field(
+        default=1, ge=1, le=4,
+        description="Optional; Number of variations to generate in this call, 1 to 4. Use it instead of calling the tool several times when the user asks for multiple images or variations."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -23,6 +27,7 @@ async def generate_image_by_flux_1_1_pro(
     aspect_ratio: str,
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
 ) -> str:
     """
     Generate an image using Flux 1.1 Pro model via the provider framework
@@ -36,6 +41,7 @@ async def generate_image_by_flux_1_1_pro(
         session_id=session_id,
         provider='jaaz',
         prompt=prompt,
+        num_images=num_images,
         aspect_ratio=aspect_ratio,
         model="black-forest-labs/flux-1.1-pro",
         input_images=None,
@@ -14,6 +14,7 @@ async def generate_image_by_flux_kontext_max_replicate(
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
     input_image: str | None = None,
+    num_images: int = 1,
 ) -> str:
     """
     Generate an image using Flux Kontext Max model via the Replicate provider framework
@@ -28,6 +29,7 @@ async def generate_image_by_flux_kontext_max_replicate(
         provider='replicate',
         model="black-forest-labs/flux-kontext-max",
         prompt=prompt,
+        num_images=num_images,
         aspect_ratio=aspect_ratio,
         input_images=[input_image] if input_image else None,
     )
@@ -13,6 +13,7 @@ async def generate_image_by_recraft_v3_replicate(
     aspect_ratio: str,
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
 ) -> str:
     """
     Generate an image using Recraft V3 model via the Replicate provider framework
@@ -26,6 +27,7 @@ async def generate_image_by_recraft_v3_replicate(
         provider='replicate',
         model="recraft-ai/recraft-v3",
         prompt=prompt,
+        num_images=num_images,
         aspect_ratio=aspect_ratio,
         input_images=None,
     )
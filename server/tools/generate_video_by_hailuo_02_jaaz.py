@@ -2,8 +2,7 @@ from typing import Annotated
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
-from services.jaaz_service import JaazService
-from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result
+from tools.video_generation.video_generation_core import generate_video_with_jaaz
 from .utils.image_utils import process_input_image
 
 
@@ -55,12 +54,6 @@ async def generate_video_by_hailuo_02_jaaz(
     ctx['tool_call_id'] = tool_call_id
 
     try:
-        # Send start notification
-        await send_video_start_notification(
-            session_id,
-            f"Starting Hailuo video generation..."
-        )
-
         # Process input images if provided (only use the first one)
         processed_input_images = None
         if input_images and len(input_images) > 0:
@@ -74,29 +67,20 @@ async def generate_video_by_hailuo_02_jaaz(
                 raise ValueError(
                     f"Failed to process input image: {first_image}. Please check if the image exists and is valid.")
 
-        # Create Jaaz service and generate video
-        jaaz_service = JaazService()
-        result = await jaaz_service.generate_video(
+        # Generate video via Jaaz service (runs as a generation job)
+        return await generate_video_with_jaaz(
+            session_id=session_id,
+            canvas_id=canvas_id,
             prompt=prompt,
             model="hailuo-02",
+            label="Hailuo",
+            provider_name="jaaz_hailuo",
+            input_images=processed_input_images,
             resolution=resolution,
             duration=duration,
-            input_images=processed_input_images,
             prompt_enhancer=prompt_enhancer,
         )
 
-        video_url = result.get('result_url')
-        if not video_url:
-            raise Exception("No video URL returned from generation")
-
-        # Process video result (save, update canvas, notify)
-        return await process_video_result(
-            video_url=video_url,
-            session_id=session_id,
-            canvas_id=canvas_id,
-            provider_name="jaaz_hailuo",
-        )
-
     except Exception as e:
         print(f"Error in Hailuo video generation: {e}")
         raise e
@@ -2,8 +2,7 @@ from typing import Annotated
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
-from services.jaaz_service import JaazService
-from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result
+from tools.video_generation.video_generation_core import generate_video_with_jaaz
 from .utils.image_utils import process_input_image
 
 
@@ -64,12 +63,6 @@ async def generate_video_by_kling_v2_jaaz(
             raise ValueError(
                 "input_images is required and cannot be empty. Please provide at least one image.")
 
-        # Send start notification
-        await send_video_start_notification(
-            session_id,
-            f"Starting Kling video generation..."
-        )
-
         # Process input images (use first image as start_image)
         first_image = input_images[0]
         processed_image = await process_input_image(first_image)
@@ -80,30 +73,21 @@ async def generate_video_by_kling_v2_jaaz(
         print(
             f"Using first input image as start image for Kling video generation: {first_image}")
 
-        # Create Jaaz service and generate video
-        jaaz_service = JaazService()
-        result = await jaaz_service.generate_video(
+        # Generate video via Jaaz service (runs as a generation job)
+        return await generate_video_with_jaaz(
+            session_id=session_id,
+            canvas_id=canvas_id,
             prompt=prompt,
             model="kling-v2.1-standard",
+            label="Kling",
+            provider_name="jaaz_kling",
+            input_images=[processed_image],
             duration=duration,
             aspect_ratio=aspect_ratio,
-            input_images=[processed_image],
             negative_prompt=negative_prompt,
             guidance_scale=guidance_scale,
         )
 
-        video_url = result.get('result_url')
-        if not video_url:
-            raise Exception("No video URL returned from generation")
-
-        # Process video result (save, update canvas, notify)
-        return await process_video_result(
-            video_url=video_url,
-            session_id=session_id,
-            canvas_id=canvas_id,
-            provider_name="jaaz_kling",
-        )
-
     except Exception as e:
         print(f"Error in Kling video generation: {e}")
         raise e
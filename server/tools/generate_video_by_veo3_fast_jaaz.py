@@ -2,8 +2,7 @@ from typing import Annotated
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
-from services.jaaz_service import JaazService
-from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result
+from tools.video_generation.video_generation_core import generate_video_with_jaaz
 from services.tool_confirmation_manager import tool_confirmation_manager
 from services.websocket_service import send_to_websocket
 import json
@@ -57,28 +56,13 @@ async def generate_video_by_veo3_fast_jaaz(
     ctx['tool_call_id'] = tool_call_id
 
     try:
-        # Send start notification
-        await send_video_start_notification(
-            session_id,
-            f"Starting Veo3 Fast video generation..."
-        )
-
-        # Create Jaaz service and generate video
-        jaaz_service = JaazService()
-        result = await jaaz_service.generate_video(
-            prompt=prompt,
-            model="veo3-fast",
-        )
-
-        video_url = result.get('result_url')
-        if not video_url:
-            raise Exception("No video URL returned from generation")
-
-        # Process video result (save, update canvas, notify)
-        return await process_video_result(
-            video_url=video_url,
+        # Generate video via Jaaz service (runs as a generation job)
+        return await generate_video_with_jaaz(
             session_id=session_id,
             canvas_id=canvas_id,
+            prompt=prompt,
+            model="veo3-fast",
+            label="Veo3 Fast",
             provider_name="jaaz_veo3_fast",
         )
 
@@ -0,0 +1,135 @@
+"""
+Record/replay wrapper around the image providers
+
+Installed over every IMAGE_PROVIDERS entry when CASSETTE_MODE is set, see
+services/cassette_service.py.
+"""
+
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from services.cassette_service import CassetteReplayError, Recorder, cassette_service
+from services.config_service import FILES_DIR
+from utils.cassette import decode_body, encode_body, request_key
+from ..utils.image_utils import generate_image_id
+from .image_base_provider import ImageProviderBase, ImageResult
+
+
+def _events(recorder: Recorder, exchanges: List[Dict[str, Any]]) -> List[List[Any]]:
+    """Recorded events with the HTTP exchanges, in time order"""
+    return sorted(cassette_service.http_events(recorder, exchanges) + recorder.events, key=lambda event: event[0])
+
+
+def _read_files(filenames: List[str]) -> Dict[str, Any]:
+    files: Dict[str, Any] = {}
+    for filename in filenames:
+        with open(os.path.join(FILES_DIR, filename), 'rb') as f:
+            # Generated images are stored whole, whatever CASSETTE_MAX_BODY
+            files[filename] = encode_body(f.read(), 'image/*', sys.maxsize)
+    return files
+
+
+def _write_copies(images: List[List[Any]], files: Dict[str, Any]) -> List[ImageResult]:
+    results: List[ImageResult] = []
+    for mime_type, width, height, filename in images:
+        data = decode_body(files.get(filename))
+        if data is None:
+            raise CassetteReplayError(f'cassette has no data for {filename}')
+        copy_name = generate_image_id() + os.path.splitext(filename)[1]
+        with open(os.path.join(FILES_DIR, copy_name), 'wb') as f:
+            f.write(data)
+        results.append((mime_type, width, height, copy_name))
+    return results
+
+
+class CassetteImageProvider(ImageProviderBase):
+    """Records the calls of the wrapped provider, or replays recorded ones"""
+
+    def __init__(self, name: str, provider: ImageProviderBase) -> None:
+        self.name = name
+        self.provider = provider
+
+    def max_images_per_call(self, model: str) -> int:
+        return self.provider.max_images_per_call(model)
+
+    async def generate(
+        self,
+        prompt: str,
+        model: str,
+        aspect_ratio: str = "1:1",
+        input_images: Optional[list[str]] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> ImageResult:
+        images = await self.generate_images(
+            prompt, model, 1, aspect_ratio, input_images, metadata, **kwargs)
+        return images[0]
+
+    async def generate_images(
+        self,
+        prompt: str,
+        model: str,
+        num_images: int = 1,
+        aspect_ratio: str = "1:1",
+        input_images: Optional[list[str]] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> list[ImageResult]:
+        # Looked up by request shape: replays must not depend on the prompt text
+        prefix = f"image-{self.name}-{request_key(model, aspect_ratio, num_images)}-"
+        if cassette_service.replaying:
+            cassette = await cassette_service.next_cassette(prefix)
+            if cassette is not None:
+                return await self._replay(cassette[1])
+            print(f"📼 No cassette {prefix}* for {self.name} {model}, calling the provider")
+        if not cassette_service.recording:
+            return await self.provider.generate_images(
+                prompt, model, num_images, aspect_ratio, input_images, metadata, **kwargs)
+
+        header = {
+            'kind': 'image',
+            'key': prefix.rstrip('-'),
+            'inputs': {
+                'provider': self.name,
+                'model': model,
+                'prompt': prompt,
+                'num_images': num_images,
+                'aspect_ratio': aspect_ratio,
+                'input_images': len(input_images or []),
+            },
+        }
+        recorder = Recorder()
+        with cassette_service.capture_http() as exchanges:
+            try:
+                images = await self.provider.generate_images(
+                    prompt, model, num_images, aspect_ratio, input_images, metadata, **kwargs)
+            except Exception as e:
+                recorder.add('error', f"{type(e).__name__}: {e}")
+                events = _events(recorder, exchanges)
+                await cassette_service.save(cassette_service.new_name(prefix), header, events)
+                raise
+        finished = time.monotonic()
+
+        try:
+            files = await run_in_threadpool(_read_files, [image[3] for image in images])
+        except OSError as e:
+            print(f"⚠️ Not recording {self.name} {model} call, cannot read its images: {e}")
+            return images
+        recorder.add('result', {'images': [list(image) for image in images], 'files': files}, at=finished)
+        events = _events(recorder, exchanges)
+        await cassette_service.save(cassette_service.new_name(prefix), header, events)
+        return images
+
+    async def _replay(self, events: List[List[Any]]) -> list[ImageResult]:
+        started = time.monotonic()
+        outcome = next((event for event in events if event[1] in ('result', 'error')), None)
+        if outcome is None:
+            raise CassetteReplayError(f'{self.name} cassette has no result')
+        offset, event_type, data = outcome
+        # The provider's HTTP exchanges are not re-sent, only their duration is kept
+        await cassette_service.pace(started, offset)
+        if event_type == 'error':
+            raise CassetteReplayError(data)
+        return await run_in_threadpool(_write_copies, data['images'], data['files'])
@@ -8,7 +8,8 @@ from typing import Optional, Any
 from pydantic import BaseModel
 from .image_base_provider import ImageProviderBase
 from ..utils.image_utils import get_image_info_and_save, generate_image_id
-from services.config_service import FILES_DIR, config_service
+from services.config_service import FILES_DIR
+from services.comfyui_client_service import comfyui_client_service, workflow_affinity
 from routers.comfyui_execution import execute
 
 
@@ -122,28 +123,28 @@ class ComfyUIProvider(ImageProviderBase, provider_name="comfyui"):
             # Get context from kwargs
             ctx = kwargs.get("ctx", {})
 
-            api_url = str(
-                config_service.app_config.get("comfyui", {}).get("url", "")
-            ).rstrip("/")
-
             # Calculate dimensions
             width, height = self._calculate_dimensions(aspect_ratio, model)
 
             # Build workflow
             workflow = self._build_workflow(prompt, model, width, height)
 
-            # Execute workflow
-            execution = await execute(workflow, api_url, ctx=ctx)
-            print("🦄image execution outputs", execution.outputs)
-            url = execution.outputs[0]
-
-            # Save the image
-            image_id = generate_image_id()
-            mime_type, width, height, extension = await get_image_info_and_save(
-                url, os.path.join(FILES_DIR, f"{image_id}")
-            )
-            filename = f"{image_id}.{extension}"
-            return mime_type, width, height, filename
+            async def run_on(api_url: str) -> tuple[str, int, int, str]:
+                # Execute workflow
+                execution = await execute(workflow, api_url, ctx=ctx)
+                print("🦄image execution outputs", execution.outputs)
+                url = execution.outputs[0]
+
+                # Save the image
+                image_id = generate_image_id()
+                mime_type, width, height, extension = await get_image_info_and_save(
+                    url, os.path.join(FILES_DIR, f"{image_id}")
+                )
+                filename = f"{image_id}.{extension}"
+                return mime_type, width, height, filename
+
+            # Runs on the least loaded ComfyUI server
+            return await comfyui_client_service.dispatch(run_on, workflow_affinity(workflow))
 
         except Exception as e:
             print('Error generating image with ComfyUI:', e)
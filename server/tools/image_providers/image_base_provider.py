@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 from typing import Optional, Any, Tuple
 
+# (mime_type, width, height, filename)
+ImageResult = Tuple[str, int, int, str]
+
 
 class ImageProviderBase(ABC):
     @abstractmethod
@@ -27,4 +30,36 @@ class ImageProviderBase(ABC):
         Returns:
             Tuple[str, int, int, str]: (mime_type, width, height, filename)
         """
-        pass
\ No newline at end of file
+        pass
+
+    def max_images_per_call(self, model: str) -> int:
+        """Number of images one generate_images() request can return for the model"""
+        return 1
+
+    async def generate_images(
+        self,
+        prompt: str,
+        model: str,
+        num_images: int = 1,
+        aspect_ratio: str = "1:1",
+        input_images: Optional[list[str]] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> list[ImageResult]:
+        """
+        Generate up to max_images_per_call(model) images with one provider request
+
+        Providers whose API returns several images per request override this
+        together with max_images_per_call(); callers fan out for the rest.
+
+        Returns:
+            list[ImageResult]: (mime_type, width, height, filename) per image
+        """
+        return [await self.generate(
+            prompt=prompt,
+            model=model,
+            aspect_ratio=aspect_ratio,
+            input_images=input_images,
+            metadata=metadata,
+            **kwargs
+        )]
@@ -4,7 +4,7 @@ import asyncio
 from typing import Optional, List, Any, Dict
 from pydantic import BaseModel
 from openai.types import Image
-from .image_base_provider import ImageProviderBase
+from .image_base_provider import ImageProviderBase, ImageResult
 from ..utils.image_utils import get_image_info_and_save, generate_image_id
 from services.config_service import FILES_DIR
 from utils.http_client import HttpClient
@@ -210,35 +210,40 @@ class JaazImageProvider(ImageProviderBase):
 
                 return JaazImagesResponse(**json_data)
 
+    async def _save_image(self, image_url: str, metadata: Optional[Dict[str, Any]] = None) -> ImageResult:
+        image_id = generate_image_id()
+        mime_type, width, height, extension = await get_image_info_and_save(
+            image_url,
+            os.path.join(FILES_DIR, f'{image_id}'),
+            metadata=metadata
+        )
+
+        filename = f'{image_id}.{extension}'
+        return mime_type, width, height, filename
+
     async def _process_response(
         self,
         res: JaazImagesResponse,
         error_prefix: str = "Jaaz",
         metadata: Optional[Dict[str, Any]] = None
-    ) -> tuple[str, int, int, str]:
+    ) -> list[ImageResult]:
         """
-        Process ImagesResponse and save image
+        Process ImagesResponse and save its images in parallel
 
         Args:
             res: OpenAI ImagesResponse object
             error_prefix: Error message prefix
 
         Returns:
-            tuple[str, int, int, str]: (mime_type, width, height, filename)
+            list[ImageResult]: (mime_type, width, height, filename) per image
         """
-        if res.data and len(res.data) > 0:
-            image_data = res.data[0]
-            if hasattr(image_data, 'url') and image_data.url:
-                image_url = image_data.url
-                image_id = generate_image_id()
-                mime_type, width, height, extension = await get_image_info_and_save(
-                    image_url,
-                    os.path.join(FILES_DIR, f'{image_id}'),
-                    metadata=metadata
-                )
-
-                filename = f'{image_id}.{extension}'
-                return mime_type, width, height, filename
+        image_urls = [
+            image_data.url for image_data in res.data or []
+            if hasattr(image_data, 'url') and image_data.url
+        ]
+        if image_urls:
+            return list(await asyncio.gather(
+                *(self._save_image(image_url, metadata) for image_url in image_urls)))
 
         # If no valid image data found
         raise Exception(
@@ -262,7 +267,7 @@ class JaazImageProvider(ImageProviderBase):
         """
         # Check if it's an OpenAI model
         if model.startswith('openai/'):
-            return await self._generate_openai_image(
+            images = await self._generate_openai_image(
                 prompt=prompt,
                 model=model,
                 input_images=input_images,
@@ -270,6 +275,7 @@ class JaazImageProvider(ImageProviderBase):
                 metadata=metadata,
                 **kwargs
             )
+            return images[0]
 
         # Replicate compatible logic
         return await self._generate_replicate_image(
@@ -281,6 +287,41 @@ class JaazImageProvider(ImageProviderBase):
             **kwargs
         )
 
+    def max_images_per_call(self, model: str) -> int:
+        # OpenAI format models take `n`, Replicate format ones return one image
+        return 10 if model.startswith('openai/') else 1
+
+    async def generate_images(
+        self,
+        prompt: str,
+        model: str,
+        num_images: int = 1,
+        aspect_ratio: str = "1:1",
+        input_images: Optional[list[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> list[ImageResult]:
+        """Generate several images in one request for OpenAI format models"""
+        if model.startswith('openai/'):
+            return await self._generate_openai_image(
+                prompt=prompt,
+                model=model,
+                input_images=input_images,
+                aspect_ratio=aspect_ratio,
+                metadata=metadata,
+                num_images=num_images,
+                **kwargs
+            )
+        return await super().generate_images(
+            prompt=prompt,
+            model=model,
+            num_images=num_images,
+            aspect_ratio=aspect_ratio,
+            input_images=input_images,
+            metadata=metadata,
+            **kwargs
+        )
+
     async def _generate_replicate_image(
         self,
         prompt: str,
@@ -311,7 +352,8 @@ class JaazImageProvider(ImageProviderBase):
                         "Warning: Replicate format only supports single image input. Using first image.")
 
             res = await self._make_request(url, headers, data)
-            return await self._process_response(res, "Jaaz", metadata)
+            images = await self._process_response(res, "Jaaz", metadata)
+            return images[0]
 
         except Exception as e:
             print(f'Error generating image with Jaaz: {e}')
@@ -339,14 +381,15 @@ class JaazImageProvider(ImageProviderBase):
         input_images: Optional[list[str]] = None,
         aspect_ratio: str = "1:1",
         metadata: Optional[Dict[str, Any]] = None,
+        num_images: int = 1,
         **kwargs: Any
-    ) -> tuple[str, int, int, str]:
+    ) -> list[ImageResult]:
         """
-        Generate image using Jaaz API service calling OpenAI model
+        Generate images using Jaaz API service calling OpenAI model
         Compatible with OpenAI image generation API
 
         Returns:
-            tuple[str, int, int, str]: (mime_type, width, height, filename)
+            list[ImageResult]: (mime_type, width, height, filename) per image
         """
         try:
             url = self._build_url()
@@ -358,7 +401,7 @@ class JaazImageProvider(ImageProviderBase):
             data = {
                 "model": model,
                 "prompt": enhanced_prompt,
-                "n": kwargs.get("num_images", 1),
+                "n": num_images,
                 "size": 'auto',
                 "mask": None,  # Add mask here if needed
             }
@@ -383,7 +426,7 @@ class JaazImageProvider(ImageProviderBase):
                 task = await self._wait_for_task_completion(enhanced_prompt)
                 if task:
                     print('🦄 Successfully recovered using cloud task')
-                    return await self._process_cloud_task_result(task, metadata)
+                    return [await self._process_cloud_task_result(task, metadata)]
                 else:
                     print('🦄 No cloud task available for recovery')
             except Exception as fallback_error:
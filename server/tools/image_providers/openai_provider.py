@@ -1,8 +1,9 @@
 import os
+import asyncio
 import traceback
 from typing import Optional, Any
 from openai import OpenAI
-from .image_base_provider import ImageProviderBase
+from .image_base_provider import ImageProviderBase, ImageResult
 from ..utils.image_utils import get_image_info_and_save, generate_image_id
 from services.config_service import FILES_DIR
 from services.config_service import config_service
@@ -11,6 +12,12 @@ from services.config_service import config_service
 class OpenAIImageProvider(ImageProviderBase):
     """OpenAI image generation provider implementation"""
 
+    # Upper bound of `n` for the OpenAI images API
+    MAX_IMAGES_PER_CALL = 10
+
+    def max_images_per_call(self, model: str) -> int:
+        return self.MAX_IMAGES_PER_CALL
+
     async def generate(
         self,
         prompt: str,
@@ -25,6 +32,54 @@ class OpenAIImageProvider(ImageProviderBase):
         Returns:
             tuple[str, int, int, str]: (mime_type, width, height, filename)
         """
+        kwargs.pop("num_images", None)
+        images = await self.generate_images(
+            prompt=prompt,
+            model=model,
+            num_images=1,
+            aspect_ratio=aspect_ratio,
+            input_images=input_images,
+            **kwargs
+        )
+        return images[0]
+
+    async def _save_image(self, image_data: Any) -> ImageResult:
+        # Handle different response formats
+        image_id = generate_image_id()
+        if hasattr(image_data, 'b64_json') and image_data.b64_json:
+            # Base64 response
+            mime_type, width, height, extension = await get_image_info_and_save(
+                image_data.b64_json, os.path.join(FILES_DIR, f'{image_id}'), is_b64=True
+            )
+        elif hasattr(image_data, 'url') and image_data.url:
+            # URL response
+            mime_type, width, height, extension = await get_image_info_and_save(
+                image_data.url, os.path.join(FILES_DIR, f'{image_id}')
+            )
+        else:
+            raise Exception("Invalid response format from OpenAI API")
+
+        # Ensure mime_type is not None
+        if mime_type is None:
+            raise Exception('Failed to determine image MIME type')
+
+        return mime_type, width, height, f'{image_id}.{extension}'
+
+    async def generate_images(
+        self,
+        prompt: str,
+        model: str,
+        num_images: int = 1,
+        aspect_ratio: str = "1:1",
+        input_images: Optional[list[str]] = None,
+        **kwargs: Any
+    ) -> list[ImageResult]:
+        """
+        Generate `num_images` images with one OpenAI API request (`n`)
+
+        Returns:
+            list[ImageResult]: (mime_type, width, height, filename) per image
+        """
 
         config = config_service.app_config.get('openai', {})
         self.api_key = str(config.get("api_key", ""))
@@ -52,7 +107,7 @@ class OpenAIImageProvider(ImageProviderBase):
                         model=model,
                         image=image_file,
                         prompt=prompt,
-                        n=kwargs.get("num_images", 1)
+                        n=num_images
                     )
             else:
                 # Image generation mode
@@ -69,7 +124,7 @@ class OpenAIImageProvider(ImageProviderBase):
                 result = self.client.images.generate(
                     model=model,
                     prompt=prompt,
-                    n=kwargs.get("num_images", 1),
+                    n=num_images,
                     size=size,
                 )
 
@@ -77,32 +132,9 @@ class OpenAIImageProvider(ImageProviderBase):
             if not result.data or len(result.data) == 0:
                 raise Exception("No image data returned from OpenAI API")
 
-            image_data = result.data[0]
-
-            # Handle different response formats
-            if hasattr(image_data, 'b64_json') and image_data.b64_json:
-                # Base64 response
-                image_b64 = image_data.b64_json
-                image_id = generate_image_id()
-                mime_type, width, height, extension = await get_image_info_and_save(
-                    image_b64, os.path.join(FILES_DIR, f'{image_id}'), is_b64=True
-                )
-            elif hasattr(image_data, 'url') and image_data.url:
-                # URL response
-                image_url = image_data.url
-                image_id = generate_image_id()
-                mime_type, width, height, extension = await get_image_info_and_save(
-                    image_url, os.path.join(FILES_DIR, f'{image_id}')
-                )
-            else:
-                raise Exception("Invalid response format from OpenAI API")
-
-            # Ensure mime_type is not None
-            if mime_type is None:
-                raise Exception('Failed to determine image MIME type')
-
-            filename = f'{image_id}.{extension}'
-            return mime_type, width, height, filename
+            # Decode and save all returned images in parallel
+            return list(await asyncio.gather(
+                *(self._save_image(image_data) for image_data in result.data)))
 
         except Exception as e:
             print('Error generating image with OpenAI:', e)
@@ -3,7 +3,7 @@ import traceback
 from typing import Optional, Any
 from .image_base_provider import ImageProviderBase
 from ..utils.image_utils import get_image_info_and_save, generate_image_id
-from services.config_service import FILES_DIR
+from services.config_service import FILES_DIR, PROVIDER_API_URLS
 from utils.http_client import HttpClient
 from services.config_service import config_service
 
@@ -13,7 +13,9 @@ class ReplicateImageProvider(ImageProviderBase):
 
     def _build_url(self, model: str) -> str:
         """Build request URL for Replicate API"""
-        return f"https://api.replicate.com/v1/models/{model}/predictions"
+        config = config_service.app_config.get('replicate', {})
+        api_url = str(config.get("url") or PROVIDER_API_URLS['replicate']).rstrip('/')
+        return f"{api_url}/models/{model}/predictions"
 
     def _build_headers(self) -> dict[str, str]:
         """Build request headers"""
@@ -1,4 +1,5 @@
 from typing import Optional
+import asyncio
 import os
 import random
 import json
@@ -6,42 +7,107 @@ import sys
 import copy
 import traceback
 from utils.http_client import HttpClient
-from .image_utils import get_image_info_and_save, generate_image_id
+import aiofiles
+from fastapi.concurrency import run_in_threadpool
+from .image_utils import get_image_info_and_save, generate_image_id, save_image_data
 from services.config_service import (
-    config_service,
     FILES_DIR,
     IMAGE_FORMATS,
     VIDEO_FORMATS,
 )
 from routers.comfyui_execution import execute
-from tools.video_generation.video_canvas_utils import get_video_info_and_save
+from services.comfyui_client_service import comfyui_client_service, workflow_affinity
+from tools.video_generation.video_canvas_utils import prepare_video
 
 
-async def detect_file_type_comprehensive(url):
-    """综合判断文件类型"""
-    try:
-        # 首先尝试通过HTTP头部判断
-        async with HttpClient.create() as client:
-            response = await client.head(url)
-            content_type = response.headers.get("content-type", "").lower()
+# Outputs of one workflow downloaded at the same time
+OUTPUT_FETCH_CONCURRENCY = 8
+# Bytes needed to recognize a file by its signature
+SNIFF_SIZE = 32
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# ISO base media brands (ftyp box) that are still images
+IMAGE_FTYP_BRANDS = (b"avif", b"avis", b"heic", b"heix", b"mif1", b"msf1")
 
-            if content_type.startswith("image/"):
-                return "image"
-            elif content_type.startswith("video/"):
-                return "video"
 
-        # 如果Content-Type不明确，检查URL扩展名
-        if any(fmt in url.lower() for fmt in IMAGE_FORMATS):
-            return "image"
-        elif any(fmt in url.lower() for fmt in VIDEO_FORMATS):
-            return "video"
+def sniff_file_type(content_type: str, head: bytes, url: str) -> str:
+    """综合判断文件类型: Content-Type, then magic bytes, then the URL extension"""
+    content_type = content_type.lower()
+    if content_type.startswith("image/"):
+        return "image"
+    elif content_type.startswith("video/"):
+        return "video"
 
-        # 默认返回image
+    # ComfyUI serves some outputs as application/octet-stream
+    if head.startswith((b"\x89PNG", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"BM", b"II*\x00", b"MM\x00*")):
+        return "image"
+    if head[:4] == b"RIFF":
+        return "image" if head[8:12] == b"WEBP" else "video"
+    if head[4:8] == b"ftyp":
+        return "image" if head[8:12] in IMAGE_FTYP_BRANDS else "video"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):  # Matroska / WebM
+        return "video"
+
+    # 如果Content-Type不明确，检查URL扩展名
+    if any(fmt in url.lower() for fmt in IMAGE_FORMATS):
         return "image"
+    elif any(fmt in url.lower() for fmt in VIDEO_FORMATS):
+        return "video"
+
+    # 默认返回image
+    return "image"
+
 
-    except Exception:
-        # 出错时回退到扩展名检查
-        return "image" if any(fmt in url.lower() for fmt in IMAGE_FORMATS) else "video"
+async def fetch_output(url: str) -> tuple[str, int, int, str]:
+    """
+    Download one ComfyUI output with a single GET and save it to FILES_DIR
+
+    The type is sniffed from the response headers and the first bytes while
+    streaming: images are converted to PNG, videos are streamed to disk and
+    prepared in a worker thread.
+
+    Returns:
+        tuple[str, int, int, str]: (mime_type, width, height, filename)
+    """
+    file_id = generate_image_id()
+    file_path_without_extension = os.path.join(FILES_DIR, file_id)
+    async with HttpClient.create_aiohttp() as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            head = b""
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                head += chunk
+                if len(head) >= SNIFF_SIZE:
+                    break
+            file_type = sniff_file_type(response.headers.get("content-type", ""), head, url)
+
+            if file_type == "image":
+                image_data = head + await response.read()
+            else:
+                video_path = f"{file_path_without_extension}.mp4"
+                async with aiofiles.open(video_path, "wb") as out_file:
+                    await out_file.write(head)
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        await out_file.write(chunk)
+
+    if file_type == "image":
+        mime_type, width, height, extension = await run_in_threadpool(
+            save_image_data, image_data, file_path_without_extension
+        )
+        return mime_type, width, height, f"{file_id}.{extension}"
+
+    mime_type, info = await prepare_video(video_path)
+    return mime_type, info["width"], info["height"], f"{file_id}.mp4"
+
+
+async def fetch_outputs(urls: list[str]) -> list[tuple[str, int, int, str]]:
+    """Download all outputs of a workflow concurrently, in output order"""
+    semaphore = asyncio.Semaphore(OUTPUT_FETCH_CONCURRENCY)
+
+    async def _fetch(url: str) -> tuple[str, int, int, str]:
+        async with semaphore:
+            return await fetch_output(url)
+
+    return list(await asyncio.gather(*(_fetch(url) for url in urls)))
 
 
 def get_asset_path(filename):
@@ -97,10 +163,6 @@ class ComfyUIGenerator():
         # Get context from kwargs
         ctx = kwargs.get("ctx", {})
 
-        api_url = str(
-            config_service.app_config.get("comfyui", {}).get("url", "")
-        ).rstrip("/")
-
         # Process ratio
         if "flux" in model:
             # Flux generate images around 1M pixel (1024x1024)
@@ -130,17 +192,21 @@ class ComfyUIGenerator():
             workflow["5"]["inputs"]["height"] = height
             workflow["3"]["inputs"]["seed"] = random.randint(1, 2**32)
 
-        execution = await execute(workflow, api_url, ctx=ctx)
-        print("🦄image execution outputs", execution.outputs)
-        url = execution.outputs[0]
+        async def run_on(api_url: str) -> tuple[str, int, int, str]:
+            execution = await execute(workflow, api_url, ctx=ctx)
+            print("🦄image execution outputs", execution.outputs)
+            url = execution.outputs[0]
 
-        # get image dimensions
-        image_id = generate_image_id()
-        mime_type, width, height, extension = await get_image_info_and_save(
-            url, os.path.join(FILES_DIR, f"{image_id}")
-        )
-        filename = f"{image_id}.{extension}"
-        return mime_type, width, height, filename
+            # get image dimensions
+            image_id = generate_image_id()
+            mime_type, width, height, extension = await get_image_info_and_save(
+                url, os.path.join(FILES_DIR, f"{image_id}")
+            )
+            filename = f"{image_id}.{extension}"
+            return mime_type, width, height, filename
+
+        # Runs on the least loaded ComfyUI server
+        return await comfyui_client_service.dispatch(run_on, workflow_affinity(workflow))
 
 
 class ComfyUIWorkflowRunner():
@@ -162,28 +228,9 @@ class ComfyUIWorkflowRunner():
         ctx = kwargs.get("ctx", {})
 
         execution = await execute(
-            self.workflow, self.base_url, local_paths=True, ctx=ctx
+            self.workflow, self.base_url, local_paths=True, ctx=ctx,
+            on_preview=kwargs.get("on_preview"),
         )
         print("🦄workflow execution outputs", execution.outputs)
 
-        results = []
-        for url in execution.outputs:
-            # get image id
-            image_id = generate_image_id()
-
-            # check is video or image.
-            file_type = await detect_file_type_comprehensive(url)
-            get_info_func = (
-                get_video_info_and_save
-                if file_type == "video"
-                else get_image_info_and_save
-            )
-
-            mime_type, width, height, extension = await get_info_func(
-                url, os.path.join(FILES_DIR, f"{image_id}")
-            )
-
-            filename = f"{image_id}.{extension}"
-            results.append((mime_type, width, height, filename))
-
-        return results
\ No newline at end of file
+        return await fetch_outputs(execution.outputs)
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Compiled ComfyUI workflow templates
+
+A stored workflow (api_json + inputs definition) is compiled once, when its
+tool is registered, into a ComfyWorkflowTemplate: the parsed node graph, the
+parsed input definitions, the node inputs every tool argument is written to,
+the nodes holding a seed and the workflow's affinity keys. Running the
+workflow is then an instantiate() call that copies only the nodes it patches
+and shares every other node with the template, instead of re-reading the
+workflow from the database and scanning all nodes per run.
+
+The template's node dicts are shared between runs and must never be mutated;
+instantiate() returns a workflow that is safe to send but not to edit in place.
+"""
+
+import json
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from services.comfyui_client_service import workflow_affinity
+
+# (node id, input name)
+PatchPath = Tuple[str, str]
+
+
+def _random_seed() -> int:
+    # 使用更大的随机范围（0到2^32-1更符合常见种子范围）
+    return random.randint(1, (1 << 32) - 1)
+
+
+@dataclass(frozen=True)
+class ComfyWorkflowTemplate:
+    workflow_id: int
+    name: str
+    nodes: Mapping[str, Dict[str, Any]]
+    input_defs: Tuple[Dict[str, Any], ...]
+    # Tool argument name -> node inputs it is written to
+    input_paths: Mapping[str, Tuple[PatchPath, ...]]
+    seed_paths: Tuple[PatchPath, ...]
+    affinity: Tuple[str, ...]
+
+    def instantiate(
+        self,
+        values: Mapping[str, Any],
+        seed: Optional[Callable[[], int]] = _random_seed,
+    ) -> Dict[str, Any]:
+        """
+        Workflow for one run with the tool arguments and fresh seeds applied
+
+        Args:
+            values: Tool argument values by name, unknown names are ignored
+            seed: Seed generator, None keeps the stored seeds
+        """
+        patches: Dict[str, Dict[str, Any]] = {}
+        for name, value in values.items():
+            for node_id, input_name in self.input_paths.get(name, ()):
+                patches.setdefault(node_id, {})[input_name] = value
+        if seed is not None:
+            for node_id, input_name in self.seed_paths:
+                patches.setdefault(node_id, {})[input_name] = seed()
+
+        workflow = dict(self.nodes)
+        for node_id, inputs in patches.items():
+            node = self.nodes[node_id]
+            workflow[node_id] = {**node, "inputs": {**node.get("inputs", {}), **inputs}}
+        return workflow
+
+
+def _load_json(value: Any, default: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def compile_workflow(wf: Dict[str, Any]) -> ComfyWorkflowTemplate:
+    """
+    Compile a comfy_workflows row (id, name, api_json, inputs)
+
+    Raises:
+        ValueError: api_json is not a ComfyUI API workflow
+    """
+    nodes = _load_json(wf.get("api_json"), None)
+    if not isinstance(nodes, dict):
+        raise ValueError(f"Workflow {wf.get('id')} has no valid api_json")
+    input_defs: List[Dict[str, Any]] = [
+        param for param in _load_json(wf.get("inputs"), []) if isinstance(param, dict)
+    ]
+
+    input_paths: Dict[str, List[PatchPath]] = {}
+    for param in input_defs:
+        param_name = param.get("name")
+        node_id = param.get("node_id")
+        node_input_name = param.get("node_input_name")
+        if not (param_name and node_id and node_input_name):
+            continue
+        # Only inputs the node has are patched, as before
+        if node_input_name in nodes.get(node_id, {}).get("inputs", {}):
+            input_paths.setdefault(param_name, []).append((node_id, node_input_name))
+
+    # 遍历节点输入检测seed字段
+    seed_paths = tuple(
+        (node_id, "seed")
+        for node_id, node in nodes.items()
+        if "seed" in node.get("inputs", {})
+    )
+
+    return ComfyWorkflowTemplate(
+        workflow_id=wf.get("id"),
+        name=wf.get("name", ""),
+        nodes=nodes,
+        input_defs=tuple(input_defs),
+        input_paths={name: tuple(paths) for name, paths in input_paths.items()},
+        seed_paths=seed_paths,
+        affinity=tuple(workflow_affinity(nodes)),
+    )
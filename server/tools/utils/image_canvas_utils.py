@@ -1,43 +1,34 @@
 """
 Canvas-related utilities for image generation
-Handles canvas operations, locking, and notifications
+Handles canvas operations (placeholders, previews, inserts) and notifications
 """
 
-import asyncio
+import os
 import random
 import time
-import json
-from contextlib import asynccontextmanager
-from typing import Dict, List, Any, Optional, Union, cast
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from fastapi.concurrency import run_in_threadpool
 from nanoid import generate
+from services.config_service import FILES_DIR
 from services.db_service import db_service
-from services.websocket_service import broadcast_session_update
-from services.websocket_service import send_to_websocket
-from utils.canvas import find_next_best_element_position
+from services.canvas_writer_service import canvas_writer_service, CanvasMutation, CanvasElementUpdate
+from services.asset_catalog_service import asset_catalog_service
+from services.websocket_service import send_to_websocket, broadcast_session_update
+from utils.canvas import find_next_best_element_position, grid_offsets
 
-def generate_file_id() -> str:
-    """Generate unique file ID"""
-    return 'im_' + generate(size=8)
-
-
-class CanvasLockManager:
-    """Canvas lock manager to prevent concurrent operations causing position overlap"""
-
-    def __init__(self) -> None:
-        self._locks: Dict[str, asyncio.Lock] = {}
-
-    @asynccontextmanager
-    async def lock_canvas(self, canvas_id: str):
-        if canvas_id not in self._locks:
-            self._locks[canvas_id] = asyncio.Lock()
-
-        async with self._locks[canvas_id]:
-            yield
+GRID_SPACING = 20
+# Size of the longer side of placeholders, close to what providers return
+PLACEHOLDER_LONG_SIDE = 1024
+# Minimum seconds between two previews of the same placeholder
+PREVIEW_INTERVAL = 0.5
 
+# Placeholder element id -> [last preview time, preview count]
+_previews: Dict[str, List[Any]] = {}
 
-# Global lock manager instance
-canvas_lock_manager = CanvasLockManager()
 
+def generate_file_id() -> str:
+    """Generate unique file ID"""
+    return 'im_' + generate(size=8)
 
 
 async def generate_new_image_element(
@@ -45,8 +36,9 @@ async def generate_new_image_element(
     fileid: str,
     image_data: Dict[str, Any],
     canvas_data: Optional[Dict[str, Any]] = None,
+    position: Optional[Tuple[float, float]] = None,
 ) -> Dict[str, Any]:
-    """Generate new image element for canvas"""
+    """Generate new image element for canvas, at `position` or the next free slot"""
     if canvas_data is None:
         canvas = await db_service.get_canvas_data(canvas_id)
         if canvas is None:
@@ -55,7 +47,9 @@ async def generate_new_image_element(
 
 
 
-    new_x, new_y = await find_next_best_element_position(canvas_data)
+    if position is None:
+        position = await find_next_best_element_position(canvas_data)
+    new_x, new_y = position
 
     return {
         "type": "image",
@@ -92,60 +86,305 @@ async def generate_new_image_element(
 
 
 async def save_image_to_canvas(session_id: str, canvas_id: str, filename: str, mime_type: str, width: int, height: int) -> str:
-    """Save image to canvas with proper locking and positioning"""
-    # Use lock to ensure atomicity of the save process
-    async with canvas_lock_manager.lock_canvas(canvas_id):
-        # Fetch canvas data once inside the lock
-        canvas: Optional[Dict[str, Any]] = await db_service.get_canvas_data(canvas_id)
-        if canvas is None:
-            canvas = {'data': {}}
-        canvas_data: Dict[str, Any] = canvas.get('data', {})
+    """Add an image to the canvas through its writer (placed, saved and broadcast in a batch)"""
+    image_urls = await save_images_to_canvas(
+        session_id, canvas_id, [(mime_type, width, height, filename)])
+    return image_urls[0]
+
+
+class GridPlacement:
+    """
+    Grid of elements inserted in one writer batch
+
+    Mutations submitted together are applied in order in one batch, the first
+    one looks up the next free slot and places the grid for all of them.
+    """
+
+    def __init__(self, sizes: Sequence[Tuple[int, int]]) -> None:
+        self.offsets = grid_offsets(sizes, GRID_SPACING)
+        self.origin: Optional[Tuple[float, float]] = None
+
+    async def position(self, canvas_data: Dict[str, Any], index: int) -> Tuple[float, float]:
+        if self.origin is None:
+            self.origin = await find_next_best_element_position(canvas_data)
+        dx, dy = self.offsets[index]
+        return self.origin[0] + dx, self.origin[1] + dy
+
+
+def placeholder_size(aspect_ratio: str, long_side: int = PLACEHOLDER_LONG_SIDE) -> Tuple[int, int]:
+    """Placeholder dimensions for an aspect ratio like '16:9'"""
+    try:
+        w_ratio, h_ratio = (float(part) for part in aspect_ratio.split(':'))
+        scale = long_side / max(w_ratio, h_ratio)
+        return max(1, round(w_ratio * scale)), max(1, round(h_ratio * scale))
+    except (ValueError, ZeroDivisionError):
+        return long_side, long_side
+
+
+async def reserve_placeholders(
+    session_id: str,
+    canvas_id: str,
+    sizes: Sequence[Tuple[int, int]],
+    prompt: str = '',
+) -> List[str]:
+    """
+    Reserve pending elements for generations that have not finished yet
+
+    The placeholders are placed as a grid at the next free slot right away and
+    broadcast as `element_pending`. Previews are streamed into them with
+    send_placeholder_preview(), the result replaces them in place, see
+    save_images_to_canvas(). Never raises; returns no ids when the canvas
+    cannot be written.
+
+    Returns:
+        List[str]: Element ids of the placeholders
+    """
+    if not canvas_id or not sizes:
+        return []
+    placement = GridPlacement(sizes)
+    element_ids = [generate_file_id() for _ in sizes]
+    mutations: List[CanvasMutation] = []
+
+    for index, ((width, height), element_id) in enumerate(zip(sizes, element_ids)):
+        async def build_element(
+            canvas_data: Dict[str, Any],
+            index: int = index, element_id: str = element_id,
+            width: int = width, height: int = height,
+        ) -> Dict[str, Any]:
+            element = await generate_new_image_element(
+                canvas_id,
+                element_id,
+                {
+                    'width': width,
+                    'height': height,
+                },
+                canvas_data,
+                position=await placement.position(canvas_data, index),
+            )
+            element.update({
+                'fileId': None,
+                'status': 'pending',
+                'customData': {'pending': True, 'prompt': prompt},
+            })
+            return element
+
+        mutations.append(CanvasMutation(session_id, None, build_element, {'type': 'element_pending'}))
+
+    try:
+        await canvas_writer_service.submit(canvas_id, mutations)
+    except Exception as e:
+        print(f"⚠️ Failed to reserve canvas placeholders: {e}")
+        return []
+    return element_ids
+
+
+async def send_placeholder_preview(
+    session_id: str,
+    canvas_id: str,
+    element_id: str,
+    image: bytes,
+    mime_type: str = 'image/jpeg',
+) -> bool:
+    """
+    Show an intermediate preview in a placeholder
 
-        # Ensure 'elements' and 'files' keys exist
-        if 'elements' not in canvas_data:
-            canvas_data['elements'] = []
-        if 'files' not in canvas_data:
-            canvas_data['files'] = {}
+    Previews are broadcast only, the canvas is not saved. At most one preview
+    per PREVIEW_INTERVAL seconds is sent per placeholder, others are dropped.
 
-        file_id = generate_file_id()
-        url = f'/api/file/{filename}'
+    Returns:
+        bool: Whether the preview was sent
+    """
+    state = _previews.setdefault(element_id, [0.0, 0])
+    now = time.monotonic()
+    if now - state[0] < PREVIEW_INTERVAL:
+        return False
+    state[0] = now
+    state[1] += 1
 
-        file_data: Dict[str, Any] = {
+    extension = 'png' if mime_type == 'image/png' else 'jpg'
+    filename = f'preview_{element_id}.{extension}'
+    try:
+        await run_in_threadpool(_write_file, os.path.join(FILES_DIR, filename), image)
+    except OSError as e:
+        print(f"⚠️ Failed to store preview for {element_id}: {e}")
+        return False
+
+    # A new file id per preview, so clients do not keep showing a cached one
+    file_id = f'{element_id}_p{state[1]}'
+    await broadcast_session_update(session_id, canvas_id, {
+        'type': 'element_updated',
+        'element_id': element_id,
+        'element': {
+            'id': element_id,
+            'fileId': file_id,
+            'status': 'pending',
+            'customData': {'pending': True},
+        },
+        'file': {
             'mimeType': mime_type,
             'id': file_id,
-            'dataURL': url,
+            'dataURL': f'/api/file/{filename}?v={state[1]}',
             'created': int(time.time() * 1000),
-        }
+        },
+    })
+    return True
+
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+async def _clear_previews(element_ids: Sequence[str]) -> None:
+    def _remove() -> None:
+        for element_id in element_ids:
+            for extension in ('jpg', 'png'):
+                try:
+                    os.remove(os.path.join(FILES_DIR, f'preview_{element_id}.{extension}'))
+                except FileNotFoundError:
+                    pass
+
+    # Remove the files even without an entry: _previews does not survive a restart
+    for element_id in element_ids:
+        _previews.pop(element_id, None)
+    await run_in_threadpool(_remove)
+
+
+class _PlaceholderRemoval(CanvasElementUpdate):
+    """Deletes a placeholder, unless it already holds its asset"""
+
+    async def apply(self, canvas_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        element = next(
+            (e for e in canvas_data['elements'] if e.get('id') == self.element_id), None)
+        if element is None or not (element.get('customData') or {}).get('pending'):
+            return None
+        return await super().apply(canvas_data)
+
+
+def remove_placeholder_mutation(session_id: str, element_id: str) -> CanvasElementUpdate:
+    """Writer mutation deleting a placeholder"""
+    return _PlaceholderRemoval(
+        session_id, element_id, {'isDeleted': True, 'customData': {'pending': False}},
+        {'type': 'element_updated'})
+
+
+async def discard_placeholders(session_id: str, canvas_id: str, element_ids: Sequence[str]) -> None:
+    """Remove placeholders of generations that failed or were cancelled; never raises"""
+    if not element_ids:
+        return
+    try:
+        await canvas_writer_service.submit(
+            canvas_id, [remove_placeholder_mutation(session_id, element_id) for element_id in element_ids])
+    except Exception as e:
+        print(f"⚠️ Failed to remove canvas placeholders {', '.join(element_ids)}: {e}")
+    try:
+        await _clear_previews(element_ids)
+    except Exception as e:
+        print(f"⚠️ Failed to remove previews of {', '.join(element_ids)}: {e}")
+
 
-        new_image_element: Dict[str, Any] = await generate_new_image_element(
-            canvas_id,
-            file_id,
+async def save_images_to_canvas(
+    session_id: str,
+    canvas_id: str,
+    images: Sequence[Tuple[str, int, int, str]],
+    placeholder_ids: Sequence[str] = (),
+    **catalog_fields: Any,
+) -> List[str]:
+    """
+    Add generated images to the canvas as one writer batch
+
+    Images fill the placeholders reserved for them (swapped in place by an
+    `element_updated` patch); the others are laid out as a grid starting at
+    the next free slot. Unused placeholders are removed. Everything is placed
+    in one pass, saved once and broadcast as one event.
+
+    Args:
+        images: (mime_type, width, height, filename) per image
+        placeholder_ids: Placeholders from reserve_placeholders()
+        **catalog_fields: Extra asset catalog fields (e.g. provider)
+
+    Returns:
+        List[str]: Image URLs, in the order of `images`
+    """
+    image_urls: List[str] = []
+    files: List[Dict[str, Any]] = []
+    for mime_type, _, _, filename in images:
+        image_url = f'/api/file/{filename}'
+        image_urls.append(image_url)
+        files.append({
+            'mimeType': mime_type,
+            'id': generate_file_id(),
+            'dataURL': image_url,
+            'created': int(time.time() * 1000),
+        })
+
+    fills = list(zip(range(len(images)), placeholder_ids))
+    mutations: List[CanvasElementUpdate] = [
+        CanvasElementUpdate(
+            session_id, element_id,
             {
-                'width': width,
-                'height': height,
+                'fileId': files[index]['id'],
+                'width': images[index][1],
+                'height': images[index][2],
+                'status': 'saved',
+                'customData': {'pending': False},
             },
-            canvas_data
+            {'type': 'element_updated', 'image_url': image_urls[index]},
+            file_data=files[index],
         )
+        for index, element_id in fills
+    ]
+    mutations += [
+        remove_placeholder_mutation(session_id, element_id)
+        for element_id in placeholder_ids[len(images):]
+    ]
+    results = await canvas_writer_service.submit(canvas_id, mutations) if mutations else []
 
-        # Update the canvas data with the new element and file info
-        elements_list = cast(List[Dict[str, Any]], canvas_data['elements'])
-        elements_list.append(new_image_element)
-        canvas_data['files'][file_id] = file_data
+    # Images without a placeholder, or whose placeholder was deleted meanwhile
+    remaining = [index for (index, _), element in zip(fills, results) if element is None]
+    remaining += range(len(fills), len(images))
+    if remaining:
+        await canvas_writer_service.submit(
+            canvas_id, _grid_inserts(session_id, canvas_id, [(images[i], files[i]) for i in remaining]))
+    await _clear_previews(placeholder_ids)
 
-        image_url = f"/api/file/{filename}"
+    # Prompt/model/provider are read from the PNG text chunks
+    await asset_catalog_service.record_many(
+        [filename for _, _, _, filename in images], session_id, canvas_id, **catalog_fields)
 
-        # Save the updated canvas data back to the database
-        await db_service.save_canvas_data(canvas_id, json.dumps(canvas_data))
+    return image_urls
 
-        # Broadcast image generation message to frontend
-        await broadcast_session_update(session_id, canvas_id, {
-            'type': 'image_generated',
-            'element': new_image_element,
-            'file': file_data,
-            'image_url': image_url,
-        })
 
-        return image_url
+def _grid_inserts(
+    session_id: str,
+    canvas_id: str,
+    images: Sequence[Tuple[Tuple[str, int, int, str], Dict[str, Any]]],
+) -> List[CanvasMutation]:
+    placement = GridPlacement([(width, height) for (_, width, height, _), _ in images])
+    mutations: List[CanvasMutation] = []
+
+    for index, ((_, width, height, _), file_data) in enumerate(images):
+        async def build_element(
+            canvas_data: Dict[str, Any],
+            index: int = index, file_id: str = file_data['id'],
+            width: int = width, height: int = height,
+        ) -> Dict[str, Any]:
+            return await generate_new_image_element(
+                canvas_id,
+                file_id,
+                {
+                    'width': width,
+                    'height': height,
+                },
+                canvas_data,
+                position=await placement.position(canvas_data, index),
+            )
+
+        mutations.append(CanvasMutation(session_id, file_data, build_element, {
+            'type': 'image_generated',
+            'image_url': file_data['dataURL'],
+        }))
+    return mutations
 
 
 async def send_image_start_notification(session_id: str, message: str) -> None:
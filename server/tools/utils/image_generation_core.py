@@ -3,11 +3,12 @@ Image generation core module
 Contains the main orchestration logic for image generation across different providers
 """
 
-from typing import Optional, Dict, Any
+import asyncio
+from typing import Optional, Dict, Any, List
 from common import DEFAULT_PORT
 from utils.url_helper import get_base_url
 from tools.utils.image_utils import process_input_image
-from ..image_providers.image_base_provider import ImageProviderBase
+from ..image_providers.image_base_provider import ImageProviderBase, ImageResult
 
 # 导入所有提供商以确保自动注册 (不要删除这些导入)
 from ..image_providers.jaaz_provider import JaazImageProvider
@@ -15,11 +16,19 @@ from ..image_providers.openai_provider import OpenAIImageProvider
 from ..image_providers.replicate_provider import ReplicateImageProvider
 from ..image_providers.volces_provider import VolcesProvider
 from ..image_providers.wavespeed_provider import WavespeedProvider
+from ..image_providers.cassette_provider import CassetteImageProvider
 
 # from ..image_providers.comfyui_provider import ComfyUIProvider
 from .image_canvas_utils import (
-    save_image_to_canvas,
+    save_images_to_canvas,
+    reserve_placeholders,
+    discard_placeholders,
+    placeholder_size,
 )
+from services.generation_job_service import generation_job_service, JobContext
+from services.rate_limit_service import rate_limit_service
+from services.cassette_service import cassette_service
+from .provider_router import call_with_failover, image_candidates
 import time
 
 IMAGE_PROVIDERS: dict[str, ImageProviderBase] = {
@@ -29,6 +38,14 @@ IMAGE_PROVIDERS: dict[str, ImageProviderBase] = {
     "volces": VolcesProvider(),
     "wavespeed": WavespeedProvider(),
 }
+# Record or replay the provider calls (CASSETTE_MODE, see services/cassette_service.py)
+if cassette_service.enabled:
+    IMAGE_PROVIDERS = {
+        name: CassetteImageProvider(name, provider) for name, provider in IMAGE_PROVIDERS.items()
+    }
+
+# Upper bound of images (variations) per tool call
+MAX_NUM_IMAGES = 4
 
 
 async def generate_image_with_provider(
@@ -40,10 +57,74 @@ async def generate_image_with_provider(
     prompt: str,
     aspect_ratio: str = "1:1",
     input_images: Optional[list[str]] = None,
+    num_images: int = 1,
+    wait: bool = True,
 ) -> str:
     """
     通用图像生成函数，支持不同的模型和提供商
 
+    生成任务写入 generation_jobs 队列，由 generation_job_service 的 worker 执行；
+    wait=False 时立即返回，结果生成后直接写入画布。
+    画布上先放置占位元素 (pending)，生成完成后由结果替换。
+
+    Args:
+        canvas_id: 画布ID
+        session_id: 会话ID
+        provider: 提供商名称 (如 'jaaz', 'replicate')
+        model: 模型标识符 (如 'openai/gpt-image-1', 'google/imagen-4')
+        prompt: 图像生成提示词
+        aspect_ratio: 图像长宽比
+        input_images: 可选的输入参考图像列表
+        num_images: 生成图像数量 (变体, 1 到 MAX_NUM_IMAGES)
+        wait: 是否等待生成完成
+
+    Returns:
+        str: 生成结果消息
+    """
+    if provider not in IMAGE_PROVIDERS:
+        raise ValueError(f"Unknown provider: {provider}")
+
+    num_images = max(1, min(num_images, MAX_NUM_IMAGES))
+    # Reserve the canvas space now, the job fills it in
+    placeholder_ids = await reserve_placeholders(
+        session_id, canvas_id, [placeholder_size(aspect_ratio)] * num_images, prompt)
+
+    return await generation_job_service.run(
+        "image",
+        {
+            "provider": provider,
+            "model": model,
+            "prompt": prompt,
+            "aspect_ratio": aspect_ratio,
+            "input_images": input_images or [],
+            "num_images": num_images,
+            "placeholder_ids": placeholder_ids,
+        },
+        session_id=session_id,
+        canvas_id=canvas_id,
+        wait=wait,
+    )
+
+
+async def run_image_generation(
+    canvas_id: str,
+    session_id: str,
+    provider: str,
+    model: str,
+    # image generator args
+    prompt: str,
+    aspect_ratio: str = "1:1",
+    input_images: Optional[list[str]] = None,
+    num_images: int = 1,
+    placeholder_ids: Optional[list[str]] = None,
+) -> str:
+    """
+    执行图像生成并写入画布 (在生成任务 worker 中运行)
+
+    Models that return several images per request generate all variations in
+    one call, others get one concurrent call per image. All images are placed
+    on the canvas as a grid with a single save and broadcast.
+
     Args:
         prompt: 图像生成提示词
         aspect_ratio: 图像长宽比
@@ -52,15 +133,47 @@ async def generate_image_with_provider(
         tool_call_id: 工具调用ID
         config: 上下文运行配置，包含canvas_id，session_id，model_info，由langgraph注入
         input_images: 可选的输入参考图像列表
+        num_images: 生成图像数量
+        placeholder_ids: 画布上为结果预留的占位元素
 
     Returns:
         str: 生成结果消息
     """
 
-    provider_instance = IMAGE_PROVIDERS.get(provider)
-    if not provider_instance:
+    if provider not in IMAGE_PROVIDERS:
+        await discard_placeholders(session_id, canvas_id, placeholder_ids or [])
         raise ValueError(f"Unknown provider: {provider}")
 
+    try:
+        images = await _generate_images(
+            session_id, provider, model, prompt, aspect_ratio, input_images, num_images)
+    except BaseException:
+        # Failed or cancelled, free the reserved canvas space
+        await discard_placeholders(session_id, canvas_id, placeholder_ids or [])
+        raise
+
+    # Save images to canvas, into their placeholders
+    image_urls = await save_images_to_canvas(session_id, canvas_id, images, placeholder_ids or [])
+
+    base_url = get_base_url()
+    links = " ".join(
+        f"![image_id: {filename}]({base_url}{image_url})"
+        for (_, _, _, filename), image_url in zip(images, image_urls)
+    )
+    if len(images) == 1:
+        return f"image generated successfully {links}"
+    return f"{len(images)} images generated successfully {links}"
+
+
+async def _generate_images(
+    session_id: str,
+    provider: str,
+    model: str,
+    prompt: str,
+    aspect_ratio: str,
+    input_images: Optional[list[str]],
+    num_images: int,
+) -> List[ImageResult]:
     # Process input images for the provider
     processed_input_images: list[str] | None = None
     if input_images:
@@ -72,28 +185,60 @@ async def generate_image_with_provider(
 
         print(f"Using {len(processed_input_images)} input images for generation")
 
-    # Prepare metadata with all generation parameters
-    metadata: Dict[str, Any] = {
-        "prompt": prompt,
-        "model": model,
-        "provider": provider,
-        "aspect_ratio": aspect_ratio,
-        "input_images": input_images or [],
-    }
+    async def _generate(provider_name: str, model_name: str) -> List[ImageResult]:
+        # Prepare metadata with all generation parameters
+        metadata: Dict[str, Any] = {
+            "prompt": prompt,
+            "model": model_name,
+            "provider": provider_name,
+            "aspect_ratio": aspect_ratio,
+            "input_images": input_images or [],
+        }
+
+        image_provider = IMAGE_PROVIDERS[provider_name]
 
-    # Generate image using the selected provider
-    mime_type, width, height, filename = await provider_instance.generate(
-        prompt=prompt,
-        model=model,
-        aspect_ratio=aspect_ratio,
-        input_images=processed_input_images,
-        metadata=metadata,
+        async def _request(count: int) -> List[ImageResult]:
+            # Generate images using the selected provider, once admitted by its limits
+            async with rate_limit_service.acquire(provider_name, model_name, session_id):
+                return await image_provider.generate_images(
+                    prompt=prompt,
+                    model=model_name,
+                    num_images=count,
+                    aspect_ratio=aspect_ratio,
+                    input_images=processed_input_images,
+                    metadata=metadata,
+                )
+
+        # Native multi-output covers up to per_call images per request
+        per_call = max(1, image_provider.max_images_per_call(model_name))
+        counts = [min(per_call, num_images - i) for i in range(0, num_images, per_call)]
+        if len(counts) == 1:
+            return await _request(counts[0])
+
+        results = await asyncio.gather(*(_request(count) for count in counts), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        images = [image for r in results if not isinstance(r, BaseException) for image in r]
+        if not images:
+            raise errors[0]
+        if errors:
+            print(f"⚠️ {len(errors)} of {len(counts)} {provider_name} requests failed, keeping {len(images)} image(s): {errors[0]}")
+        return images
+
+    # Fails over to an equivalent provider (e.g. jaaz <-> replicate) on errors
+    images, used_provider, used_model = await call_with_failover(
+        image_candidates(provider, model), _generate
     )
+    if used_provider != provider:
+        print(f"🔀 Image generated by {used_provider} ({used_model}) instead of {provider}")
+    return images
 
-    # Save image to canvas
-    image_url = await save_image_to_canvas(
-        session_id, canvas_id, filename, mime_type, width, height
+
+async def _run_image_job(job: JobContext) -> str:
+    return await run_image_generation(
+        canvas_id=job.canvas_id,
+        session_id=job.session_id,
+        **job.payload,
     )
 
-    base_url = get_base_url()
-    return f"image generated successfully ![image_id: {filename}]({base_url}{image_url})"
+
+generation_job_service.register_handler("image", _run_image_job)
@@ -4,11 +4,17 @@ from PIL import Image, PngImagePlugin
 from io import BytesIO
 import base64
 import json
-from typing import Any, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
 from nanoid import generate
 from utils.http_client import HttpClient
+from utils.png_metadata import read_png_header, inject_png_text, IEND_CHUNK
 from services.config_service import FILES_DIR
 
+# PNGs with these (color type, bit depth) are stored as they are; others are
+# transcoded like non-PNG input (palette / gray+alpha to RGB(A), 16 bit ...)
+PASSTHROUGH_PNG_FORMATS = {(0, 8), (2, 8), (6, 8)}
+
 
 def generate_image_id() -> str:
     """Generate unique image ID"""
@@ -42,7 +48,80 @@ async def get_image_info_and_save(
                 async with session.get(url) as response:
                     # Read the image content as bytes
                     image_data = await response.read()
+    except Exception as e:
+        print(f"Error processing image: {e}")
+        raise e
+
+    return await run_in_threadpool(save_image_data, image_data, file_path_without_extension, metadata)
+
+
+def _metadata_text(metadata: dict[str, Any]) -> Dict[str, str]:
+    text: Dict[str, str] = {}
+    for key, value in metadata.items():
+        try:
+            # Handle different value types
+            if isinstance(value, (dict, list)):
+                # Serialize complex types as JSON
+                text[str(key)] = json.dumps(value, ensure_ascii=False)
+            elif value is None:
+                text[str(key)] = "null"
+            else:
+                # Convert to string
+                text[str(key)] = str(value)
+        except Exception as e:
+            print(f"Warning: Failed to add metadata key '{key}': {e}")
+            traceback.print_stack()
+    return text
+
 
+def _save_png_as_is(
+    image_data: bytes,
+    file_path_without_extension: str,
+    metadata: Optional[dict[str, Any]] = None
+) -> Optional[Tuple[str, int, int, str]]:
+    """
+    Store a PNG without decoding it, metadata is injected as text chunks
+
+    Returns None when the data is not a PNG that can be kept as it is.
+    """
+    try:
+        header = read_png_header(image_data)
+        if (header.color_type, header.bit_depth) not in PASSTHROUGH_PNG_FORMATS:
+            return None
+        if metadata:
+            image_data = inject_png_text(
+                image_data, {"original_format": "PNG", **_metadata_text(metadata)})
+        elif not image_data.endswith(IEND_CHUNK):
+            return None
+    except ValueError:
+        return None
+
+    file_path = f"{file_path_without_extension}.png"
+    with open(file_path, 'wb') as f:
+        f.write(image_data)
+    print(f"Saved PNG without re-encoding: {file_path} ({header.width}x{header.height})")
+    return 'image/png', header.width, header.height, 'png'
+
+
+def save_image_data(
+    image_data: bytes,
+    file_path_without_extension: str,
+    metadata: Optional[dict[str, Any]] = None
+) -> Tuple[str, int, int, str]:
+    """
+    Save downloaded image bytes as PNG with metadata (blocking)
+
+    8 bit grayscale / RGB / RGBA PNGs are stored as they are with the metadata
+    added as text chunks; everything else is decoded and converted to PNG.
+
+    Returns:
+        tuple[str, int, int, str]: (mime_type, width, height, extension) - always PNG
+    """
+    saved = _save_png_as_is(image_data, file_path_without_extension, metadata)
+    if saved is not None:
+        return saved
+
+    try:
         # Open image to get info
         image = Image.open(BytesIO(image_data))
         width, height = image.size
@@ -87,22 +166,8 @@ async def get_image_info_and_save(
         pnginfo.add_text("original_format", original_format)
         
         if metadata:
-            for key, value in metadata.items():
-                try:
-                    # Handle different value types
-                    if isinstance(value, (dict, list)):
-                        # Serialize complex types as JSON
-                        text_value = json.dumps(value, ensure_ascii=False)
-                    elif value is None:
-                        text_value = "null"
-                    else:
-                        # Convert to string
-                        text_value = str(value)
-                    
-                    pnginfo.add_text(str(key), text_value)
-                except Exception as e:
-                    print(f"Warning: Failed to add metadata key '{key}': {e}")
-                    traceback.print_stack()
+            for key, text_value in _metadata_text(metadata).items():
+                pnginfo.add_text(key, text_value)
 
         # Save as PNG with metadata
         file_path = f"{file_path_without_extension}.{extension}"
@@ -0,0 +1,231 @@
+"""
+Provider routing for image/video generation
+
+Wraps provider calls with:
+- circuit breakers: providers whose breaker is open are skipped
+- retries with full-jitter backoff, limited by the provider's retry budget
+- failover to an equivalent (provider, model) when a provider keeps failing
+- only transient errors (timeouts, connection errors, HTTP 429/5xx) are
+  retried or failed over; a bad request, auth or content policy error is
+  raised at once instead of being billed again on every candidate, and does
+  not count against the provider's circuit breaker
+- optional hedging (PROVIDER_HEDGING=true): when the first call takes longer
+  than its provider's live p95 latency, the next equivalent provider is
+  started as well and the first result wins
+
+Health data comes from services/provider_health_service.py.
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+import aiohttp
+from services.config_service import config_service
+from services.metrics_service import metrics_service
+from services.provider_health_service import (
+    provider_health_service,
+    backoff_delay,
+    CircuitOpenError,
+    HALF_OPEN,
+)
+
+T = TypeVar("T")
+Candidate = Tuple[str, str]  # (provider, model)
+
+# Groups of (provider, model) that generate with the same underlying model
+EQUIVALENT_IMAGE_MODELS: List[List[Candidate]] = [
+    [("jaaz", "black-forest-labs/flux-kontext-pro"), ("replicate", "black-forest-labs/flux-kontext-pro")],
+    [("jaaz", "black-forest-labs/flux-kontext-max"), ("replicate", "black-forest-labs/flux-kontext-max")],
+    [("jaaz", "google/imagen-4"), ("replicate", "google/imagen-4")],
+    [("jaaz", "recraft-ai/recraft-v3"), ("replicate", "recraft-ai/recraft-v3")],
+    [("jaaz", "openai/gpt-image-1"), ("openai", "openai/gpt-image-1")],
+    [("jaaz", "doubao/doubao-seedream-3-0-t2i-250415"), ("volces", "volces/doubao-seedream-3-0-t2i-250415")],
+]
+
+MAX_RETRIES = 2
+
+# Exception classes of the lazily imported SDKs (openai, httpx) meaning the
+# request did not get a response, matched by name
+_TRANSIENT_ERROR_NAMES = {'APIConnectionError', 'APITimeoutError', 'TransportError', 'TimeoutException'}
+# Status codes in the messages of providers raising plain exceptions,
+# e.g. "HTTP 503 - ..." or "status code: 429"
+_STATUS_IN_MESSAGE_RE = re.compile(r'\b(?:HTTP|status(?: code)?)[:\s]+([1-5]\d\d)\b', re.IGNORECASE)
+
+
+def hedging_enabled() -> bool:
+    return os.getenv("PROVIDER_HEDGING", "false").lower() == "true"
+
+
+def is_provider_configured(provider: str) -> bool:
+    return bool(config_service.app_config.get(provider, {}).get("api_key"))
+
+
+def image_candidates(provider: str, model: str) -> List[Candidate]:
+    """Requested (provider, model) followed by configured equivalents"""
+    candidates: List[Candidate] = [(provider, model)]
+    for group in EQUIVALENT_IMAGE_MODELS:
+        if (provider, model) in group:
+            candidates += [c for c in group if c != (provider, model) and is_provider_configured(c[0])]
+    return candidates
+
+
+def _is_transient_status(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Whether another attempt of the call may succeed: timeouts, connection errors, HTTP 429/5xx"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError,
+                          aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return _is_transient_status(error.status)
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return _is_transient_status(status)
+    if any(cls.__name__ in _TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    message = str(error)
+    match = _STATUS_IN_MESSAGE_RE.search(message)
+    if match:
+        return _is_transient_status(int(match.group(1)))
+    return 'timeout' in message.lower() or 'timed out' in message.lower()
+
+
+def _order_candidates(candidates: List[Candidate]) -> List[Candidate]:
+    """
+    Keep the requested provider first while its breaker lets calls through,
+    order the alternatives by live error rate and latency, drop open breakers.
+    """
+    primary, alternatives = candidates[0], candidates[1:]
+    alternatives = sorted(alternatives, key=lambda c: provider_health_service.score(*c))
+    ordered = [primary] + alternatives
+    available = [c for c in ordered if provider_health_service.breaker(c[0]).available()]
+    if not available:
+        providers = ", ".join(c[0] for c in candidates)
+        raise CircuitOpenError(f"All providers are temporarily unavailable ({providers}), please try again later")
+    return available
+
+
+def _release_probe(provider: str) -> None:
+    """Give back a reserved half-open probe after a call that says nothing about health"""
+    breaker = provider_health_service.breaker(provider)
+    if breaker.state == HALF_OPEN:
+        breaker.probe_in_flight = False
+
+
+async def _timed_call(candidate: Candidate, call: Callable[[str, str], Awaitable[T]]) -> T:
+    provider, model = candidate
+    started = time.monotonic()
+    try:
+        result = await call(provider, model)
+    except asyncio.CancelledError:
+        _release_probe(provider)
+        raise
+    except Exception as e:
+        if is_transient_error(e):
+            provider_health_service.record_failure(provider, model, time.monotonic() - started)
+        else:
+            # e.g. a rejected prompt or a bad request: the provider itself is up
+            _release_probe(provider)
+        raise
+    provider_health_service.record_success(provider, model, time.monotonic() - started)
+    return result
+
+
+async def _hedged_call(
+    primary: Candidate,
+    backup: Optional[Candidate],
+    call: Callable[[str, str], Awaitable[T]],
+) -> Tuple[T, Candidate]:
+    primary_task = asyncio.create_task(_timed_call(primary, call))
+    try:
+        p95 = provider_health_service.p95(*primary)
+        if backup is None or p95 is None:
+            return await primary_task, primary
+
+        done, _ = await asyncio.wait({primary_task}, timeout=p95)
+        if done or not provider_health_service.breaker(backup[0]).allow():
+            return await primary_task, primary
+
+        print(f"🪝 {primary[0]} slower than its p95 ({p95:.1f}s), hedging to {backup[0]}")
+        backup_task = asyncio.create_task(_timed_call(backup, call))
+        tasks = {primary_task: primary, backup_task: backup}
+        pending = set(tasks)
+        first_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        metrics_service.record_provider_hedge(primary[0], winner[0])
+                        return task.result(), winner
+                    if tasks[task] == primary or first_error is None:
+                        first_error = task.exception()
+            assert first_error is not None
+            raise first_error
+        finally:
+            for task in pending:
+                task.cancel()
+    except BaseException:
+        # Caller cancelled or the call failed: no orphaned, paid provider call
+        primary_task.cancel()
+        raise
+
+
+async def call_with_failover(
+    candidates: List[Candidate],
+    call: Callable[[str, str], Awaitable[T]],
+    retries: int = MAX_RETRIES,
+    hedge: Optional[bool] = None,
+) -> Tuple[T, str, str]:
+    """
+    Call providers in order until one succeeds
+
+    Args:
+        candidates: (provider, model) pairs, the requested one first
+        call: Coroutine function performing the provider call
+        retries: Maximum retries on the same provider (subject to its retry budget)
+        hedge: Hedge slow calls to the next candidate (default: PROVIDER_HEDGING)
+
+    Returns:
+        Tuple[T, str, str]: (result, provider, model) of the successful call
+    """
+    if hedge is None:
+        hedge = hedging_enabled()
+    ordered = _order_candidates(candidates)
+    last_error: Optional[BaseException] = None
+
+    for index, candidate in enumerate(ordered):
+        provider, model = candidate
+        backup = ordered[index + 1] if hedge and index + 1 < len(ordered) else None
+        attempt = 0
+        while provider_health_service.breaker(provider).allow():
+            try:
+                result, (used_provider, used_model) = await _hedged_call(candidate, backup, call)
+                return result, used_provider, used_model
+            except Exception as e:
+                if isinstance(e, ValueError) or not is_transient_error(e):
+                    # Invalid input, configuration, auth or content policy:
+                    # another attempt would be billed and fail the same way
+                    raise
+                last_error = e
+                print(f"⚠️ {provider} ({model}) failed: {e}")
+                if attempt >= retries or not provider_health_service.budget(provider).try_spend():
+                    break
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+
+        if index + 1 < len(ordered):
+            next_provider = ordered[index + 1][0]
+            print(f"🔀 Failing over from {provider} to {next_provider} for {model}")
+            metrics_service.record_provider_failover(provider, next_provider)
+
+    if last_error is None:
+        raise CircuitOpenError(f"Provider {ordered[0][0]} is temporarily unavailable, please try again later")
+    raise last_error
@@ -1,4 +1,4 @@
-from .video_generation_core import generate_video_with_provider
+from .video_generation_core import generate_video_with_provider, generate_video_with_jaaz
 from .video_canvas_utils import (
     save_video_to_canvas,
     generate_new_video_element,
@@ -9,6 +9,7 @@ from .video_canvas_utils import (
 
 __all__ = [
     "generate_video_with_provider",
+    "generate_video_with_jaaz",
     "save_video_to_canvas",
     "generate_new_video_element",
     "send_video_start_notification",
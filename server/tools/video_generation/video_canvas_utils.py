@@ -3,115 +3,111 @@ Video canvas utilities module
 Contains functions for video processing, canvas operations, and notifications
 """
 
-import json
 import time
 import os
-import asyncio
-from contextlib import asynccontextmanager
 from typing import Dict, List, Any, Tuple, Optional, Union
 from services.config_service import FILES_DIR
 from services.db_service import db_service
-from services.websocket_service import send_to_websocket, broadcast_session_update  # type: ignore
+from services.canvas_writer_service import canvas_writer_service, CanvasMutation
+from services.video_packaging_service import video_packaging_service
+from services.asset_catalog_service import asset_catalog_service
+from services.websocket_service import send_to_websocket  # type: ignore
 from common import DEFAULT_PORT
 from utils.url_helper import get_base_url
 from utils.http_client import HttpClient
+from utils.video_probe import prepare_video_asset, VideoProbeError
+from fastapi.concurrency import run_in_threadpool
 import aiofiles
 import mimetypes
 from pymediainfo import MediaInfo
 from nanoid import generate
 import random
 from utils.canvas import find_next_best_element_position
+from tools.utils.image_canvas_utils import remove_placeholder_mutation
 
-
-class CanvasLockManager:
-    """Canvas lock manager to prevent concurrent operations causing position overlap"""
-
-    def __init__(self) -> None:
-        self._locks: Dict[str, asyncio.Lock] = {}
-
-    @asynccontextmanager
-    async def lock_canvas(self, canvas_id: str):
-        if canvas_id not in self._locks:
-            self._locks[canvas_id] = asyncio.Lock()
-
-        async with self._locks[canvas_id]:
-            yield
-
-
-# Global lock manager instance
-canvas_lock_manager = CanvasLockManager()
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 async def save_video_to_canvas(
     session_id: str,
     canvas_id: str,
-    video_url: str
+    video_url: str,
+    placeholder_id: Optional[str] = None,
 ) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
     """
-    Download video, save to files, create canvas element and return data
+    Download video, save to files and add a video element to the canvas
+
+    The element is inserted (and broadcast) by the canvas writer, batched with
+    other concurrent inserts into the same canvas. With a placeholder, the
+    video takes its position and the placeholder is removed in the same batch.
 
     Args:
         session_id: Session ID for notifications
         canvas_id: Canvas ID to add video element
         video_url: URL to download video from
+        placeholder_id: Pending element reserved for the video
 
     Returns:
         Tuple of (filename, file_data, new_video_element)
     """
-    # Use lock to ensure atomicity of the save process
-    async with canvas_lock_manager.lock_canvas(canvas_id):
-        # Generate unique video ID
-        video_id = generate_video_file_id()
-
-        # Download and save video
-        print(f"🎥 Downloading video from: {video_url}")
-        mime_type, width, height, extension = await get_video_info_and_save(
-            video_url, os.path.join(FILES_DIR, f"{video_id}")
-        )
-        filename = f"{video_id}.{extension}"
+    # Generate unique video ID
+    video_id = generate_video_file_id()
 
-        print(f"🎥 Video saved as: {filename}, dimensions: {width}x{height}")
-
-        # Create file data
-        file_id = generate_video_file_id()
-        file_url = f"/api/file/{filename}"
-
-        file_data: Dict[str, Any] = {
-            "mimeType": mime_type,
-            "id": file_id,
-            "dataURL": file_url,
-            "created": int(time.time() * 1000),
-        }
+    # Download and save video
+    print(f"🎥 Downloading video from: {video_url}")
+    mime_type, extension, video_info = await download_and_prepare_video(
+        video_url, os.path.join(FILES_DIR, f"{video_id}")
+    )
+    width, height = video_info["width"], video_info["height"]
+    filename = f"{video_id}.{extension}"
+    preview = video_preview_data(video_info)
+
+    print(f"🎥 Video saved as: {filename}, dimensions: {width}x{height}")
+
+    # Create file data
+    file_id = generate_video_file_id()
+    file_url = f"/api/file/{filename}"
+
+    file_data: Dict[str, Any] = {
+        "mimeType": mime_type,
+        "id": file_id,
+        "dataURL": file_url,
+        "created": int(time.time() * 1000),
+        **preview,
+    }
 
-        # Create new video element for canvas
-        new_video_element: Dict[str, Any] = await generate_new_video_element(
+    async def build_element(canvas_data: Dict[str, Any]) -> Dict[str, Any]:
+        placeholder = next((
+            e for e in canvas_data.get("elements", [])
+            if placeholder_id and e.get("id") == placeholder_id and not e.get("isDeleted")
+        ), None)
+        return await generate_new_video_element(
             canvas_id,
             file_id,
             {
                 "width": width,
                 "height": height,
+                "preview": preview,
             },
+            canvas_data,
+            position=(placeholder["x"], placeholder["y"]) if placeholder else None,
         )
 
-        # Update canvas data
-        canvas_data: Optional[Dict[str, Any]] = await db_service.get_canvas_data(canvas_id)
-        if canvas_data is None:
-            canvas_data = {}
-        if "data" not in canvas_data:
-            canvas_data["data"] = {}
-        if "elements" not in canvas_data["data"]:
-            canvas_data["data"]["elements"] = []
-        if "files" not in canvas_data["data"]:
-            canvas_data["data"]["files"] = {}
+    mutations: List[Any] = [CanvasMutation(session_id, file_data, build_element, {
+        "type": "video_generated",
+        "video_url": file_url,
+    })]
+    if placeholder_id:
+        mutations.append(remove_placeholder_mutation(session_id, placeholder_id))
+    new_video_element = (await canvas_writer_service.submit(canvas_id, mutations))[0]
+    assert new_video_element is not None
 
-        canvas_data["data"]["elements"].append(
-            new_video_element)  # type: ignore
-        canvas_data["data"]["files"][file_id] = file_data
+    await asset_catalog_service.record(filename, session_id, canvas_id, mime_type=mime_type)
 
-        # Save updated canvas data
-        await db_service.save_canvas_data(canvas_id, json.dumps(canvas_data["data"]))
+    # Optional HLS renditions, the element is updated when they are ready
+    video_packaging_service.schedule(filename, canvas_id, session_id, new_video_element["id"])
 
-        return filename, file_data, new_video_element
+    return filename, file_data, new_video_element
 
 
 async def send_video_start_notification(session_id: str, message: str) -> None:
@@ -122,26 +118,6 @@ async def send_video_start_notification(session_id: str, message: str) -> None:
     })
 
 
-async def send_video_completion_notification(
-    session_id: str,
-    canvas_id: str,
-    new_video_element: Dict[str, Any],
-    file_data: Dict[str, Any],
-    video_url: str
-) -> None:
-    """Send WebSocket notification about video generation completion"""
-    await broadcast_session_update(
-        session_id,
-        canvas_id,
-        {
-            "type": "video_generated",
-            "element": new_video_element,
-            "file": file_data,
-            "video_url": video_url,
-        },
-    )
-
-
 async def send_video_error_notification(session_id: str, error_message: str) -> None:
     """Send WebSocket notification about video generation error"""
     print(f"🎥 Video generation error: {error_message}")
@@ -161,7 +137,8 @@ async def process_video_result(
     video_url: str,
     session_id: str,
     canvas_id: str,
-    provider_name: str = ""
+    provider_name: str = "",
+    placeholder_id: Optional[str] = None,
 ) -> str:
     """
     Complete video processing pipeline: save, update canvas, notify
@@ -171,25 +148,18 @@ async def process_video_result(
         session_id: Session ID for notifications
         canvas_id: Canvas ID to add video element
         provider_name: Name of the provider (for logging)
+        placeholder_id: Pending element the video replaces
 
     Returns:
         Success message with video link
     """
     try:
-        # Save video to canvas and get file info
+        # Save video to canvas (the canvas writer broadcasts video_generated)
         filename, file_data, new_video_element = await save_video_to_canvas(
             session_id=session_id,
             canvas_id=canvas_id,
-            video_url=video_url
-        )
-
-        # Send completion notification
-        await send_video_completion_notification(
-            session_id=session_id,
-            canvas_id=canvas_id,
-            new_video_element=new_video_element,
-            file_data=file_data,
-            video_url=file_data["dataURL"]
+            video_url=video_url,
+            placeholder_id=placeholder_id,
         )
 
         provider_info = f" using {provider_name}" if provider_name else ""
@@ -206,61 +176,116 @@ def generate_video_file_id() -> str:
     return "vi_" + generate(size=8)
 
 
-async def get_video_info_and_save(
-    url: str, file_path_without_extension: str
-) -> Tuple[str, int, int, str]:
-    # Fetch the video asynchronously
+async def download_video(url: str, file_path: str) -> None:
+    """Stream a video to disk without holding it in memory"""
     async with HttpClient.create_aiohttp() as session:
         async with session.get(url) as response:
-            video_content = await response.read()
-
-    # Save to temporary mp4 file first
-    temp_path = f"{file_path_without_extension}.mp4"
-    async with aiofiles.open(temp_path, "wb") as out_file:
-        await out_file.write(video_content)
-    print("🎥 Video saved to", temp_path)
-
+            response.raise_for_status()
+            async with aiofiles.open(file_path, "wb") as out_file:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    await out_file.write(chunk)
+    print("🎥 Video saved to", file_path)
+
+
+def _probe_with_mediainfo(file_path: str) -> Dict[str, Any]:
+    """Fallback probe for containers the MP4 header parser does not handle"""
+    media_info = MediaInfo.parse(file_path)  # type: ignore
+    for track in media_info.tracks:  # type: ignore
+        if track.track_type == "Video":  # type: ignore
+            return {
+                "width": int(track.width or 0),  # type: ignore
+                "height": int(track.height or 0),  # type: ignore
+                "duration": float(track.duration or 0) / 1000,  # type: ignore
+                "codec": track.codec_id or "",  # type: ignore
+            }
+    return {"width": 0, "height": 0, "duration": 0.0, "codec": ""}
+
+
+def _prepare_video_file(file_path: str) -> Dict[str, Any]:
     try:
-        media_info = MediaInfo.parse(temp_path)  # type: ignore
-        width: int = 0
-        height: int = 0
+        return prepare_video_asset(file_path)
+    except VideoProbeError as e:
+        print(f"🎥 {e}, falling back to MediaInfo")
+        return _probe_with_mediainfo(file_path)
 
-        for track in media_info.tracks:  # type: ignore
-            if track.track_type == "Video":  # type: ignore
-                width = int(track.width or 0)  # type: ignore
-                height = int(track.height or 0)  # type: ignore
-                print(f"Width: {width}, Height: {height}")
-                break
 
-        extension = "mp4"  # Default to mp4, can be flexible based on codec_name
+async def download_and_prepare_video(
+    url: str, file_path_without_extension: str
+) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    Download a video, then probe it, remux it to faststart and render its
+    poster frame and scrub sprite in a worker thread
+
+    Returns:
+        Tuple of (mime_type, extension, video_info), see
+        utils.video_probe.prepare_video_asset for the video_info fields
+    """
+    extension = "mp4"  # Default to mp4, can be flexible based on codec_name
+    file_path = f"{file_path_without_extension}.{extension}"
+    await download_video(url, file_path)
+    mime_type, info = await prepare_video(file_path)
+    return mime_type, extension, info
 
-        # Get mime type
-        mime_type = mimetypes.types_map.get(".mp4", "video/mp4")
 
-        print(
-            f"🎥 Video info - width: {width}, height: {height}, mime_type: {mime_type}, extension: {extension}"
-        )
+async def prepare_video(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Probe a downloaded video, remux it to faststart and render its poster
+    frame and scrub sprite in a worker thread
 
-        return mime_type, width, height, extension
+    Returns:
+        Tuple of (mime_type, video_info)
+    """
+    try:
+        info = await run_in_threadpool(_prepare_video_file, file_path)
     except Exception as e:
-        print(f"Error probing video file {temp_path}: {str(e)}")
+        print(f"Error probing video file {file_path}: {str(e)}")
         raise e
 
+    mime_type = mimetypes.types_map.get(".mp4", "video/mp4")
+    print(
+        f"🎥 Video info - width: {info['width']}, height: {info['height']}, "
+        f"duration: {info['duration']}s, codec: {info['codec']}, mime_type: {mime_type}"
+    )
+    return mime_type, info
+
+
+async def get_video_info_and_save(
+    url: str, file_path_without_extension: str
+) -> Tuple[str, int, int, str]:
+    mime_type, extension, info = await download_and_prepare_video(
+        url, file_path_without_extension
+    )
+    return mime_type, info["width"], info["height"], extension
+
+
+def video_preview_data(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Poster / sprite references stored on the canvas element and file entry"""
+    preview: Dict[str, Any] = {"duration": info.get("duration", 0)}
+    if info.get("poster"):
+        preview["posterURL"] = f"/api/file/{info['poster']}"
+    if info.get("sprite"):
+        preview["spriteURL"] = f"/api/file/{info['sprite']}"
+        preview["spriteFrames"] = info.get("sprite_frames", 0)
+    return preview
+
 
 async def generate_new_video_element(
     canvas_id: str,
     fileid: str,
     video_data: Dict[str, Any],
     canvas_data: Optional[Dict[str, Any]] = None,
+    position: Optional[Tuple[float, float]] = None,
 ) -> Dict[str, Any]:
-    """Generate new video element for canvas"""
+    """Generate new video element for canvas, at `position` or the next free slot"""
     if canvas_data is None:
         canvas = await db_service.get_canvas_data(canvas_id)
         if canvas is None:
             canvas = {"data": {}}
         canvas_data = canvas.get("data", {})
 
-    new_x, new_y = await find_next_best_element_position(canvas_data)
+    if position is None:
+        position = await find_next_best_element_position(canvas_data)
+    new_x, new_y = position
 
     return {
         "type": "video",
@@ -293,4 +318,5 @@ async def generate_new_video_element(
         "status": "saved",
         "scale": [1, 1],
         "crop": None,
+        "customData": video_data.get("preview", {}),
     }
@@ -6,9 +6,14 @@ Contains the main orchestration logic for video generation across different prov
 import traceback
 from typing import List, cast, Optional, Any
 from models.config_model import ModelInfo
+from services.jaaz_service import JaazService
+from services.generation_job_service import generation_job_service, JobContext
+from services.rate_limit_service import rate_limit_service
+from ..utils.provider_router import call_with_failover
 from ..video_providers.video_base_provider import get_default_provider, VideoProviderBase
 # Import all providers to ensure automatic registration (don't delete these imports)
 from ..video_providers.volces_provider import VolcesVideoProvider  # type: ignore
+from ..utils.image_canvas_utils import reserve_placeholders, discard_placeholders, placeholder_size
 from .video_canvas_utils import (
     send_video_start_notification,
     send_video_error_notification,
@@ -16,6 +21,13 @@ from .video_canvas_utils import (
 )
 
 
+async def _reserve_placeholder(session_id: str, canvas_id: str, aspect_ratio: str, prompt: str) -> Optional[str]:
+    # Videos take minutes, reserve their canvas space right away
+    placeholder_ids = await reserve_placeholders(
+        session_id, canvas_id, [placeholder_size(aspect_ratio)], prompt)
+    return placeholder_ids[0] if placeholder_ids else None
+
+
 async def generate_video_with_provider(
     prompt: str,
     resolution: str,
@@ -57,55 +69,165 @@ async def generate_video_with_provider(
     # Inject the tool call id into the context
     ctx['tool_call_id'] = tool_call_id
 
-    try:
-        # Determine provider selection
+    # Determine provider selection
+    model_info_list: List[ModelInfo] = cast(
+        List[ModelInfo], ctx.get('model_info', {}).get(model_name, []))
+
+    if model_info_list == []:
+        # video registed as tool
         model_info_list: List[ModelInfo] = cast(
-            List[ModelInfo], ctx.get('model_info', {}).get(model_name, []))
+            List[ModelInfo], ctx.get('tool_list', {}))
+
+    # Use get_default_provider which already handles Jaaz prioritization
+    provider_name = get_default_provider(model_info_list)
+    placeholder_id = await _reserve_placeholder(session_id, canvas_id, aspect_ratio, prompt)
+
+    # The provider call runs in a generation job worker, see _run_video_job
+    return await generation_job_service.run(
+        "video",
+        {
+            "provider_name": provider_name,
+            "model": model,
+            "prompt": prompt,
+            "resolution": resolution,
+            "duration": duration,
+            "aspect_ratio": aspect_ratio,
+            "input_images": input_images,
+            "camera_fixed": camera_fixed,
+            "kwargs": kwargs,
+            "placeholder_id": placeholder_id,
+        },
+        session_id=session_id,
+        canvas_id=canvas_id,
+    )
+
+
+async def generate_video_with_jaaz(
+    session_id: str,
+    canvas_id: str,
+    prompt: str,
+    model: str,
+    label: str,
+    provider_name: str,
+    endpoint: str = "sunra",
+    input_images: Optional[list[str]] = None,
+    **params: Any
+) -> str:
+    """
+    Generate a video through the Jaaz cloud API in a generation job
+
+    Args:
+        session_id: Session ID for notifications
+        canvas_id: Canvas ID to add the video to
+        prompt: Video generation prompt
+        model: Jaaz model name (e.g. 'kling-v2.1-standard')
+        label: Human readable model name used in notifications
+        provider_name: Provider name used in logs (e.g. 'jaaz_kling')
+        endpoint: Jaaz generation endpoint, 'sunra' or 'seedance'
+        input_images: Optional processed input images
+        **params: Extra generation parameters (resolution, duration, ...)
+
+    Returns:
+        str: Generation result message
+    """
+    placeholder_id = await _reserve_placeholder(
+        session_id, canvas_id, str(params.get("aspect_ratio") or "16:9"), prompt)
+    return await generation_job_service.run(
+        "jaaz_video",
+        {
+            "placeholder_id": placeholder_id,
+            "prompt": prompt,
+            "model": model,
+            "label": label,
+            "provider_name": provider_name,
+            "endpoint": endpoint,
+            "input_images": input_images,
+            "params": params,
+        },
+        session_id=session_id,
+        canvas_id=canvas_id,
+    )
+
+
+async def _discard_placeholder(job: JobContext) -> None:
+    placeholder_id = job.payload.get("placeholder_id")
+    if placeholder_id:
+        await discard_placeholders(job.session_id, job.canvas_id, [placeholder_id])
 
-        if model_info_list == []:
-            # video registed as tool
-            model_info_list: List[ModelInfo] = cast(
-                List[ModelInfo], ctx.get('tool_list', {}))
 
-        # Use get_default_provider which already handles Jaaz prioritization
-        provider_name = get_default_provider(model_info_list)
+async def _run_video_job(job: JobContext) -> str:
+    try:
+        return await _generate_video(job)
+    except BaseException:
+        # Failed or cancelled, free the reserved canvas space
+        await _discard_placeholder(job)
+        raise
+
+
+async def _generate_video(job: JobContext) -> str:
+    payload = job.payload
+    model: str = payload["model"]
+    model_name = model.split('/')[-1]
+    provider_name: str = payload["provider_name"]
+    session_id = job.session_id
 
+    try:
         print(f"🎥 Using provider: {provider_name} for {model_name}")
 
         # Create provider instance
         provider_instance = VideoProviderBase.create_provider(provider_name)
+        generate_args: dict[str, Any] = {
+            "prompt": payload["prompt"],
+            "model": model,
+            "resolution": payload["resolution"],
+            "duration": payload["duration"],
+            "aspect_ratio": payload["aspect_ratio"],
+            "input_images": payload.get("input_images"),
+            "camera_fixed": payload.get("camera_fixed", True),
+            **payload.get("kwargs", {}),
+        }
 
-        # Send start notification
-        await send_video_start_notification(
-            session_id,
-            f"Starting video generation using {model_name} via {provider_name}..."
-        )
-
-        # Process input images for the provider
-        processed_input_images = None
-        if input_images:
-            # For some providers, we might need to process input images differently
-            # For now, just pass them as is
-            processed_input_images = input_images
-
-        # Generate video using the selected provider
-        video_url = await provider_instance.generate(
-            prompt=prompt,
-            model=model,
-            resolution=resolution,
-            duration=duration,
-            aspect_ratio=aspect_ratio,
-            input_images=processed_input_images,
-            camera_fixed=camera_fixed,
-            **kwargs
-        )
+        if provider_instance.supports_resume:
+            task_id = job.remote_task_id
+            if not task_id:
+                await send_video_start_notification(
+                    session_id,
+                    f"Starting video generation using {model_name} via {provider_name}..."
+                )
+                # Only the create request takes a provider admission slot:
+                # polling a task for minutes must not block image calls
+                async with rate_limit_service.acquire(provider_name, model, session_id):
+                    # Breaker-guarded, never retried (a retry could start a second paid task)
+                    task_id, _, _ = await call_with_failover(
+                        [(provider_name, model)],
+                        lambda _provider, _model: provider_instance.create_task(**generate_args),
+                        retries=0,
+                        hedge=False,
+                    )
+                await job.set_remote_task_id(task_id)
+            video_url = await provider_instance.wait_for_task(task_id)
+        else:
+            await send_video_start_notification(
+                session_id,
+                f"Starting video generation using {model_name} via {provider_name}..."
+            )
+            # generate() creates and waits in one call; it is admitted through a
+            # separate video gate so it never holds the provider's image slots
+            async with rate_limit_service.acquire(f"{provider_name}:video", model, session_id):
+                video_url, _, _ = await call_with_failover(
+                    [(provider_name, model)],
+                    lambda _provider, _model: provider_instance.generate(**generate_args),
+                    retries=0,
+                    hedge=False,
+                )
 
         # Process video result (save, update canvas, notify)
         return await process_video_result(
             video_url=video_url,
             session_id=session_id,
-            canvas_id=canvas_id,
-            provider_name=f"{model_name} ({provider_name})"
+            canvas_id=job.canvas_id,
+            provider_name=f"{model_name} ({provider_name})",
+            placeholder_id=payload.get("placeholder_id"),
         )
 
     except Exception as e:
@@ -119,3 +241,66 @@ async def generate_video_with_provider(
         # Re-raise the exception for proper error handling
         raise Exception(
             f"{model_name} video generation failed: {error_message}")
+
+
+async def _run_jaaz_video_job(job: JobContext) -> str:
+    try:
+        return await _generate_jaaz_video(job)
+    except BaseException:
+        # Failed or cancelled, free the reserved canvas space
+        await _discard_placeholder(job)
+        raise
+
+
+async def _generate_jaaz_video(job: JobContext) -> str:
+    payload = job.payload
+    jaaz_service = JaazService()
+
+    task_id = job.remote_task_id
+    if not task_id:
+        await send_video_start_notification(
+            job.session_id,
+            f"Starting {payload['label']} video generation..."
+        )
+        create_task = (
+            jaaz_service.create_seedance_video_task
+            if payload.get("endpoint") == "seedance"
+            else jaaz_service.create_video_task
+        )
+        # Only the create request takes a jaaz admission slot: polling runs
+        # for up to 10 minutes and must not block jaaz image calls
+        async with rate_limit_service.acquire("jaaz", payload["model"], job.session_id):
+            # Breaker-guarded, never retried (a retry could start a second paid task)
+            task_id, _, _ = await call_with_failover(
+                [("jaaz", payload["model"])],
+                lambda _provider, _model: create_task(
+                    prompt=payload["prompt"],
+                    model=payload["model"],
+                    input_images=payload.get("input_images"),
+                    **payload.get("params", {}),
+                ),
+                retries=0,
+                hedge=False,
+            )
+        await job.set_remote_task_id(task_id)
+
+    result = await jaaz_service.poll_for_task_completion(task_id)
+    if result.get('error'):
+        raise Exception(f"Video generation failed: {result['error']}")
+
+    video_url = result.get('result_url')
+    if not video_url:
+        raise Exception("No video URL returned from generation")
+
+    # Process video result (save, update canvas, notify)
+    return await process_video_result(
+        video_url=video_url,
+        session_id=job.session_id,
+        canvas_id=job.canvas_id,
+        provider_name=payload["provider_name"],
+        placeholder_id=payload.get("placeholder_id"),
+    )
+
+
+generation_job_service.register_handler("video", _run_video_job)
+generation_job_service.register_handler("jaaz_video", _run_jaaz_video_job)
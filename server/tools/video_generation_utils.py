@@ -1,7 +1,5 @@
 # from engineio import payload
-from utils.http_client import HttpClient
 
-import aiofiles
 import io
 import os
 import base64
@@ -10,8 +8,6 @@ from PIL import Image
 from nanoid import generate
 from mimetypes import guess_type
 # import httpx
-import mimetypes
-from pymediainfo import MediaInfo
 from PIL import Image
 
 
@@ -22,43 +18,6 @@ def generate_video_file_id():
     return "vi_" + generate(size=8)
 
 
-async def get_video_info_and_save(
-    url: str, file_path_without_extension: str
-) -> tuple[str, int, int, str]:
-    # Fetch the video asynchronously
-    async with HttpClient.create_aiohttp() as session:
-        async with session.get(url) as response:
-            video_content = await response.read()
-
-    # Save to temporary mp4 file first
-    temp_path = f"{file_path_without_extension}.mp4"
-    async with aiofiles.open(temp_path, "wb") as out_file:
-        await out_file.write(video_content)
-    print("🎥 Video saved to", temp_path)
-
-    try:
-        media_info = MediaInfo.parse(temp_path)
-        for track in media_info.tracks:  # type: ignore
-            if track.track_type == "Video":
-                width = track.width
-                height = track.height
-                print(f"Width: {width}, Height: {height}")
-
-        extension = "mp4"  # 默认使用 mp4，实际情况可以根据 codec_name 灵活判断
-
-        # Get mime type
-        mime_type = mimetypes.types_map.get(".mp4", "video/mp4")
-
-        print(
-            f"🎥 Video info - width: {width}, height: {height}, mime_type: {mime_type}, extension: {extension}"
-        )
-
-        return mime_type, width, height, extension
-    except Exception as e:
-        print(f"Error probing video file {temp_path}: {str(e)}")
-        raise e
-
-
 def get_image_base64(image_name: str):
     # Process image
     image_path = os.path.join(FILES_DIR, f"{image_name}")
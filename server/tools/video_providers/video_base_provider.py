@@ -59,6 +59,32 @@ class VideoProviderBase(ABC):
         """
         pass
 
+    # Providers backed by a remote task API can split generate() into
+    # create_task() + wait_for_task(), so a generation job interrupted by a
+    # restart resumes polling the remote task instead of starting over.
+
+    @property
+    def supports_resume(self) -> bool:
+        return type(self).create_task is not VideoProviderBase.create_task
+
+    async def create_task(
+        self,
+        prompt: str,
+        model: str,
+        resolution: str = "480p",
+        duration: int = 5,
+        aspect_ratio: str = "16:9",
+        input_images: Optional[list[str]] = None,
+        camera_fixed: bool = True,
+        **kwargs: Any
+    ) -> str:
+        """Create a remote generation task and return its task ID"""
+        raise NotImplementedError
+
+    async def wait_for_task(self, task_id: str) -> str:
+        """Wait for a remote generation task and return the video URL"""
+        raise NotImplementedError
+
 
 def get_default_provider(model_info_list: Optional[List[ModelInfo]] = None) -> str:
     """Get default provider for video generation
@@ -135,6 +135,35 @@ class VolcesVideoProvider(VideoProviderBase, provider_name="volces"):
         Returns:
             str: Video URL for download
         """
+        task_id = await self.create_task(
+            prompt=prompt,
+            model=model,
+            resolution=resolution,
+            duration=duration,
+            aspect_ratio=aspect_ratio,
+            input_images=input_images,
+            camera_fixed=camera_fixed,
+            **kwargs
+        )
+        return await self.wait_for_task(task_id)
+
+    async def create_task(
+        self,
+        prompt: str,
+        model: str,
+        resolution: str = "480p",
+        duration: int = 5,
+        aspect_ratio: str = "16:9",
+        input_images: Optional[List[str]] = None,
+        camera_fixed: bool = True,
+        **kwargs: Any
+    ) -> str:
+        """
+        Create a Volces video generation task
+
+        Returns:
+            str: Volces task ID
+        """
         try:
             api_url = self._build_api_url()
             headers = self._build_headers()
@@ -182,8 +211,17 @@ class VolcesVideoProvider(VideoProviderBase, provider_name="volces"):
                 print(
                     f"🎥 Volces video generation task created, task_id: {task_id}")
 
-            # Poll for task completion
-            video_url = await self._poll_task_status(task_id, headers)
+            return task_id
+
+        except Exception as e:
+            print(f"🎥 Error generating video with Volces: {str(e)}")
+            traceback.print_exc()
+            raise e
+
+    async def wait_for_task(self, task_id: str) -> str:
+        """Poll a Volces task until completion and return the video URL"""
+        try:
+            video_url = await self._poll_task_status(task_id, self._build_headers())
             print(
                 f"🎥 Volces video generation completed, video URL: {video_url}")
 
@@ -0,0 +1,163 @@
+"""
+Chunking, tokenization and BM25 scoring for local text retrieval
+
+Text is split into overlapping chunks of about CHUNK_CHARS characters on
+paragraph boundaries. Tokens are lowercase latin words/numbers plus character
+bigrams for CJK runs, so Chinese/Japanese text without spaces is searchable.
+
+An index is assembled from per-document segments (term ids and term
+frequencies of each chunk), so a changed document only needs its own segment
+rebuilt. Scoring walks an inverted index with NumPy: for every query term the
+postings slice is scored in one vectorized step and accumulated into the
+chunk scores.
+"""
+
+import re
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+CHUNK_CHARS = 800
+CHUNK_OVERLAP = 120
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(
+    r"[a-z0-9]+(?:['_-][a-z0-9]+)*"
+    r"|[぀-ヿ㐀-䶿一-鿿가-힯]+"
+)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for match in _TOKEN_RE.findall(text.lower()):
+        if match.isascii():
+            tokens.append(match)
+        elif len(match) == 1:
+            tokens.append(match)
+        else:
+            tokens.extend(match[i:i + 2] for i in range(len(match) - 1))
+    return tokens
+
+
+def strip_html(text: str) -> str:
+    """Rich-text editor content may be HTML; keep paragraph breaks, drop tags"""
+    if "<" not in text:
+        return text
+    text = re.sub(r"(?i)</(p|div|h[1-6]|li|tr|blockquote|pre)>|<br\s*/?>", "\n\n", text)
+    return _HTML_TAG_RE.sub("", text)
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Pack paragraphs into chunks of at most `size` characters"""
+    paragraphs = [p.strip() for p in _PARAGRAPH_RE.split(strip_html(text)) if p.strip()]
+    chunks: List[str] = []
+    current = ""
+    for paragraph in paragraphs:
+        # Paragraphs longer than a chunk are cut with some overlap
+        while len(paragraph) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:size])
+            paragraph = paragraph[size - overlap:]
+        if current and len(current) + len(paragraph) + 2 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# Segment: (term_ids int32, term_freqs float32, chunk_offsets int64)
+# chunk i owns entries chunk_offsets[i]:chunk_offsets[i + 1]
+Segment = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def build_segment(chunks: Sequence[str], vocab: Dict[str, int]) -> Segment:
+    """Term ids/frequencies of each chunk; new terms are added to vocab"""
+    term_ids: List[int] = []
+    term_freqs: List[int] = []
+    offsets = [0]
+    for chunk in chunks:
+        counts: Dict[int, int] = {}
+        for token in tokenize(chunk):
+            term_id = vocab.get(token)
+            if term_id is None:
+                term_id = vocab[token] = len(vocab)
+            counts[term_id] = counts.get(term_id, 0) + 1
+        term_ids.extend(counts.keys())
+        term_freqs.extend(counts.values())
+        offsets.append(len(term_ids))
+    return (
+        np.asarray(term_ids, dtype=np.int32),
+        np.asarray(term_freqs, dtype=np.float32),
+        np.asarray(offsets, dtype=np.int64),
+    )
+
+
+class BM25Index:
+    """Immutable BM25 index over the chunks of several segments"""
+
+    def __init__(self, segments: Sequence[Segment], vocab_size: int,
+                 k1: float = BM25_K1, b: float = BM25_B) -> None:
+        term_ids: List[np.ndarray] = []
+        term_freqs: List[np.ndarray] = []
+        chunk_ids: List[np.ndarray] = []
+        chunk_lengths: List[np.ndarray] = []
+        base = 0
+        for seg_terms, seg_freqs, seg_offsets in segments:
+            n_chunks = len(seg_offsets) - 1
+            counts = np.diff(seg_offsets)
+            term_ids.append(seg_terms)
+            term_freqs.append(seg_freqs)
+            chunk_ids.append(np.repeat(np.arange(base, base + n_chunks, dtype=np.int32), counts))
+            chunk_lengths.append(np.add.reduceat(seg_freqs, seg_offsets[:-1]) if len(seg_freqs)
+                                 else np.zeros(n_chunks, dtype=np.float32))
+            # reduceat yields the next value for empty chunks; zero them
+            chunk_lengths[-1][counts == 0] = 0
+            base += n_chunks
+
+        self.num_chunks = base
+        all_terms = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int32)
+        all_freqs = np.concatenate(term_freqs) if term_freqs else np.zeros(0, dtype=np.float32)
+        all_chunks = np.concatenate(chunk_ids) if chunk_ids else np.zeros(0, dtype=np.int32)
+        lengths = np.concatenate(chunk_lengths) if chunk_lengths else np.zeros(0, dtype=np.float32)
+
+        # Inverted index: postings sorted by term, term t owns
+        # postings[term_offsets[t]:term_offsets[t + 1]]
+        order = np.argsort(all_terms, kind="stable")
+        self._post_chunks = all_chunks[order]
+        sorted_terms = all_terms[order]
+        self._term_offsets = np.searchsorted(sorted_terms, np.arange(vocab_size + 1))
+
+        avg_length = float(lengths.mean()) if base else 0.0
+        # Precomputed BM25 term weight of every posting
+        norm = k1 * (1 - b + b * lengths / avg_length) if avg_length else np.full(base, k1)
+        freqs = all_freqs[order]
+        self._post_weights = (freqs * (k1 + 1) / (freqs + norm[self._post_chunks])).astype(np.float32)
+
+        doc_freq = np.diff(self._term_offsets).astype(np.float64)
+        self._idf = np.log(1 + (base - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    def search(self, query_term_ids: Sequence[int], top_k: int) -> List[Tuple[int, float]]:
+        """Top-k (chunk index, score) with a positive score, best first"""
+        if not self.num_chunks:
+            return []
+        scores = np.zeros(self.num_chunks, dtype=np.float32)
+        for term_id in set(query_term_ids):
+            if term_id < 0 or term_id + 1 >= len(self._term_offsets):
+                continue
+            start, end = self._term_offsets[term_id], self._term_offsets[term_id + 1]
+            if start == end:
+                continue
+            # Chunks appear at most once per term, so a fancy-index add is safe
+            scores[self._post_chunks[start:end]] += self._idf[term_id] * self._post_weights[start:end]
+
+        k = min(top_k, self.num_chunks)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in candidates if scores[i] > 0]
@@ -0,0 +1,104 @@
+"""
+Parsed file snapshots and atomic writes for settings/config files
+
+CachedFile keeps the parsed content of a file in memory and re-parses it only
+when the file's signature (inode, mtime, size) changes, so request paths pay a
+stat() instead of an open() + parse. An inode change catches editors and
+write_atomic() replacing the file, an mtime/size change catches in-place edits.
+
+write_atomic() writes to a temporary file in the same directory and renames
+it over the target, so readers never see a half-written file.
+
+All functions here are blocking, run them in a thread pool from async code.
+"""
+
+import os
+import tempfile
+import threading
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+FileSignature = Tuple[int, int, int]
+
+
+def file_signature(path: str) -> Optional[FileSignature]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def write_atomic(path: str, content: str) -> FileSignature:
+    """
+    Replace a file with `content` via temp file + rename
+
+    Returns:
+        Signature of the written file
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    signature = file_signature(path)
+    assert signature is not None
+    return signature
+
+
+class CachedFile(Generic[T]):
+    """In-memory snapshot of a parsed file, invalidated on signature change"""
+
+    def __init__(self, path: str, parse: Callable[[str], T]) -> None:
+        self.path = path
+        self._parse = parse
+        self._lock = threading.Lock()
+        self._signature: Optional[FileSignature] = None
+        self._value: Optional[T] = None
+
+    def get(self) -> Tuple[Optional[T], bool]:
+        """
+        Current parsed content
+
+        Returns:
+            (value, reloaded): value is None if the file does not exist;
+            reloaded tells whether the file was (re-)parsed by this call
+
+        Raises:
+            Whatever `parse` raises for a malformed file; the previous
+            snapshot is kept so the next call retries
+        """
+        signature = file_signature(self.path)
+        if signature is not None and signature == self._signature:
+            return self._value, False
+        with self._lock:
+            if signature is None:
+                self._signature, self._value = None, None
+                return None, False
+            if signature == self._signature:
+                return self._value, False
+            with open(self.path, 'r', encoding='utf-8') as f:
+                value = self._parse(f.read())
+            self._signature, self._value = signature, value
+            return value, True
+
+    def write(self, value: T, content: str) -> None:
+        """Write `content` atomically and make `value` the snapshot for it"""
+        with self._lock:
+            self._signature = write_atomic(self.path, content)
+            self._value = value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signature, self._value = None, None
@@ -1,3 +1,4 @@
+import math
 from typing import Optional, Dict, Any, Union
 from services.db_service import db_service
 
@@ -55,4 +56,14 @@ async def find_next_best_element_position(canvas_data, max_num_per_row=4, spacin
         bottom_of_last_row = max(e.get("y", 0) + e.get("height", 0) for e in last_row)
         new_y = bottom_of_last_row + spacing
 
-    return new_x, new_y
\ No newline at end of file
+    return new_x, new_y
+
+def grid_offsets(sizes, spacing=20):
+    """
+    Offsets of elements laid out in a near-square grid, relative to its top-left
+    corner. Cells are sized to the largest element.
+    """
+    columns = math.ceil(math.sqrt(len(sizes)))
+    cell_width = max(width for width, _ in sizes) + spacing
+    cell_height = max(height for _, height in sizes) + spacing
+    return [((i % columns) * cell_width, (i // columns) * cell_height) for i in range(len(sizes))]
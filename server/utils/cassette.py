@@ -0,0 +1,146 @@
+"""
+Cassette files: recorded model streams and provider calls
+
+A cassette is a gzip-compressed JSON lines file. The first line is the header
+({"cassette": 1, "kind": ..., "key": ..., "inputs": ...}), every further line
+is one event `[t, type, data]`: `t` is the offset in seconds from the start
+of the recording, `type` says what `data` holds ("chunk", "http", "result",
+"error"). See services/cassette_service.py for recording and replay.
+
+Values are stored as JSON; LangChain messages are stored with
+message_to_dict() as {"__message__": {...}} and restored as the same message
+class. Other values JSON cannot hold are stored as their str().
+
+All functions here are blocking, run them in a thread pool from async code.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+CASSETTE_VERSION = 1
+CASSETTE_SUFFIX = '.jsonl.gz'
+
+# [offset seconds, event type, data]
+CassetteEvent = List[Any]
+
+_TEXT_TYPES = ('application/json', 'text/', 'application/x-www-form-urlencoded')
+
+
+def encode_value(value: Any) -> Any:
+    """JSON-compatible form of a stream chunk, messages included"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): encode_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    # Only streams from the agent stack hold messages, langchain is loaded then
+    from langchain_core.messages import BaseMessage, message_to_dict
+
+    if isinstance(value, BaseMessage):
+        return {'__message__': message_to_dict(value)}
+    return str(value)
+
+
+def decode_value(value: Any) -> Any:
+    """Inverse of encode_value(); tuples come back as lists"""
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    if isinstance(value, dict):
+        if '__message__' in value and len(value) == 1:
+            from langchain_core.messages import messages_from_dict
+
+            return messages_from_dict([value['__message__']])[0]
+        return {k: decode_value(v) for k, v in value.items()}
+    return value
+
+
+def encode_body(data: bytes, content_type: str, max_size: int) -> Any:
+    """
+    Stored form of an HTTP body: text for JSON/text bodies, {"b64": ...} for
+    other content, {"size", "sha256"} for bodies over max_size
+    """
+    if len(data) > max_size:
+        return {'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+    if content_type.startswith(_TEXT_TYPES):
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    return {'b64': base64.b64encode(data).decode('ascii')}
+
+
+def decode_body(body: Any) -> Optional[bytes]:
+    """Bytes of a stored body, None when only its size was kept"""
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    if isinstance(body, dict) and 'b64' in body:
+        return base64.b64decode(body['b64'])
+    return None
+
+
+def request_key(*parts: Any) -> str:
+    """Short stable digest of the inputs a cassette is looked up by"""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def write_cassette(path: str, header: Dict[str, Any], events: List[CassetteEvent]) -> int:
+    """
+    Write a cassette via temp file + rename
+
+    Returns:
+        int: Compressed size in bytes
+    """
+    lines = [json.dumps({'cassette': CASSETTE_VERSION, **header}, ensure_ascii=False, separators=(',', ':'))]
+    lines.extend(json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str) for event in events)
+    content = gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'))
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return len(content)
+
+
+def read_cassette(path: str) -> Tuple[Dict[str, Any], List[CassetteEvent]]:
+    """
+    Header and events of a cassette
+
+    Raises:
+        ValueError: Not a cassette, or written by a newer version
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    if not lines:
+        raise ValueError(f'{path} is empty')
+    header = json.loads(lines[0])
+    if not isinstance(header, dict) or 'cassette' not in header or header['cassette'] > CASSETTE_VERSION:
+        raise ValueError(f'{path} is not a version {CASSETTE_VERSION} cassette')
+    return header, [json.loads(line) for line in lines[1:]]
+
+
+def list_cassettes(directory: str, prefix: str = '') -> List[str]:
+    """Paths of the cassettes in directory whose name starts with prefix, sorted"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [
+        os.path.join(directory, name) for name in sorted(names)
+        if name.startswith(prefix) and name.endswith(CASSETTE_SUFFIX)
+    ]
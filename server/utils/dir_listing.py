@@ -0,0 +1,252 @@
+"""
+Directory listing helpers for the workspace / file browser endpoints
+
+Directories are read with a single os.scandir pass (one stat per entry) and
+the result is cached per directory. A cached listing is reused while the
+directory's mtime and inode are unchanged, which covers files being added,
+removed or renamed; LISTING_TTL bounds how stale sizes and mtimes of files
+modified in place can get.
+
+Sorting, filtering and keyset pagination are done on the cached listing, so
+paging through a directory with tens of thousands of generated assets does not
+rescan it.
+
+All functions here are blocking, run them in a thread pool from async code.
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LISTING_TTL = 30.0
+MAX_CACHED_DIRS = 128
+MAX_PAGE_SIZE = 1000
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg', '.ico'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.3gp'}
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a'}
+DOCUMENT_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.pages'}
+ARCHIVE_EXTENSIONS = {'.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz'}
+CODE_EXTENSIONS = {'.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.php', '.rb', '.go', '.rs'}
+
+SORT_FIELDS = ('mtime', 'name', 'size')
+
+
+def file_type_from_name(name: str, is_dir: bool = False) -> str:
+    """'folder', 'image', 'video', 'audio', 'document', 'archive', 'code' or 'file'"""
+    if is_dir:
+        return "folder"
+    ext = os.path.splitext(name.lower())[1]
+    if ext in IMAGE_EXTENSIONS:
+        return "image"
+    if ext in VIDEO_EXTENSIONS:
+        return "video"
+    if ext in AUDIO_EXTENSIONS:
+        return "audio"
+    if ext in DOCUMENT_EXTENSIONS:
+        return "document"
+    if ext in ARCHIVE_EXTENSIONS:
+        return "archive"
+    if ext in CODE_EXTENSIONS:
+        return "code"
+    return "file"
+
+
+class _Listing:
+    def __init__(self, mtime_ns: int, inode: int, entries: List[Dict[str, Any]]) -> None:
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.scanned_at = time.monotonic()
+        self.entries = entries
+        # (sort, descending, dirs_first) -> sorted entries
+        self.sorted: Dict[Tuple[str, bool, bool], List[Dict[str, Any]]] = {}
+
+
+_cache: 'OrderedDict[str, _Listing]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _scan(path: str) -> List[Dict[str, Any]]:
+    entries: List[Dict[str, Any]] = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+                stat = entry.stat()
+            except OSError:
+                # Broken symlink or entry removed while scanning
+                continue
+            entries.append({
+                "name": entry.name,
+                "path": entry.path,
+                "is_dir": is_dir,
+                "type": file_type_from_name(entry.name, is_dir),
+                "size": None if is_dir else stat.st_size,
+                "mtime": stat.st_mtime,
+            })
+    return entries
+
+
+def get_listing(path: str) -> _Listing:
+    """
+    Cached listing of a directory
+
+    Raises:
+        FileNotFoundError, NotADirectoryError, PermissionError
+    """
+    key = os.path.realpath(path)
+    dir_stat = os.stat(key)
+    with _cache_lock:
+        listing = _cache.get(key)
+        if (listing is not None
+                and listing.mtime_ns == dir_stat.st_mtime_ns
+                and listing.inode == dir_stat.st_ino
+                and time.monotonic() - listing.scanned_at < LISTING_TTL):
+            _cache.move_to_end(key)
+            return listing
+
+    listing = _Listing(dir_stat.st_mtime_ns, dir_stat.st_ino, _scan(key))
+    with _cache_lock:
+        _cache[key] = listing
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_DIRS:
+            _cache.popitem(last=False)
+    return listing
+
+
+def invalidate(path: str) -> None:
+    """Drop the cached listing of a directory (after changing it ourselves)"""
+    with _cache_lock:
+        _cache.pop(os.path.realpath(path), None)
+
+
+def _sort_key(sort: str, dirs_first: bool) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    if sort == 'name':
+        def key(e: Dict[str, Any]) -> Tuple[Any, ...]:
+            return (e["name"].lower(), e["name"])
+    elif sort == 'size':
+        def key(e: Dict[str, Any]) -> Tuple[Any, ...]:
+            return (e["size"] or 0, e["name"])
+    else:
+        def key(e: Dict[str, Any]) -> Tuple[Any, ...]:
+            return (e["mtime"], e["name"])
+    if not dirs_first:
+        return key
+    return lambda e: (not e["is_dir"],) + key(e)
+
+
+def _sorted_entries(listing: _Listing, sort: str, descending: bool, dirs_first: bool) -> List[Dict[str, Any]]:
+    spec = (sort, descending, dirs_first)
+    entries = listing.sorted.get(spec)
+    if entries is None:
+        key = _sort_key(sort, False)
+        entries = sorted(listing.entries, key=key, reverse=descending)
+        if dirs_first:
+            # Stable sort keeps the requested order within folders and files
+            entries.sort(key=lambda e: not e["is_dir"])
+        listing.sorted[spec] = entries
+    return entries
+
+
+def _is_after(entry_key: Tuple[Any, ...], after: Tuple[Any, ...], descending: bool, dirs_first: bool) -> bool:
+    """Whether an entry sorts strictly after the cursor position"""
+    if dirs_first:
+        # The folder/file group is always ascending, the direction only
+        # applies within a group
+        if entry_key[0] != after[0]:
+            return entry_key[0] > after[0]
+        entry_key, after = entry_key[1:], after[1:]
+    return entry_key < after if descending else entry_key > after
+
+
+def encode_cursor(values: Iterable[Any]) -> str:
+    raw = json.dumps(list(values))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Raises ValueError for malformed cursors"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def query_directory(
+    path: str,
+    sort: str = 'mtime',
+    descending: bool = True,
+    dirs_first: bool = False,
+    include_hidden: bool = True,
+    files_only: bool = False,
+    types: Optional[Iterable[str]] = None,
+    name_contains: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Sorted, filtered page of a directory listing
+
+    Args:
+        path: Directory to list
+        sort: 'mtime', 'name' or 'size' (ties broken by name)
+        descending: Sort direction
+        dirs_first: List folders before files
+        include_hidden: Include dot files
+        files_only: Skip folders
+        types: Only keep these file types (see file_type_from_name)
+        name_contains: Case-insensitive file name filter
+        limit: Page size, None for everything
+        cursor: Cursor returned with the previous page
+
+    Returns:
+        Tuple of (entries, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: Invalid sort field or cursor
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Invalid sort field: {sort}")
+    listing = get_listing(path)
+    entries = _sorted_entries(listing, sort, descending, dirs_first)
+
+    type_set = set(types) if types else None
+    needle = name_contains.lower() if name_contains else None
+    key = _sort_key(sort, dirs_first)
+
+    after: Optional[Tuple[Any, ...]] = None
+    if cursor:
+        after = tuple(decode_cursor(cursor))
+        if len(after) != (3 if dirs_first else 2):
+            raise ValueError("Invalid cursor")
+
+    page: List[Dict[str, Any]] = []
+    next_cursor: Optional[str] = None
+    for entry in entries:
+        if not include_hidden and entry["name"].startswith('.'):
+            continue
+        if files_only and entry["is_dir"]:
+            continue
+        if type_set is not None and entry["type"] not in type_set:
+            continue
+        if needle is not None and needle not in entry["name"].lower():
+            continue
+        if after is not None:
+            try:
+                if not _is_after(key(entry), after, descending, dirs_first):
+                    continue
+            except TypeError:
+                raise ValueError("Invalid cursor")
+        if limit is not None and len(page) == limit:
+            next_cursor = encode_cursor(key(page[-1]))
+            break
+        page.append(entry)
+
+    return page, next_cursor
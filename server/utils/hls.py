@@ -0,0 +1,125 @@
+"""
+HLS packaging helpers
+
+Videos are packaged into VOD HLS renditions stored under
+FILES_DIR/hls/<video_id>/:
+
+    master.m3u8             variant playlist referencing every rendition
+    360p/index.m3u8         rendition playlist
+    360p/seg_000.ts ...     MPEG-TS segments
+
+Output is written to a temporary directory and renamed into place once every
+rendition is done, so a present master.m3u8 always means a complete package.
+
+All functions here are blocking, run them in a thread pool from async code.
+"""
+
+import os
+import re
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+from services.config_service import FILES_DIR
+from utils.video_probe import probe_video, run_ffmpeg
+
+HLS_DIR = os.path.join(FILES_DIR, "hls")
+MASTER_PLAYLIST = "master.m3u8"
+SEGMENT_SECONDS = 4
+# Packaging a long 1080p clip takes a while on small machines
+PACKAGE_TIMEOUT = 15 * 60
+
+# (name, short side in pixels, video bitrate in kbit/s)
+RENDITIONS: List[Tuple[str, int, int]] = [
+    ("360p", 360, 800),
+    ("720p", 720, 2800),
+    ("1080p", 1080, 5000),
+]
+AUDIO_BITRATE_KBPS = 128
+
+
+def video_id_from_filename(filename: str) -> str:
+    """Package directory name for a stored video file name"""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", os.path.splitext(os.path.basename(filename))[0])
+
+
+def package_dir(video_id: str) -> str:
+    return os.path.join(HLS_DIR, video_id)
+
+
+def playlist_url(video_id: str) -> str:
+    return f"/api/hls/{video_id}/{MASTER_PLAYLIST}"
+
+
+def is_packaged(video_id: str) -> bool:
+    return os.path.exists(os.path.join(package_dir(video_id), MASTER_PLAYLIST))
+
+
+def select_renditions(width: int, height: int) -> List[Tuple[str, int, int]]:
+    """Renditions not larger than the source, always at least the smallest one"""
+    short_side = min(width, height) if width and height else 0
+    selected = [r for r in RENDITIONS if r[1] <= short_side]
+    return selected or RENDITIONS[:1]
+
+
+def _scaled_size(width: int, height: int, short_side: int) -> Tuple[int, int]:
+    if not width or not height:
+        return 0, short_side
+    scale = short_side / min(width, height)
+    # libx264 needs even dimensions
+    return int(round(width * scale / 2)) * 2, int(round(height * scale / 2)) * 2
+
+
+def _package_rendition(source: str, out_dir: str, size: Tuple[int, int], bitrate: int) -> bool:
+    os.makedirs(out_dir, exist_ok=True)
+    width, height = size
+    scale = f"scale={width}:{height}" if width else f"scale=-2:{height}"
+    return run_ffmpeg([
+        "-i", source,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", scale,
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main",
+        "-b:v", f"{bitrate}k", "-maxrate", f"{int(bitrate * 1.07)}k", "-bufsize", f"{bitrate * 2}k",
+        # Closed GOPs aligned with segment boundaries across renditions
+        "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT_SECONDS})", "-sc_threshold", "0",
+        "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE_KBPS}k", "-ac", "2",
+        "-f", "hls",
+        "-hls_time", str(SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "seg_%03d.ts"),
+        os.path.join(out_dir, "index.m3u8"),
+    ], timeout=PACKAGE_TIMEOUT)
+
+
+def package_hls(source: str, video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Package a video into HLS renditions
+
+    Returns:
+        Dict with 'url' (master playlist URL) and 'renditions', or None if
+        ffmpeg failed
+    """
+    if is_packaged(video_id):
+        return {"url": playlist_url(video_id), "renditions": None}
+
+    info = probe_video(source)
+    renditions = select_renditions(info["width"], info["height"])
+    tmp_dir = f"{package_dir(video_id)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    try:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        for name, short_side, bitrate in renditions:
+            size = _scaled_size(info["width"], info["height"], short_side)
+            if not _package_rendition(source, os.path.join(tmp_dir, name), size, bitrate):
+                return None
+            bandwidth = (int(bitrate * 1.07) + AUDIO_BITRATE_KBPS) * 1000
+            resolution = f",RESOLUTION={size[0]}x{size[1]}" if size[0] else ""
+            lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}{resolution}")
+            lines.append(f"{name}/index.m3u8")
+
+        with open(os.path.join(tmp_dir, MASTER_PLAYLIST), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_dir, package_dir(video_id))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {"url": playlist_url(video_id), "renditions": [r[0] for r in renditions]}
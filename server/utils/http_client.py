@@ -6,6 +6,7 @@ HTTP 客户端工厂和管理器
 - 连接池管理和超时控制
 - 同步和异步客户端支持
 - 支持代理环境变量 (trust_env=True)
+- 进程内共享的 aiohttp 连接池（keep-alive），启动时可预先建立到各供应商的 TLS 连接
 
 使用指南：
 1. httpx 客户端：
@@ -22,18 +23,26 @@ HTTP 客户端工厂和管理器
        response = client.get("https://api.example.com/data")
 """
 
+import asyncio
 import ssl
 import certifi
 import httpx
-from typing import Optional, Dict, Any, AsyncGenerator, Generator
+from typing import Optional, Dict, Any, AsyncGenerator, Generator, Iterable
+from urllib.parse import urlsplit
 from contextlib import asynccontextmanager, contextmanager
 import aiohttp
+from services.cassette_service import cassette_service
+
+# 共享连接池中空闲连接的保持时间（秒）
+SHARED_KEEPALIVE_SECONDS = 60
 
 
 class HttpClient:
     """HTTP 客户端工厂和管理器"""
 
     _ssl_context: Optional[ssl.SSLContext] = None
+    _shared_session: Optional[aiohttp.ClientSession] = None
+    _shared_loop: Optional[asyncio.AbstractEventLoop] = None
 
     @classmethod
     def _get_ssl_context(cls) -> ssl.SSLContext:
@@ -64,7 +73,7 @@ class HttpClient:
 
     @classmethod
     def _get_aiohttp_config(
-        cls, trust_env: bool = True, **kwargs: Any
+        cls, trust_env: bool = True, keepalive_timeout: float = 0, **kwargs: Any
     ) -> Dict[str, Any]:
         """获取 aiohttp 客户端配置"""
         config = {
@@ -72,10 +81,12 @@ class HttpClient:
                 ssl=cls._get_ssl_context(),
                 limit=200,
                 limit_per_host=50,
-                keepalive_timeout=0,
+                keepalive_timeout=keepalive_timeout,
             ),
             'timeout': aiohttp.ClientTimeout(total=300),
             'trust_env': trust_env,  # 启用环境变量代理支持
+            # 录制模式下记录供应商请求（见 services/cassette_service.py）
+            'trace_configs': cassette_service.trace_configs(),
             **kwargs,
         }
 
@@ -129,10 +140,16 @@ class HttpClient:
     ) -> AsyncGenerator['aiohttp.ClientSession', None]:
         """创建 aiohttp 客户端上下文管理器
 
+        使用默认参数时返回共享的连接池会话（不会在退出时关闭），
+        对同一供应商的连续请求可以复用已建立的 TLS 连接。
+
         Args:
             trust_env: 是否信任环境变量代理设置 (HTTP_PROXY, HTTPS_PROXY, etc.)
             **kwargs: 其他 aiohttp.ClientSession 参数
         """
+        if trust_env and not kwargs:
+            yield cls.get_shared_aiohttp()
+            return
         config = cls._get_aiohttp_config(trust_env=trust_env, **kwargs)
         session = aiohttp.ClientSession(**config)
         try:
@@ -140,6 +157,57 @@ class HttpClient:
         finally:
             await session.close()
 
+    @classmethod
+    def get_shared_aiohttp(cls) -> 'aiohttp.ClientSession':
+        """获取当前事件循环的共享 aiohttp 会话（keep-alive 连接池）"""
+        loop = asyncio.get_running_loop()
+        if cls._shared_session is None or cls._shared_session.closed or cls._shared_loop is not loop:
+            # 会话绑定事件循环；其他循环（如测试）各自创建新的会话
+            cls._shared_session = aiohttp.ClientSession(
+                **cls._get_aiohttp_config(keepalive_timeout=SHARED_KEEPALIVE_SECONDS))
+            cls._shared_loop = loop
+        return cls._shared_session
+
+    @classmethod
+    async def close_shared(cls) -> None:
+        """关闭共享会话（应用关闭时调用）"""
+        if cls._shared_session is not None and not cls._shared_session.closed:
+            await cls._shared_session.close()
+        cls._shared_session = None
+        cls._shared_loop = None
+
+    @classmethod
+    async def warm_up(cls, urls: Iterable[str], timeout: float = 5.0) -> Dict[str, str]:
+        """
+        预先建立到各 URL 所在主机的连接（DNS + TCP + TLS 握手）
+
+        对每个 origin 发送一次 HEAD 请求，连接随后保留在共享连接池中，
+        第一次真正的供应商请求无需再握手。
+
+        Returns:
+            Dict[str, str]: origin -> HTTP 状态码或错误类型
+        """
+        origins = []
+        for url in urls:
+            parts = urlsplit(url)
+            if parts.scheme in ('http', 'https') and parts.netloc:
+                origin = f"{parts.scheme}://{parts.netloc}"
+                if origin not in origins:
+                    origins.append(origin)
+
+        session = cls.get_shared_aiohttp()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+        async def _connect(origin: str) -> str:
+            try:
+                async with session.head(origin, timeout=client_timeout, allow_redirects=False) as response:
+                    return str(response.status)
+            except Exception as e:
+                return f"error: {type(e).__name__}"
+
+        results = await asyncio.gather(*(_connect(origin) for origin in origins))
+        return dict(zip(origins, results))
+
     @classmethod
     def create_aiohttp_client(
         cls, trust_env: bool = True, **kwargs: Any
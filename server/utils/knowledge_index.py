@@ -0,0 +1,238 @@
+"""
+Persistent retrieval index over the enabled knowledge bases
+
+Each knowledge base is chunked and tokenized into its own segment (see
+utils/bm25.py) with its own term list, stored as `<key>.npz` in INDEX_DIR
+together with its chunk texts. `manifest.json` only holds the segment file,
+name and content hash per knowledge base. sync() only re-chunks knowledge
+bases whose content changed, deletes the segments of removed ones and writes
+just the changed segment files, so enabling one more knowledge base does not
+re-process or rewrite the others.
+
+The global vocabulary is not stored: it is rebuilt in memory from the terms of
+the current segments (one np.unique over them), so the terms of removed or
+edited knowledge bases drop out with them. The BM25 postings are then built
+from the remapped segments, a handful of NumPy concatenations.
+
+All functions here are blocking, run them in a thread pool from async code.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from utils.bm25 import BM25Index, Segment, build_segment, chunk_text, tokenize
+
+MANIFEST_VERSION = 2
+
+
+def _content_hash(kb: Dict[str, Any]) -> str:
+    text = f"{kb.get('name', '')}\n{kb.get('description', '')}\n{kb.get('content', '')}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _segment_file(kb_id: str) -> str:
+    return hashlib.sha1(kb_id.encode('utf-8')).hexdigest()[:16] + '.npz'
+
+
+def _atomic_write(path: str, write) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _pack_texts(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob and byte offsets of a list of strings"""
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_texts(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+class KnowledgeIndex:
+    def __init__(self, index_dir: str) -> None:
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._loaded = False
+        # kb id -> {'hash', 'name', 'file', 'fingerprint'}
+        self._kbs: Dict[str, Dict[str, Any]] = {}
+        # kb id -> segment with kb-local term ids, its terms and chunk texts
+        self._segments: Dict[str, Segment] = {}
+        self._terms: Dict[str, np.ndarray] = {}
+        self._chunks: Dict[str, List[str]] = {}
+        # Sorted global vocabulary of the current segments
+        self._vocab = np.zeros(0, dtype=np.str_)
+        self._index: Optional[BM25Index] = None
+        # global chunk index -> (kb id, chunk number)
+        self._chunk_refs: List[Tuple[str, int]] = []
+
+    def _load(self) -> None:
+        self._loaded = True
+        manifest_path = os.path.join(self.index_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != MANIFEST_VERSION:
+                return
+            for kb_id, entry in manifest['kbs'].items():
+                with np.load(os.path.join(self.index_dir, entry['file'])) as data:
+                    self._segments[kb_id] = (data['term_ids'], data['term_freqs'], data['offsets'])
+                    self._terms[kb_id] = data['terms']
+                    self._chunks[kb_id] = _unpack_texts(data['text'], data['text_offsets'])
+                self._kbs[kb_id] = entry
+        except Exception as e:
+            # A damaged index is rebuilt from the settings on the next sync
+            print(f"⚠️ Knowledge index at {self.index_dir} is unreadable, rebuilding: {e}")
+            self._kbs, self._segments, self._terms, self._chunks = {}, {}, {}, {}
+
+    def _save_manifest(self) -> None:
+        manifest = {'version': MANIFEST_VERSION, 'kbs': self._kbs}
+        _atomic_write(os.path.join(self.index_dir, 'manifest.json'),
+                      lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode('utf-8')))
+
+    def _write_segment(self, kb_id: str, file_name: str) -> None:
+        term_ids, term_freqs, offsets = self._segments[kb_id]
+        text, text_offsets = _pack_texts(self._chunks[kb_id])
+        _atomic_write(os.path.join(self.index_dir, file_name), lambda f: np.savez(
+            f, term_ids=term_ids, term_freqs=term_freqs, offsets=offsets,
+            terms=self._terms[kb_id], text=text, text_offsets=text_offsets))
+
+    def sync(self, knowledge_list: List[Dict[str, Any]]) -> bool:
+        """
+        Bring the index in line with the enabled knowledge bases
+
+        Returns:
+            bool: Whether anything changed
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            os.makedirs(self.index_dir, exist_ok=True)
+
+            wanted = {str(kb['id']): kb for kb in knowledge_list if kb.get('id')}
+            changed = False
+            # Only the fingerprint of an unchanged knowledge base moved
+            touched = False
+            for kb_id in list(self._kbs):
+                if kb_id not in wanted:
+                    entry = self._kbs.pop(kb_id)
+                    self._segments.pop(kb_id, None)
+                    self._terms.pop(kb_id, None)
+                    self._chunks.pop(kb_id, None)
+                    try:
+                        os.remove(os.path.join(self.index_dir, entry['file']))
+                    except FileNotFoundError:
+                        pass
+                    changed = True
+
+            for kb_id, kb in wanted.items():
+                # Cheap check first so that unchanged content is not re-hashed
+                fingerprint = [kb.get('updated_at', ''), len(kb.get('content') or '')]
+                entry = self._kbs.get(kb_id)
+                if entry is not None and entry.get('fingerprint') == fingerprint:
+                    continue
+                content_hash = _content_hash(kb)
+                if entry is not None and entry['hash'] == content_hash:
+                    entry['fingerprint'] = fingerprint
+                    touched = True
+                    continue
+
+                parts = [kb.get('name') or '', kb.get('description') or '', kb.get('content') or '']
+                chunks = chunk_text('\n\n'.join(p for p in parts if p))
+                local_vocab: Dict[str, int] = {}
+                self._segments[kb_id] = build_segment(chunks, local_vocab)
+                # Dicts keep insertion order, which is the local term id order
+                self._terms[kb_id] = np.array(list(local_vocab), dtype=np.str_)
+                self._chunks[kb_id] = chunks
+                file_name = _segment_file(kb_id)
+                self._write_segment(kb_id, file_name)
+                self._kbs[kb_id] = {
+                    'hash': content_hash,
+                    'name': kb.get('name', ''),
+                    'file': file_name,
+                    'fingerprint': fingerprint,
+                }
+                print(f"📚 Indexed knowledge base {kb.get('name') or kb_id}: {len(chunks)} chunk(s)")
+                changed = True
+
+            if changed or touched:
+                self._save_manifest()
+            if changed or self._index is None:
+                self._rebuild()
+            return changed
+
+    def _rebuild(self) -> None:
+        kb_ids = list(self._kbs)
+        local_terms = [self._terms[kb_id] for kb_id in kb_ids]
+        if local_terms:
+            self._vocab, inverse = np.unique(np.concatenate(local_terms), return_inverse=True)
+        else:
+            self._vocab, inverse = np.zeros(0, dtype=np.str_), np.zeros(0, dtype=np.int64)
+        segments: List[Segment] = []
+        start = 0
+        for kb_id, terms in zip(kb_ids, local_terms):
+            # kb-local term id -> global term id
+            mapping = inverse[start:start + len(terms)].astype(np.int32)
+            start += len(terms)
+            term_ids, term_freqs, offsets = self._segments[kb_id]
+            segments.append((mapping[term_ids], term_freqs, offsets))
+        self._index = BM25Index(segments, len(self._vocab))
+        self._chunk_refs = [
+            (kb_id, i) for kb_id in kb_ids for i in range(len(self._chunks[kb_id]))
+        ]
+
+    def _term_ids(self, terms: List[str]) -> List[int]:
+        """Global ids of the terms in the vocabulary"""
+        if not terms or not len(self._vocab):
+            return []
+        positions = np.searchsorted(self._vocab, terms)
+        return [
+            int(pos) for term, pos in zip(terms, positions)
+            if pos < len(self._vocab) and self._vocab[pos] == term
+        ]
+
+    def search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        """
+        Top-k chunks for a query, best first
+
+        Returns:
+            List of {'knowledge_id', 'name', 'text', 'score'}
+        """
+        with self._lock:
+            if self._index is None:
+                return []
+            term_ids = self._term_ids(tokenize(query))
+            if not term_ids:
+                return []
+            results = []
+            for chunk_index, score in self._index.search(term_ids, top_k):
+                kb_id, chunk_no = self._chunk_refs[chunk_index]
+                entry = self._kbs[kb_id]
+                results.append({
+                    'knowledge_id': kb_id,
+                    'name': entry['name'],
+                    'text': self._chunks[kb_id][chunk_no],
+                    'score': score,
+                })
+            return results
+
+    def sync_and_search(self, knowledge_list: List[Dict[str, Any]], query: str,
+                        top_k: int) -> List[Dict[str, Any]]:
+        try:
+            self.sync(knowledge_list)
+        except Exception as e:
+            # Fall back to whatever is indexed already
+            print(f"⚠️ Failed to update knowledge index: {e}")
+            traceback.print_exc()
+        return self.search(query, top_k)
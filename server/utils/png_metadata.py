@@ -0,0 +1,162 @@
+"""
+PNG metadata helpers
+
+Generated images are stored as PNG with their generation parameters (prompt,
+model, provider, aspect ratio, input images) in text chunks, see
+tools/utils/image_utils.get_image_info_and_save. The helpers here read the
+dimensions (IHDR) and text chunks (tEXt / zTXt / iTXt) straight from the chunk
+stream, seeking over image data, so nothing is decoded. inject_png_text()
+adds text chunks to an encoded PNG the same way, which lets PNGs returned by
+providers be stored as they are instead of being decoded and re-encoded.
+
+All functions here are blocking, run them in a thread pool from async code.
+"""
+
+import struct
+import zlib
+from typing import BinaryIO, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+# Upper bound for a single text chunk; larger ones are skipped
+MAX_TEXT_CHUNK_SIZE = 4 * 1024 * 1024
+IEND_CHUNK = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+
+class PngHeader(NamedTuple):
+    width: int
+    height: int
+    bit_depth: int
+    # 0 grayscale, 2 RGB, 3 palette, 4 grayscale + alpha, 6 RGBA
+    color_type: int
+    interlace: int
+
+
+def _decode_text_chunk(chunk_type: bytes, data: bytes) -> Optional[Tuple[str, str]]:
+    key, sep, rest = data.partition(b"\x00")
+    if not sep:
+        return None
+    keyword = key.decode("latin-1")
+    try:
+        if chunk_type == b"tEXt":
+            return keyword, rest.decode("latin-1")
+        if chunk_type == b"zTXt":
+            # compression method (1 byte) followed by zlib data
+            return keyword, zlib.decompress(rest[1:]).decode("latin-1")
+        # iTXt: compression flag, compression method, language\0, translated keyword\0, text
+        compressed = rest[0] == 1
+        _, _, rest = rest[2:].partition(b"\x00")
+        _, _, text = rest.partition(b"\x00")
+        if compressed:
+            text = zlib.decompress(text)
+        return keyword, text.decode("utf-8")
+    except (zlib.error, UnicodeDecodeError, IndexError):
+        return None
+
+
+def read_png_info(f: BinaryIO) -> Tuple[int, int, Dict[str, str]]:
+    """
+    Read (width, height, text chunks) from a PNG file object
+
+    Raises:
+        ValueError: Not a PNG file
+    """
+    if f.read(8) != PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+
+    width = height = 0
+    text: Dict[str, str] = {}
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IHDR":
+            data = f.read(length)
+            width, height = struct.unpack(">II", data[:8])
+            f.seek(4, 1)  # CRC
+        elif chunk_type in TEXT_CHUNKS and length <= MAX_TEXT_CHUNK_SIZE:
+            decoded = _decode_text_chunk(chunk_type, f.read(length))
+            if decoded is not None:
+                text[decoded[0]] = decoded[1]
+            f.seek(4, 1)
+        elif chunk_type == b"IEND":
+            break
+        else:
+            f.seek(length + 4, 1)
+    return width, height, text
+
+
+def read_png_file_info(path: str) -> Tuple[int, int, Dict[str, str]]:
+    """read_png_info() for a file path"""
+    with open(path, "rb") as f:
+        return read_png_info(f)
+
+
+def read_png_header(data: bytes) -> PngHeader:
+    """
+    Validate the signature and IHDR chunk of an encoded PNG and return IHDR
+
+    Raises:
+        ValueError: Not a PNG, or its IHDR is missing or corrupt
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG file")
+    # IHDR must be the first chunk: length (13), type, 13 data bytes, CRC
+    length, chunk_type = struct.unpack(">I4s", data[8:16])
+    if chunk_type != b"IHDR" or length != 13 or len(data) < 33:
+        raise ValueError("PNG has no valid IHDR chunk")
+    ihdr = data[16:29]
+    if zlib.crc32(chunk_type + ihdr) != struct.unpack(">I", data[29:33])[0]:
+        raise ValueError("PNG IHDR checksum mismatch")
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", ihdr)
+    if width == 0 or height == 0:
+        raise ValueError("PNG has zero dimensions")
+    return PngHeader(width, height, bit_depth, color_type, interlace)
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def text_chunk(keyword: str, value: str) -> bytes:
+    """tEXt chunk, or an uncompressed iTXt chunk when the value is not latin-1"""
+    key = keyword.encode("latin-1")[:79]
+    try:
+        return _chunk(b"tEXt", key + b"\x00" + value.encode("latin-1"))
+    except UnicodeEncodeError:
+        # keyword\0, compression flag, compression method, language\0, translated keyword\0, text
+        return _chunk(b"iTXt", key + b"\x00\x00\x00\x00\x00" + value.encode("utf-8"))
+
+
+def inject_png_text(data: bytes, text: Mapping[str, str]) -> bytes:
+    """
+    Add text chunks to an encoded PNG without decoding it
+
+    The chunks are inserted right after IHDR. Existing text chunks with the
+    same keywords are dropped, so the new values win. The PNG must have passed
+    read_png_header() and end with IEND.
+
+    Raises:
+        ValueError: Truncated or corrupt chunk stream
+    """
+    if not data.endswith(IEND_CHUNK):
+        raise ValueError("PNG is truncated (no IEND chunk at the end)")
+    keywords = {key.encode("latin-1")[:79] for key in text}
+    parts: List[bytes] = [data[:33]]
+    parts.extend(text_chunk(key, value) for key, value in text.items())
+
+    # Copy the remaining chunks, skipping the replaced text chunks
+    pos = 33
+    end = len(data)
+    while pos < end:
+        if pos + 12 > end:
+            raise ValueError("PNG chunk stream is truncated")
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk_end = pos + 12 + length
+        if chunk_end > end:
+            raise ValueError("PNG chunk stream is truncated")
+        if not (chunk_type in TEXT_CHUNKS and data[pos + 8:chunk_end - 4].partition(b"\x00")[0] in keywords):
+            parts.append(data[pos:chunk_end])
+        pos = chunk_end
+    return b"".join(parts)
@@ -0,0 +1,132 @@
+"""
+Canvas thumbnail helpers
+
+Canvas thumbnails are stored as small WEBP files in the asset store (FILES_DIR)
+and referenced from the `canvases.thumbnail` column by URL, instead of keeping
+the full base64 data URL sent by the frontend inline in the database.
+
+The thumbnail file name embeds a hash of its source, so repeated saves of the
+same canvas with the same latest image do not re-render anything.
+"""
+
+import base64
+import glob
+import hashlib
+import os
+import re
+from io import BytesIO
+from typing import Optional
+from PIL import Image
+from services.config_service import FILES_DIR
+
+THUMBNAIL_MAX_SIZE = (384, 384)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_PREFIX = "thumb_"
+
+
+def _safe_canvas_id(canvas_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]", "_", canvas_id)
+
+
+def thumbnail_filename(canvas_id: str, source: str) -> str:
+    """Deterministic thumbnail file name for a canvas and its source image"""
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return f"{THUMBNAIL_PREFIX}{_safe_canvas_id(canvas_id)}_{digest}.webp"
+
+
+def is_thumbnail_url(url: str) -> bool:
+    return f"/api/file/{THUMBNAIL_PREFIX}" in url
+
+
+def load_thumbnail_source(source: str) -> Optional[bytes]:
+    """
+    Resolve the thumbnail source sent by the frontend to raw image bytes.
+
+    Supports base64 data URLs and `/api/file/<name>` URLs (relative or absolute)
+    pointing at files in the local asset store.
+    """
+    if source.startswith("data:"):
+        _, _, b64_data = source.partition(",")
+        try:
+            return base64.b64decode(b64_data)
+        except Exception:
+            return None
+
+    if "/api/file/" in source:
+        filename = source.split("/api/file/")[-1].split("?")[0]
+        file_path = os.path.join(FILES_DIR, os.path.basename(filename))
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                return f.read()
+
+    return None
+
+
+def render_thumbnail(image_bytes: bytes) -> bytes:
+    """Downscale an image to thumbnail size and encode it as WEBP"""
+    with Image.open(BytesIO(image_bytes)) as image:
+        image.thumbnail(THUMBNAIL_MAX_SIZE, Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        output = BytesIO()
+        image.save(output, format="WEBP", quality=THUMBNAIL_QUALITY)
+        return output.getvalue()
+
+
+def remove_canvas_thumbnails(canvas_id: str, keep: Optional[str] = None) -> None:
+    """Remove stored thumbnails of a canvas, optionally keeping one file"""
+    pattern = os.path.join(
+        FILES_DIR, f"{THUMBNAIL_PREFIX}{_safe_canvas_id(canvas_id)}_*.webp"
+    )
+    for path in glob.glob(pattern):
+        if keep and os.path.basename(path) == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def save_canvas_thumbnail(canvas_id: str, source: Optional[str]) -> str:
+    """
+    Store a downscaled thumbnail for a canvas and return its URL.
+
+    This function is blocking (file I/O and image decoding), run it in a
+    thread pool from async code.
+
+    Args:
+        canvas_id: Canvas ID
+        source: Data URL or `/api/file/...` URL of the image to use
+
+    Returns:
+        str: Relative URL of the thumbnail, or '' if there is no usable source
+    """
+    if not source:
+        return ""
+    if is_thumbnail_url(source):
+        return source
+
+    filename = thumbnail_filename(canvas_id, source)
+    file_path = os.path.join(FILES_DIR, filename)
+    url = f"/api/file/{filename}"
+    if os.path.exists(file_path):
+        return url
+
+    image_bytes = load_thumbnail_source(source)
+    if image_bytes is None:
+        return ""
+
+    try:
+        thumbnail_bytes = render_thumbnail(image_bytes)
+    except Exception as e:
+        print(f"Error rendering thumbnail for canvas {canvas_id}: {e}")
+        return ""
+
+    os.makedirs(FILES_DIR, exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(thumbnail_bytes)
+    os.replace(tmp_path, file_path)
+
+    remove_canvas_thumbnails(canvas_id, keep=filename)
+    return url
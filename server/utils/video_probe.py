@@ -0,0 +1,417 @@
+"""
+Video probing and preview helpers
+
+Generated videos are probed without decoding them and without loading the
+whole file: only the top-level box headers of the MP4/MOV container are
+walked (seeking over `mdat`), and the `moov` box is read to get the duration
+(mvhd), dimensions (tkhd / visual sample entry) and codec (stsd) of the video
+track.
+
+Videos whose `moov` comes after `mdat` cannot start playing before they are
+fully downloaded; when all of their `mdat` boxes precede `moov` they are
+rewritten to faststart layout (moov first, chunk offsets in stco/co64 shifted
+accordingly) without re-encoding.
+
+Truncated or malformed boxes, and files without a video track of known
+dimensions, raise VideoProbeError (never struct.error) so callers can fall
+back to another probe.
+
+Poster frames and scrub-strip sprites are rendered with ffmpeg when it is
+installed and are stored next to the video in FILES_DIR:
+`<video_id>_poster.jpg` and `<video_id>_sprite.jpg`.
+
+All functions here are blocking, run them in a thread pool from async code.
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# Boxes that only contain other boxes (on the way to tkhd / mdhd / stsd / stco)
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf"}
+
+# moov is normally a few hundred KB; refuse to load anything absurd
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+POSTER_MAX_WIDTH = 1280
+SPRITE_FRAMES = 10
+SPRITE_FRAME_WIDTH = 160
+FFMPEG_TIMEOUT = 60
+
+
+class VideoProbeError(Exception):
+    """Raised when a file is not a readable MP4/MOV container"""
+
+
+def _read_box_header(f: BinaryIO, file_size: int) -> Optional[Tuple[bytes, int, int]]:
+    """Read a box header at the current position, returns (type, size, header_size)"""
+    start = f.tell()
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    size, box_type = struct.unpack(">I4s", header)
+    header_size = 8
+    if size == 1:
+        large = f.read(8)
+        if len(large) < 8:
+            return None
+        size = struct.unpack(">Q", large)[0]
+        header_size = 16
+    elif size == 0:
+        size = file_size - start
+    if size < header_size:
+        raise VideoProbeError(f"Invalid size {size} for box {box_type!r} at offset {start}")
+    return box_type, size, header_size
+
+
+def top_level_boxes(path: str) -> List[Tuple[bytes, int, int]]:
+    """
+    List the top-level boxes of a file as (type, offset, size)
+
+    Only box headers are read, box payloads (mdat) are skipped with seeks.
+    """
+    boxes: List[Tuple[bytes, int, int]] = []
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset < file_size:
+            f.seek(offset)
+            header = _read_box_header(f, file_size)
+            if header is None:
+                break
+            box_type, size, _ = header
+            boxes.append((box_type, offset, size))
+            offset += size
+    return boxes
+
+
+def _iter_boxes(data: memoryview, start: int, end: int) -> Iterator[Tuple[bytes, int, int, int]]:
+    """Iterate boxes in a buffer, yields (type, offset, size, header_size)"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            break
+        yield box_type, offset, size, header_size
+        offset += size
+
+
+def _find_child(data: memoryview, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    """Payload (start, end) of the first child box of a given type"""
+    for child_type, offset, size, header_size in _iter_boxes(data, start, end):
+        if child_type == box_type:
+            return offset + header_size, offset + size
+    return None
+
+
+def _find_path(data: memoryview, start: int, end: int, path: List[bytes]) -> Optional[Tuple[int, int]]:
+    span: Optional[Tuple[int, int]] = (start, end)
+    for box_type in path:
+        assert span is not None
+        span = _find_child(data, span[0], span[1], box_type)
+        if span is None:
+            return None
+    return span
+
+
+def _parse_mvhd(data: memoryview, start: int) -> float:
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+    return duration / timescale if timescale else 0.0
+
+
+def _parse_tkhd(data: memoryview, start: int) -> Tuple[int, int, int]:
+    """Returns (width, height, rotation in degrees)"""
+    version = data[start]
+    # Skip version/flags, times, track id, reserved and duration
+    offset = start + (36 if version == 1 else 24)
+    # reserved(8) layer(2) alternate_group(2) volume(2) reserved(2)
+    offset += 16
+    a, b, _, c, d = struct.unpack_from(">iiiii", data, offset)[:5]
+    width, height = struct.unpack_from(">II", data, offset + 36)
+    rotation = 0
+    if a == 0 and d == 0:
+        rotation = 90 if b > 0 and c < 0 else 270 if b < 0 and c > 0 else 0
+    elif a < 0 and d < 0:
+        rotation = 180
+    return width >> 16, height >> 16, rotation
+
+
+def _parse_stsd(data: memoryview, start: int, end: int) -> Tuple[str, int, int]:
+    """Codec fourcc and coded dimensions of the first sample entry"""
+    entries = _iter_boxes(data, start + 8, end)
+    for box_type, offset, _, header_size in entries:
+        entry = offset + header_size
+        # reserved(6) data_reference_index(2) pre_defined/reserved(16) width(2) height(2)
+        width, height = struct.unpack_from(">HH", data, entry + 24)
+        return box_type.decode("latin-1").strip(), width, height
+    return "", 0, 0
+
+
+def parse_moov(moov: bytes) -> Dict[str, Any]:
+    """
+    Extract duration, dimensions and codec of the video track from a moov payload
+
+    Raises:
+        VideoProbeError: A box is truncated or malformed
+    """
+    try:
+        return _parse_moov(memoryview(moov))
+    except struct.error as e:
+        raise VideoProbeError(f"Malformed moov box: {e}") from e
+
+
+def _parse_moov(data: memoryview) -> Dict[str, Any]:
+    info: Dict[str, Any] = {"duration": 0.0, "width": 0, "height": 0, "codec": ""}
+
+    mvhd = _find_child(data, 0, len(data), b"mvhd")
+    if mvhd:
+        info["duration"] = round(_parse_mvhd(data, mvhd[0]), 3)
+
+    for box_type, offset, size, header_size in _iter_boxes(data, 0, len(data)):
+        if box_type != b"trak":
+            continue
+        trak = (offset + header_size, offset + size)
+        hdlr = _find_path(data, trak[0], trak[1], [b"mdia", b"hdlr"])
+        if hdlr is None or bytes(data[hdlr[0] + 8:hdlr[0] + 12]) != b"vide":
+            continue
+
+        width = height = rotation = 0
+        tkhd = _find_child(data, trak[0], trak[1], b"tkhd")
+        if tkhd:
+            width, height, rotation = _parse_tkhd(data, tkhd[0])
+
+        stsd = _find_path(data, trak[0], trak[1], [b"mdia", b"minf", b"stbl", b"stsd"])
+        if stsd:
+            codec, coded_width, coded_height = _parse_stsd(data, stsd[0], stsd[1])
+            info["codec"] = codec
+            if not width or not height:
+                width, height = coded_width, coded_height
+
+        if rotation in (90, 270):
+            width, height = height, width
+        info["width"], info["height"], info["rotation"] = width, height, rotation
+        break
+
+    return info
+
+
+def _read_moov(path: str, boxes: List[Tuple[bytes, int, int]]) -> Tuple[bytes, int, int]:
+    """Returns (moov payload, moov offset, moov header size)"""
+    for box_type, offset, size in boxes:
+        if box_type != b"moov":
+            continue
+        if size > MAX_MOOV_SIZE:
+            raise VideoProbeError(f"moov box too large ({size} bytes)")
+        with open(path, "rb") as f:
+            f.seek(offset)
+            header = _read_box_header(f, os.path.getsize(path))
+            assert header is not None
+            header_size = header[2]
+            payload = f.read(size - header_size)
+            if len(payload) < size - header_size:
+                # Partial download: the box header promises more than the file has
+                raise VideoProbeError(
+                    f"Truncated moov box ({len(payload)} of {size - header_size} bytes)")
+            return payload, offset, header_size
+    raise VideoProbeError("No moov box found")
+
+
+def probe_video(path: str) -> Dict[str, Any]:
+    """
+    Read duration, dimensions and codec from the container header
+
+    Returns:
+        Dict with 'duration' (seconds), 'width', 'height', 'rotation', 'codec'
+        and 'faststart' (whether moov precedes mdat)
+
+    Raises:
+        VideoProbeError: Not an MP4/MOV file, truncated or malformed moov, or
+            no video track with non-zero dimensions
+    """
+    boxes = top_level_boxes(path)
+    if not boxes or boxes[0][0] not in (b"ftyp", b"wide", b"free", b"moov", b"mdat", b"skip"):
+        raise VideoProbeError(f"{os.path.basename(path)} is not an MP4/MOV file")
+
+    moov, moov_offset, _ = _read_moov(path, boxes)
+    info = parse_moov(moov)
+    if not info["width"] or not info["height"]:
+        raise VideoProbeError(f"No video track with dimensions in {os.path.basename(path)}")
+    mdat_offsets = [offset for box_type, offset, _ in boxes if box_type == b"mdat"]
+    info["faststart"] = not mdat_offsets or moov_offset < min(mdat_offsets)
+    return info
+
+
+def _shift_chunk_offsets(moov: bytearray, start: int, end: int, delta: int) -> bool:
+    """Add delta to every stco/co64 entry in place, False if stco would overflow"""
+    data = memoryview(moov)
+    for box_type, offset, size, header_size in list(_iter_boxes(data, start, end)):
+        payload = offset + header_size
+        if box_type in CONTAINER_BOXES:
+            if not _shift_chunk_offsets(moov, payload, offset + size, delta):
+                return False
+        elif box_type == b"stco":
+            count = struct.unpack_from(">I", moov, payload + 4)[0]
+            offsets = struct.unpack_from(f">{count}I", moov, payload + 8)
+            if offsets and max(offsets) + delta > 0xFFFFFFFF:
+                return False
+            struct.pack_into(f">{count}I", moov, payload + 8, *(o + delta for o in offsets))
+        elif box_type == b"co64":
+            count = struct.unpack_from(">I", moov, payload + 4)[0]
+            offsets = struct.unpack_from(f">{count}Q", moov, payload + 8)
+            struct.pack_into(f">{count}Q", moov, payload + 8, *(o + delta for o in offsets))
+    return True
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, size: int) -> None:
+    src.seek(offset)
+    remaining = size
+    while remaining > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def make_faststart(path: str) -> bool:
+    """
+    Move moov in front of mdat in place (no re-encoding)
+
+    Returns:
+        bool: True if the file was rewritten
+    """
+    boxes = top_level_boxes(path)
+    moov_entry = next((b for b in boxes if b[0] == b"moov"), None)
+    mdat_offsets = [offset for box_type, offset, _ in boxes if box_type == b"mdat"]
+    if moov_entry is None or not mdat_offsets or moov_entry[1] < min(mdat_offsets):
+        return False
+    if moov_entry[1] < max(mdat_offsets):
+        # Offsets into an mdat after moov do not move; only the all-mdat-first
+        # layout can be fixed by shifting every chunk offset
+        return False
+    if any(box_type == b"ftyp" for box_type, _, _ in boxes[1:]):
+        # ftyp must stay first; unusual layouts are left alone
+        return False
+
+    moov_payload, _, header_size = _read_moov(path, boxes)
+    moov = bytearray(struct.pack(">I4s", moov_entry[2], b"moov") if header_size == 8
+                     else struct.pack(">I4sQ", 1, b"moov", moov_entry[2]))
+    moov += moov_payload
+    if any(box_type == b"cmov" for box_type, _, _, _ in _iter_boxes(memoryview(moov), header_size, len(moov))):
+        return False
+    # Everything from the first box after ftyp moves down by the size of moov
+    try:
+        shifted = _shift_chunk_offsets(moov, header_size, len(moov), moov_entry[2])
+    except struct.error as e:
+        print(f"🎥 Skipping faststart for {path}: malformed chunk offset table ({e})")
+        return False
+    if not shifted:
+        print(f"🎥 Skipping faststart for {path}: chunk offsets overflow stco")
+        return False
+
+    tmp_path = f"{path}.faststart.tmp"
+    try:
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            leading = [b for b in boxes if b[0] == b"ftyp"]
+            for _, offset, size in leading:
+                _copy_range(src, dst, offset, size)
+            dst.write(moov)
+            for box in boxes:
+                if box[0] in (b"ftyp", b"moov"):
+                    continue
+                _copy_range(src, dst, box[1], box[2])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def run_ffmpeg(args: List[str], timeout: float = FFMPEG_TIMEOUT) -> bool:
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"🎥 ffmpeg failed: {e}")
+        return False
+    if result.returncode != 0:
+        print(f"🎥 ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+        return False
+    return True
+
+
+def render_poster(path: str, poster_path: str, duration: float) -> bool:
+    """Write a JPEG poster frame taken a little into the video"""
+    seek = min(1.0, duration / 4) if duration else 0
+    return run_ffmpeg([
+        "-ss", f"{seek:.3f}", "-i", path,
+        "-frames:v", "1",
+        "-vf", f"scale='min({POSTER_MAX_WIDTH},iw)':-2",
+        "-q:v", "3", poster_path,
+    ])
+
+
+def render_sprite(path: str, sprite_path: str, duration: float, frames: int = SPRITE_FRAMES) -> bool:
+    """Write a single-row JPEG strip of `frames` evenly spaced thumbnails"""
+    if duration <= 0:
+        return False
+    return run_ffmpeg([
+        "-i", path,
+        "-vf", f"fps={frames}/{duration:.3f},scale={SPRITE_FRAME_WIDTH}:-2,tile={frames}x1",
+        "-frames:v", "1",
+        "-q:v", "5", sprite_path,
+    ])
+
+
+def prepare_video_asset(path: str) -> Dict[str, Any]:
+    """
+    Probe a stored video, fix its layout for streaming and render previews
+
+    Poster and sprite are written next to the video as `<name>_poster.jpg`
+    and `<name>_sprite.jpg`; their file names are returned (None when ffmpeg
+    is not available or rendering failed).
+
+    Returns:
+        Dict with the probe_video() fields plus 'poster', 'sprite' and
+        'sprite_frames'
+    """
+    info = probe_video(path)
+    if not info["faststart"]:
+        if make_faststart(path):
+            info["faststart"] = True
+            print(f"🎥 Remuxed {os.path.basename(path)} to faststart")
+
+    info.update({"poster": None, "sprite": None, "sprite_frames": 0})
+    if not ffmpeg_available():
+        return info
+
+    base, _ = os.path.splitext(path)
+    poster_path = f"{base}_poster.jpg"
+    if render_poster(path, poster_path, info["duration"]):
+        info["poster"] = os.path.basename(poster_path)
+    sprite_path = f"{base}_sprite.jpg"
+    if render_sprite(path, sprite_path, info["duration"]):
+        info["sprite"] = os.path.basename(sprite_path)
+        info["sprite_frames"] = SPRITE_FRAMES
+    return info